@@ -0,0 +1,304 @@
+import argparse
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+from .localization import setup_localization
+from .metrics import ACTUATOR_WAIT, metrics
+from .prediction import VelocityPredictor
+from .tracing import (
+    CAMERA_SOURCE,
+    MANUAL_SOURCE,
+    NETWORK_SOURCE,
+    SERIAL_SOURCE,
+    SampleTrace,
+    detach_sample,
+    end_sample,
+    record_stage,
+    resume_sample,
+)
+from .window_actions import move_mouse, viewport_size
+from .workers import ACTUATOR_WORKER, supervisor
+
+_, _lang = setup_localization()
+
+logger = logging.getLogger(__name__)
+
+# The highest priority fresh source always drives the cursor
+PRIORITY_POLICY = "priority"
+# The active source keeps the cursor until it goes stale, then the highest priority fresh source takes over
+STICKY_POLICY = "sticky"
+# Every sample drives the cursor, the newest wins, as without arbitration
+LATEST_POLICY = "latest"
+ARBITRATION_POLICIES = (PRIORITY_POLICY, STICKY_POLICY, LATEST_POLICY)
+
+# Highest priority first: moves the user asks for in the GUI, the dedicated tracker on the serial port,
+# then trackers on the network, then the camera
+DEFAULT_SOURCE_PRIORITY = (MANUAL_SOURCE, SERIAL_SOURCE, NETWORK_SOURCE, CAMERA_SOURCE)
+# A source that sent nothing for this long is stale and gives up the cursor
+DEFAULT_FRESHNESS_TIMEOUT = 0.5
+
+ACCEPTED = "accepted"
+OVERRIDDEN = "overridden"
+SUPERSEDED = "superseded"
+INPUT_SAMPLES_SERIES = 'input_samples_total{{source="{}",outcome="{}"}}'
+ACTIVE_SOURCE_SERIES = 'input_active_source{{source="{}"}}'
+FAILOVERS_SERIES = "input_failovers_total"
+PREDICTION_SERIES = 'cursor_predictions_total{{outcome="{}"}}'
+
+
+class CursorTarget:
+    """
+    A position chosen for the cursor, with the trace of the sample it came from.
+    """
+
+    __slots__ = ("source", "x", "y", "speed", "submitted", "trace")
+
+    def __init__(self, source: str, x: int, y: int, speed: float, submitted: float, trace: Optional[SampleTrace]):
+        self.source = source
+        self.x = x
+        self.y = y
+        self.speed = speed
+        self.submitted = submitted
+        self.trace = trace
+
+
+class InputArbiter:
+    """
+    Chooses which coordinate source drives the cursor and passes its targets to a single
+    actuator thread. Sources submit without waiting for the cursor to move; a target that
+    arrives while the cursor is still moving replaces the one waiting, so the actuator
+    always moves to the newest target of the active source.
+    """
+
+    def __init__(self, policy: str = PRIORITY_POLICY, priority: List[str] = DEFAULT_SOURCE_PRIORITY,
+                 freshness_timeout: float = DEFAULT_FRESHNESS_TIMEOUT):
+        self.condition = threading.Condition()
+        self.configure(policy, priority, freshness_timeout)
+        self.last_sample: Dict[str, float] = {}
+        self.active_source: Optional[str] = None
+        self.pending: Optional[CursorTarget] = None
+        self.counts: Dict[str, Dict[str, int]] = {}
+        self.failovers = 0
+        # Moves the cursor ahead of the active source, if prediction is on
+        self.predictor: Optional[VelocityPredictor] = None
+
+    def configure(self, policy: str, priority: List[str], freshness_timeout: float) -> None:
+        if policy not in ARBITRATION_POLICIES:
+            raise ValueError(f"Unknown arbitration policy: {policy}, expected one of {', '.join(ARBITRATION_POLICIES)}")
+        with self.condition:
+            self.policy = policy
+            self.priority = list(priority)
+            self.freshness_timeout = freshness_timeout
+
+    def rank(self, source: str) -> int:
+        """
+        Returns the priority of a source, lower is preferred; unlisted sources come last.
+        """
+        return self.priority.index(source) if source in self.priority else len(self.priority)
+
+    def is_fresh(self, source: str, now: float) -> bool:
+        last_sample = self.last_sample.get(source)
+        return last_sample is not None and now - last_sample <= self.freshness_timeout
+
+    def select_source(self, source: str, now: float) -> str:
+        """
+        Returns the source that drives the cursor after a sample from the given source.
+        """
+        active = self.active_source
+        if self.policy == LATEST_POLICY:
+            return source
+        if self.policy == STICKY_POLICY and active is not None and self.is_fresh(active, now):
+            return active
+        fresh = [candidate for candidate in self.last_sample if self.is_fresh(candidate, now)]
+        return min(fresh, key=self.rank)
+
+    def submit(self, source: str, x: int, y: int, speed: float, now: Optional[float] = None) -> bool:
+        """
+        Offers a target from a source. Returns True if the source drives the cursor and the
+        target was queued for the actuator, False if a preferred source overrode it.
+        """
+        if now is None:
+            now = time.perf_counter()
+        with self.condition:
+            self.last_sample[source] = now
+            selected = self.select_source(source, now)
+            if selected != self.active_source:
+                self.switch_source(selected, now)
+            if selected != source:
+                self.count(source, OVERRIDDEN)
+                return False
+            self.count(source, ACCEPTED)
+            if self.predictor is not None:
+                self.predictor.add_sample(now, x, y)
+            if self.pending is not None:
+                self.count(self.pending.source, SUPERSEDED)
+                superseded = self.pending.trace
+            else:
+                superseded = None
+            self.pending = CursorTarget(source, x, y, speed, now, detach_sample())
+            self.condition.notify()
+        if superseded is not None:
+            resume_sample(superseded)
+            end_sample()  # Did not move the cursor
+        return True
+
+    def switch_source(self, source: str, now: float) -> None:
+        previous = self.active_source
+        if previous is not None:
+            metrics.set_value(ACTIVE_SOURCE_SERIES.format(previous), 0)
+            if not self.is_fresh(previous, now):
+                self.failovers += 1
+                metrics.increment(FAILOVERS_SERIES)
+        metrics.set_value(ACTIVE_SOURCE_SERIES.format(source), 1)
+        self.active_source = source
+        if self.predictor is not None:
+            self.predictor.reset()  # The velocity of one source says nothing about another
+        logger.info(_("Cursor input switched from {} to {}").format(previous or _("none"), source))
+
+    def count(self, source: str, outcome: str) -> None:
+        counts = self.counts.setdefault(source, {ACCEPTED: 0, OVERRIDDEN: 0, SUPERSEDED: 0})
+        counts[outcome] += 1
+        metrics.increment(INPUT_SAMPLES_SERIES.format(source, outcome))
+
+    def take(self, timeout: float) -> Optional[CursorTarget]:
+        """
+        Waits up to timeout seconds for the next target and removes it.
+        """
+        with self.condition:
+            if self.pending is None:
+                self.condition.wait(timeout)
+            target, self.pending = self.pending, None
+            return target
+
+    def run(self, stop_event: threading.Event, poll_interval: float = 0.1) -> None:
+        """
+        Moves the cursor to each target in turn until the stop event is set.
+        """
+        while not stop_event.is_set():
+            target = self.take(poll_interval)
+            if target is None:
+                continue
+            resume_sample(target.trace)
+            record_stage(ACTUATOR_WAIT, target.submitted)
+            x, y = self.aim(target)
+            self.measure_latency(target)
+            move_mouse(x, y, target.speed)
+            end_sample()  # Only still open if the target was rejected
+
+    def aim(self, target: CursorTarget):
+        """
+        Returns where to move the cursor for a target, ahead of it if prediction is on.
+        """
+        if self.predictor is None:
+            return target.x, target.y
+        bounds = viewport_size()
+        with self.condition:
+            predictor = self.predictor
+            if predictor is None or target.source != self.active_source:
+                return target.x, target.y
+            x, y = predictor.predict(target.x, target.y, bounds=bounds)
+            metrics.increment(PREDICTION_SERIES.format(predictor.last_outcome))
+        return x, y
+
+    def measure_latency(self, target: CursorTarget) -> None:
+        """
+        Feeds the time from the arrival of the sample to the move command to the predictor. The
+        move itself is left out: it lasts the requested speed, far longer than any useful horizon.
+        """
+        predictor = self.predictor
+        if predictor is not None:
+            arrival = target.submitted if target.trace is None else target.trace.arrival
+            with self.condition:
+                predictor.record_latency(time.perf_counter() - arrival)
+
+    def stop(self) -> None:
+        """
+        Drops the waiting target, once the actuator thread has stopped.
+        """
+        with self.condition:
+            target, self.pending = self.pending, None
+        if target is not None:
+            resume_sample(target.trace)
+            end_sample()
+
+    def set_predictor(self, predictor: Optional[VelocityPredictor]) -> None:
+        with self.condition:
+            self.predictor = predictor
+
+    def stats(self) -> Dict[str, object]:
+        with self.condition:
+            return {
+                "policy": self.policy,
+                "active_source": self.active_source,
+                "failovers": self.failovers,
+                "sources": {source: dict(counts) for source, counts in self.counts.items()},
+            }
+
+
+arbiter = InputArbiter()
+actuator_lock = threading.Lock()
+
+
+def parse_source_priority(value: str) -> List[str]:
+    """
+    Parses a comma separated source list, highest priority first, e.g. manual,serial,network,camera.
+    """
+    priority = [source.strip() for source in value.split(",") if source.strip()]
+    unknown = [source for source in priority if source not in DEFAULT_SOURCE_PRIORITY]
+    if not priority or unknown or len(set(priority)) != len(priority):
+        raise argparse.ArgumentTypeError(
+            f"invalid input priority: {value}, expected a list of {', '.join(DEFAULT_SOURCE_PRIORITY)}")
+    return priority
+
+
+def add_arbitration_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--input-policy", choices=ARBITRATION_POLICIES, default=PRIORITY_POLICY,
+                        help="how the manual, serial, network and camera inputs share the cursor")
+    parser.add_argument("--input-priority", type=parse_source_priority, default=list(DEFAULT_SOURCE_PRIORITY),
+                        help="input sources, highest priority first, e.g. manual,serial,network,camera")
+    parser.add_argument("--input-freshness", type=float, default=DEFAULT_FRESHNESS_TIMEOUT,
+                        help="seconds without samples after which an input gives up the cursor")
+
+
+def arbitration_options_requested(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Returns the --input-policy, --input-priority and --input-freshness options.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    add_arbitration_arguments(parser)
+    args, _ = parser.parse_known_args(argv)
+    return args
+
+
+def configure_arbitration(policy: str, priority: List[str], freshness_timeout: float,
+                          predictor: Optional[VelocityPredictor] = None) -> None:
+    arbiter.configure(policy, priority, freshness_timeout)
+    arbiter.set_predictor(predictor)
+    logger.info(_("Cursor input policy {}, priority {}").format(policy, ", ".join(priority)))
+    if predictor is not None:
+        logger.info(_("Cursor prediction on, at most {:.0f} ms ahead").format(predictor.max_horizon * 1000))
+
+
+def submit_target(source: str, x: int, y: int, speed: float) -> bool:
+    """
+    Offers a cursor target from a coordinate source to the arbiter, starting the actuator
+    thread if it is not running. Returns False if a preferred source overrode it.
+    """
+    if not supervisor.is_running(ACTUATOR_WORKER):
+        start_actuator()
+    return arbiter.submit(source, x, y, speed)
+
+
+def start_actuator() -> None:
+    with actuator_lock:
+        if not supervisor.is_running(ACTUATOR_WORKER):
+            supervisor.start(ACTUATOR_WORKER, arbiter.run, release=arbiter.stop)
+
+
+def stop_actuator() -> None:
+    supervisor.stop(ACTUATOR_WORKER)
+    for source, counts in arbiter.stats()["sources"].items():
+        logger.info(_("Cursor input {}: {} samples accepted, {} overridden, {} superseded").format(
+            source, counts[ACCEPTED], counts[OVERRIDDEN], counts[SUPERSEDED]))
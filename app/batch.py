@@ -0,0 +1,143 @@
+import argparse
+import csv
+import logging
+import sys
+import time
+from typing import List, NamedTuple, Optional, Union
+
+from .frame_sources import FrameSource, open_frame_source
+from .lazy_import import lazy_import
+from .localization import setup_localization
+from .video_capture import convert_aruco_marker_ids_to_coordinates, detect_aruco_markers
+
+_, _lang = setup_localization()
+
+np = lazy_import("numpy")
+
+# Stored in the NPZ output where a frame has no decoded coordinate or fewer marker ids
+MISSING_VALUE = -1
+
+
+class FrameResult(NamedTuple):
+    frame_index: int
+    marker_ids: List[int]
+    x: Optional[int]
+    y: Optional[int]
+
+    @property
+    def decoded(self) -> bool:
+        return self.x is not None and self.y is not None
+
+
+class BatchReport(NamedTuple):
+    frames: int
+    decoded_frames: int
+    seconds: float
+
+    @property
+    def frames_per_second(self) -> float:
+        return self.frames / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def success_rate(self) -> float:
+        return self.decoded_frames / self.frames if self.frames else 0.0
+
+
+def decode_frames(source: Union[int, str, FrameSource], dictionary=None):
+    """
+    Decodes the marker coordinates of every frame of the source, as fast as frames can be read.
+    Returns the per-frame results and a BatchReport.
+    """
+    frame_source = open_frame_source(source)
+    results = []
+    started = time.perf_counter()
+    try:
+        while True:
+            ret, frame = frame_source.read()
+            if not ret:
+                break
+            marker_ids = [int(marker_id) for marker_id in detect_aruco_markers(frame, dictionary)]
+            x, y = convert_aruco_marker_ids_to_coordinates(marker_ids)
+            results.append(FrameResult(len(results), marker_ids, x, y))
+    finally:
+        frame_source.release()
+    seconds = time.perf_counter() - started
+
+    report = BatchReport(len(results), sum(1 for result in results if result.decoded), seconds)
+    return results, report
+
+
+def write_results_csv(results: List[FrameResult], path: str) -> None:
+    with open(path, "w", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["frame_index", "marker_ids", "x", "y", "decoded"])
+        for result in results:
+            writer.writerow([
+                result.frame_index,
+                " ".join(str(marker_id) for marker_id in result.marker_ids),
+                "" if result.x is None else result.x,
+                "" if result.y is None else result.y,
+                int(result.decoded),
+            ])
+
+
+def write_results_npz(results: List[FrameResult], path: str) -> None:
+    id_columns = max((len(result.marker_ids) for result in results), default=0)
+    marker_ids = np.full((len(results), id_columns), MISSING_VALUE, dtype=np.int32)
+    for row, result in enumerate(results):
+        marker_ids[row, :len(result.marker_ids)] = result.marker_ids
+    np.savez_compressed(
+        path,
+        frame_index=np.array([result.frame_index for result in results], dtype=np.int64),
+        marker_ids=marker_ids,
+        x=np.array([MISSING_VALUE if result.x is None else result.x for result in results], dtype=np.int32),
+        y=np.array([MISSING_VALUE if result.y is None else result.y for result in results], dtype=np.int32),
+        decoded=np.array([result.decoded for result in results], dtype=bool),
+    )
+
+
+def write_results(results: List[FrameResult], path: str) -> None:
+    """
+    Writes per-frame results as CSV or NPZ, depending on the file extension.
+    """
+    if path.lower().endswith(".npz"):
+        write_results_npz(results, path)
+    else:
+        write_results_csv(results, path)
+
+
+def format_report(report: BatchReport) -> str:
+    return _("{} frames in {:.2f}s ({:.1f} fps), decoded {} ({:.1%})").format(
+        report.frames, report.seconds, report.frames_per_second, report.decoded_frames, report.success_rate
+    )
+
+
+def batch_main(argv: Optional[List[str]] = None) -> int:
+    """
+    Entry point for headless batch decoding of a video file or image directory.
+    """
+    parser = argparse.ArgumentParser(description=_("Decode ArUco marker coordinates from recorded frames."))
+    parser.add_argument("source", help=_("video file, image directory or camera index"))
+    parser.add_argument("-o", "--output", help=_("write per-frame results to this .csv or .npz file"))
+    parser.add_argument("--dictionary", type=int, default=None, help=_("cv2.aruco predefined dictionary id"))
+    parser.add_argument("--verbose", action="store_true", help=_("keep the per-frame detection log"))
+    args, _unknown = parser.parse_known_args(argv)
+
+    if not args.verbose:
+        # The per-frame detection log would dominate the run time
+        logging.getLogger().setLevel(logging.CRITICAL)
+
+    try:
+        results, report = decode_frames(args.source, args.dictionary)
+    except IOError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    if args.output:
+        write_results(results, args.output)
+    print(format_report(report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(batch_main())
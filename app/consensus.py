@@ -0,0 +1,83 @@
+import logging
+from collections import Counter, deque
+from typing import Callable, NamedTuple, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW_SIZE = 5
+DEFAULT_MIN_AGREEMENT = 3
+
+# Vote cast by frames that do not contain exactly four marker ids
+NO_DECODE = None
+
+
+class ConsensusResult(NamedTuple):
+    x: Optional[int]
+    y: Optional[int]
+    # Share of the window that voted for (x, y)
+    confidence: float
+    # True only on the frame where (x, y) became the stable coordinate
+    changed: bool
+
+
+class ConsensusDecoder:
+    """
+    Votes over the marker id tuples of the last frames and only reports a coordinate
+    once enough of them agree, so a single misdetected frame cannot move the cursor.
+    """
+
+    def __init__(
+        self,
+        convert: Callable[[Sequence[int]], Tuple[Optional[int], Optional[int]]],
+        window_size: int = DEFAULT_WINDOW_SIZE,
+        min_agreement: int = DEFAULT_MIN_AGREEMENT,
+    ):
+        """
+        convert turns an agreed id tuple into coordinates, normally convert_aruco_marker_ids_to_coordinates.
+        """
+        if not 0 < min_agreement <= window_size:
+            raise ValueError(f"min_agreement must be between 1 and window_size: {min_agreement}")
+        self.convert = convert
+        self.window_size = window_size
+        self.min_agreement = min_agreement
+        self.history = deque()
+        self.votes = Counter()
+        self.leader = NO_DECODE
+        self.stable_ids: Optional[Tuple[int, ...]] = None
+        self.stable_coordinates: Tuple[Optional[int], Optional[int]] = (None, None)
+
+    def reset(self) -> None:
+        self.history.clear()
+        self.votes.clear()
+        self.leader = NO_DECODE
+        self.stable_ids = None
+        self.stable_coordinates = (None, None)
+
+    def update(self, marker_ids: Sequence[int]) -> ConsensusResult:
+        """
+        Adds the marker ids of one frame and returns the current stable coordinate.
+        """
+        vote = tuple(int(marker_id) for marker_id in marker_ids) if len(marker_ids) == 4 else NO_DECODE
+        self.history.append(vote)
+        self.votes[vote] += 1
+        if len(self.history) > self.window_size:
+            dropped = self.history.popleft()
+            self.votes[dropped] -= 1
+            if not self.votes[dropped]:
+                del self.votes[dropped]
+
+        # A vote for the current leader keeps it in the lead, so only other votes need a recount
+        if vote != self.leader:
+            self.leader = max(self.votes, key=lambda candidate: (candidate is not NO_DECODE, self.votes[candidate]))
+
+        changed = False
+        if (self.leader is not NO_DECODE and self.leader != self.stable_ids
+                and self.votes[self.leader] >= self.min_agreement):
+            self.stable_ids = self.leader
+            self.stable_coordinates = self.convert(list(self.leader))
+            changed = True
+            logger.debug("stable marker_ids: %s", self.leader)
+
+        x, y = self.stable_coordinates
+        confidence = self.votes.get(self.stable_ids, 0) / self.window_size if self.stable_ids else 0.0
+        return ConsensusResult(x, y, confidence, changed)
@@ -0,0 +1,260 @@
+import argparse
+import json
+import logging
+import signal
+import sys
+import threading
+import tkinter as tk
+from typing import List, Optional
+
+from .arbitration import add_arbitration_arguments, configure_arbitration, stop_actuator
+from .gaze_stream import DEFAULT_GAZE_STREAM_NAME, start_gaze_stream, stop_gaze_stream
+from .localization import setup_localization
+from .log_policy import configure_logging, parse_log_level
+from .logging_handlers import LOG_FORMAT, start_queue_logging, stop_queue_logging
+from .metrics import metrics, write_metrics
+from .multi_camera import start_multi_camera_thread
+from .network_input import parse_network_address, start_network_input, stop_network_input
+from .prediction import add_prediction_arguments, create_predictor
+from .profiling import PROFILE_MODES, start_profiler, stop_profiler, write_profile_report
+from .serial import (
+    CALIBRATION_DONE,
+    CALIBRATION_REQUIRED,
+    CalibrationDoneCommand,
+    CalibrationRequiredCommand,
+    Command,
+    CommandParser,
+    CoordinateCommand,
+    disconnect_from_serial,
+    start_serial_thread,
+)
+from .session_recorder import add_recording_arguments, start_session_recorder, stop_session_recorder
+from .tracing import trace_buffer
+from .ui_dispatcher import ui_dispatcher
+from .video_capture import start_video_thread, stop_video_capture
+
+_, _lang = setup_localization()
+
+DEFAULT_BAUD_RATE = 9600
+DEFAULT_METRICS_INTERVAL = 10.0
+# How often the Tk root is serviced when overlays are enabled
+OVERLAY_POLL_INTERVAL = 0.02
+
+stop_event = threading.Event()
+
+
+class OverlayDisabledCommand(Command):
+    """
+    Accepts a calibration command without showing anything, for a daemon started without overlays.
+    """
+
+    def __init__(self, command: str):
+        self.command = command
+
+    def matches(self, line: str) -> bool:
+        return line.strip() == self.command
+
+    def execute(self, line: str) -> bool:
+        logging.info(_("{}: ignored, overlays are disabled").format(self.command))
+        return True
+
+
+def create_command_parser(overlay: bool) -> CommandParser:
+    if overlay:
+        return CommandParser([CoordinateCommand(), CalibrationRequiredCommand(), CalibrationDoneCommand()])
+    return CommandParser([
+        CoordinateCommand(),
+        OverlayDisabledCommand(CALIBRATION_REQUIRED),
+        OverlayDisabledCommand(CALIBRATION_DONE),
+    ])
+
+
+def load_config(path: str) -> dict:
+    """
+    Reads daemon options from a JSON file, with the long option names as keys,
+    e.g. {"serial_port": "/dev/ttyUSB0", "camera": "0", "overlay": false}, or "cameras": ["0", "1"].
+    """
+    with open(path) as config_file:
+        config = json.load(config_file)
+    if not isinstance(config, dict):
+        raise ValueError(_("Config file {} must contain a JSON object").format(path))
+    return {key.replace("-", "_"): value for key, value in config.items()}
+
+
+def validate_config(parser: argparse.ArgumentParser, config: dict) -> dict:
+    """
+    Checks the config values against the options they set, which argparse does not do for
+    defaults, and returns them ready for set_defaults. A single log_level becomes a list.
+    Raises ValueError for unknown options and values outside the choices of an option.
+    """
+    actions = {action.dest: action for action in parser._actions if action.dest != "help"}
+    config = dict(config)
+    if isinstance(config.get("log_level"), str):
+        config["log_level"] = [config["log_level"]]
+    for key, value in config.items():
+        action = actions.get(key)
+        if action is None:
+            raise ValueError(_("Unknown option in config file: {}").format(key))
+        if action.choices is None:
+            continue
+        for item in value if isinstance(value, list) else [value]:
+            if item not in action.choices:
+                raise ValueError(_("Invalid {} in config file: {}, expected one of {}").format(
+                    key, item, ", ".join(str(choice) for choice in action.choices)))
+    return config
+
+
+def parse_daemon_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Parses the daemon options; options given on the command line override the config file.
+    """
+    config_parser = argparse.ArgumentParser(add_help=False)
+    config_parser.add_argument("--config", help=_("JSON file with default values for these options"))
+    config_args, _unknown = config_parser.parse_known_args(argv)
+
+    parser = argparse.ArgumentParser(
+        parents=[config_parser],
+        description=_("Drive the cursor from serial and camera input without the control window."),
+    )
+    parser.add_argument("--serial-port", help=_("serial port to read coordinates from"))
+    parser.add_argument("--baud-rate", type=int, default=DEFAULT_BAUD_RATE)
+    parser.add_argument("--camera", help=_("camera index, video file or image directory to decode markers from"))
+    parser.add_argument("--cameras", nargs="+", metavar="CAMERA",
+                        help=_("capture from several cameras, video files or image directories at once"))
+    parser.add_argument("--network-input", type=parse_network_address,
+                        help=_("receive commands on udp://HOST:PORT or tcp://HOST:PORT"))
+    parser.add_argument("--gaze-stream", nargs="?", const=DEFAULT_GAZE_STREAM_NAME,
+                        help=_("publish decoded gaze samples to this shared memory ring"))
+    add_arbitration_arguments(parser)
+    add_prediction_arguments(parser)
+    add_recording_arguments(parser)
+    parser.add_argument("--overlay", action="store_true",
+                        help=_("create a hidden Tk root to show calibration overlays"))
+    parser.add_argument("--metrics-file", help=_("write a latency snapshot to this .json or .prom file"))
+    parser.add_argument("--metrics-interval", type=float, default=DEFAULT_METRICS_INTERVAL,
+                        help=_("seconds between metrics file writes"))
+    parser.add_argument("--trace-file", help=_("write the latency traces to this file on exit"))
+    parser.add_argument("--profile", choices=PROFILE_MODES, help=_("profile CPU or memory until exit"))
+    parser.add_argument("--profile-dir", help=_("directory for the profile reports"))
+    parser.add_argument("--log-level", action="append", default=[],
+                        help=_("LEVEL for all logging or SUBSYSTEM=LEVEL, may be repeated"))
+    parser.add_argument("--lang", default="en", help=argparse.SUPPRESS)  # Read by setup_localization
+
+    if config_args.config:
+        try:
+            parser.set_defaults(**validate_config(parser, load_config(config_args.config)))
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    args = parser.parse_args(argv)
+    if isinstance(args.network_input, str):  # From the config file
+        try:
+            args.network_input = parse_network_address(args.network_input)
+        except argparse.ArgumentTypeError as e:
+            parser.error(str(e))
+    if args.camera is not None and args.cameras:
+        parser.error(_("give either --camera or --cameras"))
+    if not args.serial_port and args.camera is None and not args.cameras and args.network_input is None:
+        parser.error(_("nothing to do, give --serial-port, --camera or --cameras and/or --network-input"))
+    try:
+        args.log_level = dict(parse_log_level(value) for value in args.log_level)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    return args
+
+
+def request_stop(signum=None, frame=None) -> None:
+    stop_event.set()
+
+
+def export_metrics(path: str) -> None:
+    try:
+        write_metrics(path)
+    except OSError as e:
+        logging.error(_("Cannot export latency metrics to {}: {}").format(path, e))
+
+
+def create_overlay_root():
+    """
+    Creates the hidden Tk root that overlay windows need and lets worker threads post to it.
+    """
+    root = tk.Tk()
+    root.withdraw()
+    ui_dispatcher.attach(root)
+    return root
+
+
+def run_until_stopped(args: argparse.Namespace, root=None) -> None:
+    """
+    Waits on the main thread for SIGTERM or SIGINT, servicing the Tk root and writing
+    the metrics file meanwhile.
+    """
+    poll_interval = OVERLAY_POLL_INTERVAL if root is not None else args.metrics_interval
+    polls_per_export = max(1, round(args.metrics_interval / poll_interval))
+    polls = 0
+    while not stop_event.wait(poll_interval):
+        if root is not None:
+            root.update()
+        polls += 1
+        if args.metrics_file and polls % polls_per_export == 0:
+            export_metrics(args.metrics_file)
+
+
+def daemon_main(argv: Optional[List[str]] = None) -> int:
+    """
+    Entry point for running the serial and camera ingestion without the Tk control window.
+    """
+    args = parse_daemon_args(argv)
+    configure_logging(LOG_FORMAT, levels=args.log_level)
+    start_queue_logging(list(logging.getLogger().handlers))
+    if args.profile:
+        start_profiler(args.profile, args.profile_dir)
+
+    stop_event.clear()
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    root = create_overlay_root() if args.overlay else None
+    exit_code = 0
+    configure_arbitration(args.input_policy, args.input_priority, args.input_freshness, create_predictor(args))
+    try:
+        if args.gaze_stream:
+            start_gaze_stream(args.gaze_stream)
+        start_session_recorder(args)
+        if args.serial_port and not start_serial_thread(
+                args.serial_port, args.baud_rate, create_command_parser(args.overlay)):
+            exit_code = 1
+        elif args.network_input and not start_network_input(*args.network_input, create_command_parser(args.overlay)):
+            exit_code = 1
+        else:
+            if args.cameras:
+                start_multi_camera_thread(args.cameras)
+            elif args.camera is not None:
+                start_video_thread(args.camera, None)  # No preview canvas
+            logging.info(_("Eye tracker daemon running, send SIGTERM to stop"))
+            run_until_stopped(args, root)
+    finally:
+        logging.info(_("Stopping eye tracker daemon"))
+        disconnect_from_serial()
+        stop_network_input()
+        stop_video_capture()
+        stop_session_recorder()
+        stop_actuator()
+        stop_gaze_stream()
+        if args.metrics_file:
+            export_metrics(args.metrics_file)
+        if args.trace_file:
+            trace_buffer.write_chrome_trace(args.trace_file)
+        write_profile_report()
+        stop_profiler()
+        if root is not None:
+            ui_dispatcher.detach()
+            root.destroy()
+        end_to_end = metrics.snapshot()["end_to_end"]
+        logging.info(_("Moved the cursor {} times, p95 latency {:.1f} ms").format(
+            end_to_end["count"], end_to_end["p95"] * 1000))
+        stop_queue_logging()
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(daemon_main())
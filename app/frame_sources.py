@@ -0,0 +1,190 @@
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple, Union
+
+from .lazy_import import lazy_import
+from .localization import setup_localization
+
+_, _lang = setup_localization()
+
+logger = logging.getLogger(__name__)
+
+cv2 = lazy_import("cv2")
+
+IMAGE_EXTENSIONS = (".bmp", ".jpeg", ".jpg", ".png", ".tif", ".tiff")
+DEFAULT_CAPTURE_WIDTH = 1920
+DEFAULT_CAPTURE_HEIGHT = 1080
+
+
+class FrameSource(ABC):
+    """
+    Abstract base class for anything frames can be read from.
+    """
+
+    # Live sources retry failed reads, recorded ones stop at the first failed read
+    is_live = False
+
+    @abstractmethod
+    def is_opened(self) -> bool:
+        """
+        Checks if the source is open and can deliver frames.
+        """
+        pass
+
+    @abstractmethod
+    def read(self):
+        """
+        Reads the next frame, returning (ok, frame) like cv2.VideoCapture.read.
+        """
+        pass
+
+    @abstractmethod
+    def release(self) -> None:
+        """
+        Releases the underlying device or file handles.
+        """
+        pass
+
+    def grab(self) -> bool:
+        """
+        Advances to the next frame without decoding it, if the source supports that.
+        """
+        return self.is_opened()
+
+    def retrieve(self):
+        """
+        Decodes the frame selected by the last grab.
+        """
+        return self.read()
+
+    def frame_size(self) -> Optional[Tuple[int, int]]:
+        """
+        Returns the (width, height) of the frames the source delivers, or None if it cannot tell.
+        """
+        return None
+
+
+class VideoCaptureFrameSource(FrameSource):
+    """
+    Frame source backed by a cv2.VideoCapture.
+    """
+
+    def __init__(self, target: Union[int, str]):
+        self.target = target
+        self.capture = cv2.VideoCapture(target)
+
+    def is_opened(self) -> bool:
+        return self.capture.isOpened()
+
+    def read(self):
+        return self.capture.read()
+
+    def grab(self) -> bool:
+        return self.capture.grab()
+
+    def retrieve(self):
+        return self.capture.retrieve()
+
+    def frame_size(self) -> Optional[Tuple[int, int]]:
+        # A camera reports the size it settled on, which may differ from the one asked for
+        width = int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        return (width, height) if width and height else None
+
+    def release(self) -> None:
+        self.capture.release()
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.target!r})"
+
+
+class CameraFrameSource(VideoCaptureFrameSource):
+    """
+    Frame source for a live camera, identified by its device index.
+    """
+
+    is_live = True
+
+    def __init__(self, device_index: int, width: int = DEFAULT_CAPTURE_WIDTH, height: int = DEFAULT_CAPTURE_HEIGHT):
+        super().__init__(device_index)
+        self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+
+
+class VideoFileFrameSource(VideoCaptureFrameSource):
+    """
+    Frame source for a recorded video file.
+    """
+
+    def frame_count(self) -> int:
+        return int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT))
+
+
+class ImageDirectoryFrameSource(FrameSource):
+    """
+    Frame source for a directory of still images, read in file name order.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.paths: List[str] = []
+        if os.path.isdir(directory):
+            self.paths = sorted(
+                os.path.join(directory, name)
+                for name in os.listdir(directory)
+                if name.lower().endswith(IMAGE_EXTENSIONS)
+            )
+        self.position = 0
+        self.released = False
+
+    def is_opened(self) -> bool:
+        return not self.released and bool(self.paths)
+
+    def grab(self) -> bool:
+        if not self.is_opened() or self.position >= len(self.paths):
+            return False
+        self.position += 1
+        return True
+
+    def retrieve(self):
+        frame = cv2.imread(self.paths[self.position - 1])
+        if frame is None:
+            logger.warning(_("Cannot read image {}").format(self.paths[self.position - 1]))
+            return False, None
+        return True, frame
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def frame_count(self) -> int:
+        return len(self.paths)
+
+    def release(self) -> None:
+        self.released = True
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.directory!r})"
+
+
+def open_frame_source(source: Union[int, str, FrameSource],
+                      capture_size: Optional[Tuple[int, int]] = None) -> FrameSource:
+    """
+    Opens a frame source from a device index, a video file path or an image directory.
+    A camera is asked for capture_size (width, height), if given.
+    Raises IOError if the source cannot be opened.
+    """
+    if isinstance(source, FrameSource):
+        frame_source = source
+    elif isinstance(source, int) or (isinstance(source, str) and source.isdigit()):
+        frame_source = CameraFrameSource(int(source), *(capture_size or ()))
+    elif os.path.isdir(source):
+        frame_source = ImageDirectoryFrameSource(source)
+    else:
+        frame_source = VideoFileFrameSource(source)
+
+    if not frame_source.is_opened():
+        raise IOError(_("Cannot open frame source {}").format(source))
+    return frame_source
@@ -0,0 +1,238 @@
+import argparse
+import functools
+import logging
+import threading
+import time
+from typing import List, Optional
+
+from .lazy_import import lazy_import
+from .localization import setup_localization
+from .tracing import SOURCE_THREAD_IDS
+
+_, _lang = setup_localization()
+
+logger = logging.getLogger(__name__)
+
+# Only imported once a stream is published or read
+np = lazy_import("numpy")
+shared_memory = lazy_import("multiprocessing.shared_memory")
+resource_tracker = lazy_import("multiprocessing.resource_tracker")
+
+DEFAULT_GAZE_STREAM_NAME = "eye-tracker-gaze"
+# About 4 seconds of 1 kHz input, how far a reader may fall behind before it loses samples
+DEFAULT_GAZE_STREAM_CAPACITY = 4096
+
+GAZE_STREAM_MAGIC = 0x47415A45  # "GAZE"
+GAZE_STREAM_VERSION = 1
+# Header slots, int64 each, followed by the records at HEADER_BYTES
+MAGIC_SLOT, VERSION_SLOT, CAPACITY_SLOT, WRITE_COUNT_SLOT = range(4)
+HEADER_BYTES = 64
+
+# Numeric source codes in the records, the same as the trace lanes
+SOURCE_CODES = SOURCE_THREAD_IDS
+SOURCE_NAMES = {code: source for source, code in SOURCE_CODES.items()}
+
+gaze_publisher: Optional["GazePublisher"] = None
+# Shared memory names of the streams published by this process
+published_streams = set()
+
+
+@functools.lru_cache(maxsize=None)
+def gaze_sample_dtype():
+    """
+    One record of the ring. sequence is the index of the sample since the stream was created,
+    timestamp is time.time() seconds, x and y are screen pixels and confidence is 0 to 1.
+    """
+    return np.dtype([
+        ("sequence", "<i8"),
+        ("timestamp", "<f8"),
+        ("x", "<f8"),
+        ("y", "<f8"),
+        ("confidence", "<f4"),
+        ("source", "<u4"),
+    ])
+
+
+def gaze_stream_size(capacity: int) -> int:
+    return HEADER_BYTES + capacity * gaze_sample_dtype().itemsize
+
+
+def map_gaze_stream(buffer):
+    """
+    Returns the header and record arrays viewing a shared memory buffer, without copying.
+    """
+    header = np.ndarray((4,), dtype="<i8", buffer=buffer)
+    records = np.ndarray((int(header[CAPACITY_SLOT]),), dtype=gaze_sample_dtype(), buffer=buffer, offset=HEADER_BYTES)
+    return header, records
+
+
+class GazePublisher:
+    """
+    Single producer of a ring of gaze samples in shared memory. Publishing writes the record
+    and then advances the write count, and never waits: a reader that falls more than a ring
+    behind loses the oldest samples instead of holding the producer back. The serial, network
+    and camera threads take turns through a lock that readers never touch.
+    """
+
+    def __init__(self, name: str = DEFAULT_GAZE_STREAM_NAME, capacity: int = DEFAULT_GAZE_STREAM_CAPACITY):
+        self.name = name
+        self.capacity = capacity
+        try:
+            self.memory = shared_memory.SharedMemory(name=name, create=True, size=gaze_stream_size(capacity))
+        except FileExistsError:
+            # Left behind by a process that did not exit cleanly
+            logger.warning(_("Replacing the existing gaze stream {}").format(name))
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.memory = shared_memory.SharedMemory(name=name, create=True, size=gaze_stream_size(capacity))
+        header = np.ndarray((4,), dtype="<i8", buffer=self.memory.buf)
+        header[:] = (GAZE_STREAM_MAGIC, GAZE_STREAM_VERSION, capacity, 0)
+        self.header, self.records = map_gaze_stream(self.memory.buf)
+        self.records["sequence"] = -1
+        self.write_count = 0
+        published_streams.add(self.memory._name)
+        self.lock = threading.Lock()
+
+    def publish(self, x: float, y: float, source: str, confidence: float = 1.0,
+                timestamp: Optional[float] = None) -> None:
+        with self.lock:
+            if self.records is None:
+                return  # Closed by another thread
+            index = self.write_count
+            self.records[index % self.capacity] = (
+                index, time.time() if timestamp is None else timestamp, x, y, confidence, SOURCE_CODES.get(source, 0))
+            self.write_count = index + 1
+            self.header[WRITE_COUNT_SLOT] = self.write_count  # Publishes the record to readers
+
+    def close(self) -> None:
+        """
+        Removes the stream; attached readers keep their mapping until they close it.
+        """
+        with self.lock:
+            if self.memory is None:
+                return
+            self.header = self.records = None  # The mapping cannot be closed while arrays view it
+            published_streams.discard(self.memory._name)
+            self.memory.close()
+            self.memory.unlink()
+            self.memory = None
+
+
+class GazeStreamReader:
+    """
+    Attaches to a gaze stream published by another process, or this one. read() returns
+    the samples published since the previous call as a view into the shared ring; copy
+    what you need and check intact() before trusting the copy, because the producer may
+    overwrite the oldest samples at any time.
+    """
+
+    def __init__(self, name: str = DEFAULT_GAZE_STREAM_NAME, from_start: bool = False):
+        self.memory = shared_memory.SharedMemory(name=name)
+        # The stream belongs to the publisher, the tracker must not unlink it when this process exits
+        if shared_memory._USE_POSIX and self.memory._name not in published_streams:
+            resource_tracker.unregister(self.memory._name, "shared_memory")
+        self.header, self.records = map_gaze_stream(self.memory.buf)
+        if int(self.header[MAGIC_SLOT]) != GAZE_STREAM_MAGIC or int(self.header[VERSION_SLOT]) != GAZE_STREAM_VERSION:
+            self.close()
+            raise ValueError(_("{} is not a gaze stream of version {}").format(name, GAZE_STREAM_VERSION))
+        self.capacity = int(self.header[CAPACITY_SLOT])
+        self.cursor = max(0, self.write_count() - self.capacity + 1) if from_start else self.write_count()
+        self.read_start = self.cursor
+        self.lost = 0
+
+    def write_count(self) -> int:
+        """
+        Number of samples published since the stream was created.
+        """
+        return int(self.header[WRITE_COUNT_SLOT])
+
+    def read(self):
+        """
+        Returns a view of the samples published since the last read, oldest first. A view
+        ends at the end of the ring, so call again until it comes back empty to catch up.
+        Samples overwritten before they were read are counted in lost.
+        """
+        write_count = self.write_count()
+        # The slot of write_count - capacity may be being overwritten right now
+        oldest = write_count - self.capacity + 1
+        if self.cursor < oldest:
+            self.lost += oldest - self.cursor
+            self.cursor = oldest
+        start = self.cursor % self.capacity
+        count = min(write_count - self.cursor, self.capacity - start)
+        self.read_start = self.cursor
+        self.cursor += count
+        return self.records[start:start + count]
+
+    def intact(self) -> bool:
+        """
+        Returns True if the samples returned by the last read have not been overwritten since.
+        """
+        return self.read_start == self.cursor or self.read_start > self.write_count() - self.capacity
+
+    def latest(self):
+        """
+        Returns a copy of the newest sample, or None if nothing was published yet.
+        """
+        while True:
+            write_count = self.write_count()
+            if write_count == 0:
+                return None
+            sample = self.records[(write_count - 1) % self.capacity].copy()
+            if int(sample["sequence"]) == write_count - 1:
+                return sample
+
+    def close(self) -> None:
+        """
+        Detaches from the stream; views returned by read() must be deleted first.
+        """
+        self.header = self.records = None
+        self.memory.close()
+
+
+def source_name(code: int) -> str:
+    return SOURCE_NAMES.get(int(code), "unknown")
+
+
+def gaze_stream_requested(argv: Optional[List[str]] = None) -> Optional[str]:
+    """
+    Returns the --gaze-stream name, if given.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--gaze-stream", nargs="?", const=DEFAULT_GAZE_STREAM_NAME, default=None,
+                        help="publish decoded gaze samples to this shared memory ring")
+    args, _ = parser.parse_known_args(argv)
+    return args.gaze_stream
+
+
+def start_gaze_stream(name: str = DEFAULT_GAZE_STREAM_NAME, capacity: int = DEFAULT_GAZE_STREAM_CAPACITY) -> bool:
+    """
+    Starts publishing decoded samples to the named stream. Returns True if it could be created.
+    """
+    global gaze_publisher
+    stop_gaze_stream()
+    try:
+        gaze_publisher = GazePublisher(name, capacity)
+    except (OSError, ValueError) as e:
+        logger.error(_("Cannot create gaze stream {}: {}").format(name, e))
+        return False
+    logger.info(_("Publishing gaze samples to shared memory {}").format(name))
+    return True
+
+
+def stop_gaze_stream() -> None:
+    global gaze_publisher
+    publisher, gaze_publisher = gaze_publisher, None
+    if publisher is not None:
+        logger.info(_("Stopped gaze stream {} after {} samples").format(publisher.name, publisher.write_count))
+        publisher.close()
+
+
+def publish_gaze_sample(x: float, y: float, source: str, confidence: float = 1.0) -> None:
+    """
+    Publishes a sample if a gaze stream was started, and does nothing otherwise.
+    """
+    publisher = gaze_publisher
+    if publisher is not None:
+        publisher.publish(x, y, source, confidence)
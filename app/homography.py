@@ -0,0 +1,195 @@
+import json
+import logging
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from .lazy_import import lazy_import
+from .localization import setup_localization
+from .user_dirs import user_config_dir
+from .window_actions import MarkerPosition, get_overlay_marker_coordinates, get_overlay_marker_size
+
+_, _lang = setup_localization()
+
+logger = logging.getLogger(__name__)
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+HOMOGRAPHY_FILE_NAME = "homography.json"
+# At least four markers, so one bad marker cannot dominate the solution
+MIN_CALIBRATION_MARKERS = 4
+RANSAC_REPROJECTION_THRESHOLD = 3.0
+# Re-solve once the mean reprojection error exceeds this many screen pixels
+DEFAULT_MAX_REPROJECTION_ERROR = 8.0
+
+
+def calibration_marker_screen_corners(screen_width, screen_height, marker_size=None):
+    """
+    Returns the screen corners of each overlay marker by id, in ArUco corner order
+    (top left, top right, bottom right, bottom left).
+    """
+    if marker_size is None:
+        marker_size = get_overlay_marker_size(screen_width, screen_height)
+    screen_corners = {}
+    for position in MarkerPosition:
+        x, y = get_overlay_marker_coordinates(position, marker_size, screen_width, screen_height)
+        screen_corners[position.value] = np.array(
+            [[x, y], [x + marker_size, y], [x + marker_size, y + marker_size], [x, y + marker_size]], dtype=np.float32
+        )
+    return screen_corners
+
+
+def match_marker_corners(camera_corners: Dict[int, "np.ndarray"], screen_corners: Dict[int, "np.ndarray"]):
+    """
+    Pairs up the corners of the markers seen by the camera with their screen positions.
+    Returns two (N, 2) arrays and the number of markers matched.
+    """
+    marker_ids = sorted(set(camera_corners) & set(screen_corners))
+    if not marker_ids:
+        return np.empty((0, 2), np.float32), np.empty((0, 2), np.float32), 0
+    camera_points = np.concatenate([camera_corners[marker_id] for marker_id in marker_ids]).astype(np.float32)
+    screen_points = np.concatenate([screen_corners[marker_id] for marker_id in marker_ids]).astype(np.float32)
+    return camera_points, screen_points, len(marker_ids)
+
+
+class ScreenHomography:
+    """
+    Maps camera pixel coordinates to screen coordinates through a solved homography.
+    """
+
+    def __init__(self, matrix, screen_size: Tuple[int, int], reprojection_error: float = 0.0,
+                 solved_at: Optional[float] = None):
+        self.matrix = np.asarray(matrix, dtype=np.float64)
+        self.screen_size = tuple(screen_size)
+        self.reprojection_error = reprojection_error
+        self.solved_at = time.time() if solved_at is None else solved_at
+
+    @classmethod
+    def solve(cls, camera_points, screen_points, screen_size: Tuple[int, int]) -> "ScreenHomography":
+        """
+        Solves the homography from matched points; raises ValueError if it cannot be solved.
+        """
+        if len(camera_points) < 4:
+            raise ValueError(_("At least 4 point pairs are needed, got {}").format(len(camera_points)))
+        matrix, _inliers = cv2.findHomography(camera_points, screen_points, cv2.RANSAC, RANSAC_REPROJECTION_THRESHOLD)
+        if matrix is None:
+            raise ValueError(_("Cannot solve camera to screen homography"))
+        homography = cls(matrix, screen_size)
+        homography.reprojection_error = homography.error(camera_points, screen_points)
+        return homography
+
+    def map_points(self, camera_points):
+        """
+        Maps an (N, 2) array of camera points to screen points in one vectorized call.
+        """
+        points = np.asarray(camera_points, dtype=np.float32).reshape(-1, 1, 2)
+        return cv2.perspectiveTransform(points, self.matrix).reshape(-1, 2)
+
+    def map_point(self, x: float, y: float) -> Tuple[int, int]:
+        """
+        Maps one camera point to integer screen coordinates, clamped to the screen.
+        """
+        screen_x, screen_y = self.map_points([[x, y]])[0]
+        width, height = self.screen_size
+        return int(min(max(round(screen_x), 0), width - 1)), int(min(max(round(screen_y), 0), height - 1))
+
+    def error(self, camera_points, screen_points) -> float:
+        """
+        Returns the mean distance in screen pixels between mapped camera points and their screen points.
+        """
+        if len(camera_points) == 0:
+            return 0.0
+        return float(np.mean(np.linalg.norm(self.map_points(camera_points) - screen_points, axis=1)))
+
+    def to_dict(self):
+        return {
+            "matrix": self.matrix.tolist(),
+            "screen_size": list(self.screen_size),
+            "reprojection_error": self.reprojection_error,
+            "solved_at": self.solved_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data) -> "ScreenHomography":
+        return cls(data["matrix"], data["screen_size"], data["reprojection_error"], data["solved_at"])
+
+
+def default_homography_path() -> str:
+    return os.path.join(user_config_dir(), HOMOGRAPHY_FILE_NAME)
+
+
+class HomographyCalibrator:
+    """
+    Keeps a persisted camera to screen homography and re-solves it from the calibration
+    overlay markers whenever its reprojection error drifts past max_error.
+    """
+
+    def __init__(self, screen_size: Tuple[int, int], path: Optional[str] = None,
+                 max_error: float = DEFAULT_MAX_REPROJECTION_ERROR):
+        self.screen_size = tuple(screen_size)
+        self.path = default_homography_path() if path is None else path
+        self.max_error = max_error
+        self.screen_corners = calibration_marker_screen_corners(*self.screen_size)
+        self.homography: Optional[ScreenHomography] = None
+        self.solves = 0
+        self.last_error: Optional[float] = None
+        self.load()
+
+    def load(self) -> bool:
+        """
+        Loads the saved homography if there is one for the current screen size.
+        """
+        try:
+            with open(self.path) as homography_file:
+                homography = ScreenHomography.from_dict(json.load(homography_file))
+        except (OSError, ValueError, KeyError) as e:
+            logger.debug(f"No saved homography loaded from {self.path}: {e}")
+            return False
+        if homography.screen_size != self.screen_size:
+            logger.info(_("Saved homography is for a {}x{} screen, recalibration needed").format(
+                *homography.screen_size))
+            return False
+        self.homography = homography
+        return True
+
+    def save(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "w") as homography_file:
+                json.dump(self.homography.to_dict(), homography_file, indent=2)
+        except OSError as e:
+            logger.error(_("Cannot save homography to {}: {}").format(self.path, e))
+
+    def update(self, camera_corners: Dict[int, "np.ndarray"], force: bool = False) -> bool:
+        """
+        Checks the homography against the overlay markers seen in one frame and re-solves
+        and saves it if forced, if there is none yet or if its error has drifted.
+        Returns True if it was re-solved.
+        """
+        camera_points, screen_points, marker_count = match_marker_corners(camera_corners, self.screen_corners)
+        if marker_count < MIN_CALIBRATION_MARKERS:
+            return False
+
+        if self.homography is not None and not force:
+            self.last_error = self.homography.error(camera_points, screen_points)
+            if self.last_error <= self.max_error:
+                return False
+            logger.info(_("Homography error drifted to {:.1f}px, re-solving").format(self.last_error))
+
+        try:
+            self.homography = ScreenHomography.solve(camera_points, screen_points, self.screen_size)
+        except ValueError as e:
+            logger.error(e)
+            return False
+        self.last_error = self.homography.reprojection_error
+        self.solves += 1
+        self.save()
+        logger.info(_("Solved camera to screen homography from {} markers, error {:.2f}px").format(
+            marker_count, self.last_error))
+        return True
+
+    def map_point(self, x: float, y: float) -> Optional[Tuple[int, int]]:
+        if self.homography is None:
+            return None
+        return self.homography.map_point(x, y)
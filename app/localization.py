@@ -1,25 +1,138 @@
 import argparse
+import functools
 import gettext
 import os
+from typing import Dict, List, Optional
+
+DEFAULT_LANGUAGE = "en"
+SUPPORTED_LANGUAGES = {"English": "en", "中文": "zh"}
+
+LOCALE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "translations")
+
+current_language: Optional[str] = None
+current_translation: Optional[gettext.NullTranslations] = None
+
+
+def requested_language(argv: Optional[List[str]] = None) -> str:
+    """
+    Returns the --lang command line option.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--lang", default=DEFAULT_LANGUAGE, help="ISO code of the language to use")
+    args, _ = parser.parse_known_args(argv)
+    return args.lang
+
+
+@functools.lru_cache(maxsize=None)
+def load_translation(lang: str) -> gettext.NullTranslations:
+    """
+    Loads the catalog of a language once; later switches reuse it.
+    """
+    return gettext.translation("messages", LOCALE_DIR, languages=[lang], fallback=True)
+
+
+def translate(message: str) -> str:
+    """
+    Translates a message into the current language. This is the `_` of every module,
+    so a language switch applies to all messages translated afterwards.
+    """
+    if current_translation is None:
+        setup_localization()
+    return current_translation.gettext(message)
+
+
+def set_language(lang: str) -> None:
+    """
+    Switches the current language in place, see retranslate_widgets for what is already shown.
+    """
+    global current_language, current_translation
+    current_translation = load_translation(lang)
+    current_language = lang
+
+
+def reset_localization() -> None:
+    """
+    Forgets the bootstrapped language, so the next setup_localization reads --lang again.
+    """
+    global current_language, current_translation
+    current_language = None
+    current_translation = None
+    load_translation.cache_clear()
+    message_ids.cache_clear()
 
 
 def setup_localization():
-    # Set up argument parsing for language selection
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--lang", default="en", help="ISO code of the language to use")
-    args, _ = parser.parse_known_args()
-
-    # Set the language from the argument
-    lang = args.lang
-
-    # Set up gettext and translation based on command line argument
-    locale_dir = os.path.join(
-        os.path.dirname(os.path.dirname(__file__)), "translations"
-    )
-    gettext.bindtextdomain("messages", locale_dir)
-    gettext.textdomain("messages")
-    translation = gettext.translation(
-        "messages", locale_dir, languages=[lang], fallback=True
-    )
-
-    return translation.gettext, lang
+    """
+    Returns the translate function and the current language. The first call reads --lang
+    and loads its catalog, later calls return right away.
+    """
+    global current_language, current_translation
+    if current_translation is None:
+        gettext.bindtextdomain("messages", LOCALE_DIR)
+        gettext.textdomain("messages")
+        current_language = requested_language()
+        current_translation = load_translation(current_language)
+
+    return translate, current_language
+
+
+@functools.lru_cache(maxsize=None)
+def message_ids(lang: str) -> Dict[str, str]:
+    """
+    Maps the translated texts of a language back to their messages.
+    """
+    catalog = getattr(load_translation(lang), "_catalog", {})
+    return {text: message for message, text in catalog.items() if isinstance(message, str) and message}
+
+
+def retranslate_text(text: str, previous_language: str) -> str:
+    """
+    Translates a text shown in the previous language into the current one. Texts that
+    are not translated messages, like port names, come back unchanged.
+    """
+    return translate(message_ids(previous_language).get(text, text))
+
+
+def is_message(text: str, message: str) -> bool:
+    """
+    Checks if a text shows the message in any supported language, so a placeholder is still
+    recognized after the language was switched.
+    """
+    return text == message or any(load_translation(lang).gettext(message) == text
+                                  for lang in SUPPORTED_LANGUAGES.values())
+
+
+def retranslate_widgets(widget, previous_language: str) -> int:
+    """
+    Relabels a Tk widget and all its descendants in the current language: window titles,
+    text options, menu entries and tree headings. Returns the number of texts changed.
+    Widgets showing a Tk variable are skipped, their variable is retranslated instead.
+    """
+    changed = 0
+
+    def relabel(text, configure):
+        nonlocal changed
+        new_text = retranslate_text(text, previous_language)
+        if new_text != text:
+            configure(new_text)
+            changed += 1
+
+    widgets = [widget]
+    while widgets:
+        widget = widgets.pop()
+        widgets.extend(widget.winfo_children())
+        widget_class = widget.winfo_class()
+        if widget_class in ("Tk", "Toplevel"):
+            relabel(widget.title(), widget.title)
+        elif widget_class == "Menu":
+            last = widget.index("end")
+            for index in range(last + 1 if last is not None else 0):
+                if widget.type(index) in ("command", "cascade", "checkbutton", "radiobutton"):
+                    relabel(widget.entrycget(index, "label"),
+                            lambda label, index=index: widget.entryconfigure(index, label=label))
+        elif widget_class == "Treeview":
+            for column in ("#0", *widget["columns"]):
+                relabel(widget.heading(column, "text"), lambda text, column=column: widget.heading(column, text=text))
+        elif "text" in widget.keys() and not ("textvariable" in widget.keys() and str(widget.cget("textvariable"))):
+            relabel(widget.cget("text"), lambda text: widget.configure(text=text))
+    return changed
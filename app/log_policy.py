@@ -0,0 +1,161 @@
+import argparse
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+DEFAULT_LOG_LEVEL = logging.INFO
+
+# Subsystem names accepted by --log-level and the loggers they control
+SUBSYSTEM_LOGGERS = {
+    "serial": "app.serial",
+    "network": "app.network_input",
+    "input": "app.arbitration",
+    "video": "app.video_capture",
+    "cameras": "app.multi_camera",
+    "frames": "app.frame_sources",
+    "consensus": "app.consensus",
+    "homography": "app.homography",
+    "window": "app.window_actions",
+}
+
+# Repeated messages pass at this rate once their burst is used up
+DEFAULT_RATE_LIMIT_PER_SECOND = 1.0
+DEFAULT_RATE_LIMIT_BURST = 5
+# Pre-formatted messages get a bucket each, so only the most recently logged ones are kept
+DEFAULT_RATE_LIMIT_BUCKETS = 256
+
+
+class LazyMessage:
+    """
+    Log message that is translated and formatted only when a handler emits it, so a
+    record below the logger level never pays for the gettext lookup or the string.
+    """
+
+    __slots__ = ("translate", "template", "args")
+
+    def __init__(self, translate: Callable[[str], str], template: str, *args):
+        self.translate = translate
+        self.template = template
+        self.args = args
+
+    def __str__(self) -> str:
+        return self.translate(self.template).format(*self.args)
+
+
+def lazy_translator(translate: Callable[[str], str]) -> Callable[..., LazyMessage]:
+    """
+    Returns N_(template, *args) building LazyMessages with the given gettext function.
+    N_ is one of the default babel keywords, so the templates are still extracted.
+    """
+
+    def lazy(template: str, *args) -> LazyMessage:
+        return LazyMessage(translate, template, *args)
+
+    return lazy
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket per logger, level and message template: a message may repeat burst
+    times, then only rate times per second. The next record that passes reports how
+    many were suppressed in between. At most max_buckets are kept, the least recently
+    used bucket is evicted with its suppressed count.
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE_LIMIT_PER_SECOND, burst: int = DEFAULT_RATE_LIMIT_BURST,
+                 clock: Callable[[], float] = time.monotonic, max_buckets: int = DEFAULT_RATE_LIMIT_BUCKETS):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.max_buckets = max_buckets
+        # key -> [tokens, last refill time, suppressed count], least recently used first
+        self.buckets: "OrderedDict[Tuple[str, int, str], List]" = OrderedDict()
+        self.suppressed = 0
+        self.lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        template = record.msg.template if isinstance(record.msg, LazyMessage) else record.msg
+        key = (record.name, record.levelno, str(template))
+        now = self.clock()
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = [float(self.burst), now, 0]
+                if len(self.buckets) > self.max_buckets:
+                    self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end(key)
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens < 1:
+                bucket[0] = tokens
+                bucket[2] += 1
+                self.suppressed += 1
+                return False
+            bucket[0] = tokens - 1
+            suppressed, bucket[2] = bucket[2], 0
+
+        if suppressed:
+            record.msg = f"{record.getMessage()} ({suppressed} similar messages suppressed)"
+            record.args = None
+        return True
+
+
+rate_limit_filter: Optional[RateLimitFilter] = None
+
+
+def parse_log_level(value: str) -> Tuple[Optional[str], int]:
+    """
+    Parses LEVEL or SUBSYSTEM=LEVEL into (subsystem or None for the root logger, level).
+    """
+    subsystem, _sep, level_name = value.rpartition("=")
+    level = logging.getLevelName(level_name.strip().upper())
+    if not isinstance(level, int):
+        raise argparse.ArgumentTypeError(f"unknown log level: {level_name}")
+    subsystem = subsystem.strip() or None
+    if subsystem is not None and subsystem not in SUBSYSTEM_LOGGERS:
+        raise argparse.ArgumentTypeError(
+            f"unknown subsystem: {subsystem}, expected one of {', '.join(SUBSYSTEM_LOGGERS)}")
+    return subsystem, level
+
+
+def log_levels_requested(argv: Optional[List[str]] = None) -> Dict[Optional[str], int]:
+    """
+    Reads the --log-level options, e.g. `--log-level WARNING --log-level video=DEBUG`.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--log-level", action="append", default=[], type=parse_log_level,
+                        help="LEVEL for all logging or SUBSYSTEM=LEVEL, may be repeated")
+    args, _ = parser.parse_known_args(argv)
+    return dict(args.log_level)
+
+
+def apply_log_levels(levels: Dict[Optional[str], int], rate_limit: bool = True) -> None:
+    """
+    Sets the root and subsystem logger levels and adds the rate limit filter to the subsystem loggers.
+    """
+    global rate_limit_filter
+    logging.getLogger().setLevel(levels.get(None, DEFAULT_LOG_LEVEL))
+    if rate_limit_filter is None:
+        rate_limit_filter = RateLimitFilter()
+    for subsystem, logger_name in SUBSYSTEM_LOGGERS.items():
+        logger = logging.getLogger(logger_name)
+        logger.setLevel(levels.get(subsystem, logging.NOTSET))
+        if rate_limit:
+            logger.addFilter(rate_limit_filter)
+        else:
+            logger.removeFilter(rate_limit_filter)
+
+
+def configure_logging(log_format: str, argv: Optional[List[str]] = None,
+                      levels: Optional[Dict[Optional[str], int]] = None) -> None:
+    """
+    Sets up the root handler and applies the given levels, or else the --log-level options.
+    """
+    if levels is None:
+        levels = log_levels_requested(argv)
+    logging.basicConfig(level=levels.get(None, DEFAULT_LOG_LEVEL), format=log_format)
+    apply_log_levels(levels)
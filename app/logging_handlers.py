@@ -0,0 +1,147 @@
+import logging
+import queue
+import tkinter as tk
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener
+from typing import List, Optional
+
+from .localization import setup_localization
+
+_, _lang = setup_localization()
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_MAX_LINES = 1000
+DEFAULT_MAX_PENDING_LINES = 2000
+DEFAULT_FLUSH_INTERVAL_MS = 100
+
+queue_listener: Optional[QueueListener] = None
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    QueueHandler for a bounded queue that counts and drops records when the queue is full,
+    so a logging thread never blocks on slow handlers.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class TkinterLoggingHandler(logging.Handler):
+    """
+    Collects formatted log lines from any thread and writes them to a text widget in
+    batches on the Tk thread, keeping only the newest max_lines lines in the widget.
+    """
+
+    def __init__(self, log_widget, max_lines: int = DEFAULT_MAX_LINES,
+                 max_pending_lines: int = DEFAULT_MAX_PENDING_LINES):
+        super().__init__()
+        self.log_widget = log_widget
+        self.max_lines = max_lines
+        self.max_pending_lines = max_pending_lines
+        self.pending = deque()
+        self.dropped = 0
+        self.reported_dropped = 0
+        self.root = None
+        self.flush_interval_ms = DEFAULT_FLUSH_INTERVAL_MS
+
+    def emit(self, record):
+        if len(self.pending) >= self.max_pending_lines:
+            self.dropped += 1
+            return
+        self.pending.append(self.format(record))
+
+    def attach(self, root, flush_interval_ms: int = DEFAULT_FLUSH_INTERVAL_MS) -> None:
+        """
+        Starts flushing on the given Tk root; must be called from the Tk thread.
+        """
+        self.root = root
+        self.flush_interval_ms = flush_interval_ms
+        root.after(flush_interval_ms, self.flush_tick)
+
+    def flush_tick(self) -> None:
+        """
+        Writes the pending lines and reschedules itself until the window is destroyed.
+        """
+        try:
+            if self.root is None or not self.log_widget.winfo_exists():
+                self.root = None
+                return
+            self.flush_to_widget()
+            self.root.after(self.flush_interval_ms, self.flush_tick)
+        except tk.TclError:  # Destroyed between the check and the write
+            self.root = None
+
+    def flush(self) -> None:
+        """
+        Does nothing: logging.shutdown calls flush from whichever thread exits, after the
+        widget is gone, and the widget is only written on the Tk thread by flush_tick.
+        """
+
+    def flush_to_widget(self) -> None:
+        """
+        Writes the pending lines to the widget; must run on the Tk thread.
+        """
+        lines = []
+        while True:
+            try:
+                lines.append(self.pending.popleft())
+            except IndexError:
+                break
+        if self.dropped != self.reported_dropped:
+            lines.append(_("... {} log lines dropped ...").format(self.dropped - self.reported_dropped))
+            self.reported_dropped = self.dropped
+        if not lines:
+            return
+
+        self.log_widget.insert(tk.END, "\n".join(lines[-self.max_lines:]) + "\n")
+        # The text always ends with an empty line after the last newline
+        excess_lines = int(self.log_widget.index("end-1c").split(".")[0]) - 1 - self.max_lines
+        if excess_lines > 0:
+            self.log_widget.delete("1.0", f"{excess_lines + 1}.0")
+        self.log_widget.see(tk.END)  # Auto-scroll to the bottom
+
+
+def start_queue_logging(handlers: List[logging.Handler], queue_size: int = DEFAULT_QUEUE_SIZE) -> QueueListener:
+    """
+    Moves the given handlers behind a bounded queue: the root logger only enqueues records
+    and a listener thread hands them to the handlers.
+    """
+    global queue_listener
+    stop_queue_logging()
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(DroppingQueueHandler(log_queue))
+
+    queue_listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    queue_listener.start()
+    return queue_listener
+
+
+def stop_queue_logging() -> None:
+    """
+    Stops the listener after it has handled the queued records and gives its handlers back to the root logger.
+    """
+    global queue_listener
+    if queue_listener is None:
+        return
+    queue_listener.stop()
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        if isinstance(handler, DroppingQueueHandler):
+            root_logger.removeHandler(handler)
+    for handler in queue_listener.handlers:
+        if not isinstance(handler, TkinterLoggingHandler):
+            root_logger.addHandler(handler)
+    queue_listener = None
@@ -1,79 +1,172 @@
 import logging
 import os
 import sys
-import threading
+import time
 import tkinter as tk
 from tkinter import messagebox, scrolledtext, ttk
 
-from .localization import setup_localization
+# Imported first so the startup clock also covers the other app modules
+from .startup import elapsed_since_startup, print_startup_profile, startup_profile_requested
+from .arbitration import arbitration_options_requested, configure_arbitration, stop_actuator, submit_target
+from .gaze_stream import gaze_stream_requested, start_gaze_stream, stop_gaze_stream
+from .lazy_import import lazy_import
+from .localization import (
+    SUPPORTED_LANGUAGES,
+    is_message,
+    retranslate_text,
+    retranslate_widgets,
+    set_language,
+    setup_localization,
+)
+from .log_policy import configure_logging
+from .logging_handlers import LOG_FORMAT, TkinterLoggingHandler, start_queue_logging, stop_queue_logging
+from .metrics_panel import MetricsPanel, export_metrics_periodically, metrics_file_requested
+from .network_input import network_input_requested, start_network_input, stop_network_input
+from .prediction import create_predictor, prediction_options_requested
+from .profiling import (
+    profile_options_requested,
+    request_profile_report,
+    start_profiler,
+    stop_profiler,
+    write_profile_report,
+)
+from .tracing import MANUAL_SOURCE, default_trace_path, trace_buffer, trace_file_requested
 from .serial import (
-    get_serial_ports,
     start_serial_thread,
     disconnect_from_serial,
 )
-from .video_capture import get_video_devices, start_video_thread, stop_video_capture
+from .session_profile import (
+    CAMERA_DEVICE,
+    SERIAL_DEVICE,
+    SessionProfile,
+    auto_connect_requested,
+    load_session_profile,
+    save_session_profile,
+    start_session_thread,
+)
+from .ui_dispatcher import run_on_ui_thread, ui_dispatcher
+from .workers import supervisor
+from .video_capture import request_homography_calibration, start_video_thread, stop_video_capture
 from .window_actions import (
-    crazy_mouse_movement,
-    move_mouse,
+    DEFAULT_MOVE_SPEED,
     move_mouse_randomly,
+    parse_coordinates,
+    start_crazy_mouse_movement,
     stop_crazy_mouse_movement,
     viewport_size,
     hide_calibration_dot,
     show_aruco_marker,
     hide_aruco_marker,
+    prerender_aruco_markers,
+    show_all_aruco_markers,
     MarkerPosition
 )
 
 _, lang = setup_localization()
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-
+configure_logging(LOG_FORMAT)
 
-class TkinterLoggingHandler(logging.Handler):
-    def __init__(self, log_widget):
-        super().__init__()
-        self.log_widget = log_widget
-
-    def emit(self, record):
-        log_entry = self.format(record)
-        self.log_widget.insert(tk.END, log_entry + '\n')
-        self.log_widget.see(tk.END)  # Auto-scroll to the bottom
+# Left out of the startup imports, it is loaded when the recording options are read
+session_recorder = lazy_import(f"{__package__}.session_recorder")
 
 
 def on_escape(event=None):
     stop_crazy_mouse_movement()
     disconnect_from_serial()
+    stop_network_input()
     stop_video_capture()
+    stop_actuator()
     hide_calibration_dot()
     hide_aruco_marker()
+    request_profile_report()
 
 
 def validate_and_move_mouse(x_str, y_str):
     try:
-        move_mouse(x_str, y_str)
+        x, y = parse_coordinates(x_str, y_str)
     except ValueError as e:
         messagebox.showerror(_("Invalid Input"), str(e))
+        return
+    submit_target(MANUAL_SOURCE, x, y, DEFAULT_MOVE_SPEED)
+
+
+def dump_traces(path=None):
+    """
+    Writes the recent sample traces as a Chrome trace, to open in chrome://tracing or Perfetto.
+    """
+    if path is None:
+        path = trace_file_requested() or default_trace_path()
+    try:
+        trace_buffer.write_chrome_trace(path)
+        logging.info(_("Wrote latency traces to {}").format(path))
+    except OSError as e:
+        logging.error(_("Cannot write latency traces to {}: {}").format(path, e))
+
+
+def shortcut(action):
+    """
+    Wraps the handler of a single key shortcut bound on the root, so the key is ignored
+    while it is typed into an entry or text field.
+    """
+
+    def handler(event):
+        if isinstance(event.widget, (tk.Entry, tk.Text)):
+            return None
+        return action(event)
+
+    return handler
+
+
+def set_option_menu_values(option_menu, variable, values, selected=None):
+    """
+    Replaces the choices of an OptionMenu and selects the given value if it is one of them,
+    otherwise the first one.
+    """
+    menu = option_menu["menu"]
+    menu.delete(0, tk.END)
+    for value in values:
+        menu.add_command(label=value, command=tk._setit(variable, value))
+    variable.set(selected if selected in [str(value) for value in values] else values[0])
 
 
 def gui_main():
-    screen_width, screen_height = viewport_size()
+    profile_mode, profile_dir = profile_options_requested()
+    if profile_mode is not None:
+        start_profiler(profile_mode, profile_dir)
+
+    # Read before any device enumeration, so the remembered devices open right away
+    session_profile = load_session_profile()
+    auto_connect = auto_connect_requested()
 
     root = tk.Tk()
     root.title(_("Eye Tracker App"))
+    ui_dispatcher.attach(root)
     root.bind("<Escape>", on_escape)  # Bind the Escape key
-    root.bind("1", lambda event: show_aruco_marker(position=MarkerPosition.TOPLEFT))
-    root.bind("2", lambda event: show_aruco_marker(position=MarkerPosition.TOPCENTER))
-    root.bind("3", lambda event: show_aruco_marker(position=MarkerPosition.TOPRIGHT))
-    root.bind("4", lambda event: show_aruco_marker(position=MarkerPosition.MIDDLELEFT))
-    root.bind("5", lambda event: show_aruco_marker(position=MarkerPosition.CENTER))
-    root.bind("6", lambda event: show_aruco_marker(position=MarkerPosition.MIDDLERIGHT))
-    root.bind("7", lambda event: show_aruco_marker(position=MarkerPosition.BOTTOMLEFT))
-    root.bind("8", lambda event: show_aruco_marker(position=MarkerPosition.BOTTOMCENTER))
-    root.bind("9", lambda event: show_aruco_marker(position=MarkerPosition.BOTTOMRIGHT))
+    # Single key shortcuts, except while typing coordinates or the baud rate
+    root.bind("1", shortcut(lambda event: show_aruco_marker(position=MarkerPosition.TOPLEFT)))
+    root.bind("2", shortcut(lambda event: show_aruco_marker(position=MarkerPosition.TOPCENTER)))
+    root.bind("3", shortcut(lambda event: show_aruco_marker(position=MarkerPosition.TOPRIGHT)))
+    root.bind("4", shortcut(lambda event: show_aruco_marker(position=MarkerPosition.MIDDLELEFT)))
+    root.bind("5", shortcut(lambda event: show_aruco_marker(position=MarkerPosition.CENTER)))
+    root.bind("6", shortcut(lambda event: show_aruco_marker(position=MarkerPosition.MIDDLERIGHT)))
+    root.bind("7", shortcut(lambda event: show_aruco_marker(position=MarkerPosition.BOTTOMLEFT)))
+    root.bind("8", shortcut(lambda event: show_aruco_marker(position=MarkerPosition.BOTTOMCENTER)))
+    root.bind("9", shortcut(lambda event: show_aruco_marker(position=MarkerPosition.BOTTOMRIGHT)))
+    root.bind("0", shortcut(lambda event: show_all_aruco_markers()))
+
+    def calibrate_homography(event=None):
+        show_all_aruco_markers()
+        request_homography_calibration()
+
+    root.bind("c", shortcut(calibrate_homography))
+
+    metrics_panel = MetricsPanel(root)
+    root.bind("m", shortcut(metrics_panel.toggle))
+    root.bind("t", shortcut(lambda event: dump_traces()))
 
     frame = tk.Frame(root)
     frame.pack(expand=True)
 
-    supported_langs = {"English": "en", "中文": "zh"}
+    supported_langs = SUPPORTED_LANGUAGES
 
     def restart_app(selected_lang=None):
         selected_iso_code = (
@@ -83,10 +176,24 @@ def gui_main():
             sys.executable, sys.executable, *sys.argv, f"--lang={selected_iso_code}"
         )
 
+    def switch_language(selected_lang):
+        """
+        Relabels the open windows in the selected language, keeping serial and video sessions running.
+        """
+        global lang
+        started = time.perf_counter()
+        previous_lang, lang = lang, supported_langs[selected_lang]
+        set_language(lang)
+        retranslate_widgets(root, previous_lang)
+        for variable in (port_var, video_devices_var):
+            variable.set(retranslate_text(variable.get(), previous_lang))
+        logging.info(_("Switched language to {} in {:.1f} ms").format(
+            selected_lang, (time.perf_counter() - started) * 1000))
+
     language_var = tk.StringVar(root)
     language_var.set("中文" if lang == "zh" else "English")  # Set default language
     language_dropdown = tk.OptionMenu(
-        root, language_var, *supported_langs.keys(), command=restart_app
+        root, language_var, *supported_langs.keys(), command=switch_language
     )
     language_dropdown.pack()
 
@@ -101,7 +208,6 @@ def gui_main():
 
     tk.Label(frame, text=_("Display Size:")).grid(row=7, column=0, padx=10, pady=5)
     display_size_entry = tk.Entry(frame)
-    display_size_entry.insert(0, f"{screen_width} x {screen_height}")
     display_size_entry.configure(state="readonly")
     display_size_entry.grid(row=7, column=1, padx=10, pady=5)
 
@@ -123,9 +229,7 @@ def gui_main():
     go_crazy_button = tk.Button(
         frame,
         text=_("Go Crazy (hit Esc to stop)"),
-        command=lambda: threading.Thread(
-            target=crazy_mouse_movement, daemon=True
-        ).start(),
+        command=start_crazy_mouse_movement,
     )
     go_crazy_button.grid(row=10, column=0, columnspan=2, pady=10)
 
@@ -133,47 +237,53 @@ def gui_main():
     separator = ttk.Separator(frame, orient="horizontal")
     separator.grid(row=11, column=0, columnspan=2, sticky="ew", pady=10)
 
-    # Dropdown for serial port selection
-    ports = get_serial_ports()
+    # Dropdown for serial port selection, filled in once the window is shown
     port_var = tk.StringVar(root)
-    port_var.set(ports[0])  # Set to first available port or message
+    port_var.set(session_profile.serial_port or _("Searching for Serial Ports..."))
     tk.Label(frame, text=_("Select Serial Port:")).grid(
         row=12, column=0, padx=10, pady=5
     )
-    port_dropdown = tk.OptionMenu(frame, port_var, *ports)
+    port_dropdown = tk.OptionMenu(frame, port_var, port_var.get())
     port_dropdown.grid(row=12, column=1, padx=10, pady=5)
 
     # Baud rate entry
     tk.Label(frame, text=_("Baud Rate:")).grid(row=13, column=0, padx=10, pady=5)
-    baud_var = tk.StringVar(root, value="9600")  # Default value
+    baud_var = tk.StringVar(root, value=str(session_profile.baud_rate))
     baud_entry = tk.Entry(frame, textvariable=baud_var)
     baud_entry.grid(row=13, column=1, padx=10, pady=5)
 
-    # Dropdown for video device selection
-    video_devices = get_video_devices()
+    # Dropdown for video device selection, filled in once the window is shown
     video_devices_var = tk.StringVar(root)
-    video_devices_var.set(video_devices[0])  # Set to first available port or message
+    video_devices_var.set(_("Searching for Video Devices...") if session_profile.camera is None
+                          else session_profile.camera)
     tk.Label(frame, text=_("Select Video Device:")).grid(
         row=14, column=0, padx=10, pady=5
     )
-    video_device_dropdown = tk.OptionMenu(frame, video_devices_var, *video_devices)
+    video_device_dropdown = tk.OptionMenu(frame, video_devices_var, video_devices_var.get())
     video_device_dropdown.grid(row=14, column=1, padx=10, pady=5)
 
     # Log output section
     log_output = scrolledtext.ScrolledText(frame, height=10)
     log_output.grid(row=15, column=0, columnspan=2, pady=10)
 
-    # Add the custom logging handler
+    # Worker threads only enqueue log records, the widget is written in batches on the Tk thread
     log_handler = TkinterLoggingHandler(log_output)
     log_handler.setLevel(logging.DEBUG)
-    log_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-    logging.getLogger().addHandler(log_handler)
+    log_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    log_handler.attach(root)
+    start_queue_logging([*logging.getLogger().handlers, log_handler])
 
     def connect_to_serial():
-        if port_var.get() == _("No Ports Available"):
+        # The placeholders are compared as messages, they may be shown in another language by now
+        if any(is_message(port_var.get(), message)
+               for message in ("No Ports Available", "Searching for Serial Ports...")):
             messagebox.showerror(_("Error"), _("No serial ports available."))
             return
-        start_serial_thread(port_var.get(), baud_var.get())
+        if start_serial_thread(port_var.get(), baud_var.get()):
+            session_profile.serial_port = port_var.get()
+            if baud_var.get().isdigit():
+                session_profile.baud_rate = int(baud_var.get())
+            save_session_profile(session_profile)
 
     connect_to_serial_button = tk.Button(
         frame, text=_("Connect to Serial (Hit Esc to Disconnect)"), command=connect_to_serial
@@ -181,7 +291,8 @@ def gui_main():
     connect_to_serial_button.grid(row=16, column=0, columnspan=2, pady=10)
 
     def capture_video(show_video_capture):
-        if video_devices_var.get() == _("No Video Devices Available"):
+        if any(is_message(video_devices_var.get(), message)
+               for message in ("No Video Devices Available", "Searching for Video Devices...")):
             messagebox.showerror(_("Error"), _("No Video Devices Available"))
             return
 
@@ -195,21 +306,35 @@ def gui_main():
         else:
             video_canvas = None
 
-        start_video_thread(int(video_devices_var.get()), video_canvas)
+        camera = int(video_devices_var.get())
+
+        def camera_opened(capture_size):
+            # Saved once the camera is open, with the size it delivers rather than the one asked for
+            session_profile.camera = camera
+            session_profile.capture_size = capture_size or session_profile.capture_size
+            save_session_profile(session_profile)
+
+        start_video_thread(camera, video_canvas, session_profile.capture_size, session_profile.detector_mode,
+                           lambda capture_size: run_on_ui_thread(camera_opened, capture_size))
 
     start_video_capture_button = tk.Button(
         frame, text=_("Start Video Capture (Hit Esc to Stop)"), command=lambda: capture_video(show_video_capture=True)
     )
     start_video_capture_button.grid(row=17, column=0, columnspan=2, pady=10)
 
+    metrics_button = tk.Button(
+        frame, text=_("Show Latency Metrics (M)"), command=metrics_panel.toggle
+    )
+    metrics_button.grid(row=18, column=0, columnspan=2, pady=10)
+
     # Restart App button
     refresh_button = tk.Button(
         frame, text=_("Restart App"), command=lambda: restart_app(language_var.get())
     )
-    refresh_button.grid(row=18, column=0, columnspan=2, padx=10)
+    refresh_button.grid(row=19, column=0, columnspan=2, padx=10)
 
     copyright_label = tk.Label(frame, text=_("© 2024 Eye Tracker"), font=("Arial", 8))
-    copyright_label.grid(row=19, column=0, columnspan=2, pady=10)
+    copyright_label.grid(row=20, column=0, columnspan=2, pady=10)
 
     root.minsize(550, 300)
 
@@ -217,9 +342,64 @@ def gui_main():
         capture_video(show_video_capture=False)
         root.iconify()  # Minimize the window
 
-    root.bind('v', minimize_and_capture_video)
+    root.bind('v', shortcut(minimize_and_capture_video))
+
+    # Show the window before anything imports pyautogui or cv2
+    root.update()
+    if startup_profile_requested():
+        print_startup_profile(elapsed_since_startup())
+
+    screen_width, screen_height = viewport_size()
+    display_size_entry.configure(state="normal")
+    display_size_entry.insert(0, f"{screen_width} x {screen_height}")
+    display_size_entry.configure(state="readonly")
+
+    def session_devices_opened(failed, ports, video_devices):
+        """
+        Fills in the device dropdowns, keeping the reopened devices selected.
+        """
+        set_option_menu_values(port_dropdown, port_var, ports,
+                               None if SERIAL_DEVICE in failed else port_var.get())
+        set_option_menu_values(video_device_dropdown, video_devices_var, video_devices,
+                               None if CAMERA_DEVICE in failed else video_devices_var.get())
+
+    arbitration = arbitration_options_requested()
+    configure_arbitration(arbitration.input_policy, arbitration.input_priority, arbitration.input_freshness,
+                          create_predictor(prediction_options_requested()))
+
+    gaze_stream = gaze_stream_requested()
+    if gaze_stream is not None:
+        start_gaze_stream(gaze_stream)
+    session_recorder.start_session_recorder(session_recorder.recording_options_requested())
+
+    # Reopens the devices of the last session, then enumerates the others for the dropdowns
+    start_session_thread(
+        session_profile if auto_connect else SessionProfile(),
+        lambda *devices: run_on_ui_thread(session_devices_opened, *devices),
+    )
+    prerender_aruco_markers()
+
+    network_input = network_input_requested()
+    if network_input is not None:
+        start_network_input(*network_input)
+
+    metrics_file = metrics_file_requested()
+    if metrics_file is not None:
+        export_metrics_periodically(root, metrics_file)
 
     root.mainloop()
+    disconnect_from_serial()
+    stop_network_input()
+    stop_actuator()
+    supervisor.stop_all()  # Joins the capture and cursor threads, which release their devices
+    session_recorder.stop_session_recorder()
+    stop_gaze_stream()
+    trace_file = trace_file_requested()
+    if trace_file is not None:
+        dump_traces(trace_file)
+    write_profile_report()
+    stop_profiler()
+    stop_queue_logging()
 
 
 if __name__ == "__main__":
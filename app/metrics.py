@@ -0,0 +1,204 @@
+import json
+import math
+import os
+import time
+from typing import Dict, List, Optional
+
+# Stages timed along the serial and camera paths
+SERIAL_READ = "serial_read"
+SERIAL_PARSE = "serial_parse"
+# From a network wakeup until its batch of lines is received
+NETWORK_READ = "network_read"
+MOUSE_MOVE = "mouse_move"
+# From the arbitration of a cursor target until the actuator starts moving to it
+ACTUATOR_WAIT = "actuator_wait"
+CAPTURE_READ = "capture_read"
+# From the first to the last grab of a frame set captured from several cameras at once
+CAPTURE_SKEW = "capture_skew"
+DETECTION = "detection"
+CONSENSUS = "consensus"
+PREVIEW = "preview"
+# From the arrival of a serial line or camera frame until the cursor has moved
+END_TO_END = "end_to_end"
+# From the start of the app until the first cursor move, recorded once per launch
+LAUNCH_TO_FIRST_MOVE = "launch_to_first_move"
+# From losing the serial device until it is connected again
+SERIAL_RECOVERY = "serial_recovery"
+STAGES = (SERIAL_READ, SERIAL_PARSE, NETWORK_READ, ACTUATOR_WAIT, MOUSE_MOVE, CAPTURE_READ, CAPTURE_SKEW, DETECTION,
+          CONSENSUS, PREVIEW, END_TO_END, LAUNCH_TO_FIRST_MOVE, SERIAL_RECOVERY)
+
+# Buckets split every power of two into SUB_BUCKETS, so a bucket is at most 1/32 of its value
+# wide, like an HDR histogram with two significant digits. They cover about 1 us to 64 s.
+SUB_BUCKETS = 32
+MIN_EXPONENT = -19
+MAX_EXPONENT = 6
+BUCKET_COUNT = (MAX_EXPONENT - MIN_EXPONENT + 1) * SUB_BUCKETS
+
+PERCENTILES = (50, 95, 99)
+PROMETHEUS_PREFIX = "eye_tracker_"
+PROMETHEUS_METRIC = f"{PROMETHEUS_PREFIX}stage_latency_seconds"
+
+
+def bucket_index(seconds: float) -> int:
+    """
+    Returns the histogram bucket for a latency, clamped to the covered range.
+    """
+    if seconds <= 0:
+        return 0
+    mantissa, exponent = math.frexp(seconds)  # seconds = mantissa * 2 ** exponent, 0.5 <= mantissa < 1
+    if exponent < MIN_EXPONENT:
+        return 0
+    if exponent > MAX_EXPONENT:
+        return BUCKET_COUNT - 1
+    return (exponent - MIN_EXPONENT) * SUB_BUCKETS + int((mantissa - 0.5) * 2 * SUB_BUCKETS)
+
+
+def bucket_value(index: int) -> float:
+    """
+    Returns the midpoint of a histogram bucket in seconds.
+    """
+    exponent, sub_bucket = divmod(index, SUB_BUCKETS)
+    return math.ldexp(0.5 + (sub_bucket + 0.5) / (2 * SUB_BUCKETS), exponent + MIN_EXPONENT)
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram. Recording is one frexp and a list increment with no
+    lock; a stage is normally recorded from a single thread.
+    """
+
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.counts[bucket_index(seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, percent: float) -> float:
+        """
+        Returns the latency below which the given percentage of the recorded values fall.
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * percent / 100))
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(bucket_value(index), self.max)
+        return self.max
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class MetricsRegistry:
+    """
+    Latency histograms by stage name, and counters and gauges by Prometheus series name,
+    e.g. input_samples_total{source="camera",outcome="overridden"}.
+    """
+
+    def __init__(self):
+        self.histograms: Dict[str, LatencyHistogram] = {stage: LatencyHistogram() for stage in STAGES}
+        self.values: Dict[str, float] = {}
+        self.started = time.monotonic()
+
+    def histogram(self, stage: str) -> LatencyHistogram:
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = LatencyHistogram()
+        return histogram
+
+    def record(self, stage: str, seconds: float) -> None:
+        self.histogram(stage).record(seconds)
+
+    def increment(self, series: str, amount: float = 1) -> None:
+        self.values[series] = self.values.get(series, 0) + amount
+
+    def set_value(self, series: str, value: float) -> None:
+        self.values[series] = value
+
+    def reset(self) -> None:
+        for stage in list(self.histograms):
+            self.histograms[stage] = LatencyHistogram()
+        self.values = {}
+        self.started = time.monotonic()
+
+    def values_snapshot(self) -> Dict[str, float]:
+        return dict(self.values)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns count, average rate, sum, mean, max and percentiles in seconds for every stage.
+        """
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        stages = {}
+        for stage, histogram in list(self.histograms.items()):
+            stats = {
+                "count": histogram.count,
+                "rate_per_second": histogram.count / elapsed,
+                "sum": histogram.total,
+                "mean": histogram.mean(),
+                "max": histogram.max,
+            }
+            for percent in PERCENTILES:
+                stats[f"p{percent}"] = histogram.percentile(percent)
+            stages[stage] = stats
+        return stages
+
+
+metrics = MetricsRegistry()
+
+
+def record_latency(stage: str, seconds: float) -> None:
+    metrics.record(stage, seconds)
+
+
+def format_metrics_json(snapshot: Dict[str, Dict[str, float]], values: Optional[Dict[str, float]] = None) -> str:
+    return json.dumps({"timestamp": time.time(), "stages": snapshot, "values": values or {}}, indent=2)
+
+
+def format_metrics_prometheus(snapshot: Dict[str, Dict[str, float]], values: Optional[Dict[str, float]] = None) -> str:
+    """
+    Formats a snapshot as a Prometheus summary in the text exposition format, followed by
+    the counters and gauges.
+    """
+    lines: List[str] = [
+        f"# HELP {PROMETHEUS_METRIC} Latency of each eye tracker pipeline stage.",
+        f"# TYPE {PROMETHEUS_METRIC} summary",
+    ]
+    for stage, stats in snapshot.items():
+        for percent in PERCENTILES:
+            lines.append(f'{PROMETHEUS_METRIC}{{stage="{stage}",quantile="{percent / 100}"}} '
+                         f'{stats[f"p{percent}"]:.9f}')
+        lines.append(f'{PROMETHEUS_METRIC}_sum{{stage="{stage}"}} {stats["sum"]:.9f}')
+        lines.append(f'{PROMETHEUS_METRIC}_count{{stage="{stage}"}} {stats["count"]}')
+    for series, value in sorted((values or {}).items()):
+        lines.append(f"{PROMETHEUS_PREFIX}{series} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(path: str, snapshot: Optional[Dict[str, Dict[str, float]]] = None,
+                  values: Optional[Dict[str, float]] = None) -> None:
+    """
+    Writes a snapshot as Prometheus text for .prom files and as JSON otherwise. The file
+    is replaced atomically, so a node exporter textfile collector never reads half of it.
+    """
+    if snapshot is None:
+        snapshot = metrics.snapshot()
+    if values is None:
+        values = metrics.values_snapshot()
+    if path.endswith(".prom"):
+        content = format_metrics_prometheus(snapshot, values)
+    else:
+        content = format_metrics_json(snapshot, values)
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w") as metrics_file:
+        metrics_file.write(content)
+    os.replace(temporary_path, path)
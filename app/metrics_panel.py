@@ -0,0 +1,140 @@
+import argparse
+import logging
+import time
+import tkinter as tk
+from tkinter import ttk
+from typing import Dict, List, Optional
+
+from .lazy_import import lazy_import
+from .localization import setup_localization
+from .metrics import MetricsRegistry, metrics, write_metrics
+
+_, _lang = setup_localization()
+
+# Only needed once a snapshot is exported from the panel
+filedialog = lazy_import("tkinter.filedialog")
+
+DEFAULT_REFRESH_MS = 500
+DEFAULT_EXPORT_INTERVAL_MS = 10000
+
+COLUMNS = ("count", "rate", "p50", "p95", "p99", "max")
+
+
+def metrics_file_requested(argv: Optional[List[str]] = None) -> Optional[str]:
+    """
+    Returns the --metrics-file path, if given.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--metrics-file", default=None,
+                        help="write a latency snapshot to this .json or .prom file every 10 seconds")
+    args, _ = parser.parse_known_args(argv)
+    return args.metrics_file
+
+
+def format_stage_row(stats: Dict[str, float], rate: float):
+    milliseconds = [f"{stats[column] * 1000:.2f}" for column in ("p50", "p95", "p99", "max")]
+    return (stats["count"], f"{rate:.1f}", *milliseconds)
+
+
+class MetricsPanel:
+    """
+    Window listing the p50, p95 and p99 latency and the current rate of every stage.
+    It only refreshes while shown.
+    """
+
+    def __init__(self, root, registry: MetricsRegistry = metrics, refresh_ms: int = DEFAULT_REFRESH_MS):
+        self.root = root
+        self.registry = registry
+        self.refresh_ms = refresh_ms
+        self.window = None
+        self.table = None
+        self.after_id = None
+        self.previous_counts: Dict[str, int] = {}
+        self.previous_time = time.monotonic()
+
+    def is_shown(self) -> bool:
+        return self.window is not None and self.window.winfo_exists() and self.window.state() != "withdrawn"
+
+    def create_window(self) -> None:
+        self.window = tk.Toplevel(self.root)
+        self.window.title(_("Latency Metrics"))
+        self.window.protocol("WM_DELETE_WINDOW", self.hide)
+        self.table = ttk.Treeview(self.window, columns=COLUMNS, height=8)
+        self.table.heading("#0", text=_("Stage"))
+        headings = (_("Count"), _("Rate/s"), _("p50 ms"), _("p95 ms"), _("p99 ms"), _("Max ms"))
+        for column, heading in zip(COLUMNS, headings):
+            self.table.heading(column, text=heading)
+            self.table.column(column, width=80, anchor=tk.E)
+        self.table.pack(fill=tk.BOTH, expand=True)
+        buttons = tk.Frame(self.window)
+        buttons.pack(fill=tk.X)
+        tk.Button(buttons, text=_("Export..."), command=self.export).pack(side=tk.LEFT, padx=5, pady=5)
+        tk.Button(buttons, text=_("Reset"), command=self.reset).pack(side=tk.LEFT, padx=5, pady=5)
+
+    def toggle(self, event=None) -> None:
+        if self.is_shown():
+            self.hide()
+        else:
+            self.show()
+
+    def show(self) -> None:
+        if self.window is None or not self.window.winfo_exists():
+            self.create_window()
+        self.window.deiconify()
+        self.refresh()
+
+    def hide(self) -> None:
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+        if self.window is not None and self.window.winfo_exists():
+            self.window.withdraw()
+
+    def reset(self) -> None:
+        self.registry.reset()
+        self.previous_counts = {}
+        self.refresh()
+
+    def refresh(self) -> None:
+        """
+        Updates the table from a snapshot, with rates over the time since the last refresh.
+        """
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+        now = time.monotonic()
+        elapsed = max(now - self.previous_time, 1e-9)
+        for stage, stats in self.registry.snapshot().items():
+            rate = max(stats["count"] - self.previous_counts.get(stage, 0), 0) / elapsed
+            self.previous_counts[stage] = stats["count"]
+            values = format_stage_row(stats, rate)
+            if self.table.exists(stage):
+                self.table.item(stage, values=values)
+            else:
+                self.table.insert("", tk.END, iid=stage, text=stage, values=values)
+        self.previous_time = now
+        self.after_id = self.root.after(self.refresh_ms, self.refresh)
+
+    def export(self) -> None:
+        path = filedialog.asksaveasfilename(
+            parent=self.window,
+            defaultextension=".json",
+            filetypes=[(_("JSON"), "*.json"), (_("Prometheus text"), "*.prom")],
+        )
+        if not path:
+            return
+        try:
+            write_metrics(path, self.registry.snapshot(), self.registry.values_snapshot())
+            logging.info(_("Exported latency metrics to {}").format(path))
+        except OSError as e:
+            logging.error(_("Cannot export latency metrics to {}: {}").format(path, e))
+
+
+def export_metrics_periodically(root, path: str, interval_ms: int = DEFAULT_EXPORT_INTERVAL_MS) -> None:
+    """
+    Rewrites the metrics file every interval_ms on the Tk thread, e.g. for a node exporter textfile collector.
+    """
+    try:
+        write_metrics(path)
+    except OSError as e:
+        logging.error(_("Cannot export latency metrics to {}: {}").format(path, e))
+    root.after(interval_ms, export_metrics_periodically, root, path, interval_ms)
@@ -0,0 +1,100 @@
+import time
+from typing import Dict
+
+from .lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+DEFAULT_MOTION_THRESHOLD = 2.0
+DEFAULT_DOWNSAMPLE_WIDTH = 64
+# Detection still runs at least this often, so slow drifts are not missed
+DEFAULT_MAX_SKIPPED_FRAMES = 15
+# Frames detected at full rate after motion, so the consensus decoder sees the new scene settle
+DEFAULT_MOTION_HOLD_FRAMES = 5
+# Weight of the newest sample in the running average of the detection cost
+DETECTION_COST_SMOOTHING = 0.1
+
+
+class MotionGate:
+    """
+    Decides per frame whether marker detection needs to run, from the mean absolute
+    difference between downsampled copies of consecutive frames.
+    """
+
+    def __init__(
+        self,
+        threshold: float = DEFAULT_MOTION_THRESHOLD,
+        downsample_width: int = DEFAULT_DOWNSAMPLE_WIDTH,
+        max_skipped_frames: int = DEFAULT_MAX_SKIPPED_FRAMES,
+        motion_hold_frames: int = DEFAULT_MOTION_HOLD_FRAMES,
+    ):
+        self.threshold = threshold
+        self.downsample_width = downsample_width
+        self.max_skipped_frames = max_skipped_frames
+        self.motion_hold_frames = motion_hold_frames
+        self.previous = None
+        self.consecutive_skips = 0
+        self.hold_frames = 0
+        self.last_score = 0.0
+        self.frames = 0
+        self.skipped_frames = 0
+        self.gate_cpu_seconds = 0.0
+        self.detection_cpu_seconds = 0.0
+
+    def motion_score(self, frame) -> float:
+        """
+        Returns the mean absolute difference to the previous frame, in gray levels.
+        """
+        height, width = frame.shape[:2]
+        small_size = (self.downsample_width, max(1, height * self.downsample_width // width))
+        small = cv2.resize(frame, small_size, interpolation=cv2.INTER_AREA)
+        previous, self.previous = self.previous, small
+        if previous is None or previous.shape != small.shape:
+            return float("inf")
+        return float(np.mean(cv2.absdiff(small, previous)))
+
+    def should_detect(self, frame) -> bool:
+        """
+        Returns False when the frame is still enough to reuse the last detection result.
+        """
+        started = time.thread_time()
+        self.frames += 1
+        self.last_score = self.motion_score(frame)
+
+        if self.last_score >= self.threshold:
+            self.hold_frames = self.motion_hold_frames
+        if self.hold_frames > 0 or self.consecutive_skips >= self.max_skipped_frames:
+            self.hold_frames = max(self.hold_frames - 1, 0)
+            detect = True
+        else:
+            detect = False
+
+        if detect:
+            self.consecutive_skips = 0
+        else:
+            self.consecutive_skips += 1
+            self.skipped_frames += 1
+        self.gate_cpu_seconds += time.thread_time() - started
+        return detect
+
+    def record_detection_cost(self, cpu_seconds: float) -> None:
+        """
+        Feeds the CPU time one detection took into the running average used for the savings estimate.
+        """
+        if not self.detection_cpu_seconds:
+            self.detection_cpu_seconds = cpu_seconds
+        else:
+            self.detection_cpu_seconds += DETECTION_COST_SMOOTHING * (cpu_seconds - self.detection_cpu_seconds)
+
+    def metrics(self) -> Dict[str, float]:
+        skipped_fraction = self.skipped_frames / self.frames if self.frames else 0.0
+        cpu_seconds_saved = self.skipped_frames * self.detection_cpu_seconds - self.gate_cpu_seconds
+        return {
+            "frames": self.frames,
+            "skipped_frames": self.skipped_frames,
+            "skipped_fraction": skipped_fraction,
+            "motion_score": self.last_score,
+            "detection_cpu_seconds": self.detection_cpu_seconds,
+            "cpu_seconds_saved": cpu_seconds_saved,
+        }
@@ -0,0 +1,242 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from .arbitration import submit_target
+from .consensus import ConsensusDecoder, ConsensusResult
+from .frame_sources import FrameSource, open_frame_source
+from .gaze_stream import publish_gaze_sample
+from .localization import setup_localization
+from .metrics import CAPTURE_READ, CAPTURE_SKEW, CONSENSUS, DETECTION, metrics
+from .motion_gate import MotionGate
+from .tracing import CAMERA_SOURCE, begin_sample, end_sample, record_stage
+from .video_capture import (
+    DEFAULT_DETECTOR_MODE,
+    convert_aruco_marker_ids_to_coordinates,
+    detect_aruco_markers,
+    stop_video_capture,
+)
+from .workers import VIDEO_WORKER, supervisor
+
+_, _lang = setup_localization()
+
+logger = logging.getLogger(__name__)
+
+# Per camera counters, labelled with the position of the camera in the capture
+CAMERA_FRAMES_SERIES = 'camera_frames_total{{camera="{}"}}'
+CAMERA_SELECTED_SERIES = 'camera_selected_total{{camera="{}"}}'
+
+
+class CameraChannel:
+    """
+    One camera of a synchronized capture, with its own motion gate, consensus decoder
+    and statistics. grab and process are called alternately, never concurrently.
+    """
+
+    def __init__(self, index: int, source: FrameSource, detector_mode: str = DEFAULT_DETECTOR_MODE):
+        self.index = index
+        self.source = source
+        self.detector_mode = detector_mode
+        self.gate = MotionGate()
+        self.decoder = ConsensusDecoder(convert_aruco_marker_ids_to_coordinates)
+        self.consensus = ConsensusResult(None, None, 0.0, False)
+        self.grabbed = False
+        self.grab_time = 0.0
+        self.frames = 0
+        self.failed_reads = 0
+        self.detections = 0
+        self.detection_cpu_seconds = 0.0
+        self.decoded = 0
+        self.selected = 0
+
+    def grab(self) -> bool:
+        self.grabbed = self.source.grab()
+        self.grab_time = time.perf_counter()
+        if not self.grabbed:
+            self.failed_reads += 1
+        return self.grabbed
+
+    def process(self) -> Optional[ConsensusResult]:
+        """
+        Decodes the frame selected by the last grab and returns the consensus of this
+        camera, or None if there was no frame.
+        """
+        if not self.grabbed:
+            return None
+        ret, frame = self.source.retrieve()
+        if not ret:
+            self.failed_reads += 1
+            return None
+        self.frames += 1
+        if not self.gate.should_detect(frame):
+            # A still frame keeps the last result without voting again, see run_capture_loop
+            self.consensus = self.consensus._replace(changed=False)
+            return self.consensus
+        detection_cpu_started = time.thread_time()
+        marker_ids = detect_aruco_markers(frame, mode=self.detector_mode)
+        cpu_seconds = time.thread_time() - detection_cpu_started
+        self.gate.record_detection_cost(cpu_seconds)
+        self.detections += 1
+        self.detection_cpu_seconds += cpu_seconds
+        self.consensus = self.decoder.update(marker_ids)
+        if self.consensus.changed:
+            self.decoded += 1
+        return self.consensus
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "frames": self.frames,
+            "failed_reads": self.failed_reads,
+            "detections": self.detections,
+            "detection_cpu_seconds": self.detection_cpu_seconds,
+            "decoded": self.decoded,
+            "selected": self.selected,
+        }
+
+
+def merge_camera_results(results: Sequence[Optional[ConsensusResult]]) -> Optional[Tuple[int, ConsensusResult]]:
+    """
+    Returns the index and result of the camera that currently sees the markers best:
+    the stable coordinate with the most agreement, the first camera on a tie. A camera
+    that lost sight of the markers keeps its coordinate while its confidence decays, so
+    the cursor hands over to a camera covering another region as soon as it agrees more.
+    """
+    best = None
+    for index, result in enumerate(results):
+        if result is None or result.x is None or not result.confidence:
+            continue
+        if best is None or result.confidence > best[1].confidence:
+            best = (index, result)
+    return best
+
+
+class SynchronizedCapture:
+    """
+    Captures from several cameras, video files or image directories at once. Every step
+    grabs one frame from each source back to back, so the frames are taken as close in
+    time as the devices allow, then decodes them in parallel, one pool thread per camera,
+    and moves the cursor to the merged coordinate.
+    """
+
+    def __init__(self, sources: Sequence[Union[int, str, FrameSource]], capture_size=None,
+                 detector_mode: str = DEFAULT_DETECTOR_MODE, max_workers: Optional[int] = None,
+                 submit: Optional[Callable[[str, int, int, float], bool]] = None):
+        """
+        Merged coordinates are passed to submit, submit_target unless given. Raises IOError
+        if a source cannot be opened; the sources opened so far are released.
+        """
+        if not sources:
+            raise ValueError("At least one source is needed")
+        self.channels: List[CameraChannel] = []
+        self.pool: Optional[ThreadPoolExecutor] = None
+        try:
+            for index, source in enumerate(sources):
+                self.channels.append(CameraChannel(index, open_frame_source(source, capture_size), detector_mode))
+        except IOError:
+            self.release()
+            raise
+        workers = len(self.channels) if max_workers is None else max_workers
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix=VIDEO_WORKER) if workers > 1 else None
+        self.submit = submit or submit_target
+        self.steps = 0
+        self.target: Optional[Tuple[int, int]] = None
+
+    def decode(self) -> List[Optional[ConsensusResult]]:
+        if self.pool is None:
+            return [channel.process() for channel in self.channels]
+        return list(self.pool.map(CameraChannel.process, self.channels))
+
+    def step(self) -> bool:
+        """
+        Captures and decodes one frame from every source. Returns False once a recorded
+        source has ended; failed reads of live cameras are retried on the next step.
+        """
+        grab_started = time.perf_counter()
+        begin_sample(CAMERA_SOURCE, grab_started)
+        grabbed = [channel.grab() for channel in self.channels]
+        record_stage(CAPTURE_READ, grab_started)
+        if not all(grabbed):
+            ended = [channel for channel, ok in zip(self.channels, grabbed) if not ok and not channel.source.is_live]
+            if ended:
+                logger.info(_("End of frames from {}").format(ended[0].source))
+                end_sample()
+                return False
+            logger.warning("grab failed on %d of %d cameras, retrying...", grabbed.count(False), len(grabbed))
+        if len(self.channels) > 1:
+            grab_times = [channel.grab_time for channel, ok in zip(self.channels, grabbed) if ok]
+            if len(grab_times) > 1:
+                metrics.record(CAPTURE_SKEW, max(grab_times) - min(grab_times))
+
+        detection_started = time.perf_counter()
+        results = self.decode()
+        record_stage(DETECTION, detection_started)
+        for index, result in enumerate(results):  # Counted here, the registry is not locked against the pool threads
+            if result is not None:
+                metrics.increment(CAMERA_FRAMES_SERIES.format(index))
+        consensus_started = time.perf_counter()
+        merged = merge_camera_results(results)
+        record_stage(CONSENSUS, consensus_started)
+        self.steps += 1
+        if merged is not None and (merged[1].x, merged[1].y) != self.target:
+            index, consensus = merged
+            self.target = (consensus.x, consensus.y)
+            self.channels[index].selected += 1
+            metrics.increment(CAMERA_SELECTED_SERIES.format(index))
+            logger.debug("camera %d: x: %s, y: %s, confidence: %.2f", index, consensus.x, consensus.y,
+                         consensus.confidence)
+            publish_gaze_sample(consensus.x, consensus.y, CAMERA_SOURCE, consensus.confidence)
+            self.submit(CAMERA_SOURCE, consensus.x, consensus.y, 0.1)
+        end_sample()  # Only still open if the frames did not move the cursor
+        return True
+
+    def stats(self) -> List[Dict[str, float]]:
+        return [channel.stats() for channel in self.channels]
+
+    def release(self) -> None:
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+        for channel in self.channels:
+            channel.source.release()
+
+    def log_stats(self) -> None:
+        for channel in self.channels:
+            stats = channel.stats()
+            logger.info(_("Camera {} ({}): {} frames, {} detections, {} failed reads, moved the cursor {} times")
+                        .format(channel.index, channel.source, stats["frames"], stats["detections"],
+                                stats["failed_reads"], stats["selected"]))
+
+
+def read_from_video_devices(sources: Sequence[Union[int, str]], capture_size=None,
+                            detector_mode: str = DEFAULT_DETECTOR_MODE, stop_event=None) -> None:
+    """
+    Captures from all sources at once until one of the recordings ends or the stop event
+    is set. The devices are released by this thread when it stops.
+    """
+    if stop_event is None:
+        stop_event = threading.Event()
+    try:
+        capture = SynchronizedCapture(sources, capture_size, detector_mode)
+    except IOError as e:
+        logger.error(_("Failed to open video device: {}").format(e))
+        return
+
+    logger.info(_("Opened {} video devices: {}").format(
+        len(capture.channels), ", ".join(str(channel.source) for channel in capture.channels)))
+    try:
+        while not stop_event.is_set() and capture.step():
+            pass
+    finally:
+        capture.release()
+        capture.log_stats()
+
+
+def start_multi_camera_thread(sources: Sequence[Union[int, str]], capture_size=None,
+                              detector_mode: str = DEFAULT_DETECTOR_MODE) -> None:
+    """
+    Replaces any running video capture with a synchronized capture from all sources;
+    stop_video_capture stops it.
+    """
+    stop_video_capture()
+    supervisor.start(VIDEO_WORKER, read_from_video_devices, list(sources), capture_size, detector_mode)
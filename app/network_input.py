@@ -0,0 +1,239 @@
+import argparse
+import logging
+import selectors
+import socket
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .localization import setup_localization
+from .metrics import NETWORK_READ
+from .serial import CommandParser
+from .tracing import NETWORK_SOURCE, begin_sample, end_sample, record_stage
+from .workers import NETWORK_WORKER, supervisor
+
+_, _lang = setup_localization()
+
+logger = logging.getLogger(__name__)
+
+UDP_MODE = "udp"
+TCP_MODE = "tcp"
+NETWORK_MODES = (UDP_MODE, TCP_MODE)
+DEFAULT_NETWORK_HOST = "127.0.0.1"
+RECEIVE_BUFFER_SIZE = 65536
+# Datagrams queued by the kernel while a batch is executed, about a second of 1 kHz input
+SOCKET_RECEIVE_BUFFER_BYTES = 1 << 20
+# How often the receive loop checks its stop event when no data arrives
+SELECT_TIMEOUT = 0.1
+TCP_BACKLOG = 4
+# Longest unterminated line a TCP client may send, a client going over it is disconnected
+MAX_PARTIAL_LINE_BYTES = RECEIVE_BUFFER_SIZE
+
+NetworkAddress = Tuple[str, str, int]
+
+current_network_input: Optional["NetworkInput"] = None
+
+
+def parse_network_address(value: str) -> NetworkAddress:
+    """
+    Parses udp://HOST:PORT or tcp://HOST:PORT into (mode, host, port). The host defaults to
+    localhost; 0.0.0.0 or a LAN address accepts input from other machines.
+    """
+    mode, separator, address = value.partition("://")
+    host, _colon, port = address.rpartition(":")
+    if not separator or mode not in NETWORK_MODES or not port.isdigit():
+        raise argparse.ArgumentTypeError(
+            f"invalid network input: {value}, expected udp://HOST:PORT or tcp://HOST:PORT")
+    return mode, host.strip("[]") or DEFAULT_NETWORK_HOST, int(port)
+
+
+def network_input_requested(argv: Optional[List[str]] = None) -> Optional[NetworkAddress]:
+    """
+    Returns the --network-input address, if given.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--network-input", type=parse_network_address, default=None,
+                        help="receive commands on udp://HOST:PORT or tcp://HOST:PORT")
+    args, _ = parser.parse_known_args(argv)
+    return args.network_input
+
+
+class NetworkInput:
+    """
+    Receives command lines over UDP, one or more lines per datagram, or over TCP, as a
+    stream of lines from any number of clients. Sockets are non-blocking and drained
+    completely on every wakeup, and the lines are executed as one batch, so a burst
+    of coordinates moves the cursor once, to the newest position.
+    """
+
+    def __init__(self, mode: str, host: str, port: int, parser: Optional[CommandParser] = None):
+        if mode not in NETWORK_MODES:
+            raise ValueError(f"Unknown network input mode: {mode}, expected one of {', '.join(NETWORK_MODES)}")
+        self.mode = mode
+        self.host = host
+        self.port = port
+        self.parser = CommandParser() if parser is None else parser
+        self.selector = selectors.DefaultSelector()
+        self.socket: Optional[socket.socket] = None
+        # Unterminated line received so far from each TCP client
+        self.partial_lines: Dict[socket.socket, bytes] = {}
+        self.lines_received = 0
+        self.batches = 0
+        self.lines_coalesced = 0
+
+    def open(self) -> None:
+        """
+        Binds the socket; raises OSError if the address cannot be used.
+        """
+        family = socket.AF_INET6 if ":" in self.host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_DGRAM if self.mode == UDP_MODE else socket.SOCK_STREAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if self.mode == UDP_MODE:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_RECEIVE_BUFFER_BYTES)
+            sock.bind((self.host, self.port))
+            if self.mode == TCP_MODE:
+                sock.listen(TCP_BACKLOG)
+            sock.setblocking(False)
+        except OSError:
+            sock.close()
+            raise
+        self.socket = sock
+        self.port = sock.getsockname()[1]  # The port chosen by the system for port 0
+        self.selector.register(sock, selectors.EVENT_READ)
+
+    def close(self) -> None:
+        for key in list(self.selector.get_map().values()):
+            self.selector.unregister(key.fileobj)
+            key.fileobj.close()
+        self.selector.close()
+        self.partial_lines.clear()
+        self.socket = None
+
+    def run(self, stop_event) -> None:
+        while not stop_event.is_set():
+            events = self.selector.select(SELECT_TIMEOUT)
+            if not events:
+                continue
+            arrival = time.perf_counter()
+            lines = []
+            for key, _mask in events:
+                if key.fileobj is not self.socket:
+                    lines.extend(self.receive_stream(key.fileobj))
+                elif self.mode == UDP_MODE:
+                    lines.extend(self.receive_datagrams())
+                else:
+                    self.accept_clients()
+            if lines:
+                self.execute(lines, arrival)
+
+    def receive_datagrams(self) -> List[str]:
+        lines = []
+        while True:
+            try:
+                data = self.socket.recv(RECEIVE_BUFFER_SIZE)
+            except (BlockingIOError, InterruptedError):
+                return lines
+            except ConnectionResetError:
+                continue  # An ICMP port unreachable for an earlier send, on Windows
+            lines.extend(decode_lines(data.split(b"\n")))
+
+    def accept_clients(self) -> None:
+        while True:
+            try:
+                client, address = self.socket.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            client.setblocking(False)
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.partial_lines[client] = b""
+            self.selector.register(client, selectors.EVENT_READ)
+            logger.info(_("Network input client connected from {}").format(address))
+
+    def receive_stream(self, client: socket.socket) -> List[str]:
+        chunks = [self.partial_lines[client]]
+        # Bytes after the last newline, so a client that never ends its line is cut off while reading
+        pending = len(chunks[0])
+        closed = overflow = False
+        while True:
+            try:
+                data = client.recv(RECEIVE_BUFFER_SIZE)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                data = b""
+            if not data:
+                closed = True
+                break
+            chunks.append(data)
+            newline = data.rfind(b"\n")
+            pending = pending + len(data) if newline < 0 else len(data) - newline - 1
+            if pending > MAX_PARTIAL_LINE_BYTES:
+                overflow = True
+                break
+        *complete, partial = b"".join(chunks).split(b"\n")
+        if overflow:
+            self.disconnect(client)
+            logger.warning(_("Network input client sent a line longer than {} bytes, disconnected").format(
+                MAX_PARTIAL_LINE_BYTES))
+        elif closed:
+            self.disconnect(client)
+            complete.append(partial)  # The last line needs no newline
+            logger.info(_("Network input client disconnected"))
+        else:
+            self.partial_lines[client] = partial
+        return decode_lines(complete)
+
+    def disconnect(self, client: socket.socket) -> None:
+        self.selector.unregister(client)
+        client.close()
+        del self.partial_lines[client]
+
+    def execute(self, lines: List[str], arrival: float) -> None:
+        begin_sample(NETWORK_SOURCE, arrival)
+        record_stage(NETWORK_READ, arrival)
+        logger.debug("Received %d lines on %s://%s:%d", len(lines), self.mode, self.host, self.port)
+        _executed, coalesced = self.parser.parse_batch(lines)
+        end_sample()  # Only still open if the batch did not move the cursor
+        self.lines_received += len(lines)
+        self.lines_coalesced += coalesced
+        self.batches += 1
+
+    def __repr__(self):
+        return f"{self.mode}://{self.host}:{self.port}"
+
+
+def decode_lines(raw_lines: List[bytes]) -> List[str]:
+    lines = []
+    for raw_line in raw_lines:
+        line = raw_line.decode("utf-8", errors="replace").strip()
+        if line:
+            lines.append(line)
+    return lines
+
+
+def start_network_input(mode: str, host: str, port: int, parser: Optional[CommandParser] = None) -> bool:
+    """
+    Binds the address and starts receiving commands on a worker thread.
+    Returns True if the address could be bound.
+    """
+    global current_network_input
+    stop_network_input()
+    network_input = NetworkInput(mode, host, port, parser)
+    try:
+        network_input.open()
+    except OSError as e:
+        logger.error(_("Cannot receive network input on {}: {}").format(network_input, e))
+        return False
+    current_network_input = network_input
+    supervisor.start(NETWORK_WORKER, network_input.run, release=network_input.close)
+    logger.info(_("Receiving network input on {}").format(network_input))
+    return True
+
+
+def stop_network_input() -> None:
+    global current_network_input
+    if current_network_input is not None:
+        supervisor.stop(NETWORK_WORKER)  # Closes the sockets once the receive loop has stopped
+        logger.info(_("Stopped network input on {}, {} lines received, {} coalesced").format(
+            current_network_input, current_network_input.lines_received, current_network_input.lines_coalesced))
+        current_network_input = None
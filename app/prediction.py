@@ -0,0 +1,228 @@
+import argparse
+import csv
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .lazy_import import lazy_import
+from .localization import setup_localization
+
+_, _lang = setup_localization()
+
+logger = logging.getLogger(__name__)
+
+# Only needed to predict or to evaluate recorded sessions
+np = lazy_import("numpy")
+
+# Samples the velocity is fitted over; at 250 Hz about 30 ms of gaze
+DEFAULT_PREDICTION_WINDOW = 8
+# Extrapolating further than this amplifies noise more than it hides latency
+DEFAULT_MAX_HORIZON = 0.1
+# Used until a cursor move has measured the pipeline latency
+DEFAULT_HORIZON = 0.03
+# Slower gaze is a fixation or drift, whose jitter must not be extrapolated
+DEFAULT_MIN_SPEED = 300.0
+# Faster gaze is a saccade, which ends before the cursor could follow the extrapolation
+DEFAULT_MAX_SPEED = 1500.0
+# RMS distance in pixels of the samples from the fitted line above which the motion is not linear
+DEFAULT_MAX_NOISE = 20.0
+# Weight of each new latency measurement in the horizon estimate
+LATENCY_SMOOTHING = 0.1
+
+# Why a position was or was not extrapolated
+EXTRAPOLATED = "extrapolated"
+WARMING_UP = "warming_up"
+FIXATION = "fixation"
+SACCADE = "saccade"
+NOISY = "noisy"
+PREDICTION_OUTCOMES = (EXTRAPOLATED, WARMING_UP, FIXATION, SACCADE, NOISY)
+
+
+class VelocityPredictor:
+    """
+    Predicts where the gaze will be once the cursor gets there. The velocity is the least
+    squares slope of the recent samples, kept in a NumPy ring, and the position is moved
+    ahead by the measured pipeline latency. Only smooth pursuits are extrapolated:
+    fixations, saccades and erratic motion are passed through unchanged, so the cursor
+    neither jitters more than the gaze nor overshoots the end of a saccade.
+    """
+
+    def __init__(self, window: int = DEFAULT_PREDICTION_WINDOW, max_horizon: float = DEFAULT_MAX_HORIZON,
+                 min_speed: float = DEFAULT_MIN_SPEED, max_speed: float = DEFAULT_MAX_SPEED,
+                 max_noise: float = DEFAULT_MAX_NOISE):
+        if window < 3:
+            raise ValueError(f"The prediction window needs at least 3 samples, got {window}")
+        self.window = window
+        self.max_horizon = max_horizon
+        self.min_speed = min_speed
+        self.max_speed = max_speed
+        self.max_noise = max_noise
+        self.times = np.zeros(window)
+        self.positions = np.zeros((window, 2))
+        self.count = 0
+        self.latency = DEFAULT_HORIZON
+        self.last_outcome = WARMING_UP
+
+    def reset(self) -> None:
+        """
+        Forgets the samples, e.g. when another source takes over the cursor.
+        """
+        self.count = 0
+
+    def add_sample(self, timestamp: float, x: float, y: float) -> None:
+        index = self.count % self.window
+        self.times[index] = timestamp
+        self.positions[index] = (x, y)
+        self.count += 1
+
+    def record_latency(self, seconds: float) -> None:
+        """
+        Updates the horizon with a measured time from sample arrival to the move command.
+        """
+        self.latency += LATENCY_SMOOTHING * (seconds - self.latency)
+
+    def horizon(self) -> float:
+        return min(max(self.latency, 0.0), self.max_horizon)
+
+    def fit(self) -> Tuple["np.ndarray", float]:
+        """
+        Returns the velocity in pixels per second and the RMS residual in pixels of a line
+        fitted to the samples in the window.
+        """
+        count = min(self.count, self.window)
+        times = self.times[:count] if count < self.window else self.times
+        positions = self.positions[:count] if count < self.window else self.positions
+        centered_times = times - times.mean()
+        centered_positions = positions - positions.mean(axis=0)
+        spread = float(centered_times @ centered_times)
+        if spread <= 0:
+            return np.zeros(2), 0.0
+        velocity = centered_times @ centered_positions / spread
+        residuals = centered_positions - np.outer(centered_times, velocity)
+        return velocity, float(np.sqrt((residuals * residuals).sum(axis=1).mean()))
+
+    def predict(self, x: float, y: float, horizon: Optional[float] = None,
+                bounds: Optional[Tuple[int, int]] = None) -> Tuple[int, int]:
+        """
+        Returns the position to move the cursor to for the newest sample (x, y), clamped to
+        a screen of the given size. The reason is kept in last_outcome.
+        """
+        predicted_x, predicted_y = x, y
+        if self.count < 3:
+            self.last_outcome = WARMING_UP
+        else:
+            velocity, noise = self.fit()
+            speed = float(np.hypot(velocity[0], velocity[1]))
+            if speed < self.min_speed:
+                self.last_outcome = FIXATION
+            elif speed > self.max_speed:
+                self.last_outcome = SACCADE
+            elif noise > self.max_noise:
+                self.last_outcome = NOISY
+            else:
+                self.last_outcome = EXTRAPOLATED
+                if horizon is None:
+                    horizon = self.horizon()
+                predicted_x = x + velocity[0] * horizon
+                predicted_y = y + velocity[1] * horizon
+        if bounds is not None:
+            predicted_x = min(max(predicted_x, 0), bounds[0] - 1)
+            predicted_y = min(max(predicted_y, 0), bounds[1] - 1)
+        return int(round(predicted_x)), int(round(predicted_y))
+
+
+def add_prediction_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--predict", action="store_true",
+                        help="move the cursor ahead along the gaze velocity to hide the pipeline latency")
+    parser.add_argument("--predict-window", type=int, default=DEFAULT_PREDICTION_WINDOW,
+                        help="samples the gaze velocity is estimated over")
+    parser.add_argument("--predict-max-horizon", type=float, default=DEFAULT_MAX_HORIZON,
+                        help="seconds the cursor is moved ahead at most")
+    parser.add_argument("--predict-min-speed", type=float, default=DEFAULT_MIN_SPEED,
+                        help="pixels per second below which the gaze is fixating and not predicted")
+    parser.add_argument("--predict-max-speed", type=float, default=DEFAULT_MAX_SPEED,
+                        help="pixels per second above which the gaze is in a saccade and not predicted")
+    parser.add_argument("--predict-max-noise", type=float, default=DEFAULT_MAX_NOISE,
+                        help="pixels of jitter around the fitted motion above which it is not predicted")
+
+
+def prediction_options_requested(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Returns the --predict options.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    add_prediction_arguments(parser)
+    args, _ = parser.parse_known_args(argv)
+    return args
+
+
+def create_predictor(args: argparse.Namespace) -> Optional[VelocityPredictor]:
+    """
+    Returns a predictor configured by the --predict options, or None if prediction is off.
+    """
+    if not args.predict:
+        return None
+    return VelocityPredictor(args.predict_window, args.predict_max_horizon, args.predict_min_speed,
+                             args.predict_max_speed, args.predict_max_noise)
+
+
+def load_gaze_session(path: str) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Loads a recorded session: an .npz file with timestamp, x and y arrays, as written by
+    save_gaze_session, or a .csv file with timestamp, x and y columns. Returns the
+    timestamps in seconds and the positions, shape (n, 2), sorted by time.
+    """
+    if path.lower().endswith(".npz"):
+        with np.load(path) as session:
+            timestamps, xs, ys = session["timestamp"], session["x"], session["y"]
+    else:
+        with open(path, newline="") as csv_file:
+            rows = [row for row in csv.DictReader(csv_file) if row.get("x") and row.get("y")]
+        timestamps = np.array([float(row["timestamp"]) for row in rows])
+        xs = np.array([float(row["x"]) for row in rows])
+        ys = np.array([float(row["y"]) for row in rows])
+    order = np.argsort(timestamps, kind="stable")
+    return timestamps[order].astype(float), np.column_stack([xs, ys])[order].astype(float)
+
+
+def save_gaze_session(path: str, timestamps, positions) -> None:
+    np.savez_compressed(path, timestamp=np.asarray(timestamps, dtype=float),
+                        x=np.asarray(positions)[:, 0], y=np.asarray(positions)[:, 1])
+
+
+def evaluate_prediction(timestamps, positions, horizon: float,
+                        create: Callable[[], VelocityPredictor] = VelocityPredictor) -> Dict[str, float]:
+    """
+    Replays a session through a new predictor with a fixed horizon. Each prediction is
+    compared with the true position horizon seconds later, interpolated between the
+    recorded samples, and so is the unpredicted sample, which is where a cursor lagging
+    by the horizon would be. Errors are in pixels.
+    """
+    timestamps = np.asarray(timestamps, dtype=float)
+    positions = np.asarray(positions, dtype=float)
+    evaluated = int(np.searchsorted(timestamps, timestamps[-1] - horizon, side="right")) if len(timestamps) else 0
+    if not evaluated:
+        raise ValueError(_("The session is shorter than the prediction horizon"))
+    predictor = create()
+    predicted = np.empty((evaluated, 2))
+    outcomes = {outcome: 0 for outcome in PREDICTION_OUTCOMES}
+    for index in range(evaluated):
+        x, y = positions[index]
+        predictor.add_sample(timestamps[index], x, y)
+        predicted[index] = predictor.predict(x, y, horizon)
+        outcomes[predictor.last_outcome] += 1
+
+    future_times = timestamps[:evaluated] + horizon
+    future = np.column_stack([np.interp(future_times, timestamps, positions[:, axis]) for axis in (0, 1)])
+    errors = np.hypot(*(predicted - future).T)
+    baseline_errors = np.hypot(*(positions[:evaluated] - future).T)
+    report = {
+        "samples": evaluated,
+        "horizon": horizon,
+        "mean_error": float(errors.mean()),
+        "p95_error": float(np.percentile(errors, 95)),
+        "baseline_mean_error": float(baseline_errors.mean()),
+        "baseline_p95_error": float(np.percentile(baseline_errors, 95)),
+    }
+    for outcome, count in outcomes.items():
+        report[f"{outcome}_fraction"] = count / evaluated
+    return report
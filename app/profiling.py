@@ -0,0 +1,330 @@
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from .lazy_import import lazy_import
+from .localization import setup_localization
+from .user_dirs import user_cache_dir
+from .workers import PROFILE_REPORT_WORKER, supervisor
+
+_, _lang = setup_localization()
+
+# Only needed by the memory profiler, which is rarely on
+tracemalloc = lazy_import("tracemalloc")
+
+PROFILE_MODES = ("cpu", "mem")
+DEFAULT_SAMPLE_INTERVAL = 0.01
+DEFAULT_SNAPSHOT_INTERVAL = 30.0
+TRACEMALLOC_FRAMES = 10
+REPORT_ROW_LIMIT = 30
+
+active_profiler: Optional["Profiler"] = None
+
+Frame = Tuple[str, int, str]
+
+# Innermost Python functions of a thread that is blocked rather than running, as the end of the
+# file name and the function name. The sampler leaves these samples out so the report shows CPU
+# time, not wall-clock time. Blocking C calls made from other functions, e.g. time.sleep, still count.
+BLOCKING_FUNCTIONS = (
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("socket.py", "accept"),
+    (os.path.join("tkinter", "__init__.py"), "mainloop"),
+)
+
+
+def profile_options_requested(argv: Optional[List[str]] = None) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Returns the --profile mode and the --profile-dir report directory, if given.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--profile", choices=PROFILE_MODES, default=None,
+                        help="sample CPU usage of all threads or trace memory allocations")
+    parser.add_argument("--profile-dir", default=None, help="directory for the profile reports")
+    args, _ = parser.parse_known_args(argv)
+    return args.profile, args.profile_dir
+
+
+def default_profile_dir() -> str:
+    return os.path.join(user_cache_dir(), "profiles")
+
+
+class Profiler(ABC):
+    """
+    Abstract base class for profilers that run in the background while the app is used.
+    """
+
+    mode = ""
+
+    def __init__(self, interval: float, report_dir: Optional[str] = None):
+        self.interval = interval
+        self.report_dir = default_profile_dir() if report_dir is None else report_dir
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.started = time.time()
+        self.reports = 0
+
+    def start(self) -> None:
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name=f"{self.mode}-profiler", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run(self) -> None:
+        while not self.stop_event.wait(self.interval):
+            self.sample()
+
+    @abstractmethod
+    def sample(self) -> None:
+        """
+        Takes one sample or snapshot, called every interval seconds on the profiler thread.
+        """
+        pass
+
+    @abstractmethod
+    def write_report(self) -> List[str]:
+        """
+        Writes the report files for what was collected so far and returns their paths.
+        """
+        pass
+
+    def report_paths(self, *extensions: str) -> List[str]:
+        """
+        Returns a path for each file of the next report, named after the time in milliseconds
+        and the number of the report, so reports written in the same second are all kept.
+        """
+        now = time.time()
+        self.reports += 1
+        name = f"{self.mode}-{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}-{int(now * 1000) % 1000:03d}"
+        return [os.path.join(self.report_dir, f"{name}-{self.reports}.{extension}") for extension in extensions]
+
+
+class SamplingProfiler(Profiler):
+    """
+    Samples the stack of every thread through sys._current_frames, so profiled code runs
+    at full speed and the cost is one stack walk per thread and interval. Threads blocked
+    in one of the BLOCKING_FUNCTIONS are counted as idle instead of sampled.
+    """
+
+    mode = "cpu"
+
+    def __init__(self, interval: float = DEFAULT_SAMPLE_INTERVAL, report_dir: Optional[str] = None):
+        super().__init__(interval, report_dir)
+        # (thread name, stack of functions from outermost to innermost) -> samples
+        self.stacks: Counter = Counter()
+        # thread name -> samples left out because the thread was blocked
+        self.idle: Counter = Counter()
+        self.samples = 0
+
+    def sample(self) -> None:
+        own_ident = threading.get_ident()
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            if is_blocked(frame):
+                self.idle[thread_names.get(ident, str(ident))] += 1
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            self.stacks[(thread_names.get(ident, str(ident)), tuple(reversed(stack)))] += 1
+        self.samples += 1
+
+    def function_counts(self) -> Dict[str, Tuple[Counter, Counter]]:
+        """
+        Returns the self and cumulative sample counts of each function, by thread name.
+        """
+        counts: Dict[str, Tuple[Counter, Counter]] = {}
+        for (thread_name, stack), samples in list(self.stacks.items()):
+            self_counts, cumulative_counts = counts.setdefault(thread_name, (Counter(), Counter()))
+            functions = [format_function(frame) for frame in stack]
+            if functions:
+                self_counts[functions[-1]] += samples
+            for function in set(functions):
+                cumulative_counts[function] += samples
+        return counts
+
+    def format_report(self) -> str:
+        lines = [f"CPU samples: {self.samples} every {self.interval * 1000:.0f} ms "
+                 f"over {time.time() - self.started:.0f} s, blocked threads left out"]
+        for thread_name, (self_counts, cumulative_counts) in sorted(self.function_counts().items()):
+            thread_samples = sum(self_counts.values())
+            lines.append("")
+            lines.append(f"Thread {thread_name}: {thread_samples} samples, {self.idle[thread_name]} blocked")
+            lines.append(f"{'self %':>8} {'cumul %':>8}  function")
+            for function, samples in self_counts.most_common(REPORT_ROW_LIMIT):
+                lines.append(f"{samples / thread_samples:>8.1%} {cumulative_counts[function] / thread_samples:>8.1%}"
+                             f"  {function}")
+        return "\n".join(lines) + "\n"
+
+    def format_collapsed_stacks(self) -> str:
+        """
+        Formats the samples as collapsed stacks, the input of flamegraph.pl and speedscope.
+        """
+        lines = []
+        for (thread_name, stack), samples in sorted(list(self.stacks.items())):
+            names = [thread_name] + [f"{frame[2]} ({os.path.basename(frame[0])}:{frame[1]})" for frame in stack]
+            lines.append(f"{';'.join(names)} {samples}")
+        return "\n".join(lines) + "\n"
+
+    def write_report(self) -> List[str]:
+        report_path, collapsed_path = self.report_paths("txt", "collapsed")
+        write_text(report_path, self.format_report())
+        write_text(collapsed_path, self.format_collapsed_stacks())
+        return [report_path, collapsed_path]
+
+
+class MemoryTracer(Profiler):
+    """
+    Takes periodic tracemalloc snapshots and reports the allocation sites that grew the
+    most since the first snapshot and since the previous one.
+    """
+
+    mode = "mem"
+
+    def __init__(self, interval: float = DEFAULT_SNAPSHOT_INTERVAL, report_dir: Optional[str] = None,
+                 frames: int = TRACEMALLOC_FRAMES):
+        super().__init__(interval, report_dir)
+        self.frames = frames
+        self.first_snapshot: Optional["tracemalloc.Snapshot"] = None
+        self.previous_snapshot: Optional["tracemalloc.Snapshot"] = None
+        self.last_snapshot: Optional["tracemalloc.Snapshot"] = None
+        # (seconds since start, traced bytes) per snapshot
+        self.history: List[Tuple[float, int]] = []
+        self.lock = threading.Lock()
+        # Tracing that was already on, e.g. with python -X tracemalloc, is left on at stop
+        self.started_tracing = False
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self.started_tracing = True
+        self.sample()
+        super().start()
+
+    def stop(self) -> None:
+        super().stop()
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def sample(self) -> None:
+        if not tracemalloc.is_tracing():
+            return
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        traced_bytes, _peak = tracemalloc.get_traced_memory()
+        with self.lock:
+            if self.first_snapshot is None:
+                self.first_snapshot = snapshot
+            self.previous_snapshot, self.last_snapshot = self.last_snapshot, snapshot
+            self.history.append((time.time() - self.started, traced_bytes))
+
+    def format_report(self) -> str:
+        with self.lock:
+            first, previous, last = self.first_snapshot, self.previous_snapshot, self.last_snapshot
+            history = list(self.history)
+        lines = [f"Traced memory over {len(history)} snapshots every {self.interval:.0f} s:"]
+        lines.extend(f"{seconds:>10.0f} s {traced_bytes / 1024 / 1024:>10.2f} MiB" for seconds, traced_bytes in history)
+        for title, baseline in ((_("Growth since the first snapshot"), first),
+                                (_("Growth since the previous snapshot"), previous)):
+            if baseline is None or last is None or baseline is last:
+                continue
+            lines.append("")
+            lines.append(title)
+            for difference in last.compare_to(baseline, "lineno")[:REPORT_ROW_LIMIT]:
+                lines.append(str(difference))
+        if last is not None:
+            lines.append("")
+            lines.append(_("Largest allocation sites"))
+            lines.extend(str(statistic) for statistic in last.statistics("lineno")[:REPORT_ROW_LIMIT])
+        return "\n".join(lines) + "\n"
+
+    def write_report(self) -> List[str]:
+        self.sample()  # Include everything up to now
+        report_path, = self.report_paths("txt")
+        write_text(report_path, self.format_report())
+        return [report_path]
+
+
+def is_blocked(frame) -> bool:
+    code = frame.f_code
+    return any(code.co_name == function and code.co_filename.endswith(filename)
+               for filename, function in BLOCKING_FUNCTIONS)
+
+
+def format_function(frame: Frame) -> str:
+    filename, _lineno, function = frame
+    return f"{function} ({os.path.basename(filename)})"
+
+
+def write_text(path: str, text: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as report_file:
+        report_file.write(text)
+
+
+def start_profiler(mode: str, report_dir: Optional[str] = None, **kwargs) -> Profiler:
+    """
+    Starts the CPU or memory profiler; there is at most one active profiler.
+    """
+    global active_profiler
+    stop_profiler()
+    if mode == "cpu":
+        active_profiler = SamplingProfiler(report_dir=report_dir, **kwargs)
+    elif mode == "mem":
+        active_profiler = MemoryTracer(report_dir=report_dir, **kwargs)
+    else:
+        raise ValueError(f"Unknown profile mode: {mode}, expected one of {', '.join(PROFILE_MODES)}")
+    active_profiler.start()
+    logging.info(_("Started {} profiler").format(mode))
+    return active_profiler
+
+
+def write_profile_report() -> List[str]:
+    """
+    Writes the report of the active profiler, if any, which keeps running.
+    """
+    if active_profiler is None:
+        return []
+    try:
+        paths = active_profiler.write_report()
+    except OSError as e:
+        logging.error(_("Cannot write profile report to {}: {}").format(active_profiler.report_dir, e))
+        return []
+    logging.info(_("Wrote profile report to {}").format(", ".join(paths)))
+    return paths
+
+
+def request_profile_report() -> None:
+    """
+    Writes the report of the active profiler, if any, on a worker thread. A memory snapshot
+    can take seconds on a large heap, which must not freeze the Tk thread.
+    """
+    if active_profiler is None or supervisor.is_running(PROFILE_REPORT_WORKER):
+        return
+    supervisor.start(PROFILE_REPORT_WORKER, lambda stop_event: write_profile_report())
+
+
+def stop_profiler() -> None:
+    global active_profiler
+    if active_profiler is not None:
+        active_profiler.stop()
+        active_profiler = None
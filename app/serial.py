@@ -3,22 +3,40 @@ import re
 import threading
 import time
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import serial
 from serial.tools import list_ports
 
+from .arbitration import submit_target
+from .gaze_stream import publish_gaze_sample
 from .localization import setup_localization
-from .window_actions import move_mouse, show_calibration_dot, hide_calibration_dot
+from .log_policy import lazy_translator
+from .metrics import SERIAL_PARSE, SERIAL_READ, SERIAL_RECOVERY, record_latency
+from .tracing import SERIAL_SOURCE, begin_sample, current_sample, end_sample, record_stage
+from .ui_dispatcher import run_on_ui_thread
+from .window_actions import CALIBRATION_DOT_UI_KEY, show_calibration_dot, hide_calibration_dot
+from .workers import DEFAULT_JOIN_TIMEOUT, SERIAL_WORKER, supervisor
 
 _, _lang = setup_localization()
 
 current_serial_connection: Optional[serial.Serial] = None
+serial_watcher: Optional["SerialWatcher"] = None
+# Lines read over all connections, to estimate how many were lost while disconnected
+lines_received = 0
 
 CALIBRATION_REQUIRED = "calibration_required"
 CALIBRATION_DONE = "calibration_done"
 
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# Pause between polls of the input buffer, cut short when the reader is stopped
+READ_POLL_INTERVAL = 0.1
+# list_ports.comports() takes about a millisecond, so the watcher can poll it often
+DEFAULT_PORT_POLL_INTERVAL = 0.25
+MIN_RECONNECT_BACKOFF = 0.05
+MAX_RECONNECT_BACKOFF = 2.0
+
+logger = logging.getLogger(__name__)
+N_ = lazy_translator(_)
 
 
 def get_current_serial_connection() -> Optional[serial.Serial]:
@@ -34,6 +52,9 @@ class Command(ABC):
     Abstract base class for command objects.
     """
 
+    # Whether a newer line for this command makes an older, unexecuted one in the same batch moot
+    coalesce = False
+
     @abstractmethod
     def matches(self, line: str) -> bool:
         """
@@ -54,6 +75,8 @@ class CoordinateCommand(Command):
     Command class for handling coordinate commands.
     """
 
+    coalesce = True  # Only the newest position matters
+
     def matches(self, line: str) -> bool:
         """
         Checks if the given line matches the coordinate command pattern.
@@ -63,12 +86,16 @@ class CoordinateCommand(Command):
 
     def execute(self, line: str) -> bool:
         """
-        Executes the coordinate command by moving the mouse cursor.
+        Executes the coordinate command by offering the position to the cursor arbiter.
         """
         coordinates = re.findall(r"\d+", line)
         if len(coordinates) != 2:
             raise ValueError(_("Data does not contain exactly two integers."))
-        move_mouse(coordinates[0], coordinates[1], 0.2)
+        x, y = int(coordinates[0]), int(coordinates[1])
+        sample = current_sample()
+        source = SERIAL_SOURCE if sample is None else sample.source
+        publish_gaze_sample(x, y, source)
+        submit_target(source, x, y, 0.2)
         return True
 
 
@@ -87,8 +114,8 @@ class CalibrationRequiredCommand(Command):
         """
         Executes the calibration_required command by showing the calibration dot.
         """
-        logging.info(_("calibration_required: showing calibration dot"))
-        show_calibration_dot()
+        logger.info(_("calibration_required: showing calibration dot"))
+        run_on_ui_thread(show_calibration_dot, key=CALIBRATION_DOT_UI_KEY)
         return True
 
 
@@ -107,8 +134,8 @@ class CalibrationDoneCommand(Command):
         """
         Executes the calibration_done command by hiding the calibration dot.
         """
-        logging.info(_("calibration_done: hiding calibration dot"))
-        hide_calibration_dot()
+        logger.info(_("calibration_done: hiding calibration dot"))
+        run_on_ui_thread(hide_calibration_dot, key=CALIBRATION_DOT_UI_KEY)
         return True
 
 
@@ -136,35 +163,104 @@ class CommandParser:
         Parses the given line and executes the corresponding command, if any.
         Returns True if a command was executed successfully, False otherwise.
         """
+        started = time.perf_counter()
         for command in self.commands:
             if command.matches(line):
+                # Executing is timed on its own, e.g. as mouse_move
+                record_stage(SERIAL_PARSE, started)
                 return command.execute(line)
+        record_stage(SERIAL_PARSE, started)
         raise ValueError(_("Unknown command: {}").format(line))
 
+    def parse_batch(self, lines: List[str]) -> Tuple[int, int]:
+        """
+        Parses and executes lines that arrived together, in order. Of the lines for a
+        coalescing command, like coordinates, only the last one is executed. Invalid lines
+        are logged and skipped. Returns the number of lines executed and coalesced.
+        """
+        started = time.perf_counter()
+        matched = []
+        for line in lines:
+            command = next((command for command in self.commands if command.matches(line)), None)
+            if command is None:
+                logger.error(N_("ERROR: error parsing above line, invalid data, error is: {}",
+                                N_("Unknown command: {}", line)))
+                continue
+            matched.append((command, line))
+        last_index = {type(command): index for index, (command, _line) in enumerate(matched) if command.coalesce}
+        record_stage(SERIAL_PARSE, started)
+
+        executed = coalesced = 0
+        for index, (command, line) in enumerate(matched):
+            if command.coalesce and last_index[type(command)] != index:
+                coalesced += 1
+                continue
+            try:
+                command.execute(line)
+                executed += 1
+            except ValueError as e:
+                logger.error(N_("ERROR: error parsing above line, invalid data, error is: {}", e))
+        return executed, coalesced
+
 
-def read_from_serial(ser: serial.Serial, parser: CommandParser) -> None:
+def read_from_serial(ser: serial.Serial, parser: CommandParser, stop_event: Optional[threading.Event] = None) -> None:
     """
     Reads data from the serial connection and parses/executes commands.
+    Ends when the connection is replaced, closed or lost, or the stop event is set.
     """
-    global current_serial_connection
-    while get_current_serial_connection() is ser:
-        if ser.in_waiting:
-            line = ser.readline().decode("utf-8").rstrip()
-            logging.info(_("Received data from {}: {}").format(ser.port, line))
+    global current_serial_connection, lines_received
+    if stop_event is None:
+        stop_event = threading.Event()
+    while get_current_serial_connection() is ser and not stop_event.is_set():
+        try:
+            if ser.in_waiting:
+                read_started = time.perf_counter()
+                line = ser.readline().decode("utf-8").rstrip()
+            else:
+                line = None
+        except (serial.SerialException, OSError) as e:
+            if get_current_serial_connection() is ser:
+                logger.error(_("Lost connection to {}: {}").format(ser.port, e))
+                drop_serial_connection(ser)
+            return
+
+        if line is not None:
+            lines_received += 1
+            begin_sample(SERIAL_SOURCE, read_started)
+            record_stage(SERIAL_READ, read_started)
+            logger.info(N_("Received data from {}: {}", ser.port, line))
 
             try:
                 parser.parse(line)
             except ValueError as e:
-                logging.error(_("ERROR: error parsing above line, invalid data, error is: {}").format(e))
+                logger.error(N_("ERROR: error parsing above line, invalid data, error is: {}", e))
+            end_sample()  # Only still open if the line did not move the cursor
+
+        stop_event.wait(READ_POLL_INTERVAL)
+
 
-        time.sleep(0.1)
+# (time listed, port names) of the last list_ports.comports() call
+port_list_cache: Tuple[float, List[str]] = (float("-inf"), [])
+
+
+def list_serial_port_names(max_age: float = 0.0) -> List[str]:
+    """
+    Lists the serial port names, reusing the last listing if it is at most max_age seconds old.
+    """
+    global port_list_cache
+    listed_at, ports = port_list_cache
+    now = time.monotonic()
+    if now - listed_at > max_age:
+        ports = [port.device for port in list_ports.comports()]
+        port_list_cache = (now, ports)
+    return ports
 
 
 def get_serial_ports() -> List[str]:
     """
     Lists available serial port names.
     """
-    ports = [port.device for port in list_ports.comports()]
+    ports = list_serial_port_names()
     return ports if ports else [_("No Ports Available")]
 
 
@@ -175,32 +271,170 @@ def start_serial_thread(
     Starts a new thread for reading from the serial connection.
     Returns True if the thread was started successfully, False otherwise.
     """
-    global current_serial_connection
+    global current_serial_connection, serial_watcher
     disconnect_from_serial()  # Close existing serial connection if any
 
     if parser is None:
         parser = CommandParser()
 
     try:
-        ser = serial.Serial(port, baud_rate, timeout=0)
-        current_serial_connection = ser
-        threading.Thread(
-            target=read_from_serial, args=(ser, parser), daemon=True
-        ).start()
-        logging.info(_("Connected to {}").format(current_serial_connection.port))
-        return True
+        open_serial_connection(port, baud_rate, parser)
+        logger.info(_("Connected to {}").format(current_serial_connection.port))
     except serial.SerialException as e:
-        logging.error(_("Failed to connect: {}").format(e))
+        logger.error(_("Failed to connect: {}").format(e))
         return False
+    serial_watcher = SerialWatcher(port, baud_rate, parser)
+    serial_watcher.start()
+    return True
 
 
-def disconnect_from_serial() -> None:
+def open_serial_connection(port: str, baud_rate: int, parser: CommandParser) -> serial.Serial:
     """
-    Closes the current serial connection, if any.
+    Opens the port as the current serial connection and starts its reader thread.
+    Raises serial.SerialException if the port cannot be opened.
     """
     global current_serial_connection
+    ser = serial.Serial(port, baud_rate, timeout=0)
+    current_serial_connection = ser
+    supervisor.start(SERIAL_WORKER, read_from_serial, ser, parser)
+    return ser
+
+
+def drop_serial_connection(ser: serial.Serial) -> None:
+    """
+    Closes a connection whose device went away and lets the watcher reconnect it.
+    """
+    global current_serial_connection
+    if current_serial_connection is not ser:
+        return
+    current_serial_connection = None
+    try:
+        ser.close()
+    except (serial.SerialException, OSError):
+        pass  # The handle is dead already
+    watcher = serial_watcher
+    if watcher is not None and watcher.port == ser.port:
+        watcher.connection_lost()
+
+
+class SerialWatcher:
+    """
+    Watches the port of the current connection and reconnects it when the device comes back
+    after a drop, with the same command parser. Drops are noticed when reading fails or when
+    the port disappears from the port list, which catches handles that go quiet instead.
+    Reconnect attempts back off exponentially from min_backoff to max_backoff.
+    """
+
+    def __init__(self, port: str, baud_rate: int, parser: CommandParser,
+                 poll_interval: float = DEFAULT_PORT_POLL_INTERVAL, min_backoff: float = MIN_RECONNECT_BACKOFF,
+                 max_backoff: float = MAX_RECONNECT_BACKOFF):
+        self.port = port
+        self.baud_rate = baud_rate
+        self.parser = parser
+        self.poll_interval = poll_interval
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.lost = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.lost_at = 0.0
+        self.connected_at = time.monotonic()
+        self.lines_at_connect = lines_received
+        self.recovery_times: List[float] = []
+        self.samples_lost = 0
+        # Virtual ports, like ptys, are never listed, so their absence from the list means nothing
+        self.port_listed = port in list_serial_port_names()
+
+    def start(self) -> None:
+        self.thread = threading.Thread(target=self.run, name="serial-watcher", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        self.lost.set()  # Wakes run() right away
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(DEFAULT_JOIN_TIMEOUT)
+        self.thread = None
+
+    def connection_lost(self) -> None:
+        if not self.lost.is_set():
+            self.lost_at = time.monotonic()
+            self.lost.set()
+
+    def run(self) -> None:
+        while not self.stop_event.is_set():
+            if not self.lost.wait(self.poll_interval):
+                connection = get_current_serial_connection()
+                if connection is not None and self.port_listed and \
+                        self.port not in list_serial_port_names(self.poll_interval):
+                    logger.error(_("{} was unplugged").format(self.port))
+                    drop_serial_connection(connection)
+                continue
+            if self.reconnect():
+                self.lost.clear()
+
+    def reconnect(self) -> bool:
+        """
+        Waits for the port to come back and reopens it. Returns False if stopped first.
+        """
+        backoff = self.min_backoff
+        attempts = 0
+        while not self.stop_event.is_set():
+            if self.port_listed and self.port not in list_serial_port_names(self.poll_interval):
+                self.stop_event.wait(self.poll_interval)
+                continue
+            attempts += 1
+            try:
+                open_serial_connection(self.port, self.baud_rate, self.parser)
+            except serial.SerialException as e:
+                logger.debug("Reconnect attempt %d to %s failed: %s", attempts, self.port, e)
+                self.stop_event.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            self.record_recovery(attempts)
+            return True
+        return False
+
+    def record_recovery(self, attempts: int) -> None:
+        now = time.monotonic()
+        downtime = now - self.lost_at
+        connected_time = self.lost_at - self.connected_at
+        # The line rate before the drop, over the time the device was gone
+        if connected_time > 0:
+            self.samples_lost += round((lines_received - self.lines_at_connect) / connected_time * downtime)
+        self.recovery_times.append(downtime)
+        self.connected_at = now
+        self.lines_at_connect = lines_received
+        record_latency(SERIAL_RECOVERY, downtime)
+        logger.info(_("Reconnected to {} after {:.2f}s and {} attempts").format(self.port, downtime, attempts))
+        stats = self.stats()
+        logger.info(_("Serial recovery: {} reconnects, mean time to recover {:.2f}s, about {} samples lost").format(
+            stats["reconnects"], stats["mean_time_to_recover"], stats["samples_lost"]))
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns the number of reconnects, the mean time to recover in seconds and the
+        estimated number of samples lost while disconnected.
+        """
+        reconnects = len(self.recovery_times)
+        return {
+            "reconnects": reconnects,
+            "mean_time_to_recover": sum(self.recovery_times) / reconnects if reconnects else 0.0,
+            "samples_lost": self.samples_lost,
+        }
+
+
+def disconnect_from_serial() -> None:
+    """
+    Closes the current serial connection, if any, and stops reconnecting it.
+    """
+    global current_serial_connection, serial_watcher
+    if serial_watcher is not None:
+        serial_watcher.stop()
+        serial_watcher = None
+    supervisor.stop(SERIAL_WORKER)  # The reader leaves readline before the port is closed
     if current_serial_connection:
         port = current_serial_connection.port
         current_serial_connection.close()
         current_serial_connection = None
-        logging.info(_("Disconnected from {}").format(port))
+        logger.info(_("Disconnected from {}").format(port))
@@ -0,0 +1,172 @@
+import argparse
+import json
+import logging
+import os
+import threading
+from typing import Callable, List, Optional, Tuple
+
+from .localization import setup_localization
+from .serial import get_serial_ports, start_serial_thread
+from .user_dirs import user_config_dir
+from .video_capture import (
+    DEFAULT_DETECTOR_MODE,
+    DETECTOR_MODES,
+    get_video_devices,
+    start_video_thread,
+    stop_video_capture,
+    wait_for_first_frame,
+)
+
+_, _lang = setup_localization()
+
+logger = logging.getLogger(__name__)
+
+SESSION_PROFILE_FILE_NAME = "session.json"
+DEFAULT_BAUD_RATE = 9600
+# How long a remembered camera may take to deliver its first frame
+FIRST_FRAME_TIMEOUT = 5.0
+
+# Devices that could not be reopened
+SERIAL_DEVICE = "serial"
+CAMERA_DEVICE = "camera"
+
+
+class SessionProfile:
+    """
+    The devices and capture settings of the last session, reopened on the next launch.
+    """
+
+    def __init__(self, serial_port: Optional[str] = None, baud_rate: int = DEFAULT_BAUD_RATE,
+                 camera: Optional[int] = None, capture_size: Optional[Tuple[int, int]] = None,
+                 detector_mode: str = DEFAULT_DETECTOR_MODE):
+        self.serial_port = serial_port
+        self.baud_rate = baud_rate
+        self.camera = camera
+        self.capture_size = tuple(capture_size) if capture_size else None
+        self.detector_mode = detector_mode
+
+    def has_devices(self) -> bool:
+        return self.serial_port is not None or self.camera is not None
+
+    def to_dict(self):
+        return {
+            "serial_port": self.serial_port,
+            "baud_rate": self.baud_rate,
+            "camera": self.camera,
+            "capture_size": list(self.capture_size) if self.capture_size else None,
+            "detector_mode": self.detector_mode,
+        }
+
+    @classmethod
+    def from_dict(cls, data) -> "SessionProfile":
+        """
+        Builds a profile from saved data; raises ValueError for values that cannot be used.
+        """
+        profile = cls(
+            serial_port=data.get("serial_port"),
+            baud_rate=int(data.get("baud_rate", DEFAULT_BAUD_RATE)),
+            camera=None if data.get("camera") is None else int(data["camera"]),
+            capture_size=data.get("capture_size"),
+            detector_mode=data.get("detector_mode", DEFAULT_DETECTOR_MODE),
+        )
+        if profile.detector_mode not in DETECTOR_MODES:
+            raise ValueError(_("Unknown detector mode: {}").format(profile.detector_mode))
+        if profile.capture_size is not None and len(profile.capture_size) != 2:
+            raise ValueError(_("Capture size must be [width, height], got {}").format(data["capture_size"]))
+        return profile
+
+    def __eq__(self, other):
+        return isinstance(other, SessionProfile) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+def default_session_profile_path() -> str:
+    return os.path.join(user_config_dir(), SESSION_PROFILE_FILE_NAME)
+
+
+def load_session_profile(path: Optional[str] = None) -> SessionProfile:
+    """
+    Loads the saved session profile, or an empty one if there is none or it cannot be read.
+    """
+    path = default_session_profile_path() if path is None else path
+    try:
+        with open(path) as profile_file:
+            data = json.load(profile_file)
+        if not isinstance(data, dict):
+            raise ValueError(_("Session profile must be a JSON object"))
+        return SessionProfile.from_dict(data)
+    except FileNotFoundError:
+        return SessionProfile()
+    except (OSError, TypeError, ValueError) as e:
+        logger.warning(_("Ignoring session profile {}: {}").format(path, e))
+        return SessionProfile()
+
+
+def save_session_profile(profile: SessionProfile, path: Optional[str] = None) -> None:
+    """
+    Saves the session profile, replacing the old file only once the new one is complete.
+    """
+    path = default_session_profile_path() if path is None else path
+    temporary_path = path + ".tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temporary_path, "w") as profile_file:
+            json.dump(profile.to_dict(), profile_file, indent=2)
+        os.replace(temporary_path, path)
+    except OSError as e:
+        logger.error(_("Cannot save session profile to {}: {}").format(path, e))
+
+
+def auto_connect_requested(argv: Optional[List[str]] = None) -> bool:
+    """
+    Checks the app was not started with --no-auto-connect.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--no-auto-connect", action="store_true",
+                        help="do not reopen the serial port and camera of the last session")
+    args, _ = parser.parse_known_args(argv)
+    return not args.no_auto_connect
+
+
+def open_session_devices(profile: SessionProfile, video_canvas=None,
+                         first_frame_timeout: float = FIRST_FRAME_TIMEOUT) -> List[str]:
+    """
+    Opens the serial port and camera of the profile and waits until the camera delivers
+    a frame. Returns the devices that could not be opened.
+    """
+    failed = []
+    if profile.camera is not None:
+        # The camera opens on its own thread, so it warms up while the serial port opens
+        start_video_thread(profile.camera, video_canvas, profile.capture_size, profile.detector_mode)
+    if profile.serial_port is not None and not start_serial_thread(profile.serial_port, profile.baud_rate):
+        failed.append(SERIAL_DEVICE)
+    if profile.camera is not None and not wait_for_first_frame(first_frame_timeout):
+        logger.warning(_("Camera {} delivered no frame within {:.0f}s").format(profile.camera, first_frame_timeout))
+        stop_video_capture()
+        failed.append(CAMERA_DEVICE)
+    return failed
+
+
+def start_session_thread(profile: SessionProfile,
+                         on_done: Callable[[List[str], List[str], List[int]], None]) -> threading.Thread:
+    """
+    Reopens the devices of the profile in the background, then enumerates the serial
+    ports and video devices for the selection UI. Calls on_done(failed devices, ports,
+    video devices) from the background thread.
+    """
+
+    def run():
+        failed = open_session_devices(profile) if profile.has_devices() else []
+        if SERIAL_DEVICE in failed:
+            logger.warning(_("Cannot reopen serial port {}, please select a port").format(profile.serial_port))
+        if CAMERA_DEVICE in failed:
+            logger.warning(_("Cannot reopen video device {}, please select a device").format(profile.camera))
+        # A camera that is already open is not probed again, opening it twice fails on some platforms
+        in_use = () if profile.camera is None or CAMERA_DEVICE in failed else (profile.camera,)
+        on_done(failed, get_serial_ports(), get_video_devices(in_use))
+
+    thread = threading.Thread(target=run, name="session-devices", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,291 @@
+import argparse
+import csv
+import logging
+import os
+import queue
+import time
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from .lazy_import import lazy_import
+from .localization import setup_localization
+from .metrics import metrics
+from .workers import RECORDER_WORKER, supervisor
+
+_, _lang = setup_localization()
+
+logger = logging.getLogger(__name__)
+
+# Only needed once a recording is started
+cv2 = lazy_import("cv2")
+
+DEFAULT_SEGMENT_SECONDS = 60.0
+DEFAULT_QUOTA_MB = 1024.0
+# Frames waiting to be written; a full queue drops frames instead of stalling the capture loop
+DEFAULT_RECORDER_QUEUE_SIZE = 64
+DEFAULT_RECORDING_FPS = 30.0
+# Motion JPEG is available in every OpenCV build and compresses each frame on its own
+DEFAULT_RECORDING_CODEC = "MJPG"
+# Long enough to write a full queue of frames; a recorder still writing after that loses the end of its segment
+RECORDER_STOP_TIMEOUT = 10.0
+SEGMENT_PREFIX = "segment_"
+SEGMENT_EXTENSION = ".avi"
+INDEX_EXTENSION = ".csv"
+INDEX_COLUMNS = ["frame", "timestamp", "detected", "marker_ids", "x", "y", "confidence"]
+
+WRITTEN_SERIES = 'recorder_frames_total{outcome="written"}'
+DROPPED_SERIES = 'recorder_frames_total{outcome="dropped"}'
+DELETED_SERIES = "recorder_segments_deleted_total"
+
+session_recorder = None
+
+
+class RecordedFrame(NamedTuple):
+    frame: object
+    # Wall clock seconds, so footage can be matched with field reports
+    timestamp: float
+    # False when the motion gate reused the markers of an earlier frame
+    detected: bool
+    marker_ids: Sequence[int]
+    x: Optional[int]
+    y: Optional[int]
+    confidence: float
+
+
+def list_segments(directory: str) -> List[str]:
+    """
+    Returns the paths of the recorded segment videos, oldest first.
+    """
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_EXTENSION)
+    )
+
+
+def index_path(segment_path: str) -> str:
+    return segment_path[:-len(SEGMENT_EXTENSION)] + INDEX_EXTENSION
+
+
+class SessionRecorder:
+    """
+    Writes captured frames to compressed video segments of segment_seconds each, with a
+    CSV index of the timestamp and detection result of every frame next to each segment.
+    Frames are handed over through a bounded queue and written on the recorder thread;
+    when the disk falls behind, new frames are dropped and counted. Before a segment is
+    started, the oldest ones are deleted until the directory fits the quota again.
+    """
+
+    def __init__(self, directory: str, segment_seconds: float = DEFAULT_SEGMENT_SECONDS,
+                 quota_bytes: int = int(DEFAULT_QUOTA_MB * 1024 * 1024), grayscale: bool = False,
+                 scale: float = 1.0, queue_size: int = DEFAULT_RECORDER_QUEUE_SIZE,
+                 fps: float = DEFAULT_RECORDING_FPS, codec: str = DEFAULT_RECORDING_CODEC):
+        if not 0 < scale <= 1:
+            raise ValueError(f"The recording scale must be in (0, 1], got {scale}")
+        self.directory = directory
+        self.segment_seconds = segment_seconds
+        self.quota_bytes = quota_bytes
+        self.grayscale = grayscale
+        self.scale = scale
+        self.fps = fps
+        self.codec = codec
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.writer = None
+        self.index_file = None
+        self.index_writer = None
+        self.segment_path: Optional[str] = None
+        self.segment_started = 0.0
+        self.segment_size: Optional[Tuple[int, int]] = None
+        self.segment_frames = 0
+        self.segments = 0
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.segments_deleted = 0
+        self.failed = False
+
+    def submit(self, frame: RecordedFrame) -> bool:
+        """
+        Queues a frame without blocking. Returns False if the queue was full and the frame
+        dropped, or if writing has failed and nothing is recorded any more.
+        """
+        if self.failed:
+            return False
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except queue.Full:
+            self.frames_dropped += 1
+            metrics.increment(DROPPED_SERIES)
+            return False
+
+    def run(self, stop_event) -> None:
+        """
+        Writes queued frames until the stop event is set and the queue is drained.
+        """
+        try:
+            while True:
+                try:
+                    frame = self.queue.get(timeout=0.1)
+                except queue.Empty:
+                    if stop_event.is_set():
+                        break
+                    continue
+                self.write(frame)
+        except (IOError, OSError) as e:
+            self.failed = True
+            logger.error(_("Session recording stopped: {}").format(e))
+        finally:
+            self.close_segment()
+
+    def prepare(self, image):
+        if self.grayscale and image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        if self.scale != 1:
+            height, width = image.shape[:2]
+            size = (max(1, int(width * self.scale)), max(1, int(height * self.scale)))
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        return image
+
+    def write(self, frame: RecordedFrame) -> None:
+        image = self.prepare(frame.frame)
+        size = (image.shape[1], image.shape[0])
+        if (self.writer is None or size != self.segment_size
+                or frame.timestamp - self.segment_started >= self.segment_seconds):
+            self.close_segment()
+            self.open_segment(frame.timestamp, size, image.ndim == 3)
+        self.writer.write(image)
+        self.index_writer.writerow([
+            self.segment_frames, f"{frame.timestamp:.6f}", int(frame.detected),
+            " ".join(str(int(marker_id)) for marker_id in frame.marker_ids),
+            "" if frame.x is None else frame.x, "" if frame.y is None else frame.y, f"{frame.confidence:.2f}",
+        ])
+        self.segment_frames += 1
+        self.frames_written += 1
+        metrics.increment(WRITTEN_SERIES)
+
+    def open_segment(self, timestamp: float, size: Tuple[int, int], is_color: bool) -> None:
+        self.enforce_quota()
+        name = f"{SEGMENT_PREFIX}{time.strftime('%Y%m%d-%H%M%S', time.localtime(timestamp))}_{self.segments:04d}"
+        path = os.path.join(self.directory, name + SEGMENT_EXTENSION)
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*self.codec), self.fps, size, is_color)
+        if not writer.isOpened():
+            raise IOError(_("Cannot write video segment {}").format(path))
+        self.writer = writer
+        self.index_file = open(index_path(path), "w", newline="")
+        self.index_writer = csv.writer(self.index_file)
+        self.index_writer.writerow(INDEX_COLUMNS)
+        self.segment_path = path
+        self.segment_started = timestamp
+        self.segment_size = size
+        self.segment_frames = 0
+        self.segments += 1
+        logger.debug("Recording segment %s", path)
+
+    def close_segment(self) -> None:
+        if self.writer is not None:
+            self.writer.release()
+            self.writer = None
+        if self.index_file is not None:
+            self.index_file.close()
+            self.index_file = self.index_writer = None
+
+    def enforce_quota(self) -> None:
+        """
+        Deletes the oldest segments and their indexes until the recordings fit the quota.
+        Runs before each segment is started, so the directory exceeds the quota by at most
+        the segment being written.
+        """
+        segments = [(path, self.segment_bytes(path)) for path in list_segments(self.directory)]
+        total = sum(size for _path, size in segments)
+        for path, size in segments:
+            if total <= self.quota_bytes:
+                break
+            for file_path in (path, index_path(path)):
+                try:
+                    os.remove(file_path)
+                except FileNotFoundError:
+                    pass
+            total -= size
+            self.segments_deleted += 1
+            metrics.increment(DELETED_SERIES)
+            logger.info(_("Deleted {} to stay within the recording quota").format(path))
+
+    @staticmethod
+    def segment_bytes(path: str) -> int:
+        size = 0
+        for file_path in (path, index_path(path)):
+            try:
+                size += os.path.getsize(file_path)
+            except FileNotFoundError:
+                pass
+        return size
+
+
+def add_recording_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--record-session", metavar="DIRECTORY",
+                        help="record the captured frames to compressed video segments in this directory")
+    parser.add_argument("--record-segment-seconds", type=float, default=DEFAULT_SEGMENT_SECONDS,
+                        help="seconds of video per segment")
+    parser.add_argument("--record-quota-mb", type=float, default=DEFAULT_QUOTA_MB,
+                        help="megabytes the segments may use, the oldest are deleted beyond that")
+    parser.add_argument("--record-grayscale", action="store_true", help="record grayscale copies of the frames")
+    parser.add_argument("--record-scale", type=float, default=1.0, help="record frames scaled down by this factor")
+    parser.add_argument("--record-queue-size", type=int, default=DEFAULT_RECORDER_QUEUE_SIZE,
+                        help="frames waiting to be written before new ones are dropped")
+
+
+def recording_options_requested(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Returns the --record-session options.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    add_recording_arguments(parser)
+    args, _ = parser.parse_known_args(argv)
+    return args
+
+
+def start_session_recorder(args: argparse.Namespace) -> bool:
+    """
+    Starts recording the captured frames if --record-session was given. Returns True if
+    the recorder is running.
+    """
+    global session_recorder
+    stop_session_recorder()
+    if not args.record_session:
+        return False
+    try:
+        os.makedirs(args.record_session, exist_ok=True)
+        recorder = SessionRecorder(args.record_session, args.record_segment_seconds,
+                                   int(args.record_quota_mb * 1024 * 1024), args.record_grayscale,
+                                   args.record_scale, args.record_queue_size)
+    except (OSError, ValueError) as e:
+        logger.error(_("Cannot record the session to {}: {}").format(args.record_session, e))
+        return False
+    supervisor.start(RECORDER_WORKER, recorder.run)
+    session_recorder = recorder
+    logger.info(_("Recording the captured frames to {}").format(args.record_session))
+    return True
+
+
+def stop_session_recorder() -> None:
+    """
+    Stops the recorder once the queued frames are written.
+    """
+    global session_recorder
+    recorder, session_recorder = session_recorder, None
+    stopped = supervisor.stop(RECORDER_WORKER, RECORDER_STOP_TIMEOUT)
+    if recorder is not None and not stopped:
+        logger.error(_("Session recorder did not finish within {:.0f}s with {} frames still queued, {} may be cut short").format(
+            RECORDER_STOP_TIMEOUT, recorder.queue.qsize(), recorder.segment_path))
+    if recorder is not None:
+        logger.info(_("Recorded {} frames in {} segments, dropped {}, deleted {} segments over the quota").format(
+            recorder.frames_written, recorder.segments, recorder.frames_dropped, recorder.segments_deleted))
+
+
+def record_frame(frame, detected: bool, marker_ids: Sequence[int], x: Optional[int], y: Optional[int],
+                 confidence: float) -> None:
+    """
+    Queues a captured frame if a recording was started, and does nothing otherwise.
+    """
+    recorder = session_recorder
+    if recorder is not None:
+        recorder.submit(RecordedFrame(frame, time.time(), detected, marker_ids, x, y, confidence))
@@ -0,0 +1,99 @@
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import time
+from typing import List, Optional, Tuple
+
+# Taken as early as possible so time-to-first-window includes importing the app
+STARTUP_CLOCK_START = time.perf_counter()
+
+# Modules that must never be imported before the first window is shown
+STARTUP_FORBIDDEN_MODULES = ("cv2", "numpy", "PIL", "pyautogui")
+
+# Upper bound on the number of modules `import app.main` may pull in
+STARTUP_IMPORT_BUDGET = 160
+
+IMPORT_PROFILE_ROW_LIMIT = 25
+
+ImportTimeRow = Tuple[int, int, str]
+
+
+def startup_profile_requested() -> bool:
+    """
+    Checks if the app was started with --startup-profile.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="print an import time breakdown and the time to first window")
+    args, _ = parser.parse_known_args()
+    return args.startup_profile
+
+
+def elapsed_since_startup() -> float:
+    """
+    Returns the seconds elapsed since the app package started importing.
+    """
+    return time.perf_counter() - STARTUP_CLOCK_START
+
+
+def parse_import_time(output: str) -> List[ImportTimeRow]:
+    """
+    Parses `python -X importtime` output into (self_us, cumulative_us, module) rows.
+    """
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3:
+            continue
+        self_us, cumulative_us, module = fields
+        try:
+            rows.append((int(self_us), int(cumulative_us), module.strip()))
+        except ValueError:
+            continue  # header line
+    return rows
+
+
+def run_import_profile(module: str = "app.main") -> Optional[List[ImportTimeRow]]:
+    """
+    Imports the module in a fresh interpreter with `-X importtime` and returns the parsed rows.
+    Returns None when running from a frozen build, which cannot spawn a plain interpreter.
+    """
+    if getattr(sys, "frozen", False):
+        return None
+    project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=project_dir,
+        capture_output=True,
+        text=True,
+    )
+    return parse_import_time(result.stderr)
+
+
+def format_import_profile(rows: List[ImportTimeRow], limit: int = IMPORT_PROFILE_ROW_LIMIT) -> str:
+    """
+    Formats import time rows, slowest cumulative first, in the `-X importtime` layout.
+    """
+    lines = ["import time: self [us] | cumulative | imported package"]
+    for self_us, cumulative_us, module in sorted(rows, key=lambda row: row[1], reverse=True)[:limit]:
+        lines.append(f"import time: {self_us:>9} | {cumulative_us:>10} | {module}")
+    lines.append(f"{len(rows)} modules imported")
+    return "\n".join(lines)
+
+
+def print_startup_profile(first_window_seconds: float) -> None:
+    """
+    Prints the import time breakdown of the GUI entry point and the time to first window.
+    """
+    rows = run_import_profile()
+    if rows is None:
+        logging.warning("Import time breakdown is not available in frozen builds.")
+    else:
+        print(format_import_profile(rows))
+    heavy_modules = [name for name in STARTUP_FORBIDDEN_MODULES if name in sys.modules]
+    print(f"heavy modules loaded before first window: {', '.join(heavy_modules) or 'none'}")
+    print(f"time to first window: {first_window_seconds * 1000:.1f} ms")
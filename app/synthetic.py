@@ -0,0 +1,215 @@
+import csv
+import os
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from .lazy_import import lazy_import
+from .window_actions import generate_aruco_marker
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+RESOLUTIONS: Dict[str, Tuple[int, int]] = {
+    "480p": (640, 480),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+}
+
+# Each coordinate is encoded by two marker ids in 0..99, see convert_aruco_marker_ids_to_coordinates
+MAX_ENCODED_COORDINATE = 9999
+STRIP_MARKER_COUNT = 4
+GROUND_TRUTH_FILE_NAME = "ground_truth.csv"
+
+
+class SceneDistortion(NamedTuple):
+    # Maximum displacement of each strip corner, as a fraction of the strip height
+    perspective: float = 0.15
+    # Gaussian blur sigma in pixels, 0 disables blurring
+    blur: float = 1.0
+    # Standard deviation of the additive sensor noise in gray levels
+    noise: float = 4.0
+    # Maximum relative brightness change across the frame
+    lighting: float = 0.3
+
+
+class SyntheticScene(NamedTuple):
+    frame: "np.ndarray"
+    marker_ids: List[int]
+    coordinates: Tuple[int, int]
+    # Corners of each marker in the frame, left to right, shape (4, 4, 2)
+    marker_corners: "np.ndarray"
+
+
+def coordinates_to_marker_ids(x: int, y: int) -> List[int]:
+    """
+    Returns the four marker ids that convert_aruco_marker_ids_to_coordinates decodes to (x, y).
+    """
+    if not (0 <= x <= MAX_ENCODED_COORDINATE and 0 <= y <= MAX_ENCODED_COORDINATE):
+        raise ValueError(f"Coordinates must be between 0 and {MAX_ENCODED_COORDINATE}: {x}, {y}")
+    return [x // 100, x % 100, y // 100, y % 100]
+
+
+def render_marker_strip(marker_ids: List[int], marker_size: int, dictionary=None):
+    """
+    Renders the markers side by side on a white card with a quiet zone around each of them.
+    Returns the card and the corners of each marker on it.
+    """
+    if dictionary is None:
+        dictionary = cv2.aruco.DICT_6X6_100
+    margin = marker_size // 2
+    card = np.full((marker_size + 2 * margin, margin + len(marker_ids) * (marker_size + margin)), 255, dtype=np.uint8)
+    corners = []
+    for index, marker_id in enumerate(marker_ids):
+        x = margin + index * (marker_size + margin)
+        card[margin:margin + marker_size, x:x + marker_size] = generate_aruco_marker(marker_id, marker_size, dictionary)
+        corners.append([
+            [x, margin], [x + marker_size, margin], [x + marker_size, margin + marker_size], [x, margin + marker_size]
+        ])
+    return card, np.array(corners, dtype=np.float32)
+
+
+def render_background(width: int, height: int, rng):
+    """
+    Renders a smooth random texture so the markers are not on a flat, trivially segmented background.
+    """
+    coarse = rng.integers(40, 200, size=(max(height // 60, 2), max(width // 60, 2), 3), dtype=np.uint8)
+    return cv2.resize(coarse, (width, height), interpolation=cv2.INTER_CUBIC)
+
+
+def generate_scene(
+    x: int,
+    y: int,
+    resolution: str = "720p",
+    distortion: SceneDistortion = SceneDistortion(),
+    rng=None,
+    dictionary=None,
+) -> SyntheticScene:
+    """
+    Renders a camera-like BGR frame showing the four-marker id strip that encodes (x, y).
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    width, height = RESOLUTIONS[resolution]
+    marker_ids = coordinates_to_marker_ids(x, y)
+
+    # The strip covers 40-70% of the frame width, like a screen seen from a typical distance
+    strip_width = width * rng.uniform(0.4, 0.7)
+    marker_size = int(strip_width / (STRIP_MARKER_COUNT * 1.5 + 0.5))
+    card, card_corners = render_marker_strip(marker_ids, marker_size, dictionary)
+    card_height, card_width = card.shape
+
+    left = rng.uniform(0, width - card_width)
+    top = rng.uniform(0, height - card_height)
+    source_points = np.array([[0, 0], [card_width, 0], [card_width, card_height], [0, card_height]], dtype=np.float32)
+    jitter = rng.uniform(-1, 1, size=(4, 2)) * distortion.perspective * card_height
+    target_points = (source_points + [left, top] + jitter).astype(np.float32)
+    target_points[:, 0] = np.clip(target_points[:, 0], 0, width - 1)
+    target_points[:, 1] = np.clip(target_points[:, 1], 0, height - 1)
+    homography = cv2.getPerspectiveTransform(source_points, target_points)
+
+    frame = render_background(width, height, rng)
+    warped_card = cv2.warpPerspective(card, homography, (width, height), borderValue=0)
+    mask = cv2.warpPerspective(np.full_like(card, 255), homography, (width, height), borderValue=0) > 127
+    frame[mask] = cv2.cvtColor(warped_card, cv2.COLOR_GRAY2BGR)[mask]
+    marker_corners = cv2.perspectiveTransform(card_corners.reshape(-1, 1, 2), homography).reshape(-1, 4, 2)
+
+    frame = frame.astype(np.float32)
+    if distortion.lighting:
+        gradient = np.linspace(-1, 1, width, dtype=np.float32)[np.newaxis, :, np.newaxis]
+        frame *= 1 + distortion.lighting * rng.uniform(-1, 1) * gradient
+        frame += rng.uniform(-distortion.lighting, distortion.lighting) * 80
+    if distortion.blur:
+        frame = cv2.GaussianBlur(frame, (0, 0), distortion.blur)
+    if distortion.noise:
+        frame += rng.normal(0, distortion.noise, size=frame.shape).astype(np.float32)
+    frame = np.clip(frame, 0, 255).astype(np.uint8)
+
+    return SyntheticScene(frame, marker_ids, (x, y), marker_corners)
+
+
+def generate_scenes(
+    count: int,
+    resolution: str = "720p",
+    distortion: SceneDistortion = SceneDistortion(),
+    seed: Optional[int] = 0,
+    dictionary=None,
+) -> Iterator[SyntheticScene]:
+    """
+    Yields scenes for random coordinates; the same seed always yields the same scenes.
+    """
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        x, y = (int(value) for value in rng.integers(0, MAX_ENCODED_COORDINATE + 1, size=2))
+        yield generate_scene(x, y, resolution, distortion, rng, dictionary)
+
+
+def write_scene_directory(directory: str, scenes) -> int:
+    """
+    Writes the scenes as numbered PNG files plus a ground truth CSV, readable by
+    ImageDirectoryFrameSource and eye-tracker-batch. Returns the number of scenes written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    count = 0
+    with open(os.path.join(directory, GROUND_TRUTH_FILE_NAME), "w", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["frame_index", "marker_ids", "x", "y"])
+        for count, scene in enumerate(scenes, start=1):
+            cv2.imwrite(os.path.join(directory, f"frame_{count - 1:06d}.png"), scene.frame)
+            x, y = scene.coordinates
+            writer.writerow([count - 1, " ".join(str(marker_id) for marker_id in scene.marker_ids), x, y])
+    return count
+
+
+def read_ground_truth(directory: str) -> List[Tuple[int, int]]:
+    """
+    Reads the coordinates written by write_scene_directory, in frame order.
+    """
+    with open(os.path.join(directory, GROUND_TRUTH_FILE_NAME), newline="") as csv_file:
+        return [(int(row["x"]), int(row["y"])) for row in csv.DictReader(csv_file)]
+
+
+def minimum_jerk(progress):
+    """
+    Fraction of a saccade covered at each fraction of its duration, like the human eye.
+    """
+    return progress ** 3 * (10 - 15 * progress + 6 * progress ** 2)
+
+
+def generate_gaze_session(
+    seconds: float = 60.0,
+    rate: float = 250.0,
+    screen_size: Tuple[int, int] = (1920, 1080),
+    noise: float = 3.0,
+    seed: Optional[int] = 0,
+):
+    """
+    Returns the timestamps and positions, shape (n, 2), of a synthetic gaze recording:
+    fixations of 150 to 600 ms joined by minimum jerk saccades and, now and then, smooth
+    pursuits at 200 to 800 px/s. Every sample has Gaussian jitter of noise pixels.
+    """
+    rng = np.random.default_rng(seed)
+    width, height = screen_size
+    timestamps = np.arange(0, seconds, 1 / rate)
+    positions = np.empty((len(timestamps), 2))
+    position = np.array([width / 2, height / 2])
+    segment_start = 0.0
+    fixating = True
+    while segment_start < seconds:
+        pursuit = False
+        if fixating:
+            duration = rng.uniform(0.15, 0.6)
+            target = position
+        else:
+            target = np.array([rng.uniform(0, width - 1), rng.uniform(0, height - 1)])
+            distance = float(np.hypot(*(target - position)))
+            pursuit = rng.random() < 0.3
+            duration = distance / rng.uniform(200, 800) if pursuit else 0.025 + distance / 20000
+        in_segment = (timestamps >= segment_start) & (timestamps < segment_start + duration)
+        progress = (timestamps[in_segment] - segment_start) / max(duration, 1e-9)
+        covered = progress if pursuit else minimum_jerk(progress)
+        positions[in_segment] = position + np.outer(covered, target - position)
+        position = target
+        segment_start += duration
+        fixating = not fixating
+    positions += rng.normal(0, noise, positions.shape)
+    return timestamps, np.clip(positions, 0, [width - 1, height - 1])
@@ -0,0 +1,206 @@
+import argparse
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import List, Optional, Tuple
+
+from .localization import setup_localization
+from .metrics import END_TO_END, LAUNCH_TO_FIRST_MOVE, record_latency
+from .startup import STARTUP_CLOCK_START
+from .user_dirs import user_cache_dir
+
+_, _lang = setup_localization()
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TRACE_BUFFER_SIZE = 4096
+
+# Where a sample came from
+SERIAL_SOURCE = "serial"
+CAMERA_SOURCE = "camera"
+NETWORK_SOURCE = "network"
+# Moves asked for in the GUI: the move button, random moves and the crazy mouse test
+MANUAL_SOURCE = "manual"
+
+# How a sample ended
+CURSOR_MOVED = "cursor_moved"
+NO_MOVE = "no_move"
+
+# Chrome trace lanes, one per source
+SOURCE_THREAD_IDS = {SERIAL_SOURCE: 1, CAMERA_SOURCE: 2, NETWORK_SOURCE: 3, MANUAL_SOURCE: 4}
+
+Span = Tuple[str, float, float]
+
+
+class SampleTrace:
+    """
+    One serial line or camera frame, from its arrival to the cursor move it caused, if any.
+    Times are time.perf_counter() seconds.
+    """
+
+    __slots__ = ("sample_id", "source", "arrival", "spans", "finished", "outcome")
+
+    def __init__(self, sample_id: int, source: str, arrival: float):
+        self.sample_id = sample_id
+        self.source = source
+        self.arrival = arrival
+        self.spans: List[Span] = []
+        self.finished = arrival
+        self.outcome = NO_MOVE
+
+    def latency(self) -> float:
+        return self.finished - self.arrival
+
+
+class TraceBuffer:
+    """
+    Ring of the most recent finished sample traces.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_TRACE_BUFFER_SIZE):
+        self.traces = deque(maxlen=capacity)
+        self.sample_ids = itertools.count()
+
+    def append(self, trace: SampleTrace) -> None:
+        self.traces.append(trace)
+
+    def clear(self) -> None:
+        self.traces.clear()
+
+    def snapshot(self) -> List[SampleTrace]:
+        return list(self.traces)
+
+    def to_chrome_trace(self) -> dict:
+        """
+        Returns the traces in the Chrome trace event format, one complete event for each
+        sample and one for each of its stages, with the source as the thread.
+        """
+        events = [
+            {"name": "thread_name", "ph": "M", "pid": 1, "tid": thread_id, "args": {"name": source}}
+            for source, thread_id in SOURCE_THREAD_IDS.items()
+        ]
+        for trace in self.snapshot():
+            thread_id = SOURCE_THREAD_IDS.get(trace.source, 0)
+            events.append({
+                "name": f"{trace.source} sample", "cat": trace.outcome, "ph": "X", "pid": 1, "tid": thread_id,
+                "ts": trace.arrival * 1e6, "dur": trace.latency() * 1e6,
+                "args": {"sample_id": trace.sample_id, "outcome": trace.outcome},
+            })
+            for stage, started, ended in trace.spans:
+                events.append({
+                    "name": stage, "cat": trace.source, "ph": "X", "pid": 1, "tid": thread_id,
+                    "ts": started * 1e6, "dur": (ended - started) * 1e6, "args": {"sample_id": trace.sample_id},
+                })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as trace_file:
+            json.dump(self.to_chrome_trace(), trace_file)
+
+
+trace_buffer = TraceBuffer()
+
+# Seconds from launch to the first cursor move, once there was one
+first_move_seconds: Optional[float] = None
+first_move_lock = threading.Lock()
+
+# The sample being processed on each thread; reading, parsing and filtering happen on the
+# thread that received it, which hands the sample to the cursor actuator thread
+current = threading.local()
+
+
+def begin_sample(source: str, arrival: float) -> SampleTrace:
+    """
+    Starts tracing a sample on this thread, finishing the previous one if it is still open.
+    """
+    end_sample()
+    trace = SampleTrace(next(trace_buffer.sample_ids), source, arrival)
+    current.trace = trace
+    return trace
+
+
+def current_sample() -> Optional[SampleTrace]:
+    return getattr(current, "trace", None)
+
+
+def detach_sample() -> Optional[SampleTrace]:
+    """
+    Takes the sample off this thread, to be resumed on the thread that finishes it.
+    """
+    trace = getattr(current, "trace", None)
+    current.trace = None
+    return trace
+
+
+def resume_sample(trace: Optional[SampleTrace]) -> None:
+    """
+    Continues a detached sample on this thread, finishing the previous one if it is still open.
+    """
+    end_sample()
+    current.trace = trace
+
+
+def record_stage(stage: str, started: float, ended: Optional[float] = None) -> float:
+    """
+    Records a stage in its latency histogram and in the trace of the sample on this thread.
+    Returns the end time.
+    """
+    if ended is None:
+        ended = time.perf_counter()
+    record_latency(stage, ended - started)
+    trace = getattr(current, "trace", None)
+    if trace is not None:
+        trace.spans.append((stage, started, ended))
+    return ended
+
+
+def end_sample(outcome: str = NO_MOVE, finished: Optional[float] = None) -> None:
+    """
+    Finishes the sample on this thread and stores it in the trace buffer. A cursor move
+    also records the arrival to cursor latency.
+    """
+    trace = getattr(current, "trace", None)
+    if trace is None:
+        return
+    current.trace = None
+    trace.finished = time.perf_counter() if finished is None else finished
+    trace.outcome = outcome
+    trace_buffer.append(trace)
+    if outcome == CURSOR_MOVED:
+        record_latency(END_TO_END, trace.latency())
+        if first_move_seconds is None:
+            record_first_move(trace.finished)
+
+
+def record_first_move(finished: float) -> None:
+    """
+    Records the time from launch to the first cursor move driven by serial or camera input.
+    """
+    global first_move_seconds
+    with first_move_lock:
+        if first_move_seconds is not None:
+            return
+        first_move_seconds = finished - STARTUP_CLOCK_START
+    record_latency(LAUNCH_TO_FIRST_MOVE, first_move_seconds)
+    logger.info(_("First cursor move {:.0f} ms after launch").format(first_move_seconds * 1000))
+
+
+def trace_file_requested(argv: Optional[List[str]] = None) -> Optional[str]:
+    """
+    Returns the --trace-file path, if given.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--trace-file", default=None, help="write the latency traces to this file on exit")
+    args, _ = parser.parse_known_args(argv)
+    return args.trace_file
+
+
+def default_trace_path() -> str:
+    return os.path.join(user_cache_dir(), "traces", time.strftime("trace-%Y%m%d-%H%M%S.json"))
@@ -0,0 +1,92 @@
+import logging
+import threading
+from collections import deque
+from typing import Callable, Hashable, Optional
+
+DEFAULT_INTERVAL_MS = 20
+
+
+class UIDispatcher:
+    """
+    Runs UI actions posted by worker threads on the Tk thread.
+
+    Worker threads append to a deque, which is safe without a lock because append
+    and popleft are atomic, and the Tk thread drains it on a root.after tick. Of the
+    actions posted under the same key since the last tick only the newest runs, so a
+    burst of show/hide commands for one window collapses into its final state.
+
+    Actions are never run on the posting worker thread. Those posted before a root is
+    attached wait for its first tick, and those posted after detach wait for the next
+    attach; at shutdown, when no root follows, they are never run.
+    """
+
+    def __init__(self, interval_ms: int = DEFAULT_INTERVAL_MS):
+        self.interval_ms = interval_ms
+        self.pending = deque()
+        self.root = None
+        self.ui_thread: Optional[threading.Thread] = None
+        self.after_id = None
+        self.collapsed_actions = 0
+
+    def attach(self, root) -> None:
+        """
+        Starts draining on the given Tk root; must be called from the Tk thread.
+        """
+        self.root = root
+        self.ui_thread = threading.current_thread()
+        self.after_id = root.after(self.interval_ms, self.tick)
+
+    def detach(self) -> None:
+        """
+        Runs the pending actions and stops draining; must be called from the Tk thread
+        before the root is destroyed.
+        """
+        if self.root is not None and self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+        self.drain()
+        self.root = None
+        self.ui_thread = None
+        self.after_id = None
+
+    def post(self, action: Callable, *args, key: Optional[Hashable] = None) -> None:
+        """
+        Queues the action for the Tk thread. When called from the Tk thread itself while a
+        root is attached, the action runs right away.
+        """
+        if self.root is not None and threading.current_thread() is self.ui_thread:
+            action(*args)
+            return
+        self.pending.append((key, action, args))
+
+    def drain(self) -> None:
+        batch = []
+        while True:
+            try:
+                batch.append(self.pending.popleft())
+            except IndexError:
+                break
+
+        newest_by_key = {key: index for index, (key, _action, _args) in enumerate(batch) if key is not None}
+        for index, (key, action, args) in enumerate(batch):
+            if key is not None and newest_by_key[key] != index:
+                self.collapsed_actions += 1
+                continue
+            try:
+                action(*args)
+            except Exception:
+                logging.exception(f"UI action {action} failed")
+
+    def tick(self) -> None:
+        self.drain()
+        if self.root is not None:
+            self.after_id = self.root.after(self.interval_ms, self.tick)
+
+
+ui_dispatcher = UIDispatcher()
+
+
+def run_on_ui_thread(action: Callable, *args, key: Optional[Hashable] = None) -> None:
+    """
+    Runs the action on the Tk thread, see UIDispatcher.post.
+    """
+    ui_dispatcher.post(action, *args, key=key)
@@ -1,52 +1,153 @@
+import functools
 import logging
 import threading
 import time
 import tkinter as tk
 
-import cv2
-import cv2.aruco as aruco
-from PIL import Image, ImageTk
-
+from .arbitration import submit_target
+from .consensus import ConsensusDecoder, ConsensusResult
+from . import window_actions
+from .frame_sources import open_frame_source
+from .gaze_stream import publish_gaze_sample
+from .homography import HomographyCalibrator
+from .lazy_import import lazy_import
 from .localization import setup_localization
-from .window_actions import move_mouse
+from .metrics import CAPTURE_READ, CONSENSUS, DETECTION, PREVIEW, metrics
+from .motion_gate import MotionGate
+from .tracing import CAMERA_SOURCE, begin_sample, end_sample, record_stage
+from .ui_dispatcher import run_on_ui_thread
+from .window_actions import hide_aruco_marker, viewport_size
+from .workers import VIDEO_WORKER, supervisor
 
 _, _lang = setup_localization()
 
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# OpenCV and Pillow are only imported once the first frame is captured or decoded
+cv2 = lazy_import("cv2")
+aruco = lazy_import("cv2.aruco")
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+ImageTk = lazy_import("PIL.ImageTk")
+# Imported once the first frame is captured, the GUI starts without it
+session_recorder = lazy_import(f"{__package__}.session_recorder")
+
+# Preview frames posted to the Tk thread collapse into the newest under this key
+VIDEO_PREVIEW_UI_KEY = "video_preview"
 
 current_video_device = None
 video_label = None
-stop_event = threading.Event()
+homography_calibrator = None
+homography_calibration_requested = threading.Event()
+# Set once the capture started last has read its first frame or has failed to open
+capture_settled = threading.Event()
+first_frame_read = False
+MOTION_GATE_SKIPPED_SERIES = "motion_gate_skipped_fraction"
+MOTION_GATE_CPU_SAVED_SERIES = "motion_gate_cpu_seconds_saved"
+# Markers on the strip that encodes one pair of coordinates
+STRIP_MARKER_COUNT = 4
 
 
 def convert_aruco_marker_ids_to_coordinates(marker_ids):
-    if len(marker_ids) != 4:
-        logging.warning(f"{marker_ids} does not contain exactly 4 elements and coordinates cannot be deduced.")
+    if len(marker_ids) != STRIP_MARKER_COUNT:
+        logger.warning("%s does not contain exactly 4 elements and coordinates cannot be deduced.", marker_ids)
         return None, None
     return 100 * marker_ids[0] + marker_ids[1], 100 * marker_ids[2] + marker_ids[3]
 
 
-def detect_aruco_markers(img, dictionary=aruco.DICT_6X6_100):
-    aruco_dict = aruco.getPredefinedDictionary(dict=dictionary)
-    corners, ids, rejectedImgPoints = aruco.detectMarkers(image=img, dictionary=aruco_dict, parameters=None)
+@functools.lru_cache(maxsize=None)
+def get_aruco_dictionary(dictionary):
+    return aruco.getPredefinedDictionary(dict=dictionary)
+
+
+# "fast" trades small-marker recall for speed, "accurate" searches more thresholds and refines corners
+DETECTOR_MODES = ("default", "fast", "accurate")
+DEFAULT_DETECTOR_MODE = "default"
+FAST_DETECTION_MAX_WIDTH = 960
+
+
+@functools.lru_cache(maxsize=None)
+def get_detector_parameters(mode):
+    if mode not in DETECTOR_MODES:
+        raise ValueError(_("Unknown detector mode: {}").format(mode))
+    if mode == "default":
+        return None
+    parameters = aruco.DetectorParameters_create()
+    if mode == "fast":
+        parameters.adaptiveThreshWinSizeMax = 13
+    else:
+        parameters.adaptiveThreshWinSizeStep = 4
+        parameters.cornerRefinementMethod = aruco.CORNER_REFINE_SUBPIX
+    return parameters
 
-    # logging.debug(f"corners: {corners}")
-    logging.debug(f"ids: {ids}")
-    # logging.debug(f"rejectedImgPoints: {rejectedImgPoints}")
+
+def prepare_detection_image(img, mode):
+    """
+    Returns the image detection runs on; the fast mode detects on a downscaled grayscale copy.
+    Scaling keeps the left-to-right order of the markers, which is all the id decoding needs.
+    """
+    if mode != "fast":
+        return img
+    if img.ndim == 3:
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    height, width = img.shape[:2]
+    if width <= FAST_DETECTION_MAX_WIDTH:
+        return img
+    scale = FAST_DETECTION_MAX_WIDTH / width
+    return cv2.resize(img, (FAST_DETECTION_MAX_WIDTH, int(height * scale)), interpolation=cv2.INTER_AREA)
+
+
+def detect_aruco_markers(img, dictionary=None, mode=DEFAULT_DETECTOR_MODE):
+    return locate_aruco_markers(img, dictionary, mode)[0]
+
+
+def locate_aruco_markers(img, dictionary=None, mode=DEFAULT_DETECTOR_MODE):
+    """
+    Returns the ids of the detected markers sorted left to right and their centers in
+    image pixels, as an (N, 2) array in the same order.
+    """
+    if dictionary is None:
+        dictionary = aruco.DICT_6X6_100
+    aruco_dict = get_aruco_dictionary(dictionary)
+    parameters = get_detector_parameters(mode)
+    # The fast mode may detect on a downscaled copy, the centers are scaled back to the frame
+    scale = 1.0
+    if mode == "fast" and img.shape[1] > FAST_DETECTION_MAX_WIDTH:
+        scale = img.shape[1] / FAST_DETECTION_MAX_WIDTH
+    img = prepare_detection_image(img, mode)
+    corners, ids, rejectedImgPoints = aruco.detectMarkers(image=img, dictionary=aruco_dict, parameters=parameters)
+
+    # logger.debug("corners: %s", corners)
+    logger.debug("ids: %s", ids)
+    # logger.debug("rejectedImgPoints: %s", rejectedImgPoints)
 
     if ids is None:
-        logging.error("No ArUco markers detected.")
-        return []
+        logger.error("No ArUco markers detected.")
+        return [], np.empty((0, 2), dtype=np.float32)
 
     # Sort detected markers by their x-coordinate (left to right)
-    marker_positions_with_ids = [(corner[0][0][0], id[0]) for corner, id in zip(corners, ids)]
+    marker_positions_with_ids = [(corner[0][0][0], id[0], index) for index, (corner, id) in enumerate(zip(corners, ids))]
     marker_positions_with_ids.sort()
 
-    logging.debug(f"marker_positions_with_ids: {marker_positions_with_ids}")
+    logger.debug("marker_positions_with_ids: %s", marker_positions_with_ids)
 
     marker_ids = [position[1] for position in marker_positions_with_ids]
+    marker_centers = np.array([np.reshape(corners[index], (4, 2)).mean(axis=0) for _x, _id, index in marker_positions_with_ids],
+                              dtype=np.float32) * scale
+
+    return marker_ids, marker_centers
+
 
-    return marker_ids
+def detect_aruco_marker_corners(img, dictionary=None):
+    """
+    Returns the corners of every detected marker by id, each as a (4, 2) array in image pixels.
+    """
+    if dictionary is None:
+        dictionary = aruco.DICT_7X7_250
+    corners, ids, _rejected = aruco.detectMarkers(image=img, dictionary=get_aruco_dictionary(dictionary))
+    if ids is None:
+        return {}
+    return {int(marker_id[0]): corner.reshape(4, 2) for corner, marker_id in zip(corners, ids)}
 
 
 def get_current_video_device():
@@ -54,61 +155,195 @@ def get_current_video_device():
     return current_video_device
 
 
-def read_from_video_device(device_index, video_canvas) -> None:
-    global current_video_device, stop_event
-
-    cap = cv2.VideoCapture(device_index)
-    if not cap.isOpened():
-        raise IOError("Cannot open camera")
+def read_from_video_device(device_index, video_canvas, capture_size=None, detector_mode=DEFAULT_DETECTOR_MODE,
+                           on_opened=None, stop_event=None) -> None:
+    """
+    Reads frames from a camera index, video file or image directory and moves the
+    mouse to the coordinates decoded from the ArUco markers in each frame, until the
+    stop event is set. The device is released by this thread when it stops.
+    Once the device is open, on_opened is called with the frame size it delivers.
+    """
+    global current_video_device
+    if stop_event is None:
+        stop_event = threading.Event()
 
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1920)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 1080)
+    try:
+        cap = open_frame_source(device_index, capture_size)
+    except IOError as e:
+        logger.error(_("Failed to open video device: {}").format(e))
+        capture_settled.set()
+        return
 
-    logging.info(_("Opened video device {}").format(cap))
+    logger.info(_("Opened video device {}").format(cap))
     current_video_device = cap
-    stop_event.clear()
+    if on_opened is not None:
+        on_opened(cap.frame_size())
+    try:
+        run_capture_loop(cap, video_canvas, detector_mode, stop_event)
+    finally:
+        cap.release()
+        if current_video_device is cap:
+            current_video_device = None
+
+
+def run_capture_loop(cap, video_canvas, detector_mode, stop_event) -> None:
+    """
+    Decodes the frames of an open source until it ends, is replaced or the stop event is set.
+    """
+    global first_frame_read
+    decoder = ConsensusDecoder(convert_aruco_marker_ids_to_coordinates)
+    gate = MotionGate()
+    calibrator = get_homography_calibrator()
+    marker_ids = []
+    consensus = ConsensusResult(None, None, 0.0, False)
 
     while get_current_video_device() is cap and not stop_event.is_set():
+        read_started = time.perf_counter()
         ret, frame = cap.read()
+        begin_sample(CAMERA_SOURCE, read_started)
+        record_stage(CAPTURE_READ, read_started)
 
         if not ret:
-            logging.warning("cap.read is False, retrying...")
+            if not cap.is_live:
+                logger.info(_("End of frames from {}").format(cap))
+                break
+            logger.warning("cap.read is False, retrying...")
             continue
+        if not first_frame_read:
+            first_frame_read = True
+            capture_settled.set()
+
+        if video_canvas is not None:
+            preview_started = time.perf_counter()
+            draw_video_image_to_canvas(frame, video_canvas)
+            record_stage(PREVIEW, preview_started)
+
+        # While the calibration overlay covers the screen, the frame's one detection pass looks
+        # for the overlay markers, and the coordinates are held like on a still frame
+        detected = False
+        if homography_calibration_requested.is_set() or window_actions.aruco_overlay_shown:
+            calibration_started = time.perf_counter()
+            update_homography_calibration(detect_aruco_marker_corners(frame))
+            record_stage(DETECTION, calibration_started)
+        else:
+            # A still scene reuses the previous result instead of running detection again. It must
+            # not vote again either, or one misdetection would win the consensus by repetition.
+            detected = gate.should_detect(frame)
+        marker_centers = None
+        if detected:
+            detection_started, detection_cpu_started = time.perf_counter(), time.thread_time()
+            if calibrator.homography is None:
+                marker_ids = detect_aruco_markers(frame, mode=detector_mode)
+            else:
+                marker_ids, marker_centers = locate_aruco_markers(frame, mode=detector_mode)
+            gate.record_detection_cost(time.thread_time() - detection_cpu_started)
+            record_stage(DETECTION, detection_started)
+            logger.debug("marker_ids: %s", marker_ids)
+            consensus_started = time.perf_counter()
+            consensus = decoder.update(marker_ids)
+            record_stage(CONSENSUS, consensus_started)
+        else:
+            consensus = consensus._replace(changed=False)
+        publish_motion_gate_metrics(gate)
+        session_recorder.record_frame(frame, detected, marker_ids, consensus.x, consensus.y, consensus.confidence)
+        if consensus.changed:
+            logger.debug("x: %s, y: %s, confidence: %.2f", consensus.x, consensus.y, consensus.confidence)
+            publish_gaze_sample(consensus.x, consensus.y, CAMERA_SOURCE, consensus.confidence)
+            submit_target(CAMERA_SOURCE, consensus.x, consensus.y, 0.1)
+        elif marker_centers is not None and 0 < len(marker_ids) < STRIP_MARKER_COUNT:
+            # A partly hidden strip cannot be decoded, but the homography still tells where it is on screen
+            screen_x, screen_y = calibrator.map_point(*marker_centers.mean(axis=0))
+            logger.debug("Strip of %d markers mapped to x: %s, y: %s", len(marker_ids), screen_x, screen_y)
+            submit_target(CAMERA_SOURCE, screen_x, screen_y, 0.1)
+        end_sample()  # Only still open if the frame did not move the cursor
+
+    end_sample()
+    capture_settled.set()  # A recording may end before its first frame
+    gate_metrics = gate.metrics()
+    logger.info(_("Motion gate skipped {:.0%} of frames, saving {:.1f}s of CPU time").format(
+        gate_metrics["skipped_fraction"], gate_metrics["cpu_seconds_saved"]))
+
+
+def get_homography_calibrator():
+    global homography_calibrator
+    if homography_calibrator is None:
+        homography_calibrator = HomographyCalibrator(viewport_size())
+    return homography_calibrator
+
+
+def request_homography_calibration() -> None:
+    """
+    Solves the camera to screen homography from the next frame that shows the calibration overlay.
+    """
+    homography_calibration_requested.set()
+
 
-        draw_video_image_to_canvas(frame, video_canvas)
+def update_homography_calibration(marker_corners) -> None:
+    """
+    Checks the homography against the overlay marker corners detected in a frame, re-solving it
+    if it was requested or has drifted. A requested calibration hides the overlay once it is solved.
+    """
+    requested = homography_calibration_requested.is_set()
+    if get_homography_calibrator().update(marker_corners, force=requested) and requested:
+        homography_calibration_requested.clear()
+        run_on_ui_thread(hide_aruco_marker, key=window_actions.ARUCO_MARKER_UI_KEY)
 
-        marker_ids = detect_aruco_markers(frame)
-        logging.debug(f"marker_ids: {marker_ids}")
-        x, y = convert_aruco_marker_ids_to_coordinates(marker_ids)
-        logging.debug(f"x: {x}, y: {y}")
-        if x is not None and y is not None:
-            move_mouse(x, y, 0.1)
 
-        cv2.waitKey(50)
+def publish_motion_gate_metrics(gate: MotionGate) -> None:
+    gate_metrics = gate.metrics()
+    metrics.set_value(MOTION_GATE_SKIPPED_SERIES, gate_metrics["skipped_fraction"])
+    metrics.set_value(MOTION_GATE_CPU_SAVED_SERIES, gate_metrics["cpu_seconds_saved"])
 
 
 def draw_video_image_to_canvas(frame, video_canvas):
+    """
+    Converts the frame for the preview on the calling thread and shows it on the Tk
+    thread, newest frame only. The capture thread never waits for Tk, so the Tk thread
+    can stop it without both waiting on each other.
+    """
     if video_canvas is None:
         return
 
     img = cv2.resize(frame, (1280, 720))
     img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
     img_pil = Image.fromarray(img_rgb)
+    run_on_ui_thread(show_video_image, video_canvas, img_pil, key=VIDEO_PREVIEW_UI_KEY)
+
+
+def show_video_image(video_canvas, img_pil):
+    """
+    Draws a converted preview frame; must run on the Tk thread.
+    """
+    if not video_canvas.winfo_exists():
+        return
     img_tk = ImageTk.PhotoImage(image=img_pil)
-    if video_canvas.winfo_exists():
-        video_canvas.img_tk = img_tk  # Keep a reference to prevent garbage collection
-        video_canvas.create_image(0, 0, anchor=tk.NW, image=img_tk)
+    video_canvas.img_tk = img_tk  # Keep a reference to prevent garbage collection
+    video_canvas.create_image(0, 0, anchor=tk.NW, image=img_tk)
 
 
-def get_video_devices():
+def wait_for_first_frame(timeout: float) -> bool:
     """
-    Lists available video devices.
+    Waits until the capture started last reads its first frame, returning False if it
+    fails to open or reads nothing within timeout seconds.
+    """
+    capture_settled.wait(timeout)
+    return first_frame_read
+
+
+def get_video_devices(in_use=()):
+    """
+    Lists available video devices. Devices in use are listed without being opened again.
     """
     # checks the first 10 indexes.
     index = 0
     video_device_indices = []
     i = 10
     while i > 0:
+        if index in in_use:
+            video_device_indices.append(index)
+            index += 1
+            i -= 1
+            continue
         cap = cv2.VideoCapture(index)
         if cap.read()[0]:
             video_device_indices.append(index)
@@ -118,25 +353,28 @@ def get_video_devices():
     return video_device_indices if video_device_indices else [_("No Video Devices Available")]
 
 
-def start_video_thread(device_index: int, canvas: tk.Canvas) -> bool:
-    global current_video_device, stop_event
+def start_video_thread(device_index: int, canvas: tk.Canvas, capture_size=None,
+                       detector_mode: str = DEFAULT_DETECTOR_MODE, on_opened=None) -> bool:
+    global current_video_device, first_frame_read
     stop_video_capture()  # End existing video capture if any
 
+    first_frame_read = False
+    capture_settled.clear()
     try:
-        threading.Thread(
-            target=read_from_video_device, args=(device_index, canvas), daemon=True
-        ).start()
+        supervisor.start(VIDEO_WORKER, read_from_video_device, device_index, canvas, capture_size, detector_mode,
+                         on_opened)
         return True
     except IOError as e:
-        logging.error(_("Failed to open video device: {}").format(e))
+        logger.error(_("Failed to open video device: {}").format(e))
         return False
 
 
 def stop_video_capture() -> None:
-    global current_video_device, stop_event
+    """
+    Stops the capture thread and waits for it to release its device.
+    """
+    global current_video_device
     if current_video_device:
-        logging.info(_("End video capture from {}").format(current_video_device))
-        stop_event.set()  # Signal the thread to stop
-        time.sleep(1)  # Give the thread some time to exit
-        current_video_device.release()
-        current_video_device = None
+        logger.info(_("End video capture from {}").format(current_video_device))
+    supervisor.stop(VIDEO_WORKER)
+    current_video_device = None
@@ -1,28 +1,63 @@
 import logging
+import os
 import random
+import threading
+import time
 import tkinter as tk
 from enum import Enum
+from typing import Optional
 
-import cv2
-import numpy as np
-import pyautogui
-from PIL import Image, ImageTk
-
+from .lazy_import import lazy_import
 from .localization import setup_localization
+from .metrics import MOUSE_MOVE
+from .tracing import CURSOR_MOVED, MANUAL_SOURCE, end_sample, record_stage
+from .user_dirs import user_cache_dir
+from .workers import CRAZY_MOUSE_WORKER, supervisor
 
 _, _lang = setup_localization()
 
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Heavy dependencies are only imported once the first marker or mouse action needs them
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+pyautogui = lazy_import("pyautogui")
+Image = lazy_import("PIL.Image")
+ImageTk = lazy_import("PIL.ImageTk")
+# Imports this module itself, so it is loaded once the first manual move is submitted
+arbitration = lazy_import(f"{__package__}.arbitration")
 
 DEFAULT_MOVE_SPEED = 0.7
+CRAZY_MOVE_SPEED = 0.12
 CALIBRATION_DOT_SIZE = 50
-crazy_movement_active = False
 calibration_dot_window = None
+# Keys under which overlay changes are posted to the UI dispatcher
+CALIBRATION_DOT_UI_KEY = "calibration_dot"
+ARUCO_MARKER_UI_KEY = "aruco_marker"
 
 aruco_marker_window = None
-
-
-def generate_aruco_marker(marker_id: int, marker_size, dictionary=cv2.aruco.DICT_7X7_250):
+aruco_marker_label = None
+aruco_overlay_window = None
+aruco_overlay_label = None
+aruco_overlay_background = None
+# Read by the capture thread to know when the calibration markers are on screen
+aruco_overlay_shown = False
+
+DEFAULT_MARKER_SIZE = 200
+# White border around each marker in the overlay, as a fraction of the marker size
+MARKER_QUIET_ZONE = 0.25
+# Overlay pixels of this color are see-through where the window manager supports -transparentcolor
+OVERLAY_TRANSPARENT_COLOR = (255, 0, 255)
+OVERLAY_FALLBACK_COLOR = (255, 255, 255)
+marker_cache_dir = os.path.join(user_cache_dir(), "markers")
+# Rendered markers and their Tk images, keyed by (dictionary, marker id, marker size)
+marker_images = {}
+marker_photo_images = {}
+
+
+def generate_aruco_marker(marker_id: int, marker_size, dictionary=None):
+    if dictionary is None:
+        dictionary = cv2.aruco.DICT_7X7_250
     aruco_dict = cv2.aruco.getPredefinedDictionary(dict=dictionary)
     marker_image = np.zeros((marker_size, marker_size), dtype=np.uint8)
     cv2.aruco.drawMarker(aruco_dict, marker_id, marker_size, marker_image, 1)
@@ -64,117 +99,275 @@ def get_position_coordinates(position, marker_size, screen_width, screen_height)
         return 0, 0
 
 
-def show_aruco_marker(position: MarkerPosition, marker_size=200, dictionary=cv2.aruco.DICT_7X7_250):
-    global aruco_marker_window
-    if aruco_marker_window and aruco_marker_window.winfo_exists():
-        return
+def load_aruco_marker(marker_id: int, marker_size, dictionary=None):
+    """
+    Returns the marker image from memory or the on-disk cache, rendering and caching it if needed.
+    """
+    if dictionary is None:
+        dictionary = cv2.aruco.DICT_7X7_250
+    key = (dictionary, marker_id, marker_size)
+    marker_image = marker_images.get(key)
+    if marker_image is not None:
+        return marker_image
+
+    cache_path = os.path.join(marker_cache_dir, f"{dictionary}_{marker_id}_{marker_size}.png")
+    marker_image = cv2.imread(cache_path, cv2.IMREAD_GRAYSCALE) if os.path.exists(cache_path) else None
+    if marker_image is None or marker_image.shape != (marker_size, marker_size):
+        marker_image = generate_aruco_marker(marker_id, marker_size, dictionary)
+        try:
+            os.makedirs(marker_cache_dir, exist_ok=True)
+            cv2.imwrite(cache_path, marker_image)
+        except (OSError, cv2.error) as e:
+            logger.warning(_("Cannot cache ArUco marker in {}: {}").format(marker_cache_dir, e))
+    marker_images[key] = marker_image
+    return marker_image
+
+
+def get_aruco_marker_photo_image(marker_id: int, marker_size, dictionary=None):
+    if dictionary is None:
+        dictionary = cv2.aruco.DICT_7X7_250
+    key = (dictionary, marker_id, marker_size)
+    if key not in marker_photo_images:
+        marker_image = load_aruco_marker(marker_id, marker_size, dictionary)
+        marker_photo_images[key] = ImageTk.PhotoImage(Image.fromarray(marker_image))
+    return marker_photo_images[key]
+
+
+def prerender_aruco_markers(marker_size=DEFAULT_MARKER_SIZE, dictionary=None):
+    """
+    Loads every MarkerPosition marker ahead of time, so switching markers never renders one.
+    Must run on the Tk thread after the root window exists.
+    """
+    for position in MarkerPosition:
+        get_aruco_marker_photo_image(position.value, marker_size, dictionary)
 
-    screen_width, screen_height = viewport_size()
-    x_position, y_position = get_position_coordinates(position, marker_size, screen_width, screen_height)
 
+def create_aruco_marker_window():
+    global aruco_marker_window, aruco_marker_label
     aruco_marker_window = tk.Toplevel()
-    aruco_marker_window.attributes("-alpha", 0.0)
+    aruco_marker_window.withdraw()
     aruco_marker_window.overrideredirect(True)
     aruco_marker_window.attributes("-topmost", True)
 
+    aruco_marker_label = tk.Label(aruco_marker_window, borderwidth=0)
+    aruco_marker_label.pack()
+
+
+def show_aruco_marker(position: MarkerPosition, marker_size=DEFAULT_MARKER_SIZE, dictionary=None):
+    """
+    Shows the marker for the position in the reusable overlay window, replacing any marker shown before.
+    """
+    global aruco_overlay_shown
+    if aruco_marker_window is None or not aruco_marker_window.winfo_exists():
+        create_aruco_marker_window()
+    aruco_overlay_shown = False
+    if aruco_overlay_window and aruco_overlay_window.winfo_exists():
+        aruco_overlay_window.withdraw()
+
+    screen_width, screen_height = viewport_size()
+    x_position, y_position = get_position_coordinates(position, marker_size, screen_width, screen_height)
+
+    marker_image_tk = get_aruco_marker_photo_image(position.value, marker_size, dictionary)
+    aruco_marker_label.configure(image=marker_image_tk)
+
     aruco_marker_window.geometry(
         f"{marker_size}x{marker_size}+{x_position}+{y_position}"
     )
-    aruco_marker_window.attributes("-alpha", 1.0)
+    aruco_marker_window.deiconify()
+    aruco_marker_window.lift()
+
+
+def get_overlay_marker_coordinates(position, marker_size, screen_width, screen_height):
+    """
+    Returns where the overlay puts a marker: like get_position_coordinates, but moved in
+    from the screen edges far enough to leave room for the quiet zone detection needs.
+    """
+    quiet_zone = int(marker_size * MARKER_QUIET_ZONE)
+    x, y = get_position_coordinates(position, marker_size + 2 * quiet_zone, screen_width, screen_height)
+    return x + quiet_zone, y + quiet_zone
+
+
+def compose_aruco_marker_overlay(screen_width, screen_height, marker_size=DEFAULT_MARKER_SIZE, dictionary=None,
+                                 background=OVERLAY_TRANSPARENT_COLOR):
+    """
+    Renders all MarkerPosition markers into one screen-sized RGB image, each framed by a
+    white quiet zone, at the places given by get_overlay_marker_coordinates.
+    """
+    overlay = np.empty((screen_height, screen_width, 3), dtype=np.uint8)
+    overlay[:] = background
+    quiet_zone = int(marker_size * MARKER_QUIET_ZONE)
+    coordinates = {
+        position: get_overlay_marker_coordinates(position, marker_size, screen_width, screen_height)
+        for position in MarkerPosition
+    }
+    # Quiet zones first, so on small screens they cannot paint over a neighbouring marker
+    for x, y in coordinates.values():
+        overlay[y - quiet_zone:y + marker_size + quiet_zone, x - quiet_zone:x + marker_size + quiet_zone] = 255
+    for position, (x, y) in coordinates.items():
+        marker_image = load_aruco_marker(position.value, marker_size, dictionary)
+        overlay[y:y + marker_size, x:x + marker_size] = marker_image[:, :, np.newaxis]
+    return overlay
+
+
+def get_overlay_marker_size(screen_width, screen_height):
+    """
+    Returns the largest default-or-smaller marker size that fits three rows and columns with quiet zones.
+    """
+    return min(DEFAULT_MARKER_SIZE, min(screen_width, screen_height) // 5)
+
+
+def create_aruco_overlay_window():
+    """
+    Creates the full-screen overlay window and picks the background color its image should use.
+    """
+    global aruco_overlay_window, aruco_overlay_label, aruco_overlay_background
+    aruco_overlay_window = tk.Toplevel()
+    aruco_overlay_window.withdraw()
+    aruco_overlay_window.overrideredirect(True)
+    aruco_overlay_window.attributes("-topmost", True)
+
+    aruco_overlay_label = tk.Label(aruco_overlay_window, borderwidth=0)
+    aruco_overlay_label.pack()
 
-    marker_image = generate_aruco_marker(position.value, marker_size, dictionary)
-    marker_image_pil = Image.fromarray(marker_image)
-    marker_image_tk = ImageTk.PhotoImage(marker_image_pil)
+    try:
+        aruco_overlay_window.attributes("-transparentcolor", "#%02x%02x%02x" % OVERLAY_TRANSPARENT_COLOR)
+        aruco_overlay_background = OVERLAY_TRANSPARENT_COLOR
+    except tk.TclError:
+        # Only Windows supports a transparent color, elsewhere the overlay covers the screen
+        aruco_overlay_background = OVERLAY_FALLBACK_COLOR
+
+
+def show_all_aruco_markers(marker_size=None, dictionary=None):
+    """
+    Shows all nine markers at once in a full-screen overlay, so one camera frame sees every reference point.
+    """
+    global aruco_overlay_shown
+    if aruco_overlay_window is None or not aruco_overlay_window.winfo_exists():
+        create_aruco_overlay_window()
+    if aruco_marker_window and aruco_marker_window.winfo_exists():
+        aruco_marker_window.withdraw()
 
-    marker_label = tk.Label(aruco_marker_window, image=marker_image_tk)
-    marker_label.image = marker_image_tk
-    marker_label.pack()
+    screen_width, screen_height = viewport_size()
+    if marker_size is None:
+        marker_size = get_overlay_marker_size(screen_width, screen_height)
+    key = ("overlay", dictionary, marker_size, screen_width, screen_height, aruco_overlay_background)
+    if key not in marker_photo_images:
+        overlay = compose_aruco_marker_overlay(
+            screen_width, screen_height, marker_size, dictionary, aruco_overlay_background
+        )
+        marker_photo_images[key] = ImageTk.PhotoImage(Image.fromarray(overlay))
+    aruco_overlay_label.configure(image=marker_photo_images[key])
+
+    aruco_overlay_window.geometry(f"{screen_width}x{screen_height}+0+0")
+    aruco_overlay_window.deiconify()
+    aruco_overlay_window.lift()
+    aruco_overlay_shown = True
 
 
 def hide_aruco_marker():
-    global aruco_marker_window
-    if aruco_marker_window:
-        aruco_marker_window.destroy()
-        aruco_marker_window = None
+    """
+    Hides the single marker window and the all-markers overlay.
+    """
+    global aruco_overlay_shown
+    aruco_overlay_shown = False
+    for window in (aruco_marker_window, aruco_overlay_window):
+        if window and window.winfo_exists():
+            window.withdraw()
 
 
-def crazy_mouse_movement():
-    global crazy_movement_active
-    crazy_movement_active = True
-    while crazy_movement_active:
-        move_mouse_randomly(0.12)
+def crazy_mouse_movement(stop_event: Optional[threading.Event] = None):
+    if stop_event is None:
+        stop_event = threading.Event()
+    while not stop_event.is_set():
+        move_mouse_randomly(CRAZY_MOVE_SPEED)
+        stop_event.wait(CRAZY_MOVE_SPEED)  # The actuator moves asynchronously, one target per move
+
+
+def start_crazy_mouse_movement():
+    supervisor.start(CRAZY_MOUSE_WORKER, crazy_mouse_movement)
 
 
 def stop_crazy_mouse_movement():
-    global crazy_movement_active
-    crazy_movement_active = False
+    supervisor.stop(CRAZY_MOUSE_WORKER)
 
 
 def move_mouse_randomly(speed=DEFAULT_MOVE_SPEED):
+    """
+    Submits a random position on the screen to the input arbiter as a manual move.
+    """
     screen_width, screen_height = viewport_size()
     random_x = random.randint(0, screen_width - 1)
     random_y = random.randint(0, screen_height - 1)
-    move_mouse(random_x, random_y, speed)
+    arbitration.submit_target(MANUAL_SOURCE, random_x, random_y, speed)
 
 
-def move_mouse(x_str, y_str, speed=DEFAULT_MOVE_SPEED):
+def parse_coordinates(x_str, y_str):
+    """
+    Returns the coordinates as integers. Raises ValueError if they are not integers or
+    not on the screen.
+    """
     try:
         x = int(x_str)
         y = int(y_str)
     except ValueError:
-        logging.error(_("Coordinates must be valid non-negative integers."))
-        return
+        raise ValueError(_("Coordinates must be valid non-negative integers."))
     except TypeError:
-        logging.error(_("Coordinates must not be None and must be convertible to integers."))
-        return
+        raise ValueError(_("Coordinates must not be None and must be convertible to integers."))
 
     screen_width, screen_height = viewport_size()
     if x < 0 or y < 0:
-        logging.error(_("Coordinates must be non-negative."))
-        return
+        raise ValueError(_("Coordinates must be non-negative."))
     if x > screen_width or y > screen_height:
-        logging.error(
+        raise ValueError(
             _("Coordinates must be within screen size: {}x{}.").format(
                 screen_width, screen_height
             ))
+    return x, y
+
+
+def move_mouse(x_str, y_str, speed=DEFAULT_MOVE_SPEED):
+    try:
+        x, y = parse_coordinates(x_str, y_str)
+    except ValueError as e:
+        logger.error(e)
         return
+    started = time.perf_counter()
     pyautogui.moveTo(x, y, speed)
+    end_sample(CURSOR_MOVED, record_stage(MOUSE_MOVE, started))
 
 
 def viewport_size():
     return pyautogui.size()
 
 
-def show_calibration_dot():
+def create_calibration_dot_window():
     global calibration_dot_window
-    if calibration_dot_window and calibration_dot_window.winfo_exists():
-        return
-
-    screen_width, screen_height = viewport_size()
-    x_position = int(screen_width / 2 - CALIBRATION_DOT_SIZE / 2)
-    y_position = int(screen_height / 2 - CALIBRATION_DOT_SIZE / 2)
-
     calibration_dot_window = tk.Toplevel()
-    calibration_dot_window.attributes("-alpha", 0.0)
+    calibration_dot_window.withdraw()
     calibration_dot_window.overrideredirect(True)
     calibration_dot_window.attributes("-topmost", True)
     calibration_dot_window.configure(bg="red")
 
+
+def show_calibration_dot():
+    """
+    Shows the calibration dot in the center of the screen, reusing its window.
+    Must run on the Tk thread, worker threads go through run_on_ui_thread.
+    """
+    if calibration_dot_window is None or not calibration_dot_window.winfo_exists():
+        create_calibration_dot_window()
+
+    screen_width, screen_height = viewport_size()
+    x_position = int(screen_width / 2 - CALIBRATION_DOT_SIZE / 2)
+    y_position = int(screen_height / 2 - CALIBRATION_DOT_SIZE / 2)
+
     calibration_dot_window.geometry(
         f"{CALIBRATION_DOT_SIZE}x{CALIBRATION_DOT_SIZE}+{x_position}+{y_position}"
     )
-    calibration_dot_window.attributes("-alpha", 1.0)
-
-    # Force the window manager to update the window's size and position
-    # calibration_dot_window.update_idletasks()
-    # calibration_dot_window.update()
-
-    # Make sure the calibration dot window doesn't take focus
-    # calibration_dot_window.grab_release()
+    calibration_dot_window.deiconify()
+    calibration_dot_window.lift()
 
 
 def hide_calibration_dot():
-    global calibration_dot_window
-    if calibration_dot_window:
-        calibration_dot_window.destroy()
-        calibration_dot_window = None
+    if calibration_dot_window and calibration_dot_window.winfo_exists():
+        calibration_dot_window.withdraw()
@@ -0,0 +1,117 @@
+import logging
+import threading
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Supervised threads, named like their threads so profiles and logs match
+SERIAL_WORKER = "serial-reader"
+VIDEO_WORKER = "video-capture"
+CRAZY_MOUSE_WORKER = "crazy-mouse"
+NETWORK_WORKER = "network-input"
+ACTUATOR_WORKER = "cursor-actuator"
+RECORDER_WORKER = "session-recorder"
+PROFILE_REPORT_WORKER = "profile-report"
+
+# Longer than one blocking read or cursor move, the longest a worker goes without checking its stop event
+DEFAULT_JOIN_TIMEOUT = 2.0
+
+
+class Worker:
+    """
+    A supervised thread. The target is called as target(*args, stop_event=...) and must
+    return soon after the stop event is set. The release callback, if any, runs once the
+    thread has exited, so the resource it frees is no longer in use.
+    """
+
+    def __init__(self, name: str, target: Callable, args=(), release: Optional[Callable[[], None]] = None):
+        self.name = name
+        self.target = target
+        self.args = args
+        self.release = release
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name=name, daemon=True)
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def run(self) -> None:
+        try:
+            self.target(*self.args, stop_event=self.stop_event)
+        except Exception:
+            logger.exception("Worker %s failed", self.name)
+
+    def is_alive(self) -> bool:
+        return self.thread.is_alive()
+
+    def stop(self, timeout: float = DEFAULT_JOIN_TIMEOUT) -> bool:
+        """
+        Signals the thread to stop, waits up to timeout seconds for it and then runs the
+        release callback. Returns False if the thread was still running; the resource is
+        released anyway, which makes most blocking reads return.
+        """
+        self.stop_event.set()
+        if self.thread.ident is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+        stopped = not self.is_alive() or self.thread is threading.current_thread()
+        if not stopped:
+            logger.warning("Worker %s did not stop within %.1fs", self.name, timeout)
+        release, self.release = self.release, None
+        if release is not None:
+            try:
+                release()
+            except Exception:
+                logger.exception("Releasing the resources of worker %s failed", self.name)
+        return stopped
+
+
+class WorkerSupervisor:
+    """
+    Starts workers by name, at most one per name, and stops them in order: a worker is
+    stopped and its resources released before its replacement starts.
+    """
+
+    def __init__(self, join_timeout: float = DEFAULT_JOIN_TIMEOUT):
+        self.join_timeout = join_timeout
+        self.workers: Dict[str, Worker] = {}
+        self.lock = threading.Lock()
+
+    def start(self, name: str, target: Callable, *args, release: Optional[Callable[[], None]] = None) -> Worker:
+        """
+        Stops the worker running under this name, if any, then starts the new one.
+        """
+        worker = Worker(name, target, args, release)
+        with self.lock:
+            previous = self.workers.get(name)
+            self.workers[name] = worker
+        if previous is not None:
+            previous.stop(self.join_timeout)
+        worker.start()
+        return worker
+
+    def stop(self, name: str, timeout: Optional[float] = None) -> bool:
+        """
+        Stops the worker running under this name, see Worker.stop. Returns True if there was none.
+        """
+        with self.lock:
+            worker = self.workers.pop(name, None)
+        if worker is None:
+            return True
+        # Joined outside the lock, the worker may start a replacement of another worker meanwhile
+        return worker.stop(self.join_timeout if timeout is None else timeout)
+
+    def stop_all(self) -> None:
+        """
+        Stops all workers, the most recently started first.
+        """
+        with self.lock:
+            names = list(self.workers)
+        for name in reversed(names):
+            self.stop(name)
+
+    def is_running(self, name: str) -> bool:
+        worker = self.workers.get(name)
+        return worker is not None and worker.is_alive()
+
+
+supervisor = WorkerSupervisor()
@@ -0,0 +1,53 @@
+"""
+Measures ArUco detection throughput and accuracy on synthetic frames, per resolution and detector mode.
+
+    python benchmarks/bench_detection.py --frames 50 --resolutions 720p 1080p
+"""
+import argparse
+import logging
+import time
+
+from app.synthetic import RESOLUTIONS, SceneDistortion, generate_scenes
+from app.video_capture import DETECTOR_MODES, convert_aruco_marker_ids_to_coordinates, detect_aruco_markers
+
+
+def bench_detection(scenes, mode):
+    detect_aruco_markers(scenes[0].frame, mode=mode)  # warm up caches outside the timed loop
+    correct = 0
+    started = time.perf_counter()
+    for scene in scenes:
+        marker_ids = detect_aruco_markers(scene.frame, mode=mode)
+        if convert_aruco_marker_ids_to_coordinates(marker_ids) == scene.coordinates:
+            correct += 1
+    seconds = time.perf_counter() - started
+    return seconds, correct
+
+
+def main():
+    defaults = SceneDistortion()
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--frames", type=int, default=30, help="frames per resolution")
+    parser.add_argument("--resolutions", nargs="+", default=list(RESOLUTIONS), choices=list(RESOLUTIONS))
+    parser.add_argument("--modes", nargs="+", default=list(DETECTOR_MODES), choices=list(DETECTOR_MODES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--perspective", type=float, default=defaults.perspective)
+    parser.add_argument("--blur", type=float, default=defaults.blur)
+    parser.add_argument("--noise", type=float, default=defaults.noise)
+    parser.add_argument("--lighting", type=float, default=defaults.lighting)
+    args = parser.parse_args()
+
+    # The per-frame detection log would dominate the timings
+    logging.disable(logging.CRITICAL)
+
+    distortion = SceneDistortion(args.perspective, args.blur, args.noise, args.lighting)
+    print(f"{'resolution':>10} {'mode':>9} {'ms/frame':>9} {'fps':>8} {'accuracy':>9}")
+    for resolution in args.resolutions:
+        scenes = list(generate_scenes(args.frames, resolution, distortion, seed=args.seed))
+        for mode in args.modes:
+            seconds, correct = bench_detection(scenes, mode)
+            print(f"{resolution:>10} {mode:>9} {seconds / len(scenes) * 1000:>9.2f} "
+                  f"{len(scenes) / seconds:>8.1f} {correct / len(scenes):>9.1%}")
+
+
+if __name__ == "__main__":
+    main()
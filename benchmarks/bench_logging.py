@@ -0,0 +1,109 @@
+"""
+Measures the logging overhead of the frame and serial line loops, before and after the logging policy.
+
+    python benchmarks/bench_logging.py --iterations 20000
+
+"before" replays the old statements: root logger at DEBUG, f-strings and eager gettext formatting.
+"after" replays the current ones: default INFO level, lazy formatting and the rate limit filter.
+Records go to an in-memory stream, so the timings include formatting but not terminal output.
+"""
+import argparse
+import io
+import logging
+import time
+
+import numpy as np
+
+from app.localization import setup_localization
+from app.log_policy import DEFAULT_LOG_LEVEL, apply_log_levels, lazy_translator
+from app.logging_handlers import LOG_FORMAT
+
+_, _lang = setup_localization()
+N_ = lazy_translator(_)
+
+video_logger = logging.getLogger("app.video_capture")
+serial_logger = logging.getLogger("app.serial")
+
+IDS = np.array([[1], [0], [2], [0]])
+MARKER_IDS = [1, 0, 2, 0]
+POSITIONS = [(10.0, 1), (60.0, 0), (110.0, 2), (160.0, 0)]
+
+
+def frame_before(ids):
+    logging.debug(f"ids: {ids}")
+    if ids is None:
+        logging.error("No ArUco markers detected.")
+        marker_ids = []
+    else:
+        logging.debug(f"marker_positions_with_ids: {POSITIONS}")
+        marker_ids = MARKER_IDS
+    logging.debug(f"marker_ids: {marker_ids}")
+    logging.debug(f"x: {102}, y: {200}, confidence: {0.8:.2f}")
+
+
+def frame_after(ids):
+    video_logger.debug("ids: %s", ids)
+    if ids is None:
+        video_logger.error("No ArUco markers detected.")
+        marker_ids = []
+    else:
+        video_logger.debug("marker_positions_with_ids: %s", POSITIONS)
+        marker_ids = MARKER_IDS
+    video_logger.debug("marker_ids: %s", marker_ids)
+    video_logger.debug("x: %s, y: %s, confidence: %.2f", 102, 200, 0.8)
+
+
+def line_before(line):
+    logging.info(_("Received data from {}: {}").format("COM1", line))
+
+
+def line_after(line):
+    serial_logger.info(N_("Received data from {}: {}", "COM1", line))
+
+
+def configure(levels=None):
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    handler = logging.StreamHandler(io.StringIO())
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root_logger.addHandler(handler)
+    if levels is not None:
+        apply_log_levels(levels)
+    else:
+        apply_log_levels({}, rate_limit=False)
+        root_logger.setLevel(logging.DEBUG)
+
+
+def bench(statement, arg, iterations):
+    started = time.perf_counter()
+    for _iteration in range(iterations):
+        statement(arg)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    cases = [
+        ("frame, markers found", frame_before, frame_after, IDS),
+        ("frame, no markers", frame_before, frame_after, None),
+        ("serial line", line_before, line_after, "[100,200]"),
+    ]
+    after_levels = [
+        (logging.getLevelName(DEFAULT_LOG_LEVEL), {}),
+        ("serial=WARNING", {"serial": logging.WARNING}),
+    ]
+    print(f"{'loop':>22} {'policy':>15} {'us/iteration':>13}")
+    for name, before, after, arg in cases:
+        configure()
+        print(f"{name:>22} {'before (DEBUG)':>15} {bench(before, arg, args.iterations):>13.2f}")
+        for label, levels in after_levels:
+            configure(levels)
+            print(f"{name:>22} {label:>15} {bench(after, arg, args.iterations):>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
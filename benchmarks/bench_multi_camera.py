@@ -0,0 +1,64 @@
+"""
+Measures how synchronized capture scales with the number of cameras, on file-backed sources.
+
+    python benchmarks/bench_multi_camera.py --cameras 1 2 4 --frames 60 --resolution 720p
+
+Each camera reads its own directory of synthetic frames, so decoding the images and
+detecting the markers is the real work. Parallel decodes each camera on its own pool
+thread, sequential decodes them one after the other on the capture thread.
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+from app.metrics import CAPTURE_SKEW, metrics
+from app.multi_camera import SynchronizedCapture
+from app.synthetic import RESOLUTIONS, generate_scenes, write_scene_directory
+from app.video_capture import DETECTOR_MODES
+
+
+def bench_capture(directories, detector_mode, max_workers):
+    metrics.reset()
+    capture = SynchronizedCapture(directories, detector_mode=detector_mode, max_workers=max_workers,
+                                  submit=lambda *target: True)
+    started = time.perf_counter()
+    while capture.step():
+        pass
+    seconds = time.perf_counter() - started
+    capture.release()
+    return capture.steps, seconds, metrics.snapshot()[CAPTURE_SKEW]["p95"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cameras", type=int, nargs="+", default=[1, 2, 4], help="camera counts to compare")
+    parser.add_argument("--frames", type=int, default=60, help="frames per camera")
+    parser.add_argument("--resolution", default="720p", choices=list(RESOLUTIONS))
+    parser.add_argument("--mode", default="default", choices=list(DETECTOR_MODES))
+    args = parser.parse_args()
+
+    # The per-frame detection log would dominate the timings
+    logging.disable(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as root:
+        directories = []
+        for camera in range(max(args.cameras)):
+            directory = os.path.join(root, f"camera{camera}")
+            write_scene_directory(directory, generate_scenes(args.frames, args.resolution, seed=camera))
+            directories.append(directory)
+
+        print(f"{'cameras':>7} {'decoding':>10} {'sets/s':>7} {'frames/s':>9} {'speedup':>8} {'skew p95 ms':>12}")
+        for count in args.cameras:
+            sequential_seconds = None
+            for label, max_workers in (("sequential", 1), ("parallel", count))[:2 if count > 1 else 1]:
+                steps, seconds, skew = bench_capture(directories[:count], args.mode, max_workers)
+                if sequential_seconds is None:
+                    sequential_seconds = seconds
+                print(f"{count:>7} {label:>10} {steps / seconds:>7.1f} {steps * count / seconds:>9.1f} "
+                      f"{sequential_seconds / seconds:>7.2f}x {skew * 1000:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
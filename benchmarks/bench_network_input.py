@@ -0,0 +1,85 @@
+"""
+Measures the sustained command rate of the network input over loopback, for UDP and TCP.
+
+    python benchmarks/bench_network_input.py --rate 2000 --seconds 3
+
+A sender streams coordinate lines at the given rate, one line per datagram or write, while the
+network input parses them with the same CommandParser as the serial reader. Cursor moves are
+counted instead of executed, so the rate is that of the receive and parse path.
+"""
+import argparse
+import socket
+import threading
+import time
+
+from app.network_input import NETWORK_MODES, TCP_MODE, UDP_MODE, NetworkInput
+from app.serial import CommandParser, CoordinateCommand
+
+HOST = "127.0.0.1"
+
+
+class CountingCoordinateCommand(CoordinateCommand):
+    def __init__(self):
+        self.moves = 0
+
+    def execute(self, line: str) -> bool:
+        self.moves += 1
+        return True
+
+
+def send_lines(mode, port, rate, seconds):
+    if mode == UDP_MODE:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.connect((HOST, port))
+    else:
+        sock = socket.create_connection((HOST, port))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    interval = 1 / rate
+    started = time.perf_counter()
+    sent = 0
+    while sent < rate * seconds:
+        sock.send(f"{sent % 1920},{sent % 1080}\n".encode())
+        sent += 1
+        delay = started + sent * interval - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    elapsed = time.perf_counter() - started
+    sock.close()
+    return sent, elapsed
+
+
+def bench_mode(mode, rate, seconds):
+    command = CountingCoordinateCommand()
+    network_input = NetworkInput(mode, HOST, 0, CommandParser([command]))
+    network_input.open()
+    stop_event = threading.Event()
+    receiver = threading.Thread(target=network_input.run, args=(stop_event,), daemon=True)
+    receiver.start()
+
+    sent, elapsed = send_lines(mode, network_input.port, rate, seconds)
+    deadline = time.monotonic() + 2
+    while network_input.lines_received < sent and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    stop_event.set()
+    receiver.join()
+    network_input.close()
+    return sent, elapsed, network_input, command.moves
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rate", type=int, default=2000, help="lines sent per second")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--modes", nargs="+", default=list(NETWORK_MODES), choices=[UDP_MODE, TCP_MODE])
+    args = parser.parse_args()
+
+    print(f"{'mode':>5} {'sent':>7} {'received':>9} {'lines/s':>9} {'batches':>8} {'coalesced':>10} {'moves':>7}")
+    for mode in args.modes:
+        sent, elapsed, network_input, moves = bench_mode(mode, args.rate, args.seconds)
+        print(f"{mode:>5} {sent:>7} {network_input.lines_received:>9} {network_input.lines_received / elapsed:>9.0f} "
+              f"{network_input.batches:>8} {network_input.lines_coalesced:>10} {moves:>7}")
+
+
+if __name__ == "__main__":
+    main()
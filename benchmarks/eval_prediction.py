@@ -0,0 +1,78 @@
+"""
+Evaluates the cursor prediction offline, against the true future samples of a recorded session.
+
+    python benchmarks/eval_prediction.py session.npz --horizons 0.02 0.05 0.1
+    python benchmarks/eval_prediction.py --record session.npz --seconds 60
+
+Without a session, a synthetic one with fixations, saccades and smooth pursuits is used.
+--record saves the samples published by a running tracker started with --gaze-stream.
+For each horizon, the error of the predicted position is compared with the baseline error
+of a cursor lagging by that horizon, in pixels. The --predict-* options tune the predictor.
+"""
+import argparse
+import functools
+import time
+
+import numpy as np
+
+from app.gaze_stream import DEFAULT_GAZE_STREAM_NAME, GazeStreamReader, gaze_sample_dtype
+from app.prediction import (
+    EXTRAPOLATED,
+    VelocityPredictor,
+    add_prediction_arguments,
+    evaluate_prediction,
+    load_gaze_session,
+    save_gaze_session,
+)
+from app.synthetic import generate_gaze_session
+
+
+def record_session(path, seconds, stream):
+    reader = GazeStreamReader(stream)
+    chunks = []
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        chunk = reader.read().copy()
+        if not len(chunk):
+            time.sleep(0.01)
+        elif reader.intact():
+            chunks.append(chunk)
+    lost = reader.lost
+    reader.close()
+    records = np.concatenate(chunks) if chunks else np.zeros(0, dtype=gaze_sample_dtype())
+    save_gaze_session(path, records["timestamp"], np.column_stack([records["x"], records["y"]]))
+    print(f"recorded {len(records)} samples to {path}, {lost} lost")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("session", nargs="?", help="recorded .npz or .csv session with timestamp, x and y")
+    parser.add_argument("--horizons", type=float, nargs="+", default=[0.02, 0.05, 0.1],
+                        help="pipeline latencies in seconds to predict ahead by")
+    parser.add_argument("--synthetic-seconds", type=float, default=120.0)
+    parser.add_argument("--record", help="record the gaze stream to this .npz file instead of evaluating")
+    parser.add_argument("--seconds", type=float, default=60.0, help="how long to record")
+    parser.add_argument("--stream", default=DEFAULT_GAZE_STREAM_NAME, help="gaze stream to record")
+    add_prediction_arguments(parser)
+    args = parser.parse_args()
+
+    if args.record:
+        record_session(args.record, args.seconds, args.stream)
+        return
+    if args.session:
+        timestamps, positions = load_gaze_session(args.session)
+    else:
+        timestamps, positions = generate_gaze_session(args.synthetic_seconds)
+    create = functools.partial(VelocityPredictor, args.predict_window, max(args.horizons), args.predict_min_speed,
+                               args.predict_max_speed, args.predict_max_noise)
+
+    print(f"{len(timestamps)} samples over {timestamps[-1] - timestamps[0]:.1f}s")
+    print(f"{'horizon ms':>10} {'lag mean':>9} {'lag p95':>8} {'pred mean':>10} {'pred p95':>9} {'extrapolated':>13}")
+    for horizon in args.horizons:
+        report = evaluate_prediction(timestamps, positions, horizon, create)
+        print(f"{horizon * 1000:>10.0f} {report['baseline_mean_error']:>9.1f} {report['baseline_p95_error']:>8.1f} "
+              f"{report['mean_error']:>10.1f} {report['p95_error']:>9.1f} {report[f'{EXTRAPOLATED}_fraction']:>13.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import argparse
+import threading
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+from app.arbitration import (
+    ACCEPTED,
+    LATEST_POLICY,
+    OVERRIDDEN,
+    STICKY_POLICY,
+    SUPERSEDED,
+    InputArbiter,
+    arbiter,
+    parse_source_priority,
+    stop_actuator,
+    submit_target,
+)
+from app.metrics import ACTUATOR_WAIT, MOUSE_MOVE, MetricsRegistry
+from app.prediction import EXTRAPOLATED, WARMING_UP, VelocityPredictor
+from app.tracing import (
+    CAMERA_SOURCE,
+    CURSOR_MOVED,
+    MANUAL_SOURCE,
+    NETWORK_SOURCE,
+    SERIAL_SOURCE,
+    begin_sample,
+    trace_buffer,
+)
+from app.workers import ACTUATOR_WORKER, supervisor
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+class TestInputArbiter(unittest.TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        patcher = patch("app.arbitration.metrics", self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def counts(self, arbiter, source):
+        return arbiter.stats()["sources"][source]
+
+    def test_preferred_source_overrides_the_others(self):
+        arbiter = InputArbiter(freshness_timeout=0.5)
+
+        self.assertTrue(arbiter.submit(SERIAL_SOURCE, 10, 10, 0.2, now=0.0))
+        self.assertFalse(arbiter.submit(CAMERA_SOURCE, 50, 50, 0.1, now=0.1))
+        self.assertFalse(arbiter.submit(NETWORK_SOURCE, 60, 60, 0.2, now=0.2))
+
+        target = arbiter.take(0)
+        self.assertEqual((target.source, target.x, target.y, target.speed), (SERIAL_SOURCE, 10, 10, 0.2))
+        self.assertEqual(self.counts(arbiter, CAMERA_SOURCE)[OVERRIDDEN], 1)
+        self.assertEqual(self.counts(arbiter, NETWORK_SOURCE)[OVERRIDDEN], 1)
+        self.assertEqual(self.registry.values_snapshot()['input_samples_total{source="camera",outcome="overridden"}'], 1)
+        self.assertEqual(self.registry.values_snapshot()['input_active_source{source="serial"}'], 1)
+
+    def test_manual_moves_override_the_trackers(self):
+        arbiter = InputArbiter(freshness_timeout=0.5)
+        arbiter.submit(SERIAL_SOURCE, 10, 10, 0.2, now=0.0)
+
+        self.assertTrue(arbiter.submit(MANUAL_SOURCE, 300, 200, 0.7, now=0.1))
+        self.assertFalse(arbiter.submit(SERIAL_SOURCE, 11, 11, 0.2, now=0.2))
+        self.assertEqual(arbiter.take(0).source, MANUAL_SOURCE)
+        # The trackers take over again once no manual move came for the freshness timeout
+        self.assertTrue(arbiter.submit(SERIAL_SOURCE, 12, 12, 0.2, now=0.7))
+
+    def test_stale_source_fails_over_and_is_preempted_when_it_returns(self):
+        arbiter = InputArbiter(freshness_timeout=0.5)
+        arbiter.submit(SERIAL_SOURCE, 10, 10, 0.2, now=0.0)
+
+        self.assertTrue(arbiter.submit(CAMERA_SOURCE, 50, 50, 0.1, now=1.0))
+        self.assertEqual(arbiter.active_source, CAMERA_SOURCE)
+        self.assertEqual(arbiter.stats()["failovers"], 1)
+
+        self.assertTrue(arbiter.submit(SERIAL_SOURCE, 20, 20, 0.2, now=1.1))
+        self.assertFalse(arbiter.submit(CAMERA_SOURCE, 60, 60, 0.1, now=1.2))
+        self.assertEqual(arbiter.active_source, SERIAL_SOURCE)
+        self.assertEqual(arbiter.stats()["failovers"], 1)  # Preempted, not failed over
+        self.assertEqual(self.registry.values_snapshot()["input_failovers_total"], 1)
+        self.assertEqual(self.registry.values_snapshot()['input_active_source{source="camera"}'], 0)
+
+    def test_sticky_policy_keeps_the_active_source_while_it_is_fresh(self):
+        arbiter = InputArbiter(policy=STICKY_POLICY, freshness_timeout=0.5)
+        arbiter.submit(CAMERA_SOURCE, 50, 50, 0.1, now=0.0)
+
+        self.assertFalse(arbiter.submit(SERIAL_SOURCE, 10, 10, 0.2, now=0.3))
+        self.assertTrue(arbiter.submit(CAMERA_SOURCE, 51, 51, 0.1, now=0.4))
+        self.assertTrue(arbiter.submit(SERIAL_SOURCE, 11, 11, 0.2, now=1.0))
+        self.assertEqual(arbiter.active_source, SERIAL_SOURCE)
+
+    def test_latest_policy_accepts_every_source(self):
+        arbiter = InputArbiter(policy=LATEST_POLICY, priority=[SERIAL_SOURCE, CAMERA_SOURCE])
+
+        self.assertTrue(arbiter.submit(SERIAL_SOURCE, 10, 10, 0.2, now=0.0))
+        self.assertTrue(arbiter.submit(CAMERA_SOURCE, 50, 50, 0.1, now=0.0))
+
+        self.assertEqual(arbiter.take(0).source, CAMERA_SOURCE)
+        self.assertEqual(self.counts(arbiter, SERIAL_SOURCE)[SUPERSEDED], 1)
+
+    def test_waiting_target_is_replaced_by_the_newest(self):
+        arbiter = InputArbiter()
+        for x in (1, 2, 3):
+            arbiter.submit(SERIAL_SOURCE, x, x, 0.2, now=0.0)
+
+        self.assertEqual(arbiter.take(0).x, 3)
+        self.assertIsNone(arbiter.take(0))
+        self.assertEqual(self.counts(arbiter, SERIAL_SOURCE), {ACCEPTED: 3, OVERRIDDEN: 0, SUPERSEDED: 2})
+
+    @patch("app.arbitration.viewport_size", return_value=(1920, 1080))
+    def test_targets_of_the_active_source_are_predicted(self, mock_viewport_size):
+        arbiter = InputArbiter()
+        arbiter.set_predictor(VelocityPredictor(window=4))
+        for index in range(6):
+            arbiter.submit(SERIAL_SOURCE, 100 + 2 * index, 500, 0.2, now=index / 250)
+
+        target = arbiter.take(0)
+        self.assertEqual(arbiter.aim(target), (110 + int(500 * arbiter.predictor.horizon()), 500))
+        self.assertEqual(arbiter.predictor.last_outcome, EXTRAPOLATED)
+        self.assertEqual(self.registry.values_snapshot()['cursor_predictions_total{outcome="extrapolated"}'], 1)
+
+        arbiter.submit(CAMERA_SOURCE, 900, 900, 0.1, now=10.0)  # Fails over, the serial velocity no longer applies
+        self.assertEqual(arbiter.aim(arbiter.take(0)), (900, 900))
+        self.assertEqual(arbiter.predictor.last_outcome, WARMING_UP)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            InputArbiter(policy="loudest")
+
+    def test_parse_source_priority(self):
+        self.assertEqual(parse_source_priority("camera, serial"), [CAMERA_SOURCE, SERIAL_SOURCE])
+        for value in ("", "serial,serial", "serial,mouse"):
+            with self.subTest(value=value), self.assertRaises(argparse.ArgumentTypeError):
+                parse_source_priority(value)
+
+
+class TestActuator(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(stop_actuator)
+        patcher = patch("app.arbitration.metrics", MetricsRegistry())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch("app.window_actions.viewport_size", return_value=(800, 600))
+    @patch("app.window_actions.pyautogui.moveTo")
+    def test_targets_are_moved_to_on_the_actuator_thread(self, mock_move_to, mock_viewport_size):
+        threads = []
+        mock_move_to.side_effect = lambda x, y, speed: threads.append(threading.current_thread().name)
+        trace_buffer.clear()
+
+        begin_sample(SERIAL_SOURCE, time.perf_counter())
+        self.assertTrue(submit_target(SERIAL_SOURCE, 100, 200, 0.2))
+
+        self.assertTrue(wait_until(lambda: trace_buffer.snapshot()))
+        mock_move_to.assert_called_once_with(100, 200, 0.2)
+        self.assertEqual(threads, [ACTUATOR_WORKER])
+        trace = trace_buffer.snapshot()[0]
+        self.assertEqual(trace.outcome, CURSOR_MOVED)
+        self.assertEqual([stage for stage, _started, _ended in trace.spans], [ACTUATOR_WAIT, MOUSE_MOVE])
+
+        stop_actuator()
+        self.assertFalse(supervisor.is_running(ACTUATOR_WORKER))
+        self.assertIsNone(arbiter.pending)
+
+    @patch("app.arbitration.viewport_size", return_value=(800, 600))
+    @patch("app.window_actions.viewport_size", return_value=(800, 600))
+    @patch("app.window_actions.pyautogui.moveTo")
+    def test_latency_is_measured_up_to_the_move_command(self, mock_move_to, *mock_viewport_sizes):
+        mock_move_to.side_effect = lambda x, y, speed: time.sleep(speed)  # The tween blocks for its duration
+        predictor = VelocityPredictor()
+        predictor.record_latency = Mock()
+        arbiter.set_predictor(predictor)
+        self.addCleanup(arbiter.set_predictor, None)
+
+        submit_target(SERIAL_SOURCE, 100, 200, 0.2)
+
+        self.assertTrue(wait_until(lambda: mock_move_to.called))
+        predictor.record_latency.assert_called_once()
+        self.assertLess(predictor.record_latency.call_args[0][0], 0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import csv
+import io
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+
+import cv2
+import cv2.aruco as aruco
+import numpy as np
+
+from app.batch import BatchReport, FrameResult, batch_main, decode_frames, write_results
+
+
+def draw_id_strip(marker_ids, marker_size=80, margin=40):
+    aruco_dict = aruco.getPredefinedDictionary(aruco.DICT_6X6_100)
+    width = margin + len(marker_ids) * (marker_size + margin)
+    frame = np.full((marker_size + 2 * margin, width), 255, dtype=np.uint8)
+    for index, marker_id in enumerate(marker_ids):
+        marker = np.zeros((marker_size, marker_size), dtype=np.uint8)
+        aruco.drawMarker(aruco_dict, marker_id, marker_size, marker, 1)
+        x = margin + index * (marker_size + margin)
+        frame[margin:margin + marker_size, x:x + marker_size] = marker
+    return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.addCleanup(logging.getLogger().setLevel, logging.getLogger().level)
+        self.frames_dir = os.path.join(self.temp_dir.name, "frames")
+        os.mkdir(self.frames_dir)
+        cv2.imwrite(os.path.join(self.frames_dir, "0.png"), draw_id_strip([1, 2, 3, 4]))
+        cv2.imwrite(os.path.join(self.frames_dir, "1.png"), draw_id_strip([12, 34, 5, 6]))
+        cv2.imwrite(os.path.join(self.frames_dir, "2.png"), draw_id_strip([7, 8, 9]))
+
+    def test_decode_frames(self):
+        results, report = decode_frames(self.frames_dir)
+
+        self.assertEqual([(result.x, result.y) for result in results], [(102, 304), (1234, 506), (None, None)])
+        self.assertEqual(results[2].marker_ids, [7, 8, 9])
+        self.assertEqual(report.frames, 3)
+        self.assertEqual(report.decoded_frames, 2)
+        self.assertAlmostEqual(report.success_rate, 2 / 3)
+        self.assertGreater(report.frames_per_second, 0)
+
+    def test_batch_report_without_frames(self):
+        report = BatchReport(0, 0, 0.0)
+        self.assertEqual(report.frames_per_second, 0.0)
+        self.assertEqual(report.success_rate, 0.0)
+
+    def test_write_results_csv(self):
+        path = os.path.join(self.temp_dir.name, "results.csv")
+        write_results([FrameResult(0, [1, 2, 3, 4], 102, 304), FrameResult(1, [], None, None)], path)
+
+        with open(path, newline="") as csv_file:
+            rows = list(csv.reader(csv_file))
+        self.assertEqual(rows, [
+            ["frame_index", "marker_ids", "x", "y", "decoded"],
+            ["0", "1 2 3 4", "102", "304", "1"],
+            ["1", "", "", "", "0"],
+        ])
+
+    def test_write_results_npz(self):
+        path = os.path.join(self.temp_dir.name, "results.npz")
+        write_results([FrameResult(0, [1, 2, 3, 4], 102, 304), FrameResult(1, [7], None, None)], path)
+
+        with np.load(path) as data:
+            np.testing.assert_array_equal(data["marker_ids"], [[1, 2, 3, 4], [7, -1, -1, -1]])
+            np.testing.assert_array_equal(data["x"], [102, -1])
+            np.testing.assert_array_equal(data["decoded"], [True, False])
+
+    def test_batch_main(self):
+        path = os.path.join(self.temp_dir.name, "results.csv")
+        output = io.StringIO()
+        with redirect_stdout(output):
+            exit_code = batch_main([self.frames_dir, "--output", path])
+
+        self.assertEqual(exit_code, 0)
+        self.assertTrue(os.path.exists(path))
+        self.assertIn("3 frames", output.getvalue())
+        self.assertIn("66.7%", output.getvalue())
+
+    def test_batch_main_with_missing_source(self):
+        with redirect_stderr(io.StringIO()):
+            exit_code = batch_main([os.path.join(self.temp_dir.name, "missing.avi")])
+        self.assertEqual(exit_code, 1)
+
+    def test_batch_help_lists_the_batch_arguments(self):
+        # In a new process, so the options read while the modules are imported see --help too
+        result = subprocess.run([sys.executable, "-m", "app.batch", "--help"], capture_output=True, text=True,
+                                timeout=60)
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("Decode ArUco marker coordinates from recorded frames.", result.stdout)
+        for argument in ("source", "--output", "--dictionary", "--verbose"):
+            self.assertIn(argument, result.stdout)
+
+
+if __name__ == "__main__":
+    unittest.main()
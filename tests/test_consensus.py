@@ -0,0 +1,69 @@
+import unittest
+from unittest.mock import Mock
+
+from app.consensus import ConsensusDecoder
+from app.video_capture import convert_aruco_marker_ids_to_coordinates
+
+
+class TestConsensusDecoder(unittest.TestCase):
+    def setUp(self):
+        self.convert = Mock(side_effect=convert_aruco_marker_ids_to_coordinates)
+        self.decoder = ConsensusDecoder(self.convert, window_size=5, min_agreement=3)
+
+    def test_emits_coordinate_once_enough_frames_agree(self):
+        results = [self.decoder.update([1, 2, 3, 4]) for _ in range(3)]
+
+        self.assertEqual([result.changed for result in results], [False, False, True])
+        self.assertEqual((results[2].x, results[2].y), (102, 304))
+        self.assertAlmostEqual(results[2].confidence, 0.6)
+
+    def test_unchanged_frames_do_not_emit_again(self):
+        results = [self.decoder.update([1, 2, 3, 4]) for _ in range(10)]
+
+        self.assertEqual(sum(result.changed for result in results), 1)
+        self.convert.assert_called_once_with([1, 2, 3, 4])
+        self.assertEqual(results[-1].confidence, 1.0)
+
+    def test_single_misdetected_frame_is_ignored(self):
+        for _ in range(4):
+            self.decoder.update([1, 2, 3, 4])
+
+        glitch = self.decoder.update([9, 2, 3, 4])
+        missing = self.decoder.update([1, 2, 3])
+
+        self.assertFalse(glitch.changed)
+        self.assertFalse(missing.changed)
+        self.assertEqual((missing.x, missing.y), (102, 304))
+        self.assertAlmostEqual(missing.confidence, 0.6)
+
+    def test_switches_to_new_coordinate_when_it_becomes_stable(self):
+        for _ in range(5):
+            self.decoder.update([1, 2, 3, 4])
+
+        results = [self.decoder.update([5, 6, 7, 8]) for _ in range(3)]
+
+        self.assertEqual([result.changed for result in results], [False, False, True])
+        self.assertEqual((results[2].x, results[2].y), (506, 708))
+
+    def test_no_coordinate_without_valid_frames(self):
+        for _ in range(6):
+            result = self.decoder.update([])
+
+        self.assertEqual((result.x, result.y, result.confidence, result.changed), (None, None, 0.0, False))
+        self.convert.assert_not_called()
+
+    def test_reset_forgets_stable_coordinate(self):
+        for _ in range(3):
+            self.decoder.update([1, 2, 3, 4])
+        self.decoder.reset()
+
+        result = self.decoder.update([1, 2, 3, 4])
+        self.assertEqual((result.x, result.y, result.changed), (None, None, False))
+
+    def test_rejects_invalid_agreement(self):
+        with self.assertRaises(ValueError):
+            ConsensusDecoder(self.convert, window_size=3, min_agreement=4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from argparse import Namespace
+from unittest.mock import Mock, patch
+
+from app import daemon
+from app.daemon import (
+    OverlayDisabledCommand,
+    create_command_parser,
+    daemon_main,
+    parse_daemon_args,
+    request_stop,
+    run_until_stopped,
+)
+from app.serial import CALIBRATION_REQUIRED, CalibrationRequiredCommand
+
+
+class TestDaemon(unittest.TestCase):
+    def write_config(self, config):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "daemon.json")
+        with open(path, "w") as config_file:
+            json.dump(config, config_file)
+        return path
+
+    def test_parse_daemon_args_command_line_overrides_config(self):
+        path = self.write_config({"serial-port": "/dev/ttyUSB0", "baud_rate": 115200, "camera": "0"})
+
+        args = parse_daemon_args(["--config", path, "--camera", "recording.avi", "--log-level", "video=DEBUG"])
+
+        self.assertEqual(args.serial_port, "/dev/ttyUSB0")
+        self.assertEqual(args.baud_rate, 115200)
+        self.assertEqual(args.camera, "recording.avi")
+        self.assertEqual(args.log_level, {"video": logging.DEBUG})
+        self.assertFalse(args.overlay)
+
+    def test_parse_daemon_args_validates_config(self):
+        path = self.write_config({"camera": "0", "log_level": "DEBUG", "input_policy": "latest"})
+        args = parse_daemon_args(["--config", path])
+        self.assertEqual(args.log_level, {None: logging.DEBUG})
+        self.assertEqual(args.input_policy, "latest")
+
+        for config in ({"camera": "0", "profile": "gpu"}, {"camera": "0", "input_policy": "loudest"},
+                       {"camera": "0", "log_level": "LOUD"}, {"camera": "0", "camra": "1"}):
+            with self.subTest(config=config), patch("sys.stderr"), self.assertRaises(SystemExit):
+                parse_daemon_args(["--config", self.write_config(config)])
+
+    def test_daemon_help_lists_the_daemon_options(self):
+        # In a new process, so the options read while the modules are imported see --help too
+        result = subprocess.run([sys.executable, "-m", "app.daemon", "--help"], capture_output=True, text=True,
+                                timeout=60)
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        for option in ("--config", "--serial-port", "--cameras", "--network-input", "--metrics-file",
+                       "--record-session", "--input-policy"):
+            self.assertIn(option, result.stdout)
+
+    def test_parse_daemon_args_needs_an_input(self):
+        with patch("sys.stderr"), self.assertRaises(SystemExit):
+            parse_daemon_args([])
+        with patch("sys.stderr"), self.assertRaises(SystemExit):
+            parse_daemon_args(["--config", os.path.join(tempfile.gettempdir(), "missing-daemon.json")])
+
+    def test_parse_daemon_args_cameras(self):
+        path = self.write_config({"cameras": ["0", "recording.avi"]})
+
+        self.assertEqual(parse_daemon_args(["--config", path]).cameras, ["0", "recording.avi"])
+        self.assertEqual(parse_daemon_args(["--cameras", "0", "1"]).cameras, ["0", "1"])
+        with patch("sys.stderr"), self.assertRaises(SystemExit):
+            parse_daemon_args(["--camera", "0", "--cameras", "1", "2"])
+
+    def test_parse_daemon_args_network_input(self):
+        path = self.write_config({"network-input": "tcp://0.0.0.0:7000"})
+
+        self.assertEqual(parse_daemon_args(["--config", path]).network_input, ("tcp", "0.0.0.0", 7000))
+        self.assertEqual(parse_daemon_args(["--network-input", "udp://:5555"]).network_input, ("udp", "127.0.0.1", 5555))
+        with patch("sys.stderr"), self.assertRaises(SystemExit):
+            parse_daemon_args(["--config", self.write_config({"network-input": "localhost:7000"})])
+
+    def test_command_parser_without_overlay_ignores_calibration(self):
+        with patch("app.serial.run_on_ui_thread") as mock_run_on_ui_thread:
+            self.assertTrue(create_command_parser(overlay=False).parse(CALIBRATION_REQUIRED))
+        mock_run_on_ui_thread.assert_not_called()
+        self.assertIsInstance(create_command_parser(overlay=True).commands[1], CalibrationRequiredCommand)
+        self.assertFalse(OverlayDisabledCommand(CALIBRATION_REQUIRED).matches("[1,2]"))
+
+    def test_run_until_stopped_writes_metrics_until_signalled(self):
+        args = Namespace(metrics_interval=0.001, metrics_file="metrics.prom")
+        export_metrics = Mock()
+        export_metrics.side_effect = lambda path: export_metrics.call_count == 3 and request_stop()
+        daemon.stop_event.clear()
+        with patch("app.daemon.export_metrics", export_metrics):
+            run_until_stopped(args)
+
+        self.assertEqual(export_metrics.call_count, 3)
+        export_metrics.assert_called_with("metrics.prom")
+
+    @patch("app.daemon.signal.signal")
+    @patch("app.daemon.run_until_stopped")
+    @patch("app.daemon.stop_video_capture")
+    @patch("app.daemon.disconnect_from_serial")
+    @patch("app.daemon.start_video_thread")
+    @patch("app.daemon.start_serial_thread", return_value=True)
+    def test_daemon_main_runs_without_tk(self, mock_start_serial_thread, mock_start_video_thread,
+                                         mock_disconnect, mock_stop_video_capture, mock_run_until_stopped,
+                                         mock_signal):
+        root_logger = logging.getLogger()
+        self.addCleanup(root_logger.setLevel, root_logger.level)
+        with tempfile.TemporaryDirectory() as directory, patch("app.daemon.tk.Tk") as mock_tk:
+            metrics_file = os.path.join(directory, "metrics.json")
+            exit_code = daemon_main(["--serial-port", "COM1", "--camera", "0", "--metrics-file", metrics_file])
+            self.assertTrue(os.path.exists(metrics_file))
+
+        self.assertEqual(exit_code, 0)
+        mock_tk.assert_not_called()
+        self.assertEqual(mock_start_serial_thread.call_args[0][:2], ("COM1", 9600))
+        mock_start_video_thread.assert_called_once_with("0", None)
+        mock_run_until_stopped.assert_called_once()
+        self.assertEqual(mock_signal.call_count, 2)
+        mock_signal.assert_any_call(daemon.signal.SIGTERM, request_stop)
+        mock_disconnect.assert_called_once()
+        mock_stop_video_capture.assert_called_once()
+
+    @patch("app.daemon.signal.signal")
+    @patch("app.daemon.run_until_stopped")
+    @patch("app.daemon.stop_video_capture")
+    @patch("app.daemon.disconnect_from_serial")
+    @patch("app.daemon.start_serial_thread", return_value=False)
+    def test_daemon_main_fails_when_serial_cannot_connect(self, mock_start_serial_thread, mock_disconnect,
+                                                          mock_stop_video_capture, mock_run_until_stopped,
+                                                          mock_signal):
+        root_logger = logging.getLogger()
+        self.addCleanup(root_logger.setLevel, root_logger.level)
+
+        self.assertEqual(daemon_main(["--serial-port", "COM1"]), 1)
+        mock_run_until_stopped.assert_not_called()
+        mock_disconnect.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch, Mock
+
+import cv2
+import numpy as np
+
+from app.frame_sources import (
+    CameraFrameSource,
+    ImageDirectoryFrameSource,
+    VideoFileFrameSource,
+    open_frame_source,
+)
+
+
+class TestFrameSources(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def write_images(self, count):
+        for index in range(count):
+            frame = np.full((20, 30, 3), index, dtype=np.uint8)
+            cv2.imwrite(os.path.join(self.temp_dir.name, f"frame_{index:03d}.png"), frame)
+
+    @patch("cv2.VideoCapture")
+    def test_camera_frame_source_sets_capture_resolution(self, mock_video_capture):
+        mock_cap = Mock()
+        mock_video_capture.return_value = mock_cap
+
+        source = CameraFrameSource(2)
+
+        mock_video_capture.assert_called_once_with(2)
+        mock_cap.set.assert_any_call(cv2.CAP_PROP_FRAME_WIDTH, 1920)
+        mock_cap.set.assert_any_call(cv2.CAP_PROP_FRAME_HEIGHT, 1080)
+        self.assertTrue(source.is_live)
+
+    @patch("cv2.VideoCapture")
+    def test_camera_frame_source_reports_the_size_it_delivers(self, mock_video_capture):
+        sizes = {cv2.CAP_PROP_FRAME_WIDTH: 1280.0, cv2.CAP_PROP_FRAME_HEIGHT: 720.0}
+        mock_video_capture.return_value.get.side_effect = lambda prop: sizes.get(prop, 0.0)
+
+        self.assertEqual(CameraFrameSource(2).frame_size(), (1280, 720))
+        sizes.clear()
+        self.assertIsNone(CameraFrameSource(2).frame_size())  # Backend without the properties
+
+    def test_image_directory_frame_source_reads_in_name_order(self):
+        self.write_images(3)
+        with open(os.path.join(self.temp_dir.name, "notes.txt"), "w") as notes:
+            notes.write("not an image")
+
+        source = ImageDirectoryFrameSource(self.temp_dir.name)
+        self.assertTrue(source.is_opened())
+        self.assertEqual(source.frame_count(), 3)
+
+        pixels = []
+        while True:
+            ret, frame = source.read()
+            if not ret:
+                break
+            pixels.append(int(frame[0, 0, 0]))
+        self.assertEqual(pixels, [0, 1, 2])
+
+        source.release()
+        self.assertFalse(source.is_opened())
+
+    def test_video_file_frame_source_reads_recording(self):
+        path = os.path.join(self.temp_dir.name, "recording.avi")
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (32, 24))
+        for _ in range(5):
+            writer.write(np.zeros((24, 32, 3), dtype=np.uint8))
+        writer.release()
+
+        source = open_frame_source(path)
+        self.assertIsInstance(source, VideoFileFrameSource)
+        self.assertFalse(source.is_live)
+        frames = 0
+        while source.read()[0]:
+            frames += 1
+        self.assertEqual(source.frame_size(), (32, 24))
+        source.release()
+        self.assertEqual(frames, 5)
+
+    @patch("app.frame_sources.CameraFrameSource")
+    def test_open_frame_source_dispatches_on_source_type(self, mock_camera_frame_source):
+        open_frame_source("1")
+        mock_camera_frame_source.assert_called_once_with(1)
+
+        self.write_images(1)
+        self.assertIsInstance(open_frame_source(self.temp_dir.name), ImageDirectoryFrameSource)
+
+    def test_open_frame_source_raises_when_source_cannot_be_opened(self):
+        with self.assertRaises(IOError):
+            open_frame_source(self.temp_dir.name)  # empty directory
+        with self.assertRaises(IOError):
+            open_frame_source(os.path.join(self.temp_dir.name, "missing.avi"))
+
+
+if __name__ == "__main__":
+    unittest.main()
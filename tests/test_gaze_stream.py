@@ -0,0 +1,164 @@
+import os
+import subprocess
+import sys
+import unittest
+import uuid
+from multiprocessing import shared_memory
+from unittest.mock import patch
+
+import numpy as np
+
+import app.gaze_stream
+from app.gaze_stream import (
+    GazePublisher,
+    GazeStreamReader,
+    gaze_stream_requested,
+    publish_gaze_sample,
+    source_name,
+    start_gaze_stream,
+    stop_gaze_stream,
+)
+from app.serial import CoordinateCommand
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestGazeStream(unittest.TestCase):
+    def setUp(self):
+        self.name = f"test-gaze-{uuid.uuid4().hex[:12]}"
+
+    def create_publisher(self, capacity=8):
+        publisher = GazePublisher(self.name, capacity)
+        self.addCleanup(publisher.close)
+        return publisher
+
+    def test_samples_are_read_in_order(self):
+        publisher = self.create_publisher()
+        publisher.publish(10, 20, "serial", timestamp=1.5)
+        publisher.publish(30.5, 40, "camera", 0.75, timestamp=2.5)
+
+        reader = GazeStreamReader(self.name, from_start=True)
+        samples = reader.read()
+
+        self.assertEqual(samples["sequence"].tolist(), [0, 1])
+        self.assertEqual(samples["timestamp"].tolist(), [1.5, 2.5])
+        self.assertEqual(samples["x"].tolist(), [10, 30.5])
+        self.assertEqual(samples["y"].tolist(), [20, 40])
+        self.assertEqual(samples["confidence"].tolist(), [1.0, 0.75])
+        self.assertEqual([source_name(code) for code in samples["source"]], ["serial", "camera"])
+        self.assertTrue(np.shares_memory(samples, reader.records))
+        self.assertTrue(reader.intact())
+        self.assertEqual(len(reader.read()), 0)
+        del samples
+        reader.close()
+
+    def test_reader_starts_at_the_newest_sample(self):
+        publisher = self.create_publisher()
+        publisher.publish(1, 1, "serial")
+        reader = GazeStreamReader(self.name)
+
+        self.assertEqual(len(reader.read()), 0)
+        self.assertEqual(int(reader.latest()["x"]), 1)
+        publisher.publish(2, 2, "serial")
+        self.assertEqual(reader.read()["x"].tolist(), [2])
+        reader.close()
+
+    def test_read_wraps_around_the_ring(self):
+        publisher = self.create_publisher(capacity=8)
+        reader = GazeStreamReader(self.name)
+        for index in range(5):
+            publisher.publish(index, 0, "network")
+        self.assertEqual(len(reader.read()), 5)
+
+        for index in range(5, 11):
+            publisher.publish(index, 0, "network")
+
+        self.assertEqual(reader.read()["x"].tolist(), [5, 6, 7])
+        self.assertEqual(reader.read()["x"].tolist(), [8, 9, 10])
+        self.assertEqual(reader.lost, 0)
+        reader.close()
+
+    def test_slow_reader_loses_the_oldest_samples(self):
+        publisher = self.create_publisher(capacity=8)
+        reader = GazeStreamReader(self.name)
+        samples = reader.read()
+
+        for index in range(20):
+            publisher.publish(index, 0, "camera")
+        self.assertTrue(reader.intact())  # Nothing was returned by the last read
+        samples = reader.read()
+        self.assertEqual(samples["sequence"].tolist(), [13, 14, 15])
+        self.assertEqual(reader.lost, 13)
+        self.assertTrue(reader.intact())
+
+        for index in range(20, 26):
+            publisher.publish(index, 0, "camera")
+        self.assertFalse(reader.intact())
+        del samples
+        reader.close()
+
+    def test_stream_is_readable_from_another_process(self):
+        publisher = self.create_publisher()
+        for index in range(3):
+            publisher.publish(index, index * 2, "serial")
+        code = (
+            "from app.gaze_stream import GazeStreamReader\n"
+            f"reader = GazeStreamReader({self.name!r}, from_start=True)\n"
+            "samples = reader.read().copy()\n"
+            "print(samples['y'].tolist(), reader.intact())\n"
+        )
+
+        result = subprocess.run([sys.executable, "-c", code], cwd=ROOT_DIR, capture_output=True, text=True, timeout=60)
+
+        self.assertEqual(result.stdout.strip(), "[0.0, 2.0, 4.0] True", result.stderr)
+        publisher.publish(3, 6, "serial")  # Still mapped after the reader process exited
+
+    def test_unknown_shared_memory_is_rejected(self):
+        memory = shared_memory.SharedMemory(name=self.name, create=True, size=128)
+        self.addCleanup(memory.unlink)
+        self.addCleanup(memory.close)
+
+        with self.assertRaises(ValueError):
+            GazeStreamReader(self.name)
+
+    def test_stale_stream_is_replaced(self):
+        stale = GazePublisher(self.name)
+        stale.publish(1, 1, "serial")
+        stale.memory = None  # As if the process had died without unlinking it
+
+        with self.assertLogs("app.gaze_stream", "WARNING"):
+            publisher = self.create_publisher()
+
+        reader = GazeStreamReader(self.name)
+        self.assertEqual(reader.write_count(), 0)
+        reader.close()
+        self.assertEqual(publisher.capacity, 8)
+
+    def test_gaze_stream_requested(self):
+        self.assertIsNone(gaze_stream_requested([]))
+        self.assertEqual(gaze_stream_requested(["--gaze-stream"]), "eye-tracker-gaze")
+        self.assertEqual(gaze_stream_requested(["--gaze-stream", "lab"]), "lab")
+
+    @patch("app.serial.submit_target")
+    def test_coordinate_commands_are_published(self, mock_submit_target):
+        publish_gaze_sample(1, 1, "serial")  # Nothing to publish to
+
+        self.assertTrue(start_gaze_stream(self.name))
+        self.addCleanup(stop_gaze_stream)
+        reader = GazeStreamReader(self.name)
+        CoordinateCommand().execute("[100,200]")
+
+        samples = reader.read()
+        self.assertEqual((samples["x"].tolist(), samples["y"].tolist()), ([100], [200]))
+        self.assertEqual(source_name(samples["source"][0]), "serial")
+        mock_submit_target.assert_called_once_with("serial", 100, 200, 0.2)
+        del samples
+        reader.close()
+
+        stop_gaze_stream()
+        self.assertIsNone(app.gaze_stream.gaze_publisher)
+        publish_gaze_sample(1, 1, "serial")
+
+
+if __name__ == "__main__":
+    unittest.main()
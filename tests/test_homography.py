@@ -0,0 +1,115 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+
+from app.homography import (
+    HomographyCalibrator,
+    ScreenHomography,
+    calibration_marker_screen_corners,
+    match_marker_corners,
+)
+from app.video_capture import detect_aruco_marker_corners
+from app.window_actions import compose_aruco_marker_overlay, get_overlay_marker_size
+
+SCREEN_SIZE = (1280, 720)
+# Camera view of the screen: shrunk, shifted and slightly tilted
+SCREEN_TO_CAMERA = np.array([[0.7, 0.05, 120.0], [-0.03, 0.72, 60.0], [0.00002, 0.00004, 1.0]])
+
+
+def camera_frame_of_overlay(screen_to_camera=SCREEN_TO_CAMERA):
+    overlay = compose_aruco_marker_overlay(*SCREEN_SIZE, marker_size=get_overlay_marker_size(*SCREEN_SIZE),
+                                           background=(255, 255, 255))
+    return cv2.warpPerspective(overlay, screen_to_camera, SCREEN_SIZE, borderValue=(40, 40, 40))
+
+
+def project(points, matrix):
+    return cv2.perspectiveTransform(np.asarray(points, np.float32).reshape(-1, 1, 2), matrix).reshape(-1, 2)
+
+
+class TestHomography(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.path = os.path.join(temp_dir.name, "homography.json")
+        patcher = patch("app.window_actions.marker_cache_dir", temp_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_calibrator_solves_from_one_overlay_frame(self):
+        calibrator = HomographyCalibrator(SCREEN_SIZE, self.path)
+        self.assertIsNone(calibrator.map_point(0, 0))
+
+        corners = detect_aruco_marker_corners(camera_frame_of_overlay())
+        self.assertEqual(len(corners), 9)
+        self.assertTrue(calibrator.update(corners))
+        self.assertLess(calibrator.last_error, 2.0)
+
+        for screen_point in [(640, 360), (100, 650), (1200, 80)]:
+            with self.subTest(screen_point=screen_point):
+                camera_x, camera_y = project([screen_point], SCREEN_TO_CAMERA)[0]
+                mapped = calibrator.map_point(camera_x, camera_y)
+                np.testing.assert_allclose(mapped, screen_point, atol=3)
+
+    def test_calibration_is_persisted_and_reused(self):
+        calibrator = HomographyCalibrator(SCREEN_SIZE, self.path)
+        calibrator.update(detect_aruco_marker_corners(camera_frame_of_overlay()))
+        with open(self.path) as homography_file:
+            self.assertEqual(json.load(homography_file)["screen_size"], list(SCREEN_SIZE))
+
+        reloaded = HomographyCalibrator(SCREEN_SIZE, self.path)
+        self.assertIsNotNone(reloaded.homography)
+        np.testing.assert_allclose(reloaded.homography.matrix, calibrator.homography.matrix)
+
+        other_screen = HomographyCalibrator((1920, 1080), self.path)
+        self.assertIsNone(other_screen.homography)
+
+    def test_resolves_only_when_error_drifts(self):
+        screen_corners = calibration_marker_screen_corners(*SCREEN_SIZE)
+        calibrator = HomographyCalibrator(SCREEN_SIZE, self.path, max_error=5.0)
+        camera_corners = {marker_id: project(corners, SCREEN_TO_CAMERA) for marker_id, corners in screen_corners.items()}
+        self.assertTrue(calibrator.update(camera_corners))
+
+        self.assertFalse(calibrator.update(camera_corners))
+        self.assertTrue(calibrator.update(camera_corners, force=True))
+        self.assertEqual(calibrator.solves, 2)
+
+        moved_camera = SCREEN_TO_CAMERA.copy()
+        moved_camera[0, 2] += 40
+        moved_corners = {marker_id: project(corners, moved_camera) for marker_id, corners in screen_corners.items()}
+        self.assertTrue(calibrator.update(moved_corners))
+        self.assertEqual(calibrator.solves, 3)
+        self.assertLess(calibrator.last_error, 1.0)
+
+    def test_update_needs_enough_markers(self):
+        screen_corners = calibration_marker_screen_corners(*SCREEN_SIZE)
+        calibrator = HomographyCalibrator(SCREEN_SIZE, self.path)
+        self.assertFalse(calibrator.update({marker_id: screen_corners[marker_id] for marker_id in (1, 2, 3)}))
+        self.assertIsNone(calibrator.homography)
+
+    def test_map_points_is_vectorized_and_map_point_clamps(self):
+        homography = ScreenHomography(np.eye(3), SCREEN_SIZE)
+        np.testing.assert_allclose(homography.map_points([[1, 2], [3, 4]]), [[1, 2], [3, 4]])
+        self.assertEqual(homography.map_point(-10, 5000), (0, 719))
+
+    def test_match_marker_corners(self):
+        screen_corners = calibration_marker_screen_corners(*SCREEN_SIZE)
+        camera_points, screen_points, count = match_marker_corners({5: screen_corners[5], 42: np.zeros((4, 2))},
+                                                                   screen_corners)
+        self.assertEqual(count, 1)
+        self.assertEqual(camera_points.shape, (4, 2))
+        np.testing.assert_array_equal(screen_points, screen_corners[5])
+
+        self.assertEqual(match_marker_corners({}, screen_corners)[2], 0)
+
+    def test_solve_needs_four_points(self):
+        with self.assertRaises(ValueError):
+            ScreenHomography.solve(np.zeros((3, 2), np.float32), np.zeros((3, 2), np.float32), SCREEN_SIZE)
+
+
+if __name__ == "__main__":
+    unittest.main()
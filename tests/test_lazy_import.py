@@ -0,0 +1,40 @@
+import sys
+import unittest
+from unittest.mock import patch
+
+from app.lazy_import import LazyModule, is_loaded, lazy_import
+
+
+class TestLazyImport(unittest.TestCase):
+    def test_lazy_import_returns_already_imported_module(self):
+        import json
+        self.assertIs(lazy_import("json"), json)
+
+    def test_lazy_import_defers_unloaded_module(self):
+        with patch.dict(sys.modules):
+            sys.modules.pop("colorsys", None)
+            self.assertIsInstance(lazy_import("colorsys"), LazyModule)
+            self.assertFalse(is_loaded("colorsys"))
+
+    def test_lazy_module_imports_on_first_attribute_access(self):
+        with patch.dict(sys.modules):
+            sys.modules.pop("colorsys", None)
+            module = LazyModule("colorsys")
+            self.assertFalse(is_loaded("colorsys"))
+            self.assertIn("not loaded", repr(module))
+
+            self.assertEqual(module.rgb_to_hsv(1.0, 0.0, 0.0), (0.0, 1.0, 1.0))
+            self.assertTrue(is_loaded("colorsys"))
+            self.assertIn("(loaded)", repr(module))
+
+    def test_lazy_module_forwards_patching_to_real_module(self):
+        module = LazyModule("colorsys")
+        import colorsys
+        with patch.object(module, "rgb_to_hsv", return_value="patched"):
+            self.assertEqual(colorsys.rgb_to_hsv(1.0, 0.0, 0.0), "patched")
+            self.assertEqual(module.rgb_to_hsv(1.0, 0.0, 0.0), "patched")
+        self.assertEqual(colorsys.rgb_to_hsv(1.0, 0.0, 0.0), (0.0, 1.0, 1.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,62 @@
 import unittest
 from argparse import Namespace
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
-from app.localization import setup_localization
+from app import localization
+from app.localization import (
+    is_message,
+    load_translation,
+    reset_localization,
+    retranslate_text,
+    retranslate_widgets,
+    set_language,
+    setup_localization,
+)
+
+
+class FakeWidget:
+    """
+    Stand-in for a Tk widget with a text option and children.
+    """
+
+    def __init__(self, widget_class="Label", text="", children=(), textvariable=""):
+        self.widget_class = widget_class
+        self.options = {"text": text, "textvariable": textvariable}
+        self.children = list(children)
+        self.window_title = text
+
+    def winfo_children(self):
+        return self.children
+
+    def winfo_class(self):
+        return self.widget_class
+
+    def keys(self):
+        return list(self.options)
+
+    def cget(self, option):
+        return self.options[option]
+
+    def configure(self, **options):
+        self.options.update(options)
+
+    def title(self, text=None):
+        if text is None:
+            return self.window_title
+        self.window_title = text
 
 
 class TestLocalization(unittest.TestCase):
+    def setUp(self):
+        self.language = localization.current_language
+        reset_localization()
+        self.addCleanup(self.restore_language)
+
+    def restore_language(self):
+        reset_localization()
+        with patch("app.localization.requested_language", return_value=self.language or "en"):
+            setup_localization()
+
     @patch("app.localization.argparse.ArgumentParser.parse_known_args")
     def test_setup_localization_returns_correct_languages(self, mock_args):
         # Mock the arguments returned from parse_known_args to simulate different languages
@@ -17,11 +68,23 @@ class TestLocalization(unittest.TestCase):
 
         # Change the mocked language to 'zh'
         mock_args.return_value = (Namespace(lang="zh"), [])
+        reset_localization()
         _, lang = setup_localization()
 
         # Test if the returned language is 'zh'
         self.assertEqual(lang, "zh")
 
+    @patch("app.localization.argparse.ArgumentParser.parse_known_args")
+    def test_setup_localization_runs_once(self, mock_args):
+        mock_args.return_value = (Namespace(lang="zh"), [])
+        first_translate, _ = setup_localization()
+        mock_args.return_value = (Namespace(lang="en"), [])
+        second_translate, lang = setup_localization()
+
+        self.assertEqual(lang, "zh")
+        self.assertIs(first_translate, second_translate)
+        mock_args.assert_called_once()
+
     @patch("app.localization.gettext.translation")
     def test_setup_localization_valid_directory(self, mock_translation):
         # Imagine this is your valid translation object with the gettext method
@@ -37,6 +100,51 @@ class TestLocalization(unittest.TestCase):
         # Test if the translation returns expected translated text
         self.assertEqual(translation_function("input text"), "translated text")
 
+    def test_set_language_loads_each_catalog_once(self):
+        translate, _ = setup_localization()
+        with patch("app.localization.gettext.translation") as mock_translation:
+            mock_translation.side_effect = lambda *args, languages, **kwargs: MagicMock(
+                gettext=lambda message: f"{languages[0]}:{message}")
+            load_translation.cache_clear()
+
+            for lang in ("zh", "en", "zh"):
+                set_language(lang)
+                self.assertEqual(translate("Error"), f"{lang}:Error")
+
+        self.assertEqual(sorted(call.kwargs["languages"][0] for call in mock_translation.call_args_list),
+                         ["en", "zh"])
+
+    def test_retranslate_text(self):
+        set_language("zh")
+        self.assertEqual(retranslate_text("Error", "en"), "错误")
+        self.assertEqual(retranslate_text("COM1", "en"), "COM1")
+        set_language("en")
+        self.assertEqual(retranslate_text("错误", "zh"), "Error")
+
+    def test_is_message_in_any_language(self):
+        set_language("en")
+        self.assertTrue(is_message("No Ports Available", "No Ports Available"))
+        self.assertTrue(is_message("无可用串口", "No Ports Available"))  # Shown before the switch to English
+        self.assertFalse(is_message("COM1", "No Ports Available"))
+        self.assertFalse(is_message("0", "No Video Devices Available"))
+
+    def test_retranslate_widgets(self):
+        label = FakeWidget(text="Restart App")
+        port_name = FakeWidget(text="COM1")
+        option_menu = FakeWidget(widget_class="Menubutton", text="Error", textvariable="PY_VAR0")
+        window = FakeWidget(widget_class="Toplevel", text="Video Capture")
+        root = FakeWidget(widget_class="Tk", text="Eye Tracker App", children=[label, port_name, option_menu, window])
+        set_language("en")
+
+        set_language("zh")
+        changed = retranslate_widgets(root, "en")
+
+        self.assertEqual(label.cget("text"), "重启应用")
+        self.assertEqual(window.title(), "视频采集")
+        self.assertEqual(port_name.cget("text"), "COM1")
+        self.assertEqual(option_menu.cget("text"), "Error")
+        self.assertEqual(changed, 3)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,112 @@
+import argparse
+import logging
+import unittest
+from unittest.mock import Mock
+
+from app.log_policy import (
+    SUBSYSTEM_LOGGERS,
+    LazyMessage,
+    RateLimitFilter,
+    apply_log_levels,
+    lazy_translator,
+    log_levels_requested,
+    parse_log_level,
+)
+
+
+def make_record(msg, *args, name="app.video_capture", level=logging.ERROR):
+    return logging.LogRecord(name, level, __file__, 1, msg, args or None, None)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLogPolicy(unittest.TestCase):
+    def test_lazy_message_translates_only_when_formatted(self):
+        translate = Mock(side_effect=lambda template: template.upper())
+        message = lazy_translator(translate)("received {}: {}", "COM1", "[1,2]")
+
+        translate.assert_not_called()
+        self.assertEqual(str(message), "RECEIVED COM1: [1,2]")
+        translate.assert_called_once_with("received {}: {}")
+
+    def test_lazy_message_is_skipped_below_logger_level(self):
+        translate = Mock(return_value="{}")
+        logger = logging.getLogger("test_log_policy.lazy")
+        logger.setLevel(logging.WARNING)
+        self.addCleanup(logger.setLevel, logging.NOTSET)
+        logger.addHandler(logging.NullHandler())
+
+        logger.info(LazyMessage(translate, "{}", "line"))
+
+        translate.assert_not_called()
+
+    def test_parse_log_level(self):
+        self.assertEqual(parse_log_level("debug"), (None, logging.DEBUG))
+        self.assertEqual(parse_log_level("video=WARNING"), ("video", logging.WARNING))
+        for invalid in ("LOUD", "camera=DEBUG"):
+            with self.subTest(value=invalid):
+                with self.assertRaises(argparse.ArgumentTypeError):
+                    parse_log_level(invalid)
+
+    def test_log_levels_requested(self):
+        levels = log_levels_requested(["--lang", "zh", "--log-level", "WARNING", "--log-level=serial=DEBUG"])
+        self.assertEqual(levels, {None: logging.WARNING, "serial": logging.DEBUG})
+        self.assertEqual(log_levels_requested([]), {})
+
+    def test_apply_log_levels(self):
+        root_logger = logging.getLogger()
+        self.addCleanup(root_logger.setLevel, root_logger.level)
+        self.addCleanup(apply_log_levels, {}, False)
+
+        apply_log_levels({None: logging.WARNING, "video": logging.DEBUG})
+
+        self.assertEqual(root_logger.level, logging.WARNING)
+        self.assertEqual(logging.getLogger(SUBSYSTEM_LOGGERS["video"]).level, logging.DEBUG)
+        serial_logger = logging.getLogger(SUBSYSTEM_LOGGERS["serial"])
+        self.assertEqual(serial_logger.getEffectiveLevel(), logging.WARNING)
+        self.assertTrue(any(isinstance(f, RateLimitFilter) for f in serial_logger.filters))
+
+    def test_rate_limit_filter_allows_burst_then_rate(self):
+        clock = FakeClock()
+        rate_limit = RateLimitFilter(rate=1.0, burst=3, clock=clock)
+
+        passed = [rate_limit.filter(make_record("No ArUco markers detected.")) for _ in range(10)]
+        self.assertEqual(passed, [True] * 3 + [False] * 7)
+        self.assertEqual(rate_limit.suppressed, 7)
+
+        clock.now = 1.0
+        record = make_record("No ArUco markers detected.")
+        self.assertTrue(rate_limit.filter(record))
+        self.assertEqual(record.getMessage(), "No ArUco markers detected. (7 similar messages suppressed)")
+        self.assertFalse(rate_limit.filter(make_record("No ArUco markers detected.")))
+
+    def test_rate_limit_filter_keys_by_template_and_logger(self):
+        rate_limit = RateLimitFilter(rate=1.0, burst=1, clock=FakeClock())
+        translate = str
+
+        self.assertTrue(rate_limit.filter(make_record(LazyMessage(translate, "Received {}", 1))))
+        self.assertFalse(rate_limit.filter(make_record(LazyMessage(translate, "Received {}", 2))))
+        self.assertTrue(rate_limit.filter(make_record("marker_ids: %s", [1, 2])))
+        self.assertTrue(rate_limit.filter(make_record(LazyMessage(translate, "Received {}", 3), name="app.serial")))
+
+    def test_rate_limit_filter_keeps_the_most_recent_buckets(self):
+        rate_limit = RateLimitFilter(rate=1.0, burst=1, clock=FakeClock(), max_buckets=3)
+
+        for value in range(100):
+            self.assertTrue(rate_limit.filter(make_record(f"Received {value}")))
+        self.assertEqual(len(rate_limit.buckets), 3)
+
+        self.assertFalse(rate_limit.filter(make_record("Received 97")))
+        self.assertTrue(rate_limit.filter(make_record("Received 100")))
+        self.assertFalse(rate_limit.filter(make_record("Received 97")))  # Used since 98, so 98 was evicted
+        self.assertTrue(rate_limit.filter(make_record("Received 98")))
+
+
+if __name__ == "__main__":
+    unittest.main()
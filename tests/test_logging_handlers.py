@@ -0,0 +1,145 @@
+import logging
+import queue
+import threading
+import tkinter
+import unittest
+from unittest.mock import MagicMock
+
+from app.logging_handlers import (
+    DroppingQueueHandler,
+    TkinterLoggingHandler,
+    start_queue_logging,
+    stop_queue_logging,
+)
+
+
+class FakeTextWidget:
+    """
+    Minimal stand-in for a Tk text widget that tracks its lines.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.inserts = 0
+        self.see = MagicMock()
+        self.exists = True
+
+    def insert(self, index, text):
+        self.text += text
+        self.inserts += 1
+
+    def index(self, index):
+        return f"{self.text.count(chr(10)) + 1}.0"
+
+    def delete(self, start, end):
+        end_line = int(end.split(".")[0])
+        self.text = "\n".join(self.text.split("\n")[end_line - 1:])
+
+    def winfo_exists(self):
+        return self.exists
+
+    def lines(self):
+        return self.text.split("\n")[:-1]
+
+
+def make_record(message):
+    return logging.LogRecord("test", logging.INFO, __file__, 1, message, None, None)
+
+
+class TestLoggingHandlers(unittest.TestCase):
+    def test_dropping_queue_handler_counts_dropped_records(self):
+        handler = DroppingQueueHandler(queue.Queue(maxsize=2))
+        for index in range(5):
+            handler.handle(make_record(f"line {index}"))
+
+        self.assertEqual(handler.queue.qsize(), 2)
+        self.assertEqual(handler.dropped, 3)
+
+    def test_tkinter_handler_flushes_in_one_batch(self):
+        widget = FakeTextWidget()
+        handler = TkinterLoggingHandler(widget)
+        for index in range(3):
+            handler.handle(make_record(f"line {index}"))
+        self.assertEqual(widget.inserts, 0)
+
+        handler.flush_to_widget()
+
+        self.assertEqual(widget.inserts, 1)
+        self.assertEqual(widget.lines(), ["line 0", "line 1", "line 2"])
+        widget.see.assert_called_once_with(tkinter.END)
+
+        handler.flush_to_widget()  # nothing pending
+        self.assertEqual(widget.inserts, 1)
+
+    def test_tkinter_handler_keeps_a_ring_of_lines(self):
+        widget = FakeTextWidget()
+        handler = TkinterLoggingHandler(widget, max_lines=3)
+        for batch in range(3):
+            for index in range(2):
+                handler.handle(make_record(f"line {batch}.{index}"))
+            handler.flush_to_widget()
+
+        self.assertEqual(widget.lines(), ["line 1.1", "line 2.0", "line 2.1"])
+
+    def test_tkinter_handler_drops_under_overload_and_reports_it(self):
+        widget = FakeTextWidget()
+        handler = TkinterLoggingHandler(widget, max_pending_lines=2)
+        for index in range(5):
+            handler.handle(make_record(f"line {index}"))
+
+        handler.flush_to_widget()
+
+        self.assertEqual(handler.dropped, 3)
+        self.assertEqual(widget.lines(), ["line 0", "line 1", "... 3 log lines dropped ..."])
+
+    def test_tkinter_handler_flushes_on_after_timer(self):
+        root = MagicMock()
+        handler = TkinterLoggingHandler(FakeTextWidget())
+        handler.attach(root, flush_interval_ms=50)
+        root.after.assert_called_once_with(50, handler.flush_tick)
+
+        handler.flush_tick()
+        self.assertEqual(root.after.call_count, 2)
+
+    def test_tkinter_handler_stops_once_the_widget_is_destroyed(self):
+        root = MagicMock()
+        widget = FakeTextWidget()
+        handler = TkinterLoggingHandler(widget)
+        handler.attach(root, flush_interval_ms=50)
+        handler.handle(make_record("after exit"))
+
+        handler.flush()  # As logging.shutdown does, from any thread
+        self.assertEqual(widget.inserts, 0)
+
+        widget.exists = False
+        handler.flush_tick()
+        self.assertEqual(widget.inserts, 0)
+        self.assertEqual(root.after.call_count, 1)
+        self.assertIsNone(handler.root)
+
+    def test_start_queue_logging_moves_handlers_behind_listener(self):
+        root_logger = logging.getLogger()
+        original_handlers = list(root_logger.handlers)
+        self.addCleanup(lambda: [root_logger.addHandler(handler) for handler in original_handlers
+                                 if handler not in root_logger.handlers])
+        widget = FakeTextWidget()
+        tk_handler = TkinterLoggingHandler(widget)
+
+        start_queue_logging([tk_handler])
+        try:
+            self.assertEqual([type(handler) for handler in root_logger.handlers], [DroppingQueueHandler])
+
+            worker = threading.Thread(target=logging.warning, args=("from worker",))
+            worker.start()
+            worker.join()
+        finally:
+            stop_queue_logging()
+
+        tk_handler.flush_to_widget()
+        self.assertEqual(widget.lines(), ["from worker"])
+        self.assertNotIn(tk_handler, root_logger.handlers)
+        self.assertFalse([handler for handler in root_logger.handlers if isinstance(handler, DroppingQueueHandler)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import tkinter
+import unittest
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+from app.main import shortcut, validate_and_move_mouse
+
+
+class TestMain(unittest.TestCase):
+    def test_shortcut_ignores_keys_typed_into_text_fields(self):
+        action = Mock(return_value="break")
+        handler = shortcut(action)
+
+        for widget_class in (tkinter.Entry, tkinter.Text):
+            event = SimpleNamespace(widget=Mock(spec=widget_class))
+            self.assertIsNone(handler(event))
+        action.assert_not_called()
+
+        event = SimpleNamespace(widget=Mock(spec=tkinter.Tk))
+        self.assertEqual(handler(event), "break")
+        action.assert_called_once_with(event)
+
+    @patch("app.main.messagebox.showerror")
+    @patch("app.main.submit_target")
+    def test_manual_move_goes_through_the_arbiter(self, mock_submit_target, mock_showerror):
+        with patch("app.window_actions.viewport_size", return_value=(800, 600)):
+            validate_and_move_mouse("300", "200")
+            mock_submit_target.assert_called_once_with("manual", 300, 200, 0.7)
+
+            validate_and_move_mouse("900", "200")
+        mock_submit_target.assert_called_once()
+        self.assertIn("800x600", mock_showerror.call_args[0][1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import json
+import os
+import random
+import tempfile
+import unittest
+from unittest.mock import Mock
+
+from app.metrics import (
+    BUCKET_COUNT,
+    DETECTION,
+    SERIAL_PARSE,
+    STAGES,
+    LatencyHistogram,
+    MetricsRegistry,
+    bucket_index,
+    bucket_value,
+    format_metrics_prometheus,
+    write_metrics,
+)
+from app.serial import CommandParser
+
+
+class TestMetrics(unittest.TestCase):
+    def test_bucket_value_is_close_to_recorded_value(self):
+        for seconds in (2e-6, 0.00042, 0.0123, 0.1, 0.75, 3.0):
+            with self.subTest(seconds=seconds):
+                self.assertAlmostEqual(bucket_value(bucket_index(seconds)) / seconds, 1.0, delta=0.02)
+
+    def test_bucket_index_is_clamped(self):
+        self.assertEqual(bucket_index(0.0), 0)
+        self.assertEqual(bucket_index(1e-12), 0)
+        self.assertEqual(bucket_index(1e6), BUCKET_COUNT - 1)
+
+    def test_histogram_percentiles(self):
+        histogram = LatencyHistogram()
+        values = [index / 1000 for index in range(1, 1001)]  # 1 ms to 1 s
+        random.Random(0).shuffle(values)
+        for value in values:
+            histogram.record(value)
+
+        self.assertEqual(histogram.count, 1000)
+        self.assertAlmostEqual(histogram.mean(), 0.5005)
+        self.assertEqual(histogram.max, 1.0)
+        for percent, expected in ((50, 0.5), (95, 0.95), (99, 0.99)):
+            with self.subTest(percent=percent):
+                self.assertAlmostEqual(histogram.percentile(percent), expected, delta=expected * 0.02)
+
+    def test_empty_histogram(self):
+        self.assertEqual(LatencyHistogram().percentile(99), 0.0)
+        self.assertEqual(LatencyHistogram().mean(), 0.0)
+
+    def test_snapshot_contains_every_stage(self):
+        registry = MetricsRegistry()
+        registry.record(DETECTION, 0.02)
+        registry.record("custom", 0.001)
+
+        snapshot = registry.snapshot()
+
+        self.assertEqual(set(snapshot), set(STAGES) | {"custom"})
+        self.assertEqual(snapshot[DETECTION]["count"], 1)
+        self.assertAlmostEqual(snapshot[DETECTION]["p99"], 0.02, delta=0.0004)
+        self.assertGreater(snapshot[DETECTION]["rate_per_second"], 0)
+
+        registry.reset()
+        self.assertEqual(registry.snapshot()[DETECTION]["count"], 0)
+
+    def test_format_metrics_prometheus(self):
+        registry = MetricsRegistry()
+        registry.record(DETECTION, 0.5)
+        registry.record(DETECTION, 0.5)
+
+        lines = format_metrics_prometheus(registry.snapshot()).splitlines()
+
+        self.assertIn("# TYPE eye_tracker_stage_latency_seconds summary", lines)
+        self.assertIn('eye_tracker_stage_latency_seconds{stage="detection",quantile="0.5"} 0.500000000', lines)
+        self.assertIn('eye_tracker_stage_latency_seconds_sum{stage="detection"} 1.000000000', lines)
+        self.assertIn('eye_tracker_stage_latency_seconds_count{stage="detection"} 2', lines)
+
+    def test_counters_and_gauges(self):
+        registry = MetricsRegistry()
+        registry.increment('input_samples_total{source="camera",outcome="overridden"}')
+        registry.increment('input_samples_total{source="camera",outcome="overridden"}', 2)
+        registry.set_value('input_active_source{source="serial"}', 1)
+
+        lines = format_metrics_prometheus(registry.snapshot(), registry.values_snapshot()).splitlines()
+
+        self.assertIn('eye_tracker_input_samples_total{source="camera",outcome="overridden"} 3', lines)
+        self.assertIn('eye_tracker_input_active_source{source="serial"} 1', lines)
+        registry.reset()
+        self.assertEqual(registry.values_snapshot(), {})
+
+    def test_write_metrics_by_extension(self):
+        registry = MetricsRegistry()
+        registry.record(DETECTION, 0.01)
+        with tempfile.TemporaryDirectory() as directory:
+            json_path = os.path.join(directory, "metrics.json")
+            prom_path = os.path.join(directory, "metrics.prom")
+            write_metrics(json_path, registry.snapshot(), {"input_failovers_total": 2})
+            write_metrics(prom_path, registry.snapshot())
+
+            with open(json_path) as json_file:
+                content = json.load(json_file)
+            self.assertEqual(content["stages"][DETECTION]["count"], 1)
+            self.assertEqual(content["values"], {"input_failovers_total": 2})
+            with open(prom_path) as prom_file:
+                self.assertTrue(prom_file.read().startswith("# HELP"))
+            self.assertEqual(sorted(os.listdir(directory)), ["metrics.json", "metrics.prom"])
+
+    def test_command_parser_records_parse_latency(self):
+        from app import metrics as metrics_module
+        registry = MetricsRegistry()
+        original = metrics_module.metrics
+        metrics_module.metrics = registry
+        self.addCleanup(setattr, metrics_module, "metrics", original)
+        command = Mock()
+        command.matches.return_value = True
+
+        CommandParser(commands=[command]).parse("[1,2]")
+
+        self.assertEqual(registry.snapshot()[SERIAL_PARSE]["count"], 1)
+        command.execute.assert_called_once_with("[1,2]")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from app.metrics import DETECTION, MetricsRegistry
+from app.metrics_panel import MetricsPanel, format_stage_row, metrics_file_requested
+
+
+class FakeTable:
+    def __init__(self):
+        self.rows = {}
+
+    def exists(self, iid):
+        return iid in self.rows
+
+    def insert(self, parent, index, iid, text, values):
+        self.rows[iid] = values
+
+    def item(self, iid, values):
+        self.rows[iid] = values
+
+
+class TestMetricsPanel(unittest.TestCase):
+    def test_metrics_file_requested(self):
+        self.assertEqual(metrics_file_requested(["--metrics-file", "/tmp/eye.prom", "--lang=zh"]), "/tmp/eye.prom")
+        self.assertIsNone(metrics_file_requested([]))
+
+    def test_format_stage_row(self):
+        stats = {"count": 3, "p50": 0.001, "p95": 0.0125, "p99": 0.02, "max": 0.5}
+        self.assertEqual(format_stage_row(stats, 29.96), (3, "30.0", "1.00", "12.50", "20.00", "500.00"))
+
+    def test_refresh_shows_rates_since_last_refresh(self):
+        registry = MetricsRegistry()
+        root = MagicMock()
+        panel = MetricsPanel(root, registry)
+        panel.table = FakeTable()
+        panel.previous_time = 0.0
+
+        for _ in range(10):
+            registry.record(DETECTION, 0.01)
+        with patch("app.metrics_panel.time.monotonic", return_value=2.0):
+            panel.refresh()
+        self.assertEqual(panel.table.rows[DETECTION][:2], (10, "5.0"))
+
+        for _ in range(2):
+            registry.record(DETECTION, 0.01)
+        with patch("app.metrics_panel.time.monotonic", return_value=4.0):
+            panel.refresh()
+        self.assertEqual(panel.table.rows[DETECTION][:2], (12, "1.0"))
+        # Only one refresh is ever scheduled
+        root.after_cancel.assert_called_once()
+        self.assertEqual(root.after.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+
+import numpy as np
+
+from app.motion_gate import MotionGate
+
+
+def still_frame(value=100):
+    return np.full((480, 640, 3), value, dtype=np.uint8)
+
+
+class TestMotionGate(unittest.TestCase):
+    def setUp(self):
+        self.gate = MotionGate(threshold=2.0, max_skipped_frames=10, motion_hold_frames=2)
+
+    def test_first_frame_is_detected(self):
+        self.assertTrue(self.gate.should_detect(still_frame()))
+
+    def test_still_frames_are_skipped_after_hold(self):
+        decisions = [self.gate.should_detect(still_frame()) for _ in range(6)]
+
+        self.assertEqual(decisions, [True, True, False, False, False, False])
+        self.assertEqual(self.gate.metrics()["skipped_frames"], 4)
+        self.assertAlmostEqual(self.gate.metrics()["skipped_fraction"], 4 / 6)
+
+    def test_motion_restores_full_rate(self):
+        for _ in range(5):
+            self.gate.should_detect(still_frame())
+
+        moved = still_frame()
+        moved[100:300, 100:400] = 255
+        self.assertTrue(self.gate.should_detect(moved))
+        self.assertGreaterEqual(self.gate.last_score, 2.0)
+        # Motion holds detection at full rate for a few frames even if the scene settles
+        self.assertTrue(self.gate.should_detect(moved))
+        self.assertFalse(self.gate.should_detect(moved))
+
+    def test_sensor_noise_does_not_count_as_motion(self):
+        rng = np.random.default_rng(0)
+        for _ in range(3):
+            self.gate.should_detect(still_frame())
+        noisy = np.clip(still_frame() + rng.normal(0, 4, size=(480, 640, 3)), 0, 255).astype(np.uint8)
+        self.assertFalse(self.gate.should_detect(noisy))
+
+    def test_detection_is_forced_after_max_skipped_frames(self):
+        decisions = [self.gate.should_detect(still_frame()) for _ in range(14)]
+        self.assertEqual(decisions[2:], [False] * 10 + [True, False])
+
+    def test_cpu_savings_estimate(self):
+        self.gate.record_detection_cost(0.02)
+        self.gate.record_detection_cost(0.02)
+        for _ in range(5):
+            self.gate.should_detect(still_frame())
+
+        metrics = self.gate.metrics()
+        self.assertEqual(metrics["detection_cpu_seconds"], 0.02)
+        self.assertAlmostEqual(metrics["cpu_seconds_saved"], 3 * 0.02 - self.gate.gate_cpu_seconds)
+
+    def test_metrics_without_frames(self):
+        self.assertEqual(MotionGate().metrics()["skipped_fraction"], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+import threading
+import time
+import unittest
+from unittest.mock import Mock, call, patch
+
+import numpy as np
+
+from app.consensus import ConsensusResult
+from app.frame_sources import FrameSource
+from app.metrics import CAPTURE_SKEW, MetricsRegistry
+from app.multi_camera import (
+    SynchronizedCapture,
+    merge_camera_results,
+    read_from_video_devices,
+    start_multi_camera_thread,
+)
+from app.video_capture import stop_video_capture
+from app.workers import VIDEO_WORKER, supervisor
+
+FIRST_MARKERS = [1, 2, 3, 4]  # 102, 304
+SECOND_MARKERS = [5, 6, 7, 8]  # 506, 708
+
+
+class FakeFrameSource(FrameSource):
+    """
+    Recorded source whose frames are filled with a value the detection patch looks up.
+    """
+
+    def __init__(self, camera, values, events, is_live=False):
+        self.camera = camera
+        self.frames = [np.full((8, 8, 3), value, dtype=np.uint8) for value in values]
+        self.events = events
+        self.is_live = is_live
+        self.position = 0
+        self.released = False
+
+    def is_opened(self):
+        return True
+
+    def grab(self):
+        if self.position >= len(self.frames):
+            return False
+        self.events.append(("grab", self.camera))
+        if not self.is_live:  # A live camera keeps showing its last frame
+            self.position += 1
+        return True
+
+    def retrieve(self):
+        self.events.append(("retrieve", self.camera))
+        return True, self.frames[max(self.position - 1, 0)]
+
+    def read(self):
+        return self.grab() and self.retrieve()
+
+    def release(self):
+        self.released = True
+
+
+class TestMergeCameraResults(unittest.TestCase):
+    def test_most_confident_camera_wins(self):
+        results = [ConsensusResult(1, 1, 0.4, False), None, ConsensusResult(2, 2, 0.6, True)]
+
+        self.assertEqual(merge_camera_results(results), (2, results[2]))
+        self.assertEqual(merge_camera_results(results[:1] + [ConsensusResult(3, 3, 0.4, True)])[0], 0)
+
+    def test_nothing_to_merge(self):
+        self.assertIsNone(merge_camera_results([None, ConsensusResult(None, None, 0.0, False),
+                                                ConsensusResult(5, 5, 0.0, False)]))
+
+
+class TestSynchronizedCapture(unittest.TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        patcher = patch("app.multi_camera.metrics", self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Each frame of each camera has its own fill value, 20 apart so the motion gate detects every frame
+        self.markers = {}
+        patcher = patch("app.multi_camera.detect_aruco_markers",
+                        side_effect=lambda frame, mode: self.markers.get(int(frame[0, 0, 0]), []))
+        self.mock_detect_aruco_markers = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_sources(self, events, frames=12):
+        sources = []
+        for camera, markers_from in ((0, 0), (1, 6)):
+            values = [20 * index + camera for index in range(frames)]
+            for index, value in enumerate(values):
+                seen = index < 6 if camera == 0 else index >= markers_from
+                self.markers[value] = (FIRST_MARKERS if camera == 0 else SECOND_MARKERS) if seen else []
+            sources.append(FakeFrameSource(camera, values, events))
+        return sources
+
+    def test_cursor_follows_the_camera_that_sees_the_markers(self):
+        events = []
+        submit = Mock()
+        capture = SynchronizedCapture(self.create_sources(events), submit=submit)
+
+        while capture.step():
+            pass
+        capture.release()
+
+        # The second camera takes over once it agrees more than the first, which lost the markers
+        self.assertEqual(submit.call_args_list, [call("camera", 102, 304, 0.1), call("camera", 506, 708, 0.1)])
+        self.assertEqual([stats["frames"] for stats in capture.stats()], [12, 12])
+        self.assertEqual([stats["selected"] for stats in capture.stats()], [1, 1])
+        self.assertEqual([stats["decoded"] for stats in capture.stats()], [1, 1])
+        self.assertEqual(self.registry.values_snapshot()['camera_frames_total{camera="1"}'], 12)
+        self.assertEqual(self.registry.histogram(CAPTURE_SKEW).count, 12)
+        self.assertTrue(all(channel.source.released for channel in capture.channels))
+
+    def test_every_camera_is_grabbed_before_any_frame_is_decoded(self):
+        events = []
+        capture = SynchronizedCapture(self.create_sources(events, frames=4), submit=Mock())
+        while capture.step():
+            pass
+        capture.release()
+
+        for step in range(4):
+            grabs, retrieves = events[4 * step:4 * step + 2], events[4 * step + 2:4 * step + 4]
+            self.assertEqual(sorted(grabs), [("grab", 0), ("grab", 1)])
+            self.assertEqual(sorted(retrieves), [("retrieve", 0), ("retrieve", 1)])
+
+    def test_still_frames_do_not_repeat_a_misdetection(self):
+        source = FakeFrameSource(0, [0] * 18, [])
+        submit = Mock()
+        self.mock_detect_aruco_markers.side_effect = [FIRST_MARKERS] * 4 + [[9, 9, 9, 9]]
+        capture = SynchronizedCapture([source], submit=submit)
+
+        while capture.step():
+            pass
+        capture.release()
+
+        self.assertEqual(self.mock_detect_aruco_markers.call_count, 5)
+        submit.assert_called_once_with("camera", 102, 304, 0.1)
+
+    def test_sources_opened_before_a_failure_are_released(self):
+        source = FakeFrameSource(0, [0], [])
+        failure = IOError("Cannot open frame source 1")
+
+        with patch("app.multi_camera.open_frame_source", side_effect=[source, failure, source, failure]):
+            with self.assertRaises(IOError):
+                SynchronizedCapture([0, 1])
+            read_from_video_devices([0, 1])  # Logged, not raised
+
+        self.assertTrue(source.released)
+
+    @patch("app.multi_camera.submit_target")
+    def test_started_capture_is_stopped_like_a_single_camera(self, mock_submit_target):
+        events = []
+        sources = [FakeFrameSource(camera, [camera], events, is_live=True) for camera in (0, 1)]
+        self.markers[0] = FIRST_MARKERS
+
+        start_multi_camera_thread(sources)
+        deadline = time.monotonic() + 2
+        while not mock_submit_target.called and time.monotonic() < deadline:
+            time.sleep(0.005)
+        stop_video_capture()
+
+        mock_submit_target.assert_called_once_with("camera", 102, 304, 0.1)
+        self.assertFalse(supervisor.is_running(VIDEO_WORKER))
+        self.assertTrue(all(source.released for source in sources))
+        self.assertFalse([thread for thread in threading.enumerate() if thread.name.startswith(VIDEO_WORKER)])
+
+
+if __name__ == "__main__":
+    unittest.main()
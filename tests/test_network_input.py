@@ -0,0 +1,144 @@
+import argparse
+import socket
+import time
+import unittest
+from unittest.mock import patch
+
+from app.network_input import (
+    MAX_PARTIAL_LINE_BYTES,
+    TCP_MODE,
+    UDP_MODE,
+    network_input_requested,
+    parse_network_address,
+    start_network_input,
+    stop_network_input,
+)
+from app.workers import NETWORK_WORKER, supervisor
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+class TestNetworkInput(unittest.TestCase):
+    def setUp(self):
+        patcher = patch("app.serial.submit_target")
+        self.mock_submit_target = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(stop_network_input)
+
+    def start(self, mode):
+        import app.network_input
+        self.assertTrue(start_network_input(mode, "127.0.0.1", 0))
+        return app.network_input.current_network_input
+
+    def test_parse_network_address(self):
+        self.assertEqual(parse_network_address("udp://127.0.0.1:5555"), (UDP_MODE, "127.0.0.1", 5555))
+        self.assertEqual(parse_network_address("tcp://0.0.0.0:7000"), (TCP_MODE, "0.0.0.0", 7000))
+        self.assertEqual(parse_network_address("tcp://:7000"), (TCP_MODE, "127.0.0.1", 7000))
+        self.assertEqual(parse_network_address("udp://[::1]:5555"), (UDP_MODE, "::1", 5555))
+        for value in ("127.0.0.1:5555", "http://127.0.0.1:80", "udp://127.0.0.1", "udp://host:port"):
+            with self.subTest(value=value), self.assertRaises(argparse.ArgumentTypeError):
+                parse_network_address(value)
+
+    def test_network_input_requested(self):
+        self.assertIsNone(network_input_requested([]))
+        self.assertEqual(network_input_requested(["--network-input", "udp://:5555"]), (UDP_MODE, "127.0.0.1", 5555))
+
+    def test_udp_datagrams_are_parsed(self):
+        network_input = self.start(UDP_MODE)
+        sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addCleanup(sender.close)
+
+        with patch("app.serial.run_on_ui_thread") as mock_run_on_ui_thread:
+            sender.sendto(b"calibration_required\n", ("127.0.0.1", network_input.port))
+            self.assertTrue(wait_until(lambda: network_input.lines_received == 1))
+        mock_run_on_ui_thread.assert_called_once()
+
+        sender.sendto(b"10,20\n", ("127.0.0.1", network_input.port))
+        self.assertTrue(wait_until(lambda: network_input.lines_received == 2))
+        self.mock_submit_target.assert_called_once_with("network", 10, 20, 0.2)
+
+    def test_burst_of_coordinates_moves_once_to_the_newest(self):
+        network_input = self.start(UDP_MODE)
+        sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addCleanup(sender.close)
+
+        sender.sendto(b"1,1\n2,2\n3,3\n", ("127.0.0.1", network_input.port))
+        self.assertTrue(wait_until(lambda: network_input.lines_received == 3))
+
+        self.mock_submit_target.assert_called_once_with("network", 3, 3, 0.2)
+        self.assertEqual(network_input.lines_coalesced, 2)
+
+    def test_tcp_lines_may_span_packets(self):
+        network_input = self.start(TCP_MODE)
+        client = socket.create_connection(("127.0.0.1", network_input.port))
+        self.addCleanup(client.close)
+
+        client.sendall(b"100,")
+        time.sleep(0.05)
+        client.sendall(b"200\n30")
+        self.assertTrue(wait_until(lambda: network_input.lines_received == 1))
+        self.mock_submit_target.assert_called_once_with("network", 100, 200, 0.2)
+
+        client.sendall(b"0,400")
+        client.close()  # The last line needs no newline
+        self.assertTrue(wait_until(lambda: network_input.lines_received == 2))
+        self.mock_submit_target.assert_called_with("network", 300, 400, 0.2)
+
+    def test_tcp_client_without_line_ends_is_disconnected(self):
+        network_input = self.start(TCP_MODE)
+        client = socket.create_connection(("127.0.0.1", network_input.port))
+        self.addCleanup(client.close)
+
+        with self.assertLogs("app.network_input", "WARNING"):
+            try:
+                client.sendall(b"1,2\n" + b"9" * (MAX_PARTIAL_LINE_BYTES + 1))
+            except OSError:
+                pass  # The server may already have hung up
+            client.settimeout(2)
+            try:
+                self.assertEqual(client.recv(1), b"")
+            except ConnectionResetError:
+                pass  # Closed with the rest of the line unread
+        self.assertTrue(wait_until(lambda: network_input.lines_received == 1))
+        self.assertEqual(network_input.partial_lines, {})
+        self.mock_submit_target.assert_called_once_with("network", 1, 2, 0.2)
+
+    def test_invalid_lines_are_logged_and_skipped(self):
+        network_input = self.start(UDP_MODE)
+        sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addCleanup(sender.close)
+
+        with self.assertLogs("app.serial", "ERROR"):
+            sender.sendto(b"hello\n5,6\n", ("127.0.0.1", network_input.port))
+            self.assertTrue(wait_until(lambda: network_input.lines_received == 2))
+        self.mock_submit_target.assert_called_once_with("network", 5, 6, 0.2)
+
+    def test_address_in_use(self):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(listener.close)
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(1)
+
+        with self.assertLogs("app.network_input", "ERROR"):
+            self.assertFalse(start_network_input(TCP_MODE, "127.0.0.1", listener.getsockname()[1]))
+        self.assertFalse(supervisor.is_running(NETWORK_WORKER))
+
+    def test_stop_closes_the_socket(self):
+        network_input = self.start(UDP_MODE)
+        listening_socket = network_input.socket
+
+        stop_network_input()
+
+        self.assertFalse(supervisor.is_running(NETWORK_WORKER))
+        self.assertEqual(listening_socket.fileno(), -1)
+
+
+if __name__ == "__main__":
+    unittest.main()
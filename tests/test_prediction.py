@@ -0,0 +1,135 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from app.prediction import (
+    EXTRAPOLATED,
+    FIXATION,
+    NOISY,
+    SACCADE,
+    WARMING_UP,
+    VelocityPredictor,
+    create_predictor,
+    evaluate_prediction,
+    load_gaze_session,
+    prediction_options_requested,
+    save_gaze_session,
+)
+from app.synthetic import generate_gaze_session
+
+RATE = 250.0
+
+
+def feed(predictor, positions, start=0.0):
+    for index, (x, y) in enumerate(positions):
+        predictor.add_sample(start + index / RATE, x, y)
+
+
+class TestVelocityPredictor(unittest.TestCase):
+    def test_pursuit_is_extrapolated_by_the_horizon(self):
+        predictor = VelocityPredictor(window=8)
+        positions = [(100 + 2 * index, 300 - index) for index in range(20)]  # 500 and -250 px/s
+        feed(predictor, positions)
+
+        self.assertEqual(positions[-1], (138, 281))
+        self.assertEqual(predictor.predict(*positions[-1], horizon=0.04), (138 + 20, 281 - 10))
+        self.assertEqual(predictor.last_outcome, EXTRAPOLATED)
+
+    def test_measured_latency_sets_the_horizon_up_to_the_maximum(self):
+        predictor = VelocityPredictor(max_horizon=0.05)
+        for _sample in range(100):
+            predictor.record_latency(0.2)
+
+        self.assertEqual(predictor.horizon(), 0.05)
+        feed(predictor, [(100 + 4 * index, 100) for index in range(8)])
+        self.assertEqual(predictor.predict(128, 100), (128 + 50, 100))
+
+    def test_fixation_saccade_and_noise_are_not_extrapolated(self):
+        rng = np.random.default_rng(0)
+        cases = [
+            (FIXATION, [(500 + rng.normal(0, 3), 400 + rng.normal(0, 3)) for _index in range(8)]),
+            (SACCADE, [(100 + 40 * index, 400) for index in range(8)]),  # 10000 px/s
+            (NOISY, [(100 + 3 * index, 400 + (40 if index % 2 else -40)) for index in range(8)]),
+        ]
+        for outcome, positions in cases:
+            with self.subTest(outcome=outcome):
+                predictor = VelocityPredictor()
+                feed(predictor, positions)
+                x, y = positions[-1]
+                self.assertEqual(predictor.predict(x, y, horizon=0.05), (int(round(x)), int(round(y))))
+                self.assertEqual(predictor.last_outcome, outcome)
+
+    def test_warming_up_and_reset(self):
+        predictor = VelocityPredictor()
+        feed(predictor, [(0, 0), (4, 0)])
+        self.assertEqual(predictor.predict(4, 0), (4, 0))
+        self.assertEqual(predictor.last_outcome, WARMING_UP)
+
+        feed(predictor, [(8, 0), (12, 0)], start=2 / RATE)
+        predictor.reset()
+        predictor.predict(12, 0)
+        self.assertEqual(predictor.last_outcome, WARMING_UP)
+
+    def test_prediction_is_clamped_to_the_screen(self):
+        predictor = VelocityPredictor()
+        feed(predictor, [(1900 + 2 * index, 10 - index) for index in range(8)])
+
+        self.assertEqual(predictor.predict(1914, 3, horizon=0.1, bounds=(1920, 1080)), (1919, 0))
+
+    def test_window_needs_three_samples(self):
+        with self.assertRaises(ValueError):
+            VelocityPredictor(window=2)
+
+    def test_create_predictor(self):
+        self.assertIsNone(create_predictor(prediction_options_requested([])))
+        predictor = create_predictor(prediction_options_requested(["--predict", "--predict-window", "12",
+                                                                   "--predict-max-speed", "2000"]))
+        self.assertEqual((predictor.window, predictor.max_speed), (12, 2000))
+
+
+class TestPredictionEvaluation(unittest.TestCase):
+    def test_prediction_beats_the_lagging_cursor_on_synthetic_gaze(self):
+        timestamps, positions = generate_gaze_session(seconds=20, rate=RATE, seed=1)
+
+        report = evaluate_prediction(timestamps, positions, 0.05)
+
+        self.assertAlmostEqual(report["samples"], len(timestamps) - 0.05 * RATE, delta=1)
+        self.assertLess(report["mean_error"], report["baseline_mean_error"])
+        self.assertGreater(report["extrapolated_fraction"], 0)
+        self.assertAlmostEqual(sum(report[f"{outcome}_fraction"] for outcome in
+                                   (EXTRAPOLATED, WARMING_UP, FIXATION, SACCADE, NOISY)), 1.0)
+
+    def test_perfect_pursuit_is_predicted_exactly(self):
+        timestamps = np.arange(200) / RATE
+        positions = np.column_stack([100 + 500 * timestamps, np.full(200, 300.0)])
+
+        report = evaluate_prediction(timestamps, positions, 0.04)
+
+        self.assertAlmostEqual(report["baseline_mean_error"], 20.0)
+        self.assertLess(report["mean_error"], 1.0)
+
+    def test_session_shorter_than_the_horizon(self):
+        with self.assertRaises(ValueError):
+            evaluate_prediction([0.0, 0.01], [(0, 0), (1, 1)], 0.5)
+
+    def test_sessions_are_saved_and_loaded(self):
+        timestamps, positions = generate_gaze_session(seconds=1, seed=2)
+        with tempfile.TemporaryDirectory() as directory:
+            npz_path = os.path.join(directory, "session.npz")
+            save_gaze_session(npz_path, timestamps, positions)
+            loaded_timestamps, loaded_positions = load_gaze_session(npz_path)
+            np.testing.assert_array_equal(loaded_timestamps, timestamps)
+            np.testing.assert_array_equal(loaded_positions, positions)
+
+            csv_path = os.path.join(directory, "session.csv")
+            with open(csv_path, "w") as csv_file:
+                csv_file.write("timestamp,x,y,source\n0.02,12,13,serial\n0.01,10,11,serial\n0.03,,,serial\n")
+            loaded_timestamps, loaded_positions = load_gaze_session(csv_path)
+            self.assertEqual(loaded_timestamps.tolist(), [0.01, 0.02])
+            self.assertEqual(loaded_positions.tolist(), [[10, 11], [12, 13]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+import os
+import tempfile
+import threading
+import tracemalloc
+import unittest
+
+from app import profiling
+from app.profiling import (
+    MemoryTracer,
+    SamplingProfiler,
+    profile_options_requested,
+    request_profile_report,
+    start_profiler,
+    stop_profiler,
+    write_profile_report,
+)
+from app.workers import PROFILE_REPORT_WORKER, supervisor
+
+
+def wait_in_named_function(event):
+    event.wait()
+
+
+def spin_in_named_function(event):
+    while not event.is_set():
+        pass
+
+
+class TestProfiling(unittest.TestCase):
+    def test_profile_options_requested(self):
+        self.assertEqual(profile_options_requested(["--profile=cpu", "--lang", "zh"]), ("cpu", None))
+        self.assertEqual(profile_options_requested(["--profile", "mem", "--profile-dir", "out"]), ("mem", "out"))
+        self.assertEqual(profile_options_requested([]), (None, None))
+
+    def start_thread(self, target, name):
+        release = threading.Event()
+        thread = threading.Thread(target=target, args=(release,), name=name)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(release.set)
+
+    def test_sampling_profiler_samples_other_threads(self):
+        self.start_thread(spin_in_named_function, "serial-reader")
+        profiler = SamplingProfiler()
+
+        for _ in range(3):
+            profiler.sample()
+
+        self_counts, cumulative_counts = profiler.function_counts()["serial-reader"]
+        self.assertEqual(sum(self_counts.values()), 3)
+        self.assertEqual(cumulative_counts["spin_in_named_function (test_profiling.py)"], 3)
+        collapsed = [line for line in profiler.format_collapsed_stacks().splitlines()
+                     if line.startswith("serial-reader;")]
+        self.assertTrue(collapsed)
+        self.assertTrue(all(";spin_in_named_function (test_profiling.py:" in line for line in collapsed))
+        self.assertEqual(sum(int(line.rsplit(" ", 1)[1]) for line in collapsed), 3)
+        self.assertIn("Thread serial-reader: 3 samples, 0 blocked", profiler.format_report())
+
+    def test_sampling_profiler_leaves_out_blocked_threads(self):
+        self.start_thread(wait_in_named_function, "network-input")
+        profiler = SamplingProfiler()
+
+        for _ in range(3):
+            profiler.sample()
+
+        self.assertNotIn("network-input", profiler.function_counts())
+        self.assertEqual(profiler.idle["network-input"], 3)
+
+    def test_memory_tracer_reports_growing_allocation_site(self):
+        with tempfile.TemporaryDirectory() as directory:
+            tracer = MemoryTracer(interval=3600, report_dir=directory)
+            tracer.start()
+            try:
+                growing = [bytearray(1024) for _ in range(1000)]
+                paths = tracer.write_report()
+            finally:
+                tracer.stop()
+
+            self.assertEqual(len(paths), 1)
+            with open(paths[0]) as report_file:
+                report = report_file.read()
+        self.assertEqual(len(tracer.history), 2)
+        growth = report.split("Growth since the first snapshot")[1]
+        self.assertIn("test_profiling.py", growth.splitlines()[1])
+        del growing
+
+    def test_memory_tracer_leaves_tracing_it_did_not_start(self):
+        tracemalloc.start()
+        self.addCleanup(tracemalloc.stop)
+        tracer = MemoryTracer(interval=3600)
+
+        tracer.start()
+        tracer.stop()
+
+        self.assertTrue(tracemalloc.is_tracing())
+
+    def test_reports_written_in_the_same_second_are_kept(self):
+        with tempfile.TemporaryDirectory() as directory:
+            profiler = SamplingProfiler(report_dir=directory)
+            paths = profiler.write_report() + profiler.write_report()
+
+            self.assertEqual(len(set(paths)), 4)
+            self.assertEqual(len(os.listdir(directory)), 4)
+        # The text report and the collapsed stacks of one report share their name
+        self.assertEqual(os.path.splitext(paths[0])[0], os.path.splitext(paths[1])[0])
+
+    def test_start_and_write_profile_report(self):
+        with tempfile.TemporaryDirectory() as directory:
+            start_profiler("cpu", directory, interval=0.001)
+            try:
+                self.assertIsInstance(profiling.active_profiler, SamplingProfiler)
+                paths = write_profile_report()
+            finally:
+                stop_profiler()
+
+            self.assertEqual(sorted(os.path.splitext(path)[1] for path in paths), [".collapsed", ".txt"])
+            self.assertTrue(all(os.path.exists(path) for path in paths))
+        self.assertIsNone(profiling.active_profiler)
+        self.assertEqual(write_profile_report(), [])
+
+    def test_request_profile_report_writes_on_a_worker(self):
+        with tempfile.TemporaryDirectory() as directory:
+            start_profiler("cpu", directory, interval=0.001)
+            self.addCleanup(stop_profiler)
+            written = []
+            write_report = profiling.active_profiler.write_report
+
+            def record_thread():
+                written.append(threading.current_thread().name)
+                return write_report()
+
+            profiling.active_profiler.write_report = record_thread
+            request_profile_report()
+            supervisor.stop(PROFILE_REPORT_WORKER)
+
+            self.assertEqual(written, [PROFILE_REPORT_WORKER])
+            self.assertEqual(len(os.listdir(directory)), 2)
+
+    def test_start_profiler_with_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            start_profiler("gpu")
+
+
+if __name__ == "__main__":
+    unittest.main()
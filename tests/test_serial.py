@@ -1,9 +1,12 @@
+import time
 import unittest
 from unittest.mock import patch, Mock, call, MagicMock
 
 import serial
 
+from app.metrics import SERIAL_RECOVERY, MetricsRegistry
 from app.serial import (
+    SerialWatcher,
     disconnect_from_serial,
     read_from_serial,
     get_serial_ports,
@@ -13,9 +16,20 @@ from app.serial import (
     CalibrationRequiredCommand,
     CalibrationDoneCommand,
 )
+from app.ui_dispatcher import ui_dispatcher
+from app.workers import WorkerSupervisor
+from app.window_actions import CALIBRATION_DOT_UI_KEY, hide_calibration_dot, show_calibration_dot
+
+
+def logged_messages(mock_log):
+    return [str(args[0]) for args, _kwargs in mock_log.call_args_list]
 
 
 class TestSerial(unittest.TestCase):
+    def setUp(self):
+        ui_dispatcher.attach(MagicMock())  # This test thread plays the Tk thread, so calibration posts run inline
+        self.addCleanup(ui_dispatcher.detach)
+
     def test_coordinate_command_matches(self):
         coordinate_command = CoordinateCommand()
         test_strings = [
@@ -36,13 +50,13 @@ class TestSerial(unittest.TestCase):
                     matches, expected_match, f"Unexpected result for '{test_string}'"
                 )
 
-    @patch("app.serial.move_mouse")
-    def test_coordinate_command_execute(self, mock_move_mouse):
+    @patch("app.serial.submit_target")
+    def test_coordinate_command_execute(self, mock_submit_target):
         coordinate_command = CoordinateCommand()
         test_line = "123,456"
         result = coordinate_command.execute(test_line)
 
-        mock_move_mouse.assert_called_once_with("123", "456", 0.2)
+        mock_submit_target.assert_called_once_with("serial", 123, 456, 0.2)
         self.assertTrue(result)
 
     def test_calibration_required_command_matches(self):
@@ -58,6 +72,16 @@ class TestSerial(unittest.TestCase):
         mock_show_calibration_dot.assert_called_once()
         self.assertTrue(result)
 
+    @patch("app.serial.run_on_ui_thread")
+    def test_calibration_commands_post_to_ui_thread(self, mock_run_on_ui_thread):
+        CalibrationRequiredCommand().execute("calibration_required")
+        CalibrationDoneCommand().execute("calibration_done")
+
+        mock_run_on_ui_thread.assert_has_calls([
+            call(show_calibration_dot, key=CALIBRATION_DOT_UI_KEY),
+            call(hide_calibration_dot, key=CALIBRATION_DOT_UI_KEY),
+        ])
+
     def test_calibration_done_command_matches(self):
         calibration_done_command = CalibrationDoneCommand()
         self.assertTrue(calibration_done_command.matches("calibration_done"))
@@ -77,7 +101,7 @@ class TestSerial(unittest.TestCase):
         mock_ser.in_waiting = True
         mock_ser.readline.return_value = b"[100,200]\n"
 
-        mock_move_mouse = Mock()
+        mock_submit_target = Mock()
 
         parser = CommandParser(
             commands=[
@@ -90,16 +114,12 @@ class TestSerial(unittest.TestCase):
         with patch(
             "app.serial.get_current_serial_connection"
         ) as mock_get_current_serial, patch(
-            "app.serial.logging.info"
-        ) as mock_logging_info, patch("app.serial.move_mouse", mock_move_mouse):
+            "app.serial.logger.info"
+        ) as mock_logging_info, patch("app.serial.submit_target", mock_submit_target):
             mock_get_current_serial.side_effect = [mock_ser, None]
             read_from_serial(mock_ser, parser)
-            mock_logging_info.assert_has_calls(
-                [
-                    call("Received data from {}: [100,200]".format(mock_ser.port)),
-                ]
-            )
-            mock_move_mouse.assert_called_once_with("100", "200", 0.2)
+            self.assertEqual(logged_messages(mock_logging_info), ["Received data from COM8: [100,200]"])
+            mock_submit_target.assert_called_once_with("serial", 100, 200, 0.2)
 
     def test_read_from_serial_calibration_required(self):
         mock_ser = Mock()
@@ -120,16 +140,14 @@ class TestSerial(unittest.TestCase):
         with patch(
             "app.serial.get_current_serial_connection"
         ) as mock_get_current_serial, patch(
-            "app.serial.logging.info"
+            "app.serial.logger.info"
         ) as mock_logging_info, patch("app.serial.show_calibration_dot", mock_show_calibration_dot):
             mock_get_current_serial.side_effect = [mock_ser, None]
             read_from_serial(mock_ser, parser)
-            mock_logging_info.assert_has_calls(
-                [
-                    call("Received data from {}: calibration_required".format(mock_ser.port)),
-                    call("calibration_required: showing calibration dot"),
-                ]
-            )
+            self.assertEqual(logged_messages(mock_logging_info), [
+                "Received data from COM8: calibration_required",
+                "calibration_required: showing calibration dot",
+            ])
             mock_show_calibration_dot.assert_called_once()
 
     def test_read_from_serial_calibration_done(self):
@@ -151,16 +169,14 @@ class TestSerial(unittest.TestCase):
         with patch(
             "app.serial.get_current_serial_connection"
         ) as mock_get_current_serial, patch(
-            "app.serial.logging.info"
+            "app.serial.logger.info"
         ) as mock_logging_info, patch("app.serial.hide_calibration_dot", mock_hide_calibration_dot):
             mock_get_current_serial.side_effect = [mock_ser, None]
             read_from_serial(mock_ser, parser)
-            mock_logging_info.assert_has_calls(
-                [
-                    call("Received data from {}: calibration_done".format(mock_ser.port)),
-                    call("calibration_done: hiding calibration dot"),
-                ]
-            )
+            self.assertEqual(logged_messages(mock_logging_info), [
+                "Received data from COM8: calibration_done",
+                "calibration_done: hiding calibration dot",
+            ])
             mock_hide_calibration_dot.assert_called_once()
 
     def test_read_from_serial_invalid_data(self):
@@ -180,19 +196,32 @@ class TestSerial(unittest.TestCase):
         with patch(
             "app.serial.get_current_serial_connection"
         ) as mock_get_current_serial, patch(
-            "app.serial.logging.error"
+            "app.serial.logger.error"
         ) as mock_logging_error, patch(
-            "app.serial.logging.info"
-        ) as mock_logging_info, patch("app.serial.move_mouse") as mock_move_mouse:
+            "app.serial.logger.info"
+        ) as mock_logging_info, patch("app.serial.submit_target") as mock_submit_target:
             mock_get_current_serial.side_effect = [mock_ser, None]
             read_from_serial(mock_ser, parser)
-            mock_logging_info.assert_called_once_with(
-                "Received data from {}: invalid_data".format(mock_ser.port)
-            )
-            mock_logging_error.assert_called_once_with(
+            self.assertEqual(logged_messages(mock_logging_info), ["Received data from COM8: invalid_data"])
+            self.assertEqual(logged_messages(mock_logging_error), [
                 "ERROR: error parsing above line, invalid data, error is: Unknown command: invalid_data"
-            )
-            mock_move_mouse.assert_not_called()
+            ])
+            mock_submit_target.assert_not_called()
+
+    @patch("app.serial.run_on_ui_thread")
+    @patch("app.serial.submit_target")
+    def test_parse_batch_coalesces_coordinates(self, mock_submit_target, mock_run_on_ui_thread):
+        parser = CommandParser()
+
+        with patch("app.serial.logger.error") as mock_logging_error:
+            executed, coalesced = parser.parse_batch(["1,1", "calibration_required", "2,2", "invalid_data", "3,3"])
+
+        self.assertEqual((executed, coalesced), (2, 2))
+        mock_submit_target.assert_called_once_with("serial", 3, 3, 0.2)
+        mock_run_on_ui_thread.assert_called_once()
+        self.assertEqual(logged_messages(mock_logging_error), [
+            "ERROR: error parsing above line, invalid data, error is: Unknown command: invalid_data"
+        ])
 
     @patch("app.serial.list_ports.comports")
     def test_get_serial_ports_with_available_ports(self, mock_comports):
@@ -229,13 +258,17 @@ class TestSerial(unittest.TestCase):
         ) as mock_disconnect, patch(
             "app.serial.threading.Thread"
         ) as mock_thread, patch(
-            "app.serial.logging.info"
-        ) as mock_logging_info:
+            "app.serial.logger.info"
+        ) as mock_logging_info, patch("app.serial.list_ports.comports", return_value=[]), patch(
+            "app.serial.serial_watcher", None
+        ), patch("app.serial.supervisor", WorkerSupervisor()):
             result = start_serial_thread("COM8", 9600)
 
             mock_disconnect.assert_called_once()
             mock_serial.assert_called_once_with("COM8", 9600, timeout=0)
-            mock_thread.assert_called_once()
+            # The reader and the watcher that reconnects the port
+            self.assertEqual([thread_call.kwargs["name"] for thread_call in mock_thread.call_args_list],
+                             ["serial-reader", "serial-watcher"])
             mock_logging_info.assert_called_once_with("Connected to COM8")
             self.assertTrue(result)
 
@@ -243,7 +276,7 @@ class TestSerial(unittest.TestCase):
         with patch("app.serial.serial.Serial") as mock_serial, patch(
             "app.serial.disconnect_from_serial"
         ) as mock_disconnect, patch(
-            "app.serial.logging.error"
+            "app.serial.logger.error"
         ) as mock_logging_error:
             mock_serial.side_effect = serial.SerialException("Connection failed")
 
@@ -260,7 +293,7 @@ class TestSerial(unittest.TestCase):
         mock_ser.port = "COM8"
 
         with patch("app.serial.current_serial_connection", mock_ser), patch(
-            "app.serial.logging.info"
+            "app.serial.logger.info"
         ) as mock_logging_info:
             disconnect_from_serial()
 
@@ -268,5 +301,112 @@ class TestSerial(unittest.TestCase):
         mock_logging_info.assert_called_once_with("Disconnected from COM8")
 
 
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+class TestSerialWatcher(unittest.TestCase):
+    def setUp(self):
+        self.ports = ["COM8"]
+        patchers = [
+            patch("app.serial.list_ports.comports", side_effect=lambda: [MagicMock(device=port) for port in self.ports]),
+            patch("app.serial.port_list_cache", (float("-inf"), [])),
+            patch("app.serial.current_serial_connection", None),
+            patch("app.serial.serial_watcher", None),
+        ]
+        self.registry = MetricsRegistry()
+        patchers.append(patch("app.metrics.metrics", self.registry))
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(disconnect_from_serial)
+
+    def connection(self):
+        mock_ser = Mock()
+        mock_ser.port = "COM8"
+        mock_ser.in_waiting = 0
+        return mock_ser
+
+    def test_read_error_drops_the_connection_and_notifies_the_watcher(self):
+        import app.serial
+        mock_ser = self.connection()
+        type(mock_ser).in_waiting = property(Mock(side_effect=serial.SerialException("device disconnected")))
+        app.serial.current_serial_connection = mock_ser
+        watcher = app.serial.serial_watcher = SerialWatcher("COM8", 9600, CommandParser())
+
+        with patch("app.serial.logger.error") as mock_logging_error:
+            read_from_serial(mock_ser, CommandParser())
+
+        mock_ser.close.assert_called_once()
+        self.assertIsNone(app.serial.current_serial_connection)
+        self.assertTrue(watcher.lost.is_set())
+        self.assertEqual(logged_messages(mock_logging_error), ["Lost connection to COM8: device disconnected"])
+
+    def test_reconnects_when_the_port_comes_back(self):
+        import app.serial
+        parser = CommandParser()
+        reopened = self.connection()
+        with patch("app.serial.serial.Serial", side_effect=[serial.SerialException("busy"), reopened]) as mock_serial, \
+                patch("app.serial.read_from_serial") as mock_read_from_serial:
+            watcher = SerialWatcher("COM8", 9600, parser, poll_interval=0.005, min_backoff=0.005)
+            watcher.start()
+            self.addCleanup(watcher.stop)
+
+            self.ports = []
+            app.serial.port_list_cache = (float("-inf"), [])
+            watcher.connection_lost()
+            time.sleep(0.05)
+            mock_serial.assert_not_called()  # Not listed, so not retried
+            self.ports = ["COM8"]
+
+            self.assertTrue(wait_until(lambda: watcher.stats()["reconnects"] == 1))
+            watcher.stop()
+
+        self.assertEqual(mock_serial.call_count, 2)
+        self.assertIs(app.serial.current_serial_connection, reopened)
+        self.assertEqual(mock_read_from_serial.call_args.args, (reopened, parser))
+        self.assertGreater(watcher.stats()["mean_time_to_recover"], 0.05)
+        self.assertEqual(self.registry.histogram(SERIAL_RECOVERY).count, 1)
+
+    def test_unplugged_port_drops_a_quiet_connection(self):
+        import app.serial
+        mock_ser = self.connection()
+        app.serial.current_serial_connection = mock_ser
+        watcher = app.serial.serial_watcher = SerialWatcher("COM8", 9600, CommandParser(), poll_interval=0.005)
+        watcher.start()
+
+        self.ports = []
+        self.assertTrue(wait_until(watcher.lost.is_set))
+        mock_ser.close.assert_called_once()
+        self.assertIsNone(app.serial.current_serial_connection)
+
+    def test_unlisted_virtual_port_is_not_dropped(self):
+        import app.serial
+        self.ports = []
+        mock_ser = self.connection()
+        mock_ser.port = "/dev/pts/3"
+        app.serial.current_serial_connection = mock_ser
+        watcher = app.serial.serial_watcher = SerialWatcher("/dev/pts/3", 9600, CommandParser(), poll_interval=0.005)
+        watcher.start()
+
+        time.sleep(0.05)
+        self.assertFalse(watcher.lost.is_set())
+        self.assertIs(app.serial.current_serial_connection, mock_ser)
+
+    def test_samples_lost_are_estimated_from_the_line_rate(self):
+        with patch("app.serial.time.monotonic", return_value=100.0), patch("app.serial.lines_received", 0):
+            watcher = SerialWatcher("COM8", 9600, CommandParser())
+        watcher.lost_at = 110.0  # 10 lines per second for 10 seconds
+        with patch("app.serial.time.monotonic", return_value=110.5), patch("app.serial.lines_received", 100):
+            watcher.record_recovery(attempts=1)
+
+        self.assertEqual(watcher.stats(), {"reconnects": 1, "mean_time_to_recover": 0.5, "samples_lost": 5})
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,105 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from app.session_profile import (
+    CAMERA_DEVICE,
+    SERIAL_DEVICE,
+    SessionProfile,
+    auto_connect_requested,
+    load_session_profile,
+    open_session_devices,
+    save_session_profile,
+    start_session_thread,
+)
+
+
+class TestSessionProfile(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.path = os.path.join(temp_dir.name, "config", "session.json")
+
+    def test_profile_is_saved_and_loaded(self):
+        profile = SessionProfile("/dev/ttyUSB0", 115200, 1, (1280, 720), "fast")
+
+        save_session_profile(profile, self.path)
+
+        self.assertEqual(load_session_profile(self.path), profile)
+        self.assertFalse(os.path.exists(self.path + ".tmp"))
+
+    def test_missing_profile_is_empty(self):
+        profile = load_session_profile(self.path)
+
+        self.assertFalse(profile.has_devices())
+        self.assertEqual(profile.baud_rate, 9600)
+
+    def test_unusable_profile_is_ignored(self):
+        os.makedirs(os.path.dirname(self.path))
+        for content in ("not json", "[1, 2]", json.dumps({"camera": "front"}), json.dumps({"detector_mode": "turbo"}),
+                        json.dumps({"capture_size": [1280]})):
+            with self.subTest(content=content):
+                with open(self.path, "w") as profile_file:
+                    profile_file.write(content)
+                with self.assertLogs("app.session_profile", "WARNING"):
+                    self.assertEqual(load_session_profile(self.path), SessionProfile())
+
+    def test_auto_connect_requested(self):
+        self.assertTrue(auto_connect_requested([]))
+        self.assertFalse(auto_connect_requested(["--no-auto-connect"]))
+
+    @patch("app.session_profile.wait_for_first_frame", return_value=True)
+    @patch("app.session_profile.start_serial_thread", return_value=True)
+    @patch("app.session_profile.start_video_thread", return_value=True)
+    def test_open_session_devices(self, mock_start_video_thread, mock_start_serial_thread, mock_wait_for_first_frame):
+        profile = SessionProfile("COM3", 115200, 0, (1280, 720), "fast")
+
+        self.assertEqual(open_session_devices(profile, first_frame_timeout=2.0), [])
+
+        mock_start_video_thread.assert_called_once_with(0, None, (1280, 720), "fast")
+        mock_start_serial_thread.assert_called_once_with("COM3", 115200)
+        mock_wait_for_first_frame.assert_called_once_with(2.0)
+
+    @patch("app.session_profile.stop_video_capture")
+    @patch("app.session_profile.wait_for_first_frame", return_value=False)
+    @patch("app.session_profile.start_serial_thread", return_value=False)
+    @patch("app.session_profile.start_video_thread", return_value=True)
+    def test_open_session_devices_reports_failures(self, mock_start_video_thread, mock_start_serial_thread,
+                                                   mock_wait_for_first_frame, mock_stop_video_capture):
+        profile = SessionProfile("COM3", camera=2)
+
+        self.assertEqual(open_session_devices(profile, first_frame_timeout=0), [SERIAL_DEVICE, CAMERA_DEVICE])
+        mock_stop_video_capture.assert_called_once()
+
+    @patch("app.session_profile.get_video_devices", return_value=[0, 2])
+    @patch("app.session_profile.get_serial_ports", return_value=["COM1", "COM3"])
+    @patch("app.session_profile.open_session_devices", return_value=[SERIAL_DEVICE])
+    def test_session_thread_enumerates_after_opening(self, mock_open_session_devices, mock_get_serial_ports,
+                                                     mock_get_video_devices):
+        results = []
+        profile = SessionProfile("COM9", camera=2)
+
+        start_session_thread(profile, lambda *devices: results.append(devices)).join(5)
+
+        mock_open_session_devices.assert_called_once_with(profile)
+        mock_get_video_devices.assert_called_once_with((2,))
+        self.assertEqual(results, [([SERIAL_DEVICE], ["COM1", "COM3"], [0, 2])])
+
+    @patch("app.session_profile.get_video_devices", return_value=[0])
+    @patch("app.session_profile.get_serial_ports", return_value=["COM1"])
+    @patch("app.session_profile.open_session_devices")
+    def test_session_thread_without_devices_only_enumerates(self, mock_open_session_devices, mock_get_serial_ports,
+                                                            mock_get_video_devices):
+        results = []
+
+        start_session_thread(SessionProfile(), lambda *devices: results.append(devices)).join(5)
+
+        mock_open_session_devices.assert_not_called()
+        mock_get_video_devices.assert_called_once_with(())
+        self.assertEqual(results, [([], ["COM1"], [0])])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,163 @@
+import csv
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import Mock, patch
+
+import cv2
+import numpy as np
+
+import app.session_recorder
+from app.metrics import MetricsRegistry
+from app.session_recorder import (
+    RecordedFrame,
+    SessionRecorder,
+    index_path,
+    list_segments,
+    record_frame,
+    recording_options_requested,
+    start_session_recorder,
+    stop_session_recorder,
+)
+from app.video_capture import read_from_video_device
+from app.workers import RECORDER_WORKER, supervisor
+
+
+def recorded_frame(value, timestamp, marker_ids=(), x=None, y=None):
+    frame = np.full((120, 160, 3), value, dtype=np.uint8)
+    return RecordedFrame(frame, timestamp, True, list(marker_ids), x, y, 0.6 if x is not None else 0.0)
+
+
+def read_index(segment_path):
+    with open(index_path(segment_path), newline="") as index_file:
+        return list(csv.DictReader(index_file))
+
+
+class TestSessionRecorder(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.registry = MetricsRegistry()
+        patcher = patch("app.session_recorder.metrics", self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def record(self, recorder, frames):
+        for frame in frames:
+            self.assertTrue(recorder.submit(frame))
+        stop_event = threading.Event()
+        stop_event.set()
+        recorder.run(stop_event)  # Drains the queue before returning
+
+    def test_frames_are_written_to_segments_with_an_index(self):
+        recorder = SessionRecorder(self.directory, segment_seconds=1.0, grayscale=True, scale=0.5)
+        frames = [recorded_frame(10 * index, 100 + 0.25 * index, [1, 2, 3, 4], 102, 304) for index in range(6)]
+
+        self.record(recorder, frames)
+
+        segments = list_segments(self.directory)
+        self.assertEqual(len(segments), 2)  # 4 frames in the first second, 2 in the next
+        capture = cv2.VideoCapture(segments[0])
+        ret, frame = capture.read()
+        capture.release()
+        self.assertTrue(ret)
+        self.assertEqual(frame.shape[:2], (60, 80))
+        index = read_index(segments[0])
+        self.assertEqual([row["frame"] for row in index], ["0", "1", "2", "3"])
+        self.assertEqual(index[1], {"frame": "1", "timestamp": "100.250000", "detected": "1",
+                                    "marker_ids": "1 2 3 4", "x": "102", "y": "304", "confidence": "0.60"})
+        self.assertEqual(len(read_index(segments[1])), 2)
+        self.assertEqual(self.registry.values_snapshot()['recorder_frames_total{outcome="written"}'], 6)
+
+    def test_frames_are_dropped_when_the_writer_falls_behind(self):
+        recorder = SessionRecorder(self.directory, queue_size=2)
+
+        accepted = [recorder.submit(recorded_frame(0, index)) for index in range(5)]
+
+        self.assertEqual(accepted, [True, True, False, False, False])
+        self.assertEqual(recorder.frames_dropped, 3)
+        self.assertEqual(self.registry.values_snapshot()['recorder_frames_total{outcome="dropped"}'], 3)
+
+    def test_oldest_segments_are_deleted_beyond_the_quota(self):
+        for name in ("segment_20260101-000000_0000", "segment_20260101-000100_0001", "segment_20260101-000200_0002"):
+            with open(os.path.join(self.directory, name + ".avi"), "wb") as video_file:
+                video_file.write(b"\0" * 900)
+            with open(os.path.join(self.directory, name + ".csv"), "w") as index_file:
+                index_file.write("x" * 100)
+        recorder = SessionRecorder(self.directory, quota_bytes=2500)
+
+        recorder.enforce_quota()
+
+        self.assertEqual([os.path.basename(path) for path in list_segments(self.directory)],
+                         ["segment_20260101-000100_0001.avi", "segment_20260101-000200_0002.avi"])
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "segment_20260101-000000_0000.csv")))
+        self.assertEqual(recorder.segments_deleted, 1)
+
+        recorder.quota_bytes = 0
+        self.record(recorder, [recorded_frame(0, 0.0)])
+        self.assertEqual(len(list_segments(self.directory)), 1)  # Only the new segment is left
+        self.assertEqual(self.registry.values_snapshot()["recorder_segments_deleted_total"], 3)
+
+    def test_unwritable_segment_stops_the_recording(self):
+        recorder = SessionRecorder(os.path.join(self.directory, "missing"))
+
+        with self.assertLogs("app.session_recorder", "ERROR"):
+            self.record(recorder, [recorded_frame(0, 0.0)])
+        self.assertEqual(recorder.frames_written, 0)
+
+        # Later frames are turned away instead of filling the queue and counting as dropped
+        self.assertFalse(any([recorder.submit(recorded_frame(0, index)) for index in range(100)]))
+        self.assertTrue(recorder.queue.empty())
+        self.assertEqual(recorder.frames_dropped, 0)
+        self.assertNotIn('recorder_frames_total{outcome="dropped"}', self.registry.values_snapshot())
+
+    def test_invalid_scale(self):
+        with self.assertRaises(ValueError):
+            SessionRecorder(self.directory, scale=2)
+
+    def test_started_recorder_records_the_capture_loop(self):
+        args = recording_options_requested(["--record-session", self.directory, "--record-grayscale"])
+        self.assertIsNone(recording_options_requested([]).record_session)
+        self.assertFalse(start_session_recorder(recording_options_requested([])))
+        record_frame(np.zeros((8, 8, 3), dtype=np.uint8), True, [], None, None, 0.0)  # Nothing to record to
+
+        self.assertTrue(start_session_recorder(args))
+        self.addCleanup(stop_session_recorder)
+        self.assertTrue(supervisor.is_running(RECORDER_WORKER))
+        source = Mock()
+        source.is_live = False
+        frame = np.zeros((120, 160, 3), dtype=np.uint8)
+        source.read.side_effect = [(True, frame)] * 3 + [(False, None)]
+        with patch("app.video_capture.open_frame_source", return_value=source), \
+                patch("app.video_capture.detect_aruco_markers", return_value=[1, 2, 3, 4]), \
+                patch("app.video_capture.submit_target"), \
+                patch("app.video_capture.current_video_device", None):
+            read_from_video_device("recording.avi", None)
+        stop_session_recorder()
+
+        self.assertIsNone(app.session_recorder.session_recorder)
+        self.assertFalse(supervisor.is_running(RECORDER_WORKER))
+        index = read_index(list_segments(self.directory)[0])
+        self.assertEqual([(row["x"], row["y"]) for row in index], [("", ""), ("", ""), ("102", "304")])
+
+    def test_recorder_that_does_not_finish_in_time_is_logged(self):
+        args = recording_options_requested(["--record-session", self.directory])
+        release = threading.Event()
+        with patch.object(SessionRecorder, "write", lambda recorder, frame: release.wait()):
+            self.assertTrue(start_session_recorder(args))
+            thread = supervisor.workers[RECORDER_WORKER].thread
+            self.addCleanup(thread.join)
+            self.addCleanup(release.set)
+            record_frame(np.zeros((8, 8, 3), dtype=np.uint8), True, [], None, None, 0.0)  # Stuck writing
+            record_frame(np.zeros((8, 8, 3), dtype=np.uint8), True, [], None, None, 0.0)
+
+            with patch("app.session_recorder.RECORDER_STOP_TIMEOUT", 0.2), \
+                    self.assertLogs("app.session_recorder", "ERROR") as log:
+                stop_session_recorder()
+        self.assertIn("did not finish within", log.output[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
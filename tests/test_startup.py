@@ -0,0 +1,52 @@
+import unittest
+from unittest.mock import patch
+
+from app.startup import (
+    STARTUP_FORBIDDEN_MODULES,
+    STARTUP_IMPORT_BUDGET,
+    format_import_profile,
+    parse_import_time,
+    run_import_profile,
+)
+
+IMPORT_TIME_OUTPUT = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:        40 |         80 |     tkinter.constants
+import time:       900 |       5000 | app.main
+"""
+
+
+class TestStartup(unittest.TestCase):
+    def test_parse_import_time(self):
+        rows = parse_import_time(IMPORT_TIME_OUTPUT)
+        self.assertEqual(rows, [(120, 120, "_io"), (40, 80, "tkinter.constants"), (900, 5000, "app.main")])
+
+    def test_format_import_profile_sorts_by_cumulative_time(self):
+        output = format_import_profile(parse_import_time(IMPORT_TIME_OUTPUT), limit=2)
+        lines = output.splitlines()
+        self.assertIn("app.main", lines[1])
+        self.assertIn("_io", lines[2])
+        self.assertEqual(lines[-1], "3 modules imported")
+
+    @patch("app.startup.sys.frozen", True, create=True)
+    def test_run_import_profile_in_frozen_build(self):
+        self.assertIsNone(run_import_profile())
+
+    def test_startup_import_budget(self):
+        rows = run_import_profile("app.main")
+        imported = [module for _, _, module in rows]
+        self.assertIn("app.main", imported)
+        for forbidden in STARTUP_FORBIDDEN_MODULES:
+            with self.subTest(module=forbidden):
+                self.assertFalse(
+                    [module for module in imported if module.split(".")[0] == forbidden],
+                    f"{forbidden} must not be imported before the first window",
+                )
+        self.assertLessEqual(
+            len(imported), STARTUP_IMPORT_BUDGET,
+            f"importing app.main pulls in {len(imported)} modules, budget is {STARTUP_IMPORT_BUDGET}",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from app.batch import decode_frames
+from app.synthetic import (
+    RESOLUTIONS,
+    SceneDistortion,
+    coordinates_to_marker_ids,
+    generate_scene,
+    generate_scenes,
+    read_ground_truth,
+    write_scene_directory,
+)
+from app.video_capture import DETECTOR_MODES, convert_aruco_marker_ids_to_coordinates, detect_aruco_markers
+
+
+class TestSynthetic(unittest.TestCase):
+    def test_coordinates_to_marker_ids_round_trips(self):
+        for x, y in [(0, 0), (102, 304), (1920, 1080), (9999, 9999)]:
+            with self.subTest(x=x, y=y):
+                self.assertEqual(convert_aruco_marker_ids_to_coordinates(coordinates_to_marker_ids(x, y)), (x, y))
+
+        with self.assertRaises(ValueError):
+            coordinates_to_marker_ids(10000, 0)
+
+    def test_generate_scene_matches_resolution_and_ground_truth(self):
+        for resolution, (width, height) in RESOLUTIONS.items():
+            with self.subTest(resolution=resolution):
+                scene = generate_scene(1234, 567, resolution, rng=np.random.default_rng(0))
+                self.assertEqual(scene.frame.shape, (height, width, 3))
+                self.assertEqual(scene.frame.dtype, np.uint8)
+                self.assertEqual(scene.marker_ids, [12, 34, 5, 67])
+                self.assertEqual(scene.coordinates, (1234, 567))
+                self.assertEqual(scene.marker_corners.shape, (4, 4, 2))
+                self.assertTrue(np.all(np.diff(scene.marker_corners[:, 0, 0]) > 0), "markers run left to right")
+
+    def test_generate_scenes_is_repeatable(self):
+        first = [scene.coordinates for scene in generate_scenes(3, "480p", seed=7)]
+        second = [scene.coordinates for scene in generate_scenes(3, "480p", seed=7)]
+        self.assertEqual(first, second)
+
+    def test_generated_scenes_are_detected_in_every_mode(self):
+        scenes = list(generate_scenes(3, "480p", SceneDistortion(perspective=0.1, blur=0.8, noise=3.0), seed=1))
+        for mode in DETECTOR_MODES:
+            for scene in scenes:
+                with self.subTest(mode=mode, coordinates=scene.coordinates):
+                    marker_ids = detect_aruco_markers(scene.frame, mode=mode)
+                    self.assertEqual(convert_aruco_marker_ids_to_coordinates(marker_ids), scene.coordinates)
+
+    def test_write_scene_directory_is_readable_by_batch_decoding(self):
+        with tempfile.TemporaryDirectory() as directory:
+            count = write_scene_directory(directory, generate_scenes(3, "480p", seed=2))
+            self.assertEqual(count, 3)
+            self.assertEqual(len([name for name in os.listdir(directory) if name.endswith(".png")]), 3)
+
+            results, report = decode_frames(directory)
+            self.assertEqual([(result.x, result.y) for result in results], read_ground_truth(directory))
+            self.assertEqual(report.success_rate, 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
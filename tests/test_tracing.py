@@ -0,0 +1,129 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from app.metrics import END_TO_END, LAUNCH_TO_FIRST_MOVE, MetricsRegistry
+from app.tracing import (
+    CAMERA_SOURCE,
+    CURSOR_MOVED,
+    NO_MOVE,
+    SERIAL_SOURCE,
+    TraceBuffer,
+    begin_sample,
+    current_sample,
+    end_sample,
+    record_stage,
+    trace_file_requested,
+)
+
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        buffer_patcher = patch("app.tracing.trace_buffer", TraceBuffer(capacity=3))
+        self.trace_buffer = buffer_patcher.start()
+        self.addCleanup(buffer_patcher.stop)
+        self.registry = MetricsRegistry()
+        metrics_patcher = patch("app.metrics.metrics", self.registry)
+        metrics_patcher.start()
+        self.addCleanup(metrics_patcher.stop)
+        first_move_patcher = patch("app.tracing.first_move_seconds", None)
+        first_move_patcher.start()
+        self.addCleanup(first_move_patcher.stop)
+        self.addCleanup(end_sample)
+
+    def test_sample_carries_its_stages_to_the_cursor_move(self):
+        begin_sample(SERIAL_SOURCE, 10.0)
+        record_stage("serial_read", 10.0, 10.001)
+        record_stage("serial_parse", 10.001, 10.002)
+        record_stage("mouse_move", 10.002, 10.2)
+        end_sample(CURSOR_MOVED, 10.2)
+
+        trace, = self.trace_buffer.snapshot()
+        self.assertEqual(trace.source, SERIAL_SOURCE)
+        self.assertEqual(trace.outcome, CURSOR_MOVED)
+        self.assertEqual([stage for stage, _started, _ended in trace.spans],
+                         ["serial_read", "serial_parse", "mouse_move"])
+        self.assertAlmostEqual(trace.latency(), 0.2)
+        self.assertIsNone(current_sample())
+        snapshot = self.registry.snapshot()
+        self.assertEqual(snapshot[END_TO_END]["count"], 1)
+        self.assertEqual(snapshot["serial_parse"]["count"], 1)
+
+    def test_stages_without_a_sample_are_only_measured(self):
+        record_stage("mouse_move", 1.0, 1.1)
+        end_sample(CURSOR_MOVED)
+
+        self.assertEqual(self.trace_buffer.snapshot(), [])
+        self.assertEqual(self.registry.snapshot()["mouse_move"]["count"], 1)
+        self.assertEqual(self.registry.snapshot()[END_TO_END]["count"], 0)
+
+    def test_open_sample_is_finished_by_the_next_one(self):
+        begin_sample(CAMERA_SOURCE, 1.0)
+        begin_sample(CAMERA_SOURCE, 2.0)
+        end_sample()
+
+        first, second = self.trace_buffer.snapshot()
+        self.assertEqual((first.arrival, first.outcome), (1.0, NO_MOVE))
+        self.assertEqual(second.arrival, 2.0)
+        self.assertLess(first.sample_id, second.sample_id)
+
+    def test_samples_are_per_thread(self):
+        begin_sample(CAMERA_SOURCE, 1.0)
+        worker = threading.Thread(target=lambda: (begin_sample(SERIAL_SOURCE, 2.0), end_sample(CURSOR_MOVED)))
+        worker.start()
+        worker.join()
+
+        self.assertEqual(current_sample().source, CAMERA_SOURCE)
+        self.assertEqual([trace.source for trace in self.trace_buffer.snapshot()], [SERIAL_SOURCE])
+
+    @patch("app.tracing.STARTUP_CLOCK_START", 4.0)
+    def test_first_cursor_move_after_launch_is_recorded_once(self):
+        begin_sample(CAMERA_SOURCE, 5.0)
+        end_sample(NO_MOVE, 5.1)
+        self.assertEqual(self.registry.histogram(LAUNCH_TO_FIRST_MOVE).count, 0)
+
+        for arrival in (6.0, 7.0):
+            begin_sample(SERIAL_SOURCE, arrival)
+            end_sample(CURSOR_MOVED, arrival + 0.5)
+
+        histogram = self.registry.histogram(LAUNCH_TO_FIRST_MOVE)
+        self.assertEqual(histogram.count, 1)
+        self.assertAlmostEqual(histogram.max, 2.5, delta=0.1)
+
+    def test_buffer_keeps_only_the_newest_traces(self):
+        for arrival in range(5):
+            begin_sample(CAMERA_SOURCE, float(arrival))
+        end_sample()
+
+        self.assertEqual([trace.arrival for trace in self.trace_buffer.snapshot()], [2.0, 3.0, 4.0])
+
+    def test_write_chrome_trace(self):
+        begin_sample(CAMERA_SOURCE, 1.0)
+        record_stage("detection", 1.01, 1.03)
+        end_sample(CURSOR_MOVED, 1.05)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "traces", "trace.json")
+            self.trace_buffer.write_chrome_trace(path)
+            with open(path) as trace_file:
+                events = json.load(trace_file)["traceEvents"]
+
+        complete_events = [event for event in events if event["ph"] == "X"]
+        self.assertEqual([event["name"] for event in complete_events], ["camera sample", "detection"])
+        sample, detection = complete_events
+        self.assertAlmostEqual(sample["ts"], 1e6)
+        self.assertAlmostEqual(sample["dur"], 5e4)
+        self.assertEqual(sample["cat"], CURSOR_MOVED)
+        self.assertAlmostEqual(detection["dur"], 2e4)
+        self.assertEqual(sample["tid"], detection["tid"])
+
+    def test_trace_file_requested(self):
+        self.assertEqual(trace_file_requested(["--trace-file", "trace.json"]), "trace.json")
+        self.assertIsNone(trace_file_requested([]))
+
+
+if __name__ == "__main__":
+    unittest.main()
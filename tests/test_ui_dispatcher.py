@@ -0,0 +1,102 @@
+import threading
+import unittest
+from unittest.mock import MagicMock, Mock, call
+
+from app.ui_dispatcher import UIDispatcher
+
+
+def post_from_worker(dispatcher, *posts):
+    def worker():
+        for action, args, key in posts:
+            dispatcher.post(action, *args, key=key)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+
+
+class TestUIDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.root = MagicMock()
+        self.dispatcher = UIDispatcher(interval_ms=10)
+
+    def test_posts_wait_for_a_root(self):
+        action = Mock()
+        post_from_worker(self.dispatcher, (action, (1, 2), None))
+        self.dispatcher.post(action, 3)  # Not inline either, there is no Tk thread yet
+        action.assert_not_called()
+
+        self.dispatcher.attach(self.root)
+        self.dispatcher.tick()
+        self.assertEqual(action.call_args_list, [call(1, 2), call(3)])
+
+    def test_posts_after_detach_wait_for_the_next_attach(self):
+        self.dispatcher.attach(self.root)
+        self.dispatcher.detach()
+        action = Mock()
+
+        post_from_worker(self.dispatcher, (action, (), None))
+        self.dispatcher.post(action)
+        action.assert_not_called()
+        self.assertEqual(len(self.dispatcher.pending), 2)
+
+        self.dispatcher.attach(self.root)
+        self.dispatcher.tick()
+        self.assertEqual(action.call_count, 2)
+
+    def test_worker_posts_run_on_tick(self):
+        self.dispatcher.attach(self.root)
+        self.root.after.assert_called_once_with(10, self.dispatcher.tick)
+        action = Mock()
+
+        post_from_worker(self.dispatcher, (action, ("a",), None), (action, ("b",), None))
+        action.assert_not_called()
+
+        self.dispatcher.tick()
+        self.assertEqual(action.call_args_list, [call("a"), call("b")])
+        self.assertEqual(self.root.after.call_count, 2)
+
+    def test_posts_from_tk_thread_run_inline(self):
+        self.dispatcher.attach(self.root)
+        action = Mock()
+        self.dispatcher.post(action)
+        action.assert_called_once_with()
+
+    def test_redundant_show_hide_pairs_collapse(self):
+        self.dispatcher.attach(self.root)
+        show, hide, other = Mock(), Mock(), Mock()
+
+        post_from_worker(
+            self.dispatcher,
+            (show, (), "dot"), (hide, (), "dot"), (other, (), None), (show, (), "dot"), (hide, (), "dot"),
+        )
+        self.dispatcher.drain()
+
+        show.assert_not_called()
+        hide.assert_called_once()
+        other.assert_called_once()
+        self.assertEqual(self.dispatcher.collapsed_actions, 3)
+
+    def test_failing_action_does_not_stop_drain(self):
+        self.dispatcher.attach(self.root)
+        failing, action = Mock(side_effect=RuntimeError("boom")), Mock()
+        post_from_worker(self.dispatcher, (failing, (), None), (action, (), None))
+
+        with self.assertLogs(level="ERROR"):
+            self.dispatcher.drain()
+        action.assert_called_once()
+
+    def test_detach_runs_pending_actions_and_stops_ticking(self):
+        self.dispatcher.attach(self.root)
+        action = Mock()
+        post_from_worker(self.dispatcher, (action, (), None))
+
+        self.dispatcher.detach()
+        action.assert_called_once()
+        self.root.after_cancel.assert_called_once()
+        self.dispatcher.tick()
+        self.assertEqual(self.root.after.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
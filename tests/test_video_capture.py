@@ -1,4 +1,7 @@
+import os
+import tempfile
 import threading
+import time
 import tkinter
 import unittest
 from unittest.mock import patch, Mock, MagicMock
@@ -7,18 +10,40 @@ import cv2.aruco as aruco
 import numpy as np
 from PIL import Image
 
+from app.homography import HomographyCalibrator, ScreenHomography
+from app.metrics import MetricsRegistry
+from app.synthetic import render_marker_strip
 from app.video_capture import (
     convert_aruco_marker_ids_to_coordinates,
     detect_aruco_markers,
+    get_current_video_device,
+    homography_calibration_requested,
+    request_homography_calibration,
+    update_homography_calibration,
     get_video_devices,
     start_video_thread,
     stop_video_capture,
     read_from_video_device,
-    draw_video_image_to_canvas
+    wait_for_first_frame,
+    draw_video_image_to_canvas,
+    show_video_image,
+    VIDEO_PREVIEW_UI_KEY,
 )
+from app.window_actions import ARUCO_MARKER_UI_KEY, hide_aruco_marker
 
 
 class TestVideoCapture(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.temp_dir = temp_dir.name
+        # No homography saved on this machine is loaded into the capture loop
+        for patcher in (patch("app.video_capture.homography_calibrator", None),
+                        patch("app.homography.default_homography_path",
+                              return_value=os.path.join(temp_dir.name, "homography.json")),
+                        patch("app.window_actions.marker_cache_dir", temp_dir.name)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
 
     def test_convert_aruco_marker_ids_to_coordinates(self):
         self.assertEqual(convert_aruco_marker_ids_to_coordinates([1, 2, 3, 4]), (102, 304))
@@ -41,6 +66,21 @@ class TestVideoCapture(unittest.TestCase):
         marker_ids = detect_aruco_markers(img, dictionary)
         self.assertEqual(marker_ids, [])
 
+    @patch("app.video_capture.aruco.detectMarkers")
+    def test_detect_aruco_markers_fast_mode_detects_on_downscaled_grayscale(self, mock_detectMarkers):
+        mock_detectMarkers.return_value = ([], None, Mock())
+        img = np.zeros((2160, 3840, 3), dtype=np.uint8)
+
+        detect_aruco_markers(img, mode="fast")
+
+        detection_image = mock_detectMarkers.call_args.kwargs["image"]
+        self.assertEqual(detection_image.shape, (540, 960))
+        self.assertIsNotNone(mock_detectMarkers.call_args.kwargs["parameters"])
+
+    def test_detect_aruco_markers_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            detect_aruco_markers(np.zeros((10, 10), dtype=np.uint8), mode="turbo")
+
     @patch("cv2.VideoCapture")
     def test_get_video_devices(self, mock_video_capture):
         mock_cap = Mock()
@@ -57,45 +97,52 @@ class TestVideoCapture(unittest.TestCase):
         video_device_indices = get_video_devices()
         self.assertEqual(video_device_indices, [0, 1, 2])
 
-    @patch("time.sleep")
-    def test_stop_video_capture(self, mock_sleep):
-        # Mock the current_video_device and stop_event
-        mock_current_video_device = Mock()
-        mock_stop_event = threading.Event()
+    @patch("cv2.VideoCapture")
+    def test_get_video_devices_does_not_open_devices_in_use(self, mock_video_capture):
+        mock_video_capture.return_value.read.return_value = (False, None)
 
-        # Ensure stop_event is initialized
-        mock_stop_event.clear()
+        self.assertEqual(get_video_devices(in_use=(3,)), [3])
+        self.assertNotIn(3, [call.args[0] for call in mock_video_capture.call_args_list])
+        self.assertEqual(mock_video_capture.call_count, 9)
 
-        with patch("app.video_capture.current_video_device", mock_current_video_device), \
-            patch("app.video_capture.stop_event", mock_stop_event):
-            stop_video_capture()
-            self.assertTrue(mock_stop_event.is_set())
-            mock_sleep.assert_called_once_with(1)
-            self.assertTrue(mock_current_video_device.release.called)
+    @patch("app.video_capture.detect_aruco_markers", return_value=[])
+    @patch("app.video_capture.open_frame_source")
+    def test_stop_video_capture(self, mock_open_frame_source, mock_detect_aruco_markers):
+        mock_source = Mock()
+        mock_source.is_live = True
+        mock_source.read.return_value = (True, np.zeros((10, 10, 3), dtype=np.uint8))
+        mock_open_frame_source.return_value = mock_source
+        start_video_thread(0, None)
+        self.assertTrue(wait_for_first_frame(2))
 
-    @patch("threading.Thread")
-    @patch("app.video_capture.stop_video_capture")
-    def test_start_video_thread(self, mock_stop_video_capture, mock_thread):
-        mock_thread_instance = Mock()
-        mock_thread.return_value = mock_thread_instance
+        started = time.perf_counter()
+        stop_video_capture()
 
+        # The thread has exited and released the device before stop_video_capture returns
+        self.assertLess(time.perf_counter() - started, 0.5)
+        mock_source.release.assert_called_once()
+        self.assertNotIn("video-capture", [thread.name for thread in threading.enumerate()])
+        self.assertIsNone(get_current_video_device())
+
+    @patch("app.video_capture.supervisor")
+    @patch("app.video_capture.stop_video_capture")
+    def test_start_video_thread(self, mock_stop_video_capture, mock_supervisor):
         canvas = MagicMock()
         result = start_video_thread(0, canvas)
 
         self.assertTrue(result)
         mock_stop_video_capture.assert_called_once()
-        mock_thread.assert_called_once_with(target=read_from_video_device, args=(0, canvas), daemon=True)
-        mock_thread_instance.start.assert_called_once()
+        mock_supervisor.start.assert_called_once_with("video-capture", read_from_video_device, 0, canvas, None,
+                                                      "default", None)
 
     @patch("cv2.VideoCapture")
     @patch("app.video_capture.detect_aruco_markers")
     @patch("app.video_capture.convert_aruco_marker_ids_to_coordinates")
-    @patch("app.video_capture.move_mouse")
+    @patch("app.video_capture.submit_target")
     @patch("PIL.Image.fromarray")
-    @patch("app.video_capture.get_current_video_device")
     @patch("app.video_capture.draw_video_image_to_canvas")
-    def test_read_from_video_device(self, mock_draw_video_image_to_canvas, mock_get_current_video_device,
-                                    mock_fromarray, mock_move_mouse,
+    def test_read_from_video_device(self, mock_draw_video_image_to_canvas,
+                                    mock_fromarray, mock_submit_target,
                                     mock_convert_aruco_marker_ids_to_coordinates, mock_detect_aruco_markers,
                                     mock_video_capture):
         mock_cap = Mock()
@@ -104,7 +151,7 @@ class TestVideoCapture(unittest.TestCase):
         mock_frame = np.zeros((1080, 1920, 3), dtype=np.uint8)  # Creating a dummy frame
         mock_cap.read.return_value = (True, mock_frame)
 
-        mock_get_current_video_device.return_value = mock_cap
+        mock_detect_aruco_markers.return_value = [1, 0, 2, 0]
         mock_convert_aruco_marker_ids_to_coordinates.return_value = (100, 200)
 
         # Create a mock image with a valid mode
@@ -120,18 +167,168 @@ class TestVideoCapture(unittest.TestCase):
 
         with patch(
           "app.video_capture.current_video_device", mock_cap
-        ), patch("app.video_capture.stop_event", mock_stop_event):
-            read_from_video_device(0, canvas)
+        ):
+            read_from_video_device(0, canvas, stop_event=mock_stop_event)
             self.assertTrue(mock_cap.read.called)
             self.assertEqual(mock_cap.read.call_count, 4)  # 4 reads before stopping
             mock_detect_aruco_markers.assert_called()
-            mock_convert_aruco_marker_ids_to_coordinates.assert_called()
-            mock_move_mouse.assert_called()
+            # The same markers in every frame decode once and move the mouse once
+            mock_convert_aruco_marker_ids_to_coordinates.assert_called_once_with([1, 0, 2, 0])
+            mock_submit_target.assert_called_once_with("camera", 100, 200, 0.1)
             mock_draw_video_image_to_canvas.assert_called()
 
+    @patch("app.video_capture.submit_target")
+    @patch("app.video_capture.detect_aruco_markers", return_value=[1, 2, 3, 4])
+    @patch("app.video_capture.open_frame_source")
+    def test_read_from_video_device_stops_at_end_of_recording(self, mock_open_frame_source,
+                                                              mock_detect_aruco_markers, mock_submit_target):
+        mock_source = Mock()
+        mock_source.is_live = False
+        frame = np.zeros((10, 10, 3), dtype=np.uint8)
+        mock_source.read.side_effect = [(True, frame), (True, frame), (True, frame), (False, None)]
+        mock_open_frame_source.return_value = mock_source
+
+        with patch("app.video_capture.current_video_device", None):
+            read_from_video_device("recording.avi", None)
+
+        mock_open_frame_source.assert_called_once_with("recording.avi", None)
+        self.assertEqual(mock_source.read.call_count, 4)
+        mock_source.release.assert_called_once()
+        mock_submit_target.assert_called_once_with("camera", 102, 304, 0.1)
+        self.assertTrue(wait_for_first_frame(0))
+
+    @patch("app.video_capture.open_frame_source")
+    def test_read_from_video_device_reports_the_opened_size(self, mock_open_frame_source):
+        mock_source = Mock()
+        mock_source.is_live = False
+        mock_source.read.return_value = (False, None)
+        mock_source.frame_size.return_value = (1280, 720)
+        mock_open_frame_source.return_value = mock_source
+        on_opened = Mock()
+
+        with patch("app.video_capture.current_video_device", None):
+            read_from_video_device(7, None, (1920, 1080), on_opened=on_opened)
+
+        on_opened.assert_called_once_with((1280, 720))
+
+    @patch("app.video_capture.open_frame_source", side_effect=IOError("Cannot open frame source 7"))
+    def test_wait_for_first_frame_fails_when_device_cannot_be_opened(self, mock_open_frame_source):
+        with patch("app.video_capture.supervisor"):
+            start_video_thread(7, None, (1280, 720), "fast")
+
+        read_from_video_device(7, None, (1280, 720), "fast")
+
+        mock_open_frame_source.assert_called_once_with(7, (1280, 720))
+        self.assertFalse(wait_for_first_frame(0))
+
+    @patch("app.video_capture.submit_target")
+    @patch("app.video_capture.detect_aruco_markers", return_value=[1, 2, 3, 4])
+    @patch("app.video_capture.open_frame_source")
+    def test_read_from_video_device_skips_detection_on_still_frames(self, mock_open_frame_source,
+                                                                    mock_detect_aruco_markers, mock_submit_target):
+        mock_source = Mock()
+        mock_source.is_live = False
+        frame = np.zeros((120, 160, 3), dtype=np.uint8)
+        mock_source.read.side_effect = [(True, frame)] * 20 + [(False, None)]
+        mock_open_frame_source.return_value = mock_source
+
+        registry = MetricsRegistry()
+
+        with patch("app.video_capture.current_video_device", None), \
+                patch("app.video_capture.metrics", registry):
+            read_from_video_device("recording.avi", None)
+
+        self.assertLess(mock_detect_aruco_markers.call_count, 20)
+        values = registry.values_snapshot()
+        self.assertAlmostEqual(values["motion_gate_skipped_fraction"], (20 - mock_detect_aruco_markers.call_count) / 20)
+        self.assertIn("motion_gate_cpu_seconds_saved", values)
+        mock_submit_target.assert_called_once_with("camera", 102, 304, 0.1)
+
+    @patch("app.video_capture.submit_target")
+    @patch("app.video_capture.detect_aruco_markers")
+    @patch("app.video_capture.open_frame_source")
+    def test_still_frames_do_not_repeat_a_misdetection(self, mock_open_frame_source,
+                                                       mock_detect_aruco_markers, mock_submit_target):
+        mock_source = Mock()
+        mock_source.is_live = False
+        frame = np.zeros((120, 160, 3), dtype=np.uint8)
+        mock_source.read.side_effect = [(True, frame)] * 18 + [(False, None)]
+        mock_open_frame_source.return_value = mock_source
+        # The last frame detected before the scene is still enough to skip detection is misread
+        mock_detect_aruco_markers.side_effect = [[1, 2, 3, 4]] * 4 + [[9, 9, 9, 9]]
+
+        with patch("app.video_capture.current_video_device", None):
+            read_from_video_device("recording.avi", None)
+
+        self.assertEqual(mock_detect_aruco_markers.call_count, 5)
+        mock_submit_target.assert_called_once_with("camera", 102, 304, 0.1)
+
+    @patch("app.video_capture.run_on_ui_thread")
+    @patch("app.video_capture.get_homography_calibrator")
+    def test_update_homography_calibration(self, mock_get_homography_calibrator, mock_run_on_ui_thread):
+        calibrator = mock_get_homography_calibrator.return_value
+
+        request_homography_calibration()
+        calibrator.update.return_value = True
+        update_homography_calibration({1: "corners"})
+
+        calibrator.update.assert_called_once_with({1: "corners"}, force=True)
+        mock_run_on_ui_thread.assert_called_once_with(hide_aruco_marker, key=ARUCO_MARKER_UI_KEY)
+        self.assertFalse(homography_calibration_requested.is_set())
+
+        # Without a request the homography is only checked for drift
+        update_homography_calibration({1: "corners"})
+        calibrator.update.assert_called_with({1: "corners"}, force=False)
+        mock_run_on_ui_thread.assert_called_once()
+
+    @patch("app.video_capture.update_homography_calibration")
+    @patch("app.video_capture.detect_aruco_marker_corners", return_value={1: "corners"})
+    @patch("app.video_capture.detect_aruco_markers")
+    @patch("app.video_capture.open_frame_source")
+    def test_overlay_frames_only_detect_the_overlay_markers(self, mock_open_frame_source, mock_detect_aruco_markers,
+                                                            mock_detect_aruco_marker_corners,
+                                                            mock_update_homography_calibration):
+        mock_source = Mock()
+        mock_source.is_live = False
+        mock_source.read.side_effect = [(True, np.zeros((10, 10, 3), dtype=np.uint8))] * 3 + [(False, None)]
+        mock_open_frame_source.return_value = mock_source
+
+        with patch("app.video_capture.current_video_device", None), \
+                patch("app.window_actions.aruco_overlay_shown", True):
+            read_from_video_device("recording.avi", None)
+
+        self.assertEqual(mock_detect_aruco_marker_corners.call_count, 3)
+        mock_update_homography_calibration.assert_called_with({1: "corners"})
+        mock_detect_aruco_markers.assert_not_called()
+
+    @patch("app.video_capture.submit_target")
+    @patch("app.video_capture.open_frame_source")
+    def test_partly_hidden_strip_is_mapped_through_the_homography(self, mock_open_frame_source, mock_submit_target):
+        # Three markers of a strip whose fourth is hidden, seen by a camera at half the screen resolution
+        card, card_corners = render_marker_strip([1, 2, 3], 60)
+        frame = np.full((360, 640, 3), 255, dtype=np.uint8)
+        frame[100:100 + card.shape[0], 200:200 + card.shape[1]] = card[..., np.newaxis]
+        strip_center = card_corners.reshape(-1, 2).mean(axis=0) + (200, 100)
+        calibrator = HomographyCalibrator((1280, 720), os.path.join(self.temp_dir, "homography.json"))
+        calibrator.homography = ScreenHomography(np.diag([2.0, 2.0, 1.0]), (1280, 720))
+        mock_source = Mock()
+        mock_source.is_live = False
+        mock_source.read.side_effect = [(True, frame), (False, None)]
+        mock_open_frame_source.return_value = mock_source
+
+        with patch("app.video_capture.current_video_device", None), \
+                patch("app.video_capture.homography_calibrator", calibrator):
+            read_from_video_device("recording.avi", None)
+
+        mock_submit_target.assert_called_once()
+        source, x, y, speed = mock_submit_target.call_args[0]
+        self.assertEqual(source, "camera")
+        np.testing.assert_allclose((x, y), strip_center * 2, atol=2)
+
+    @patch("app.video_capture.run_on_ui_thread")
     @patch("PIL.ImageTk.PhotoImage")
     @patch("PIL.Image.fromarray")
-    def test_draw_video_image_to_canvas(self, mock_fromarray, mock_photoimage):
+    def test_draw_video_image_to_canvas(self, mock_fromarray, mock_photoimage, mock_run_on_ui_thread):
         mock_frame = np.zeros((1080, 1920, 3), dtype=np.uint8)  # Creating a dummy frame
         mock_img_pil = Mock(spec=Image.Image)
         mock_fromarray.return_value = mock_img_pil
@@ -141,8 +338,12 @@ class TestVideoCapture(unittest.TestCase):
         canvas = MagicMock()
         draw_video_image_to_canvas(mock_frame, canvas)
 
+        # Only the conversion runs on the capture thread, Tk objects are made on the Tk thread
         mock_fromarray.assert_called_once()
-        mock_photoimage.assert_called_once()
+        mock_photoimage.assert_not_called()
+        mock_run_on_ui_thread.assert_called_once_with(show_video_image, canvas, mock_img_pil,
+                                                      key=VIDEO_PREVIEW_UI_KEY)
+        show_video_image(canvas, mock_img_pil)
         canvas.create_image.assert_called_once_with(0, 0, anchor=tkinter.NW, image=mock_img_tk)
         self.assertEqual(canvas.img_tk, mock_img_tk)
 
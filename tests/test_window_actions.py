@@ -1,18 +1,33 @@
+import os
+import tempfile
+import threading
 import unittest
 from unittest.mock import patch, MagicMock
 
+import cv2
 import numpy as np
+import tkinter
 
+import app.window_actions
 from app.window_actions import (
     show_calibration_dot,
     hide_calibration_dot,
     calibration_dot_window,
     viewport_size,
+    crazy_mouse_movement,
     move_mouse_randomly,
     move_mouse,
     show_aruco_marker,
     hide_aruco_marker,
     aruco_marker_window,
+    load_aruco_marker,
+    compose_aruco_marker_overlay,
+    get_overlay_marker_coordinates,
+    get_overlay_marker_size,
+    show_all_aruco_markers,
+    OVERLAY_FALLBACK_COLOR,
+    marker_images,
+    prerender_aruco_markers,
     MarkerPosition
 )
 
@@ -27,10 +42,18 @@ class TestWindowActions(unittest.TestCase):
     def test_move_mouse_randomly(self):
         with patch("app.window_actions.random.randint") as mock_randint:
             with patch("app.window_actions.viewport_size", return_value=(800, 600)):
-                with patch("app.window_actions.move_mouse") as mock_move_mouse:
+                with patch("app.arbitration.submit_target") as mock_submit_target:
                     mock_randint.side_effect = [100, 200]
                     move_mouse_randomly(0.5)
-                    mock_move_mouse.assert_called_with(100, 200, 0.5)
+                    mock_submit_target.assert_called_with("manual", 100, 200, 0.5)
+
+    def test_crazy_mouse_movement_submits_manual_moves(self):
+        stop_event = threading.Event()
+        with patch("app.window_actions.viewport_size", return_value=(800, 600)), \
+                patch("app.arbitration.submit_target", side_effect=lambda *args: stop_event.set()) as mock_submit_target:
+            crazy_mouse_movement(stop_event)
+        mock_submit_target.assert_called_once()
+        self.assertEqual(mock_submit_target.call_args[0][0], "manual")
 
     def test_move_mouse_valid_coordinates(self):
         with patch("app.window_actions.viewport_size", return_value=(800, 600)):
@@ -62,6 +85,7 @@ class TestWindowActions(unittest.TestCase):
             self.assertEqual(width, 1920)
             self.assertEqual(height, 1080)
 
+    @patch("app.window_actions.calibration_dot_window", None)
     @patch("app.window_actions.viewport_size", return_value=(800, 600))
     def test_show_calibration_dot(self, mock_viewport_size):
         with patch(
@@ -74,21 +98,40 @@ class TestWindowActions(unittest.TestCase):
             instance.geometry.assert_called_once_with("50x50+375+275")
             instance.attributes.assert_any_call("-topmost", True)
             instance.configure.assert_called_once_with(bg="red")
+            instance.deiconify.assert_called_once()
+
+            # Showing it again reuses the window
+            show_calibration_dot()
+            mock_Toplevel.assert_called_once()
+            self.assertEqual(instance.deiconify.call_count, 2)
 
     @patch("app.window_actions.calibration_dot_window", new_callable=MagicMock)
     def test_hide_calibration_dot(self, mock_calibration_dot_window):
         instance = mock_calibration_dot_window
         hide_calibration_dot()
-        instance.destroy.assert_called_once()
-        self.assertIsNone(calibration_dot_window)
+        instance.withdraw.assert_called_once()
+        instance.destroy.assert_not_called()
 
     @patch("app.window_actions.calibration_dot_window", None)
     def test_hide_calibration_dot_when_not_visible(self):
         hide_calibration_dot()  # Should not raise an exception or call destroy
         self.assertIsNone(calibration_dot_window)
 
+    def patch_marker_caches(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        for patcher in (patch("app.window_actions.marker_cache_dir", temp_dir.name),
+                        patch.dict("app.window_actions.marker_images", clear=True),
+                        patch.dict("app.window_actions.marker_photo_images", clear=True)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return temp_dir.name
+
+    @patch("app.window_actions.aruco_marker_label", None)
+    @patch("app.window_actions.aruco_marker_window", None)
     @patch("app.window_actions.viewport_size", return_value=(800, 600))
     def test_show_aruco_marker(self, mock_viewport_size):
+        self.patch_marker_caches()
         with patch("app.window_actions.tk.Toplevel", new_callable=MagicMock) as mock_Toplevel:
             with patch("app.window_actions.generate_aruco_marker", return_value=np.zeros((200, 200), dtype=np.uint8)):
                 position = MarkerPosition.CENTER
@@ -100,13 +143,125 @@ class TestWindowActions(unittest.TestCase):
                     instance.overrideredirect.assert_called_once_with(True)
                     instance.geometry.assert_called_once_with("200x200+300+200")
                     instance.attributes.assert_any_call("-topmost", True)
+                    instance.deiconify.assert_called_once()
+
+    @patch("app.window_actions.aruco_marker_label", new_callable=MagicMock)
+    @patch("app.window_actions.aruco_marker_window", new_callable=MagicMock)
+    @patch("app.window_actions.aruco_overlay_window", new_callable=MagicMock)
+    @patch("app.window_actions.aruco_overlay_shown", True)
+    @patch("app.window_actions.viewport_size", return_value=(800, 600))
+    def test_show_aruco_marker_replaces_the_overlay(self, mock_viewport_size, mock_overlay_window, mock_marker_window,
+                                                    mock_marker_label):
+        self.patch_marker_caches()
+        with patch("app.window_actions.get_aruco_marker_photo_image"):
+            show_aruco_marker(MarkerPosition.CENTER)
+
+        mock_overlay_window.withdraw.assert_called_once()
+        mock_marker_window.deiconify.assert_called_once()
+        self.assertFalse(app.window_actions.aruco_overlay_shown)
+
+    @patch("app.window_actions.aruco_marker_label", None)
+    @patch("app.window_actions.aruco_marker_window", None)
+    @patch("app.window_actions.viewport_size", return_value=(800, 600))
+    def test_switching_aruco_marker_reuses_window(self, mock_viewport_size):
+        self.patch_marker_caches()
+        with patch("app.window_actions.tk.Toplevel", new_callable=MagicMock) as mock_Toplevel, \
+                patch("app.window_actions.tk.Label", new_callable=MagicMock) as mock_Label, \
+                patch("app.window_actions.ImageTk.PhotoImage") as mock_PhotoImage, \
+                patch("app.window_actions.generate_aruco_marker",
+                      return_value=np.zeros((200, 200), dtype=np.uint8)) as mock_generate_aruco_marker:
+            mock_PhotoImage.side_effect = lambda image: MagicMock()
+            show_aruco_marker(MarkerPosition.TOPLEFT)
+            show_aruco_marker(MarkerPosition.BOTTOMRIGHT)
+            show_aruco_marker(MarkerPosition.TOPLEFT)
+
+            mock_Toplevel.assert_called_once()
+            mock_Label.assert_called_once()
+            self.assertEqual(mock_generate_aruco_marker.call_count, 2)
+            self.assertEqual(mock_PhotoImage.call_count, 2)
+            instance = mock_Toplevel.return_value
+            self.assertEqual(
+                [geometry_call.args[0] for geometry_call in instance.geometry.call_args_list],
+                ["200x200+0+0", "200x200+600+400", "200x200+0+0"],
+            )
+            instance.destroy.assert_not_called()
+
+    def test_load_aruco_marker_uses_disk_cache(self):
+        cache_dir = self.patch_marker_caches()
+        marker = load_aruco_marker(5, 100)
+        self.assertEqual(marker.shape, (100, 100))
+        self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+        marker_images.clear()
+        with patch("app.window_actions.generate_aruco_marker") as mock_generate_aruco_marker:
+            cached_marker = load_aruco_marker(5, 100)
+            mock_generate_aruco_marker.assert_not_called()
+        np.testing.assert_array_equal(cached_marker, marker)
+        self.assertIs(load_aruco_marker(5, 100), cached_marker)
+
+    @patch("app.window_actions.get_aruco_marker_photo_image")
+    def test_prerender_aruco_markers(self, mock_get_aruco_marker_photo_image):
+        prerender_aruco_markers()
+        self.assertEqual(
+            [marker_call.args[0] for marker_call in mock_get_aruco_marker_photo_image.call_args_list],
+            [position.value for position in MarkerPosition],
+        )
+
+    def test_compose_aruco_marker_overlay_is_detectable_in_one_frame(self):
+        self.patch_marker_caches()
+        for screen_size in [(1920, 1080), (800, 600)]:
+            with self.subTest(screen_size=screen_size):
+                marker_size = get_overlay_marker_size(*screen_size)
+                overlay = compose_aruco_marker_overlay(*screen_size, marker_size=marker_size)
+                self.assertEqual(overlay.shape, (screen_size[1], screen_size[0], 3))
+
+                aruco_dict = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_7X7_250)
+                corners, ids, _ = cv2.aruco.detectMarkers(overlay, aruco_dict)
+                self.assertEqual(sorted(ids.ravel()), [position.value for position in MarkerPosition])
+                for corner, marker_id in zip(corners, ids.ravel()):
+                    expected_x, expected_y = get_overlay_marker_coordinates(
+                        MarkerPosition(marker_id), marker_size, *screen_size
+                    )
+                    np.testing.assert_allclose(corner[0][0], (expected_x, expected_y), atol=1.5)
+
+    @patch("app.window_actions.aruco_marker_window", None)
+    @patch("app.window_actions.aruco_overlay_label", None)
+    @patch("app.window_actions.aruco_overlay_window", None)
+    @patch("app.window_actions.aruco_overlay_background", None)
+    @patch("app.window_actions.viewport_size", return_value=(800, 600))
+    def test_show_all_aruco_markers(self, mock_viewport_size):
+        self.patch_marker_caches()
+        with patch("app.window_actions.tk.Toplevel", new_callable=MagicMock) as mock_Toplevel, \
+                patch("app.window_actions.tk.Label", new_callable=MagicMock), \
+                patch("app.window_actions.ImageTk.PhotoImage") as mock_PhotoImage, \
+                patch("app.window_actions.compose_aruco_marker_overlay") as mock_compose:
+            mock_compose.return_value = np.zeros((600, 800, 3), dtype=np.uint8)
+            instance = mock_Toplevel.return_value
+
+            def attributes(name, value):
+                if name == "-transparentcolor":
+                    raise tkinter.TclError("bad attribute name")
+
+            instance.attributes.side_effect = attributes
+
+            show_all_aruco_markers()
+            show_all_aruco_markers()
+
+            mock_Toplevel.assert_called_once()
+            mock_compose.assert_called_once_with(800, 600, 120, None, OVERLAY_FALLBACK_COLOR)
+            mock_PhotoImage.assert_called_once()
+            instance.geometry.assert_called_with("800x600+0+0")
+            self.assertEqual(instance.deiconify.call_count, 2)
+
+            hide_aruco_marker()
+            instance.withdraw.assert_called()
 
     @patch("app.window_actions.aruco_marker_window", new_callable=MagicMock)
     def test_hide_aruco_marker(self, mock_aruco_marker_window):
         instance = mock_aruco_marker_window
         hide_aruco_marker()
-        instance.destroy.assert_called_once()
-        self.assertIsNone(aruco_marker_window)
+        instance.withdraw.assert_called_once()
+        instance.destroy.assert_not_called()
 
     @patch("app.window_actions.aruco_marker_window", None)
     def test_hide_aruco_marker_when_not_visible(self):
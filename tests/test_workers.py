@@ -0,0 +1,211 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, Mock, patch
+
+import numpy as np
+
+from app.serial import disconnect_from_serial, start_serial_thread
+from app.ui_dispatcher import ui_dispatcher
+from app.video_capture import start_video_thread, stop_video_capture, wait_for_first_frame
+from app.window_actions import start_crazy_mouse_movement, stop_crazy_mouse_movement
+from app.workers import CRAZY_MOUSE_WORKER, SERIAL_WORKER, VIDEO_WORKER, Worker, WorkerSupervisor, supervisor
+
+CYCLES = 1000
+# Each cycle with a preview converts a frame to 1280x720, so fewer of them
+PREVIEW_CYCLES = 100
+
+
+def wait_for(started, stop_event):
+    started.set()
+    stop_event.wait()
+
+
+class FakeFrameSource:
+    """
+    Live source that counts its releases and fails reads once released, like a closed camera.
+    """
+
+    is_live = True
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+
+    def __init__(self):
+        self.releases = 0
+
+    def read(self):
+        if self.releases:
+            raise RuntimeError("read after release")
+        return True, self.frame
+
+    def release(self):
+        self.releases += 1
+
+
+class FakeTkCanvas:
+    """
+    Preview canvas that records the threads drawing on it; Tk only allows its own thread.
+    """
+
+    def __init__(self):
+        self.drawing_threads = set()
+
+    def winfo_exists(self):
+        return True
+
+    def create_image(self, *args, **kwargs):
+        self.drawing_threads.add(threading.current_thread())
+
+
+class TestWorkers(unittest.TestCase):
+    def test_stop_joins_before_releasing(self):
+        events = []
+        started = threading.Event()
+
+        def work(stop_event):
+            started.set()
+            stop_event.wait()
+            time.sleep(0.01)
+            events.append("exited")
+
+        worker = Worker("test-worker", work, release=lambda: events.append("released"))
+        worker.start()
+        started.wait(1)
+
+        self.assertTrue(worker.stop(timeout=1))
+        self.assertEqual(events, ["exited", "released"])
+        self.assertFalse(worker.is_alive())
+
+    def test_stop_times_out_and_releases_anyway(self):
+        release = Mock()
+        blocked = threading.Event()
+        worker = Worker("stuck-worker", lambda stop_event: blocked.wait(1), release=release)
+        worker.start()
+
+        with self.assertLogs("app.workers", "WARNING"):
+            self.assertFalse(worker.stop(timeout=0.01))
+        release.assert_called_once()
+        blocked.set()
+
+    def test_start_replaces_the_worker_with_the_same_name(self):
+        workers = WorkerSupervisor(join_timeout=1)
+        first_started, second_started = threading.Event(), threading.Event()
+        first = workers.start("source", wait_for, first_started)
+        first_started.wait(1)
+
+        second = workers.start("source", wait_for, second_started)
+
+        self.assertFalse(first.is_alive())
+        self.assertTrue(second_started.wait(1))
+        self.assertTrue(workers.is_running("source"))
+        workers.stop_all()
+        self.assertFalse(second.is_alive())
+        self.assertTrue(workers.stop("source"))
+
+    def test_failing_worker_is_logged(self):
+        def fail(stop_event):
+            raise ValueError("broken device")
+
+        worker = Worker("failing-worker", fail)
+        with self.assertLogs("app.workers", "ERROR"):
+            worker.start()
+            worker.thread.join(1)
+
+
+class TestWorkerLeaks(unittest.TestCase):
+    """
+    Restarts every supervised source many times and checks that no thread or device is left behind.
+    """
+
+    def setUp(self):
+        self.threads_before = threading.active_count()
+
+    def assert_no_leaked_threads(self):
+        names = [thread.name for thread in threading.enumerate()]
+        for name in (SERIAL_WORKER, VIDEO_WORKER, CRAZY_MOUSE_WORKER, "serial-watcher"):
+            self.assertNotIn(name, names)
+        self.assertEqual(threading.active_count(), self.threads_before)
+
+    @patch("app.video_capture.logger")
+    @patch("app.video_capture.detect_aruco_markers", return_value=[])
+    @patch("app.video_capture.open_frame_source")
+    def test_video_start_stop_cycles(self, mock_open_frame_source, mock_detect_aruco_markers, mock_logger):
+        sources = []
+
+        def open_source(device_index, capture_size):
+            sources.append(FakeFrameSource())
+            return sources[-1]
+
+        mock_open_frame_source.side_effect = open_source
+
+        started = time.perf_counter()
+        for _cycle in range(CYCLES):
+            start_video_thread(0, None)
+            self.assertTrue(wait_for_first_frame(1))
+            stop_video_capture()
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(len(sources), CYCLES)
+        self.assertEqual([source.releases for source in sources], [1] * CYCLES)
+        self.assertLess(elapsed / CYCLES, 0.05)
+        self.assert_no_leaked_threads()
+
+    @patch("app.workers.logger")
+    @patch("PIL.ImageTk.PhotoImage")
+    @patch("app.video_capture.logger")
+    @patch("app.video_capture.detect_aruco_markers", return_value=[])
+    @patch("app.video_capture.open_frame_source")
+    def test_video_start_stop_cycles_from_the_tk_thread_with_preview(self, mock_open_frame_source,
+                                                                     mock_detect_aruco_markers, mock_logger,
+                                                                     mock_photo_image, mock_workers_logger):
+        mock_open_frame_source.side_effect = lambda device_index, capture_size: FakeFrameSource()
+        ui_dispatcher.attach(MagicMock())  # This test thread plays the Tk thread
+        self.addCleanup(ui_dispatcher.detach)
+        canvas = FakeTkCanvas()
+
+        started = time.perf_counter()
+        for _cycle in range(PREVIEW_CYCLES):
+            start_video_thread(0, canvas)
+            self.assertTrue(wait_for_first_frame(1))
+            stop_video_capture()
+            ui_dispatcher.drain()  # The Tk thread goes back to its event loop
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(canvas.drawing_threads, {threading.current_thread()})
+        self.assertLess(elapsed / PREVIEW_CYCLES, 0.1)
+        mock_workers_logger.warning.assert_not_called()
+        self.assert_no_leaked_threads()
+
+    @patch("app.serial.logger")
+    @patch("app.serial.list_ports.comports", return_value=[MagicMock(device="COM8")])
+    @patch("app.serial.serial.Serial")
+    def test_serial_start_stop_cycles(self, mock_serial, mock_comports, mock_logger):
+        connections = []
+
+        def open_port(port, baud_rate, timeout):
+            connection = Mock(port=port, in_waiting=0)
+            connections.append(connection)
+            return connection
+
+        mock_serial.side_effect = open_port
+
+        for _cycle in range(CYCLES):
+            self.assertTrue(start_serial_thread("COM8", 9600))
+            disconnect_from_serial()
+
+        self.assertEqual(len(connections), CYCLES)
+        self.assertTrue(all(connection.close.call_count == 1 for connection in connections))
+        self.assert_no_leaked_threads()
+
+    # A cursor move blocks in pyautogui, releasing the GIL like this sleep
+    @patch("app.window_actions.move_mouse_randomly", side_effect=lambda speed: time.sleep(0.0005))
+    def test_crazy_mouse_start_stop_cycles(self, mock_move_mouse_randomly):
+        for _cycle in range(CYCLES):
+            start_crazy_mouse_movement()
+            stop_crazy_mouse_movement()
+
+        self.assertFalse(supervisor.is_running(CRAZY_MOUSE_WORKER))
+        self.assert_no_leaked_threads()
+
+
+if __name__ == "__main__":
+    unittest.main()